@@ -21,7 +21,10 @@ from .ai_providers import (
     verify_api_key_sync,
     get_available_providers,
     get_provider,
-    create_client
+    create_client,
+    get_http_client_stats,
+    close_http_clients,
+    aclose_http_clients
 )
 from .ai_config_manager import (
     AIConfigManager,
@@ -72,6 +75,7 @@ __all__ = [
     'AI_PROVIDERS', 'AIProvider', 'AIModel', 'UniversalAIClient',
     'verify_api_key', 'verify_api_key_sync', 'get_available_providers',
     'get_provider', 'create_client',
+    'get_http_client_stats', 'close_http_clients', 'aclose_http_clients',
     # ai_config_manager
     'AIConfigManager', 'get_ai_config_manager', 'PROMPT_PRESETS', 'PromptPreset',
     # ai_db_manager
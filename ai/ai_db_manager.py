@@ -21,6 +21,7 @@ AI 决策数据库管理模块
 使用独立的 arena.db 数据库
 """
 
+import os
 import sqlite3
 import json
 import time
@@ -39,9 +40,80 @@ ARENA_DB_PATH = "arena.db"
 # 线程锁（SQLite 线程安全）
 _db_lock = threading.Lock()
 
+# 每个线程持有的长连接 {db_path: [conn, 嵌套深度]}
+_thread_local = threading.local()
+
 # 系统版本号（用于审计追踪）
 SYSTEM_VERSION = "1.0.0"
 
+# 每个 AI 的初始资金（资金曲线 / 回撤计算的基准）
+ARENA_INITIAL_CAPITAL = 10000.0
+
+# ai_stats 中随平仓增量维护的风险聚合字段（迁移时为旧表补列）
+_RUNNING_STATS_COLUMNS = {
+    'peak_equity': f"REAL DEFAULT {ARENA_INITIAL_CAPITAL}",
+    'max_drawdown': "REAL DEFAULT 0.0",
+    'current_drawdown': "REAL DEFAULT 0.0",
+    'consecutive_losses': "INTEGER DEFAULT 0",
+    'max_win_streak': "INTEGER DEFAULT 0",
+    'max_loss_streak': "INTEGER DEFAULT 0",
+    'daily_pnl': "REAL DEFAULT 0.0",
+    'daily_pnl_date': "TEXT DEFAULT ''",
+}
+
+# ai_positions 复合索引（按竞技场每轮的访问模式建立）
+# - (agent_name, status, exit_time, pnl): 单日 PnL / 回撤 / 连亏 / 交易历史，带 pnl 可覆盖查询不回表
+# - (status, exit_time): 全部未平仓 / 已平仓列表
+_POSITION_INDEXES = {
+    'idx_positions_agent_status_exit': "ai_positions(agent_name, status, exit_time, pnl)",
+    'idx_positions_status_exit': "ai_positions(status, exit_time)",
+}
+
+# 每轮决策都会执行的热点查询（方法与启动时的查询计划检查共用）
+_SQL_OPEN_POSITIONS_BY_AGENT = """
+    SELECT * FROM ai_positions 
+    WHERE status = 'open' AND agent_name = ?
+"""
+_SQL_OPEN_POSITIONS = "SELECT * FROM ai_positions WHERE status = 'open'"
+_SQL_DAILY_PNL = """
+    SELECT COALESCE(SUM(pnl), 0) as daily_pnl
+    FROM ai_positions
+    WHERE agent_name = ? 
+      AND status = 'closed'
+      AND exit_time >= ? 
+      AND exit_time < ?
+"""
+_SQL_DRAWDOWN_TRADES = """
+    SELECT pnl, exit_time
+    FROM ai_positions
+    WHERE agent_name = ? 
+      AND status = 'closed'
+      AND exit_time >= ?
+    ORDER BY exit_time ASC, id ASC
+"""
+_SQL_HISTORY_OPEN = """
+    SELECT * FROM ai_positions 
+    WHERE agent_name = ? AND status = 'open'
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+_SQL_HISTORY_CLOSED = """
+    SELECT * FROM ai_positions 
+    WHERE agent_name = ? AND status = 'closed'
+    ORDER BY exit_time DESC
+    LIMIT ?
+"""
+
+# 名称 -> (SQL, 示例参数)
+_HOT_QUERIES = {
+    'get_open_positions(agent)': (_SQL_OPEN_POSITIONS_BY_AGENT, ('deepseek',)),
+    'get_open_positions': (_SQL_OPEN_POSITIONS, ()),
+    'get_daily_pnl': (_SQL_DAILY_PNL, ('deepseek', 0, 0)),
+    'get_max_drawdown': (_SQL_DRAWDOWN_TRADES, ('deepseek', 0)),
+    'get_trade_history(open)': (_SQL_HISTORY_OPEN, ('deepseek', 50)),
+    'get_trade_history(closed)': (_SQL_HISTORY_CLOSED, ('deepseek', 50)),
+}
+
 
 @dataclass
 class AIDecision:
@@ -81,20 +153,148 @@ class AIStats:
     avg_pnl: float = 0.0
     last_signal: str = ""
     last_updated: int = 0
+    # 增量维护的风险聚合（平仓时与上面的字段在同一事务内更新）
+    peak_equity: float = ARENA_INITIAL_CAPITAL  # 资金曲线峰值
+    max_drawdown: float = 0.0  # 最大回撤（%）
+    current_drawdown: float = 0.0  # 当前回撤（%）
+    consecutive_losses: int = 0  # 当前连续亏损笔数（pnl < 0）
+    max_win_streak: int = 0
+    max_loss_streak: int = 0
+    daily_pnl: float = 0.0  # daily_pnl_date 当日累计 PnL
+    daily_pnl_date: str = ""  # YYYY-MM-DD（本地时间）
     
     def to_dict(self) -> Dict:
         return asdict(self)
 
 
-@contextmanager
-def get_db_connection(db_path: str = ARENA_DB_PATH):
-    """获取数据库连接（上下文管理器）"""
+def _trade_date(ts_ms: int) -> str:
+    """平仓时间戳 -> 本地日期（与 get_daily_pnl 的日界一致）"""
+    return datetime.fromtimestamp(ts_ms / 1000).strftime('%Y-%m-%d')
+
+
+def _apply_trade(stats: Dict[str, Any], pnl: float, is_win: bool, exit_time: int) -> Dict[str, Any]:
+    """
+    把一笔平仓计入 ai_stats 聚合（update_stats / close_position / backfill_stats 共用）
+    
+    返回新的字段字典，不修改入参
+    """
+    stats = dict(stats)
+    total_trades = stats['total_trades'] + 1
+    win_count = stats['win_count'] + (1 if is_win else 0)
+    loss_count = stats['loss_count'] + (0 if is_win else 1)
+    total_pnl = stats['total_pnl'] + pnl
+    
+    # 连胜/连败
+    current_streak = stats['current_streak']
+    if is_win:
+        current_streak = max(1, current_streak + 1) if current_streak >= 0 else 1
+    else:
+        current_streak = min(-1, current_streak - 1) if current_streak <= 0 else -1
+    
+    # 资金曲线与回撤
+    equity = ARENA_INITIAL_CAPITAL + total_pnl
+    peak_equity = max(stats.get('peak_equity') or ARENA_INITIAL_CAPITAL, equity)
+    current_drawdown = (peak_equity - equity) / peak_equity * 100 if peak_equity > 0 else 0.0
+    
+    trade_date = _trade_date(exit_time)
+    if stats.get('daily_pnl_date') == trade_date:
+        daily_pnl = (stats.get('daily_pnl') or 0.0) + pnl
+    else:
+        daily_pnl = pnl
+    
+    stats.update(
+        total_trades=total_trades,
+        win_count=win_count,
+        loss_count=loss_count,
+        win_rate=win_count / total_trades,
+        total_pnl=total_pnl,
+        current_streak=current_streak,
+        best_trade=max(stats['best_trade'], pnl),
+        worst_trade=min(stats['worst_trade'], pnl),
+        avg_pnl=total_pnl / total_trades,
+        peak_equity=peak_equity,
+        max_drawdown=max(stats.get('max_drawdown') or 0.0, current_drawdown),
+        current_drawdown=current_drawdown,
+        consecutive_losses=(stats.get('consecutive_losses') or 0) + 1 if pnl < 0 else 0,
+        max_win_streak=max(stats.get('max_win_streak') or 0, current_streak),
+        max_loss_streak=max(stats.get('max_loss_streak') or 0, -current_streak),
+        daily_pnl=daily_pnl,
+        daily_pnl_date=trade_date,
+    )
+    return stats
+
+
+# _apply_trade 写回 ai_stats 的字段
+_STATS_UPDATE_COLUMNS = [
+    'total_trades', 'win_count', 'loss_count', 'win_rate', 'total_pnl',
+    'current_streak', 'best_trade', 'worst_trade', 'avg_pnl',
+] + list(_RUNNING_STATS_COLUMNS)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    """
+    打开长连接并设置 PRAGMA
+    
+    - journal_mode=WAL: 读写互不阻塞，提交只追加 WAL
+    - synchronous=NORMAL: WAL 模式下只在 checkpoint 时 fsync（断电最多丢最近的事务，不会损坏库）
+    - cache_size / mmap_size: 环境变量 ARENA_DB_CACHE_KB（默认 16MB）/ ARENA_DB_MMAP_MB（默认 256MB）
+    - auto_vacuum=INCREMENTAL: 仅对新建的库生效，空闲页由 database.maintenance 逐步归还
+    """
     conn = sqlite3.connect(db_path, timeout=10)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{_env_int('ARENA_DB_CACHE_KB', 16384)}")
+    conn.execute(f"PRAGMA mmap_size={_env_int('ARENA_DB_MMAP_MB', 256) * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+@contextmanager
+def get_db_connection(db_path: str = ARENA_DB_PATH):
+    """
+    获取数据库连接（上下文管理器）
+    
+    每个线程对每个数据库复用一条长连接（SQLite 连接不能跨线程使用）；
+    最外层退出时回滚未提交的事务，语义与原来的“用完即关”一致
+    """
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    
+    entry = connections.get(db_path)
+    if entry is None:
+        entry = connections[db_path] = [_open_connection(db_path), 0]
+    conn = entry[0]
+    
+    entry[1] += 1
     try:
         yield conn
     finally:
-        conn.close()
+        entry[1] -= 1
+        if entry[1] == 0 and conn.in_transaction:
+            conn.rollback()
+
+
+def close_thread_connections():
+    """关闭当前线程持有的所有长连接（线程退出前 / 测试清理时调用）"""
+    connections = getattr(_thread_local, 'connections', None)
+    if not connections:
+        return
+    for conn, _ in connections.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
 
 
 class AIDBManager:
@@ -103,9 +303,36 @@ class AIDBManager:
     def __init__(self, db_path: str = ARENA_DB_PATH):
         self.db_path = db_path
         self._init_tables()
+        self.check_query_plans()
+    
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """
+        对热点查询执行 EXPLAIN QUERY PLAN，回退为全表扫描时打印警告
+        
+        返回:
+            {查询名称: [查询计划明细, ...]}
+        """
+        plans = {}
+        # 使用独立的短连接：EXPLAIN 不校验 schema，长连接语句缓存里可能是索引变更前的计划
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            for name, (sql, params) in _HOT_QUERIES.items():
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                details = [row[3] for row in rows]
+                plans[name] = details
+                # 全表扫描："SCAN ai_positions" / 旧版本 "SCAN TABLE ai_positions"
+                scans = [d for d in details if d.startswith('SCAN') and 'ai_positions' in d]
+                if scans:
+                    logger.warning(f"[AIDBManager] 热点查询 {name} 未命中索引: {'; '.join(scans)}")
+        except sqlite3.Error as e:
+            logger.warning(f"[AIDBManager] 查询计划检查失败: {e}")
+        finally:
+            conn.close()
+        return plans
     
     def _init_tables(self):
-        """初始化数据库表"""
+        """初始化数据库表（旧库新增风险聚合字段后自动回填一次）"""
+        added = []
         with _db_lock:
             with get_db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
@@ -152,10 +379,26 @@ class AIDBManager:
                         worst_trade REAL DEFAULT 0.0,
                         avg_pnl REAL DEFAULT 0.0,
                         last_signal TEXT DEFAULT '',
-                        last_updated INTEGER DEFAULT 0
+                        last_updated INTEGER DEFAULT 0,
+                        peak_equity REAL DEFAULT 10000.0,
+                        max_drawdown REAL DEFAULT 0.0,
+                        current_drawdown REAL DEFAULT 0.0,
+                        consecutive_losses INTEGER DEFAULT 0,
+                        max_win_streak INTEGER DEFAULT 0,
+                        max_loss_streak INTEGER DEFAULT 0,
+                        daily_pnl REAL DEFAULT 0.0,
+                        daily_pnl_date TEXT DEFAULT ''
                     )
                 """)
                 
+                # 迁移：为旧表添加风险聚合字段（建表完成后从已平仓记录回填）
+                stats_columns = {row[1] for row in cursor.execute("PRAGMA table_info(ai_stats)")}
+                added = [name for name in _RUNNING_STATS_COLUMNS if name not in stats_columns]
+                for name in added:
+                    cursor.execute(f"ALTER TABLE ai_stats ADD COLUMN {name} {_RUNNING_STATS_COLUMNS[name]}")
+                if added:
+                    logger.info("[AIDBManager] 已添加风险聚合字段到 ai_stats 表，将从历史平仓记录回填")
+                
                 # AI 虚拟持仓表（字段与主系统 SimulatedPosition 对齐）
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS ai_positions (
@@ -189,6 +432,21 @@ class AIDBManager:
                     ON ai_decisions(agent_name, timestamp DESC)
                 """)
                 
+                # 迁移：ai_positions 复合索引（新建索引后 ANALYZE 一次，让查询规划器拿到统计信息）
+                existing = {
+                    row[0] for row in cursor.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ai_positions'"
+                    )
+                }
+                created = False
+                for index_name, definition in _POSITION_INDEXES.items():
+                    if index_name not in existing:
+                        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {definition}")
+                        created = True
+                if created:
+                    cursor.execute("ANALYZE ai_positions")
+                    logger.info("[AIDBManager] 已为 ai_positions 创建复合索引")
+                
                 # 初始化 AI 统计记录（包含所有支持的 AI）
                 all_agents = ['deepseek', 'qwen', 'perplexity', 'gpt', 'claude', 'spark_lite', 'spark', 'hunyuan', 'glm', 'doubao', 'openai']
                 for agent in all_agents:
@@ -199,46 +457,65 @@ class AIDBManager:
                 
                 conn.commit()
                 logger.debug(f"[AIDBManager] 数据库初始化完成: {self.db_path}")
+        
+        if added:
+            self.backfill_stats()
     
     # ========== 决策记录 ==========
     
     def save_decision(self, decision: AIDecision) -> int:
         """保存 AI 决策（含版本号用于审计追踪）"""
+        return self.save_decisions_batch([decision])[0]
+    
+    def save_decisions_batch(self, decisions: List[AIDecision]) -> List[int]:
+        """
+        在一个事务内保存一整轮决策（每轮只提交一次）
+        
+        返回:
+            与 decisions 顺序一致的决策 ID 列表
+        """
+        if not decisions:
+            return []
+        
+        now_ms = int(time.time() * 1000)
         with _db_lock:
             with get_db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO ai_decisions 
-                    (timestamp, agent_name, symbol, signal, price, confidence, 
-                     reasoning, thinking, user_prompt_snapshot, indicators_snapshot, 
-                     timeframe, latency_ms, version)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    decision.timestamp or int(time.time() * 1000),
-                    decision.agent_name,
-                    decision.symbol,
-                    decision.signal,
-                    decision.price,
-                    decision.confidence,
-                    decision.reasoning,
-                    decision.thinking,
-                    decision.user_prompt_snapshot,
-                    decision.indicators_snapshot,
-                    decision.timeframe,
-                    decision.latency_ms,
-                    decision.version or SYSTEM_VERSION
-                ))
-                conn.commit()
-                decision_id = cursor.lastrowid
+                decision_ids = []
+                last_signals = {}
+                for decision in decisions:
+                    cursor.execute("""
+                        INSERT INTO ai_decisions 
+                        (timestamp, agent_name, symbol, signal, price, confidence, 
+                         reasoning, thinking, user_prompt_snapshot, indicators_snapshot, 
+                         timeframe, latency_ms, version)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        decision.timestamp or now_ms,
+                        decision.agent_name,
+                        decision.symbol,
+                        decision.signal,
+                        decision.price,
+                        decision.confidence,
+                        decision.reasoning,
+                        decision.thinking,
+                        decision.user_prompt_snapshot,
+                        decision.indicators_snapshot,
+                        decision.timeframe,
+                        decision.latency_ms,
+                        decision.version or SYSTEM_VERSION
+                    ))
+                    decision_ids.append(cursor.lastrowid)
+                    last_signals[decision.agent_name] = (decision.signal, decision.timestamp)
                 
-                # 更新最后信号
-                cursor.execute("""
+                # 更新最后信号（每个 AI 取本轮最后一条）
+                cursor.executemany("""
                     UPDATE ai_stats SET last_signal = ?, last_updated = ?
                     WHERE agent_name = ?
-                """, (decision.signal, decision.timestamp, decision.agent_name))
+                """, [(signal, ts, agent) for agent, (signal, ts) in last_signals.items()])
                 conn.commit()
                 
-                return decision_id
+                return decision_ids
     
     def get_latest_decisions(
         self, 
@@ -320,49 +597,76 @@ class AIDBManager:
     
     def update_stats(self, agent_name: str, pnl: float, is_win: bool):
         """更新 AI 绩效"""
+        with _db_lock:
+            with get_db_connection(self.db_path) as conn:
+                self._record_trade(conn.cursor(), agent_name, pnl, is_win, int(time.time() * 1000))
+                conn.commit()
+    
+    def _record_trade(self, cursor, agent_name: str, pnl: float, is_win: bool, exit_time: int):
+        """在调用方的事务内把一笔平仓计入 ai_stats（含回撤 / 连亏 / 单日 PnL 聚合）"""
+        cursor.execute(
+            "SELECT * FROM ai_stats WHERE agent_name = ?",
+            (agent_name,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return
+        
+        stats = _apply_trade(dict(row), pnl, is_win, exit_time)
+        assignments = ", ".join(f"{name} = ?" for name in _STATS_UPDATE_COLUMNS)
+        cursor.execute(
+            f"UPDATE ai_stats SET {assignments}, last_updated = ? WHERE agent_name = ?",
+            [stats[name] for name in _STATS_UPDATE_COLUMNS] + [int(time.time() * 1000), agent_name]
+        )
+    
+    def backfill_stats(self) -> Dict[str, int]:
+        """
+        从 ai_positions 的已平仓记录重算全部 ai_stats 聚合（旧数据库迁移后运行一次）
+        
+        按 (agent_name, exit_time) 顺序单次扫描覆盖索引，在一个事务内写回
+        
+        返回:
+            {agent_name: 计入的平仓笔数}
+        """
+        empty = asdict(AIStats())
         with _db_lock:
             with get_db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute(
-                    "SELECT * FROM ai_stats WHERE agent_name = ?",
-                    (agent_name,)
-                )
-                row = cursor.fetchone()
+                agents = {row['agent_name'] for row in cursor.execute("SELECT agent_name FROM ai_stats")}
+                running = {agent: dict(empty) for agent in agents}
+                counts = {agent: 0 for agent in agents}
                 
-                if row:
-                    stats = dict(row)
-                    total_trades = stats['total_trades'] + 1
-                    win_count = stats['win_count'] + (1 if is_win else 0)
-                    loss_count = stats['loss_count'] + (0 if is_win else 1)
-                    total_pnl = stats['total_pnl'] + pnl
-                    
-                    # 连胜/连败
-                    current_streak = stats['current_streak']
-                    if is_win:
-                        current_streak = max(1, current_streak + 1) if current_streak >= 0 else 1
-                    else:
-                        current_streak = min(-1, current_streak - 1) if current_streak <= 0 else -1
-                    
-                    best_trade = max(stats['best_trade'], pnl)
-                    worst_trade = min(stats['worst_trade'], pnl)
-                    win_rate = win_count / total_trades if total_trades > 0 else 0
-                    avg_pnl = total_pnl / total_trades if total_trades > 0 else 0
-                    
-                    cursor.execute("""
-                        UPDATE ai_stats SET
-                            total_trades = ?, win_count = ?, loss_count = ?,
-                            win_rate = ?, total_pnl = ?, current_streak = ?,
-                            best_trade = ?, worst_trade = ?, avg_pnl = ?,
-                            last_updated = ?
-                        WHERE agent_name = ?
-                    """, (
-                        total_trades, win_count, loss_count, win_rate,
-                        total_pnl, current_streak, best_trade, worst_trade,
-                        avg_pnl, int(time.time() * 1000), agent_name
-                    ))
+                cursor.execute("""
+                    SELECT agent_name, pnl, exit_time
+                    FROM ai_positions
+                    WHERE status = 'closed'
+                    ORDER BY agent_name, exit_time, id
+                """)
+                for row in cursor:
+                    agent = row['agent_name']
+                    if agent not in running:
+                        running[agent] = dict(empty)
+                        counts[agent] = 0
+                    pnl = row['pnl'] or 0.0
+                    running[agent] = _apply_trade(running[agent], pnl, pnl > 0, row['exit_time'] or 0)
+                    counts[agent] += 1
                 
+                now_ms = int(time.time() * 1000)
+                assignments = ", ".join(f"{name} = ?" for name in _STATS_UPDATE_COLUMNS)
+                for agent, stats in running.items():
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO ai_stats (agent_name, last_updated) VALUES (?, ?)",
+                        (agent, now_ms)
+                    )
+                    cursor.execute(
+                        f"UPDATE ai_stats SET {assignments}, last_updated = ? WHERE agent_name = ?",
+                        [stats[name] for name in _STATS_UPDATE_COLUMNS] + [now_ms, agent]
+                    )
                 conn.commit()
+        
+        logger.info(f"[AIDBManager] ai_stats 回填完成: {sum(counts.values())} 笔平仓 / {len(counts)} 个 AI")
+        return counts
     
     # ========== 虚拟持仓（字段与主系统 SimulatedPosition 对齐） ==========
     
@@ -478,12 +782,16 @@ class AIDBManager:
                     pnl = 0
                     logger.warning(f"[AIDBManager] 平仓计算异常: entry_price={entry_price}, qty={qty}")
                 
+                exit_time = int(time.time() * 1000)
                 cursor.execute("""
                     UPDATE ai_positions SET
                         status = 'closed', exit_price = ?,
                         exit_time = ?, pnl = ?
                     WHERE id = ?
-                """, (exit_price, int(time.time() * 1000), pnl, position_id))
+                """, (exit_price, exit_time, pnl, position_id))
+                
+                # 绩效与风险聚合和平仓记录在同一事务内提交
+                self._record_trade(cursor, agent_name, pnl, pnl > 0, exit_time)
                 
                 conn.commit()
                 
@@ -493,10 +801,6 @@ class AIDBManager:
                     f"qty=${qty:.0f} × {leverage}x | pnl=${pnl:.2f}"
                 )
         
-        # 更新绩效（在锁外调用，避免死锁）
-        if agent_name:
-            self.update_stats(agent_name, pnl, pnl > 0)
-        
         return pnl
     
     def get_open_positions(self, agent_name: Optional[str] = None) -> List[Dict]:
@@ -510,14 +814,9 @@ class AIDBManager:
             cursor = conn.cursor()
             
             if agent_name:
-                cursor.execute("""
-                    SELECT * FROM ai_positions 
-                    WHERE status = 'open' AND agent_name = ?
-                """, (agent_name,))
+                cursor.execute(_SQL_OPEN_POSITIONS_BY_AGENT, (agent_name,))
             else:
-                cursor.execute(
-                    "SELECT * FROM ai_positions WHERE status = 'open'"
-                )
+                cursor.execute(_SQL_OPEN_POSITIONS)
             
             rows = cursor.fetchall()
             positions = []
@@ -599,17 +898,13 @@ class AIDBManager:
         with get_db_connection(self.db_path) as conn:
             cursor = conn.cursor()
             
-            # 获取已平仓记录（按平仓时间倒序）
-            cursor.execute("""
-                SELECT * FROM ai_positions 
-                WHERE agent_name = ?
-                ORDER BY 
-                    CASE WHEN status = 'open' THEN 0 ELSE 1 END,
-                    COALESCE(exit_time, created_at) DESC
-                LIMIT ?
-            """, (agent_name, limit))
-            
+            # 未平仓在前（按开仓时间倒序），再补已平仓（按平仓时间倒序）
+            # 分两次查询，两段都能沿 (agent_name, status, exit_time) 索引读取，无需对全部历史排序
+            cursor.execute(_SQL_HISTORY_OPEN, (agent_name, limit))
             rows = cursor.fetchall()
+            if len(rows) < limit:
+                cursor.execute(_SQL_HISTORY_CLOSED, (agent_name, limit - len(rows)))
+                rows += cursor.fetchall()
             trades = []
             
             for row in rows:
@@ -693,10 +988,18 @@ class AIDBManager:
         
         返回:
             当日累计 PnL
+        
+        当天的值直接读取 ai_stats 中增量维护的聚合，其他日期按平仓记录汇总
         """
         if date is None:
             date = datetime.now()
         
+        if date.strftime('%Y-%m-%d') == datetime.now().strftime('%Y-%m-%d'):
+            stats = self.get_stats(agent_name)
+            if stats is None or stats.daily_pnl_date != date.strftime('%Y-%m-%d'):
+                return 0.0
+            return float(stats.daily_pnl)
+        
         # 计算当日开始和结束时间戳（毫秒）
         day_start = datetime(date.year, date.month, date.day)
         day_end = day_start + timedelta(days=1)
@@ -705,51 +1008,44 @@ class AIDBManager:
         
         with get_db_connection(self.db_path) as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COALESCE(SUM(pnl), 0) as daily_pnl
-                FROM ai_positions
-                WHERE agent_name = ? 
-                  AND status = 'closed'
-                  AND exit_time >= ? 
-                  AND exit_time < ?
-            """, (agent_name, start_ts, end_ts))
+            cursor.execute(_SQL_DAILY_PNL, (agent_name, start_ts, end_ts))
             row = cursor.fetchone()
             return float(row['daily_pnl']) if row else 0.0
     
-    def get_max_drawdown(self, agent_name: str, lookback_days: int = 30) -> Tuple[float, float]:
+    def get_max_drawdown(self, agent_name: str, lookback_days: Optional[int] = None) -> Tuple[float, float]:
         """
         计算指定 AI 的最大回撤
         
         参数:
             agent_name: AI 名称
-            lookback_days: 回溯天数
+            lookback_days: 回溯天数（None=全部历史，直接读取 ai_stats 中增量维护的聚合）
         
         返回:
             (max_drawdown_pct, current_drawdown_pct)
             - max_drawdown_pct: 历史最大回撤百分比
             - current_drawdown_pct: 当前回撤百分比
         """
+        if lookback_days is None:
+            stats = self.get_stats(agent_name)
+            if stats is None:
+                return 0.0, 0.0
+            return float(stats.max_drawdown), float(stats.current_drawdown)
+        
+        # 指定窗口：以窗口起点为初始资金重放窗口内的平仓
         cutoff_ts = int((datetime.now() - timedelta(days=lookback_days)).timestamp() * 1000)
         
         with get_db_connection(self.db_path) as conn:
             cursor = conn.cursor()
             
             # 获取所有已平仓交易，按时间排序
-            cursor.execute("""
-                SELECT pnl, exit_time
-                FROM ai_positions
-                WHERE agent_name = ? 
-                  AND status = 'closed'
-                  AND exit_time >= ?
-                ORDER BY exit_time ASC
-            """, (agent_name, cutoff_ts))
+            cursor.execute(_SQL_DRAWDOWN_TRADES, (agent_name, cutoff_ts))
             rows = cursor.fetchall()
             
             if not rows:
                 return 0.0, 0.0
             
             # 计算资金曲线和回撤
-            initial_capital = 10000.0  # 假设初始资金 10000 USD
+            initial_capital = ARENA_INITIAL_CAPITAL
             equity = initial_capital
             peak = initial_capital
             max_drawdown = 0.0
@@ -771,36 +1067,31 @@ class AIDBManager:
     
     def get_consecutive_losses(self, agent_name: str, limit: int = 10) -> int:
         """
-        获取连续亏损次数
+        获取连续亏损次数（读取 ai_stats 中增量维护的聚合）
         
         参数:
             agent_name: AI 名称
-            limit: 检查最近多少笔交易
+            limit: 最多返回的次数
         
         返回:
-            连续亏损次数（0 表示最近一笔是盈利）
+            连续亏损次数（0 表示最近一笔不是亏损）
         """
-        with get_db_connection(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT pnl
-                FROM ai_positions
-                WHERE agent_name = ? AND status = 'closed'
-                ORDER BY exit_time DESC
-                LIMIT ?
-            """, (agent_name, limit))
-            rows = cursor.fetchall()
-            
-            consecutive_losses = 0
-            for row in rows:
-                if row['pnl'] is not None and row['pnl'] < 0:
-                    consecutive_losses += 1
-                else:
-                    break
-            
-            return consecutive_losses
+        stats = self.get_stats(agent_name)
+        if stats is None:
+            return 0
+        return min(int(stats.consecutive_losses), limit)
 
-    def get_arena_context(self, agent_name: str) -> Dict[str, Any]:
+    def get_all_arena_contexts(self, agent_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        一次读取 ai_stats，构建所有 AI 的竞技场上下文（每轮决策只查一次库）
+        
+        返回:
+            {agent_name: get_arena_context 的结果}
+        """
+        all_stats = self.get_all_stats()
+        return {agent: self.get_arena_context(agent, all_stats) for agent in agent_names}
+    
+    def get_arena_context(self, agent_name: str, all_stats: Optional[List[AIStats]] = None) -> Dict[str, Any]:
         """
          获取完整的竞技场上下文（用于 AI 决策）
         
@@ -820,8 +1111,11 @@ class AIDBManager:
                 'total_participants': 5,
                 'competition_intensity': 'high'  # high/medium/low
             }
+        
+        all_stats: 已读取的排行榜（get_all_stats 的结果），None 时自行查询
         """
-        all_stats = self.get_all_stats()
+        if all_stats is None:
+            all_stats = self.get_all_stats()
         
         if not all_stats:
             return {
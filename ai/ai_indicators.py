@@ -546,6 +546,16 @@ def calc_vwap(
     return vwap
 
 
+def _ohlcv_matrix(ohlcv) -> np.ndarray:
+    """K线列表 / 结构化数组（MarketDataProvider as_arrays）-> (n, 6) float64 数组"""
+    if isinstance(ohlcv, np.ndarray):
+        if ohlcv.dtype.names:
+            return np.column_stack([ohlcv[name].astype(np.float64) for name in ohlcv.dtype.names])
+        if ohlcv.dtype == np.float64 and ohlcv.ndim == 2:
+            return ohlcv
+    return np.array(ohlcv, dtype=np.float64)
+
+
 # 缓存装饰器
 
 class IndicatorCache:
@@ -728,11 +738,11 @@ class IndicatorCalculator:
         返回:
             指标计算结果（NumPy 数组）
         """
-        if not ohlcv:
+        if ohlcv is None or len(ohlcv) == 0:
             return {'error': '无数据'}
         
-        # 提取价格数据为 NumPy 数组（一次性转换，避免重复）
-        ohlcv_arr = np.array(ohlcv, dtype=np.float64)
+        # 提取价格数据为 NumPy 数组（已是二维数组时不再转换）
+        ohlcv_arr = _ohlcv_matrix(ohlcv)
         opens = ohlcv_arr[:, 1]
         highs = ohlcv_arr[:, 2]
         lows = ohlcv_arr[:, 3]
@@ -793,6 +803,9 @@ class IndicatorCalculator:
             {indicator_name: result, ...}
         """
         results = {}
+        # 只转换一次，各指标共享同一个数组
+        if ohlcv is not None and len(ohlcv) > 0:
+            ohlcv = _ohlcv_matrix(ohlcv)
         for indicator in indicators:
             results[indicator] = IndicatorCalculator.calculate(indicator, ohlcv)
         return results
@@ -34,8 +34,12 @@ AI 大模型统一适配器 - 唯一的 AI API 调用层
 都应该调用此模块，不要重复实现 API 调用逻辑。
 """
 
+import os
 import re
+import time
+import atexit
 import logging
+import threading
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 
@@ -296,9 +300,13 @@ PROVIDER_ALIASES = {
 # 通用 AI 客户端 - 唯一的 API 调用实现
 # ============================================================================
 
+_PROBED_PROXY_UNSET = object()
+_probed_proxy = _PROBED_PROXY_UNSET
+
+
 def _detect_proxy() -> Optional[str]:
-    """自动检测可用的代理"""
-    import os
+    """自动检测可用的代理（本地端口探测结果在进程内缓存）"""
+    global _probed_proxy
     import socket
     
     # 1. 优先使用环境变量
@@ -307,6 +315,9 @@ def _detect_proxy() -> Optional[str]:
         if proxy:
             return proxy
     
+    if _probed_proxy is not _PROBED_PROXY_UNSET:
+        return _probed_proxy
+    
     # 2. 检测常用代理端口
     proxy_ports = [
         (49494, 'http'),  # Clash Verge 自定义端口
@@ -315,6 +326,7 @@ def _detect_proxy() -> Optional[str]:
         (1080, 'socks5'), # 通用 SOCKS5
     ]
     
+    _probed_proxy = None
     for port, protocol in proxy_ports:
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -323,12 +335,233 @@ def _detect_proxy() -> Optional[str]:
             sock.close()
             if result == 0:
                 if protocol == 'socks5':
-                    return f"socks5://127.0.0.1:{port}"
-                return f"http://127.0.0.1:{port}"
+                    _probed_proxy = f"socks5://127.0.0.1:{port}"
+                else:
+                    _probed_proxy = f"http://127.0.0.1:{port}"
+                break
         except:
             pass
     
-    return None
+    return _probed_proxy
+
+
+# ============================================================================
+# HTTP 连接池 - 进程级共享的 httpx 客户端
+# ============================================================================
+#
+# 每次请求新建 httpx.Client 意味着每次 AI 调用都要重新 TCP 握手、TLS 握手、
+# 代理 CONNECT。这里按 (服务商 base URL, 代理) 复用客户端：
+# - keep-alive 长连接，连接数有上限
+# - 启用 HTTP/2（h2 随 requirements.txt 中的 httpx[http2] 安装，通过 ALPN 协商，
+#   服务商不支持时自动回落 HTTP/1.1；精简环境缺少 h2 时降级为 HTTP/1.1 keep-alive）
+# - 异步客户端绑定事件循环，按循环分别缓存，循环关闭后自动丢弃
+# - 记录每个服务商的连接建立耗时和首字节耗时（TTFB）
+#
+# 环境变量：
+# - AI_HTTP2: 是否启用 HTTP/2（默认 1）
+# - AI_HTTP_MAX_CONNECTIONS: 每个客户端最大连接数（默认 20）
+# - AI_HTTP_MAX_KEEPALIVE: 最大空闲长连接数（默认 10）
+# - AI_HTTP_KEEPALIVE_EXPIRY: 空闲长连接保留秒数（默认 90）
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 需要 h2 包，未安装时降级为 HTTP/1.1 keep-alive"""
+    if os.getenv("AI_HTTP2", "1").strip().lower() in ("0", "false", "no", "off"):
+        return False
+    import importlib.util
+    return importlib.util.find_spec("h2") is not None
+
+
+class _RequestTrace:
+    """
+    httpx trace 扩展回调：记录单次请求的连接耗时与首字节耗时
+    
+    复用连接时不会触发 connect 事件，connect_ms 保持 None。
+    """
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.connect_ms: Optional[float] = None
+        self.ttfb_ms: Optional[float] = None
+    
+    def on_event(self, name: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        if name.endswith("connect_tcp.started"):
+            self.connect_started = now
+        elif name.endswith(("connect_tcp.complete", "start_tls.complete")) and self.connect_started is not None:
+            # TLS 在 TCP 之后完成，最终值覆盖 TCP + TLS（+ 代理 CONNECT）
+            self.connect_ms = (now - self.connect_started) * 1000
+        elif name.endswith("receive_response_headers.complete"):
+            self.ttfb_ms = (now - self.start) * 1000
+    
+    async def on_event_async(self, name: str, info: Dict[str, Any]):
+        self.on_event(name, info)
+
+
+class _ProviderTiming:
+    """单个服务商的请求耗时统计"""
+    
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_ms_total = 0.0
+        self.ttfb_ms_total = 0.0
+        self.ttfb_samples = 0
+        self.last_connect_ms: Optional[float] = None
+        self.last_ttfb_ms: Optional[float] = None
+        self.http_version = ""
+    
+    def observe(self, trace: _RequestTrace, http_version: str = ""):
+        self.requests += 1
+        if trace.connect_ms is not None:
+            self.new_connections += 1
+            self.connect_ms_total += trace.connect_ms
+            self.last_connect_ms = trace.connect_ms
+        if trace.ttfb_ms is not None:
+            self.ttfb_samples += 1
+            self.ttfb_ms_total += trace.ttfb_ms
+            self.last_ttfb_ms = trace.ttfb_ms
+        if http_version:
+            self.http_version = http_version
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'new_connections': self.new_connections,
+            'reused_connections': self.requests - self.new_connections,
+            'avg_connect_ms': round(self.connect_ms_total / self.new_connections, 1) if self.new_connections else None,
+            'avg_ttfb_ms': round(self.ttfb_ms_total / self.ttfb_samples, 1) if self.ttfb_samples else None,
+            'last_connect_ms': round(self.last_connect_ms, 1) if self.last_connect_ms is not None else None,
+            'last_ttfb_ms': round(self.last_ttfb_ms, 1) if self.last_ttfb_ms is not None else None,
+            'http_version': self.http_version,
+        }
+
+
+class _HTTPClientPool:
+    """进程级 httpx 客户端注册表"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+        # (base_url, proxy) -> [(event_loop, AsyncClient), ...]
+        self._async_clients: Dict[Tuple[str, Optional[str]], List[Tuple[Any, Any]]] = {}
+        self._timing: Dict[str, _ProviderTiming] = {}
+    
+    def _client_kwargs(self, proxy: Optional[str]) -> Dict[str, Any]:
+        import httpx
+        return {
+            'proxy': proxy,
+            'http2': _http2_enabled(),
+            'timeout': 60,
+            'limits': httpx.Limits(
+                max_connections=int(_env_number("AI_HTTP_MAX_CONNECTIONS", 20)),
+                max_keepalive_connections=int(_env_number("AI_HTTP_MAX_KEEPALIVE", 10)),
+                keepalive_expiry=_env_number("AI_HTTP_KEEPALIVE_EXPIRY", 90),
+            ),
+        }
+    
+    def get_client(self, base_url: str, proxy: Optional[str] = None):
+        """获取同步客户端（线程安全，跨线程共享）"""
+        import httpx
+        key = (base_url, proxy)
+        with self._lock:
+            client = self._sync_clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(**self._client_kwargs(proxy))
+                self._sync_clients[key] = client
+            return client
+    
+    def get_async_client(self, base_url: str, proxy: Optional[str] = None):
+        """获取当前事件循环的异步客户端"""
+        import asyncio
+        import httpx
+        loop = asyncio.get_running_loop()
+        key = (base_url, proxy)
+        with self._lock:
+            # 丢弃已关闭事件循环上的客户端（其连接已无法在新循环中使用）
+            entries = [(l, c) for l, c in self._async_clients.get(key, [])
+                       if not l.is_closed() and not c.is_closed]
+            for entry_loop, client in entries:
+                if entry_loop is loop:
+                    break
+            else:
+                client = httpx.AsyncClient(**self._client_kwargs(proxy))
+                entries.append((loop, client))
+            self._async_clients[key] = entries
+            return client
+    
+    def record(self, provider_name: str, trace: _RequestTrace, http_version: str = ""):
+        with self._lock:
+            timing = self._timing.get(provider_name)
+            if timing is None:
+                timing = self._timing[provider_name] = _ProviderTiming()
+            timing.observe(trace, http_version)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'http2': _http2_enabled(),
+                'sync_clients': len(self._sync_clients),
+                'async_clients': sum(len(v) for v in self._async_clients.values()),
+                'providers': {name: t.to_dict() for name, t in self._timing.items()},
+            }
+    
+    def close(self):
+        """关闭所有同步客户端；异步客户端需在各自的事件循环中 aclose"""
+        with self._lock:
+            clients = list(self._sync_clients.values())
+            self._sync_clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+    
+    async def aclose(self):
+        """关闭当前事件循环上的异步客户端（事件循环关闭前调用）"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        to_close = []
+        with self._lock:
+            for key, entries in list(self._async_clients.items()):
+                keep = []
+                for entry_loop, client in entries:
+                    (to_close if entry_loop is loop else keep).append((entry_loop, client))
+                if keep:
+                    self._async_clients[key] = keep
+                else:
+                    del self._async_clients[key]
+        for _, client in to_close:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+
+
+_http_pool = _HTTPClientPool()
+atexit.register(_http_pool.close)
+
+
+def get_http_client_stats() -> Dict[str, Any]:
+    """获取 AI HTTP 连接池统计（连接复用次数、各服务商连接耗时 / TTFB）"""
+    return _http_pool.get_stats()
+
+
+def close_http_clients():
+    """关闭共享的同步 HTTP 客户端"""
+    _http_pool.close()
+
+
+async def aclose_http_clients():
+    """关闭当前事件循环上共享的异步 HTTP 客户端"""
+    await _http_pool.aclose()
 
 
 class UniversalAIClient:
@@ -463,6 +696,34 @@ class UniversalAIClient:
         """清理响应内容（移除 think 标签等）"""
         content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
         return content
+
+    def _post(self, endpoint: str, headers: Dict[str, str], payload: Dict) -> Dict:
+        """通过共享连接池发送请求（同步）"""
+        client = _http_pool.get_client(self.provider.api_base, self.proxy)
+        trace = _RequestTrace()
+        http_version = ""
+        try:
+            response = client.post(endpoint, headers=headers, json=payload, timeout=self.timeout,
+                                   extensions={"trace": trace.on_event})
+            http_version = response.http_version
+        finally:
+            _http_pool.record(self.provider.name, trace, http_version)
+        response.raise_for_status()
+        return response.json()
+    
+    async def _apost(self, endpoint: str, headers: Dict[str, str], payload: Dict) -> Dict:
+        """通过共享连接池发送请求（异步）"""
+        client = _http_pool.get_async_client(self.provider.api_base, self.proxy)
+        trace = _RequestTrace()
+        http_version = ""
+        try:
+            response = await client.post(endpoint, headers=headers, json=payload, timeout=self.timeout,
+                                         extensions={"trace": trace.on_event_async})
+            http_version = response.http_version
+        finally:
+            _http_pool.record(self.provider.name, trace, http_version)
+        response.raise_for_status()
+        return response.json()
     
     def chat(self, prompt: str, system_prompt: str = None, max_tokens: int = 4096, temperature: float = 0.3) -> str:
         """
@@ -489,17 +750,9 @@ class UniversalAIClient:
         endpoint = self._get_endpoint()
         
         try:
-            # 配置代理
-            transport = None
-            if self.proxy:
-                transport = httpx.HTTPTransport(proxy=self.proxy)
-            
-            with httpx.Client(timeout=self.timeout, transport=transport) as client:
-                response = client.post(endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                content = self._parse_response(data)
-                return self._clean_response(content)
+            data = self._post(endpoint, headers, payload)
+            content = self._parse_response(data)
+            return self._clean_response(content)
         except httpx.HTTPStatusError as e:
             logger.error(f"[{self.provider.name}] HTTP 错误: {e.response.status_code} - {e.response.text[:200]}")
             raise
@@ -523,17 +776,9 @@ class UniversalAIClient:
         endpoint = self._get_endpoint()
         
         try:
-            # 配置代理
-            transport = None
-            if self.proxy:
-                transport = httpx.AsyncHTTPTransport(proxy=self.proxy)
-            
-            async with httpx.AsyncClient(timeout=self.timeout, transport=transport) as client:
-                response = await client.post(endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                content = self._parse_response(data)
-                return self._clean_response(content)
+            data = await self._apost(endpoint, headers, payload)
+            content = self._parse_response(data)
+            return self._clean_response(content)
         except httpx.HTTPStatusError as e:
             logger.error(f"[{self.provider.name}] HTTP 错误: {e.response.status_code} - {e.response.text[:200]}")
             raise
@@ -545,24 +790,14 @@ class UniversalAIClient:
         """
         使用完整消息列表发送请求（同步）
         """
-        import httpx
-        
         headers = self._build_headers()
         payload = self._build_payload(messages, max_tokens, temperature)
         endpoint = self._get_endpoint()
         
         try:
-            # 配置代理
-            transport = None
-            if self.proxy:
-                transport = httpx.HTTPTransport(proxy=self.proxy)
-            
-            with httpx.Client(timeout=self.timeout, transport=transport) as client:
-                response = client.post(endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                content = self._parse_response(data)
-                return self._clean_response(content)
+            data = self._post(endpoint, headers, payload)
+            content = self._parse_response(data)
+            return self._clean_response(content)
         except Exception as e:
             logger.error(f"[{self.provider.name}] 请求失败: {e}")
             raise
@@ -571,24 +806,14 @@ class UniversalAIClient:
         """
         使用完整消息列表发送请求（异步）
         """
-        import httpx
-        
         headers = self._build_headers()
         payload = self._build_payload(messages, max_tokens, temperature)
         endpoint = self._get_endpoint()
         
         try:
-            # 配置代理
-            transport = None
-            if self.proxy:
-                transport = httpx.AsyncHTTPTransport(proxy=self.proxy)
-            
-            async with httpx.AsyncClient(timeout=self.timeout, transport=transport) as client:
-                response = await client.post(endpoint, headers=headers, json=payload)
-                response.raise_for_status()
-                data = response.json()
-                content = self._parse_response(data)
-                return self._clean_response(content)
+            data = await self._apost(endpoint, headers, payload)
+            content = self._parse_response(data)
+            return self._clean_response(content)
         except Exception as e:
             logger.error(f"[{self.provider.name}] 请求失败: {e}")
             raise
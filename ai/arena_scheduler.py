@@ -51,6 +51,60 @@ class BattleResult:
     latency_ms: float
 
 
+class LatencyHistogram:
+    """
+    单个 AI 的调用延迟直方图
+    
+    内部按桶计数；to_dict 输出累计计数（le_Ns = 耗时 ≤ N 秒的调用数，'+Inf' = 总数），
+    与 Prometheus 直方图一致。超时 / 失败另外单独计数。
+    """
+    
+    BUCKETS = (1, 2, 5, 10, 20, 30, 60, 90, 120)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0
+        self.sum_sec = 0.0
+        self.max_sec = 0.0
+        self.last_sec = 0.0
+        self.timeouts = 0
+        self.errors = 0
+    
+    def observe(self, seconds: float, timed_out: bool = False, error: bool = False):
+        """记录一次调用耗时"""
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+        self.sum_sec += seconds
+        self.max_sec = max(self.max_sec, seconds)
+        self.last_sec = seconds
+        if timed_out:
+            self.timeouts += 1
+        elif error:
+            self.errors += 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            cumulative += count
+            buckets[f"le_{bound}s"] = cumulative
+        buckets['+Inf'] = cumulative + self.counts[-1]
+        return {
+            'count': self.total,
+            'avg_sec': self.sum_sec / self.total if self.total else 0.0,
+            'max_sec': self.max_sec,
+            'last_sec': self.last_sec,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'buckets': buckets
+        }
+
+
 # ============================================================================
 # 精准时间对齐工具
 # ============================================================================
@@ -126,11 +180,14 @@ class ArenaScheduler:
         self,
         agents: List[str] = None,
         api_keys: Dict[str, str] = None,
-        ai_takeover: bool = False
+        ai_takeover: bool = False,
+        agent_timeout: float = None
     ):
         self.agents = agents or ['deepseek', 'qwen', 'perplexity']
         self.api_keys = api_keys or {}
         self.ai_takeover_enabled = ai_takeover  # AI 托管开关
+        # 单个 AI 批量调用超时（秒），超时的 AI 本轮跳过，不拖住其他 AI
+        self.agent_timeout = agent_timeout or float(os.getenv("ARENA_AGENT_TIMEOUT", "90"))
         
         self._db_manager = None
         self._indicator_calculator = None
@@ -143,6 +200,7 @@ class ArenaScheduler:
         self._total_cycles = 0
         self._successful_cycles = 0
         self._last_error: Optional[str] = None
+        self._agent_latency: Dict[str, LatencyHistogram] = {}  # agent_name -> 延迟直方图
     
     def _get_db_manager(self):
         if self._db_manager is None:
@@ -150,6 +208,11 @@ class ArenaScheduler:
             self._db_manager = get_ai_db_manager()
         return self._db_manager
     
+    def _get_async_db(self):
+        """数据库管理器的异步代理：读写在数据库线程池执行，不阻塞事件循环"""
+        from database.async_db import AsyncDBProxy
+        return AsyncDBProxy(self._get_db_manager())
+    
     def _get_indicator_calculator(self):
         if self._indicator_calculator is None:
             from ai.ai_indicators import IndicatorCalculator
@@ -344,6 +407,7 @@ class ArenaScheduler:
                 'successful_cycles': 成功周期数,
                 'success_rate': 成功率,
                 'api_failures': {agent: count},
+                'agent_latency': {agent: {count, avg_sec, max_sec, timeouts, buckets, ...}},
                 'last_error': 最后错误信息,
                 'alerts': [告警列表]
             }
@@ -378,6 +442,7 @@ class ArenaScheduler:
             'successful_cycles': self._successful_cycles,
             'success_rate': success_rate,
             'api_failures': dict(self._api_failure_counts),
+            'agent_latency': {agent: hist.to_dict() for agent, hist in list(self._agent_latency.items())},
             'last_error': self._last_error,
             'alerts': alerts
         }
@@ -435,10 +500,8 @@ class ArenaScheduler:
         )
         
         # 3.  获取每个 AI 的竞技场上下文（排名、对手信息）
-        db = self._get_db_manager()
-        arena_contexts = {}
-        for agent in self.agents:
-            arena_contexts[agent] = db.get_arena_context(agent)
+        adb = self._get_async_db()
+        arena_contexts = await adb.get_all_arena_contexts(self.agents)
         
         # 4. 并发调用所有 AI（带竞技场上下文）
         tasks = [
@@ -461,15 +524,13 @@ class ArenaScheduler:
                 processed.append(result)
         
         # 4. 存储到数据库（P1: 保存后回填 decision_id 用于审计追踪）
-        db = self._get_db_manager()
         from ai.ai_db_manager import AIDecision
         import json
         
-        for d in processed:
-            if d.get('error'):
-                continue
-            
-            decision = AIDecision(
+        saved = [d for d in processed if not d.get('error')]
+        indicators_snapshot = json.dumps(market_data['indicators'])
+        decision_ids = await self._save_decisions(adb, [
+            AIDecision(
                 timestamp=timestamp,
                 agent_name=d['agent_name'],
                 symbol=symbol,
@@ -479,11 +540,13 @@ class ArenaScheduler:
                 reasoning=d['reasoning'],
                 thinking=d.get('thinking', ''),
                 user_prompt_snapshot=user_prompt,
-                indicators_snapshot=json.dumps(market_data['indicators']),
+                indicators_snapshot=indicators_snapshot,
                 timeframe=timeframe,
                 latency_ms=d.get('latency_ms', 0)
             )
-            decision_id = db.save_decision(decision)
+            for d in saved
+        ])
+        for d, decision_id in zip(saved, decision_ids):
             # P1: 回填 decision_id，形成"决策→执行→结果"闭环
             d['decision_id'] = decision_id
         
@@ -568,20 +631,21 @@ class ArenaScheduler:
         sentiment = self._fetch_sentiment()
         
         # 3. 获取竞技场上下文
-        db = self._get_db_manager()
-        arena_contexts = {agent: db.get_arena_context(agent) for agent in self.agents}
-        
-        # 4. 获取每个 AI 的当前持仓和账户余额
+        # 4. 获取每个 AI 的当前持仓和账户余额（查询并发在数据库线程池执行）
+        adb = self._get_async_db()
+        arena_contexts, all_positions, all_stats = await asyncio.gather(
+            adb.get_all_arena_contexts(self.agents),
+            asyncio.gather(*[adb.get_open_positions(agent_name) for agent_name in self.agents]),
+            asyncio.gather(*[adb.get_stats(agent_name) for agent_name in self.agents]),
+        )
         agent_positions = {}
         agent_balances = {}
         INITIAL_BALANCE = 10000.0  # 初始资金
         
-        for agent_name in self.agents:
-            positions = db.get_open_positions(agent_name)
+        for agent_name, positions, stats in zip(self.agents, all_positions, all_stats):
             agent_positions[agent_name] = positions
             
             # 计算可用余额 = 初始资金 + 已实现盈亏 - 当前持仓占用
-            stats = db.get_stats(agent_name)
             realized_pnl = stats.total_pnl if stats else 0
             
             # 计算持仓占用金额
@@ -596,92 +660,86 @@ class ArenaScheduler:
                 'available': max(0, available_balance)
             }
         
-        # 5. 批量调用每个 AI（每个 AI 一次调用分析所有币种）
-        all_results = []  # List[BattleResult]
+        # 5. 并发批量调用所有 AI（每个 AI 一次调用分析所有币种，单个 AI 超时不影响其他 AI）
+        agent_outcomes = await asyncio.gather(*[
+            self._call_batch_agent(
+                agent_name,
+                contexts=contexts,
+                user_prompt=user_prompt,
+                arena_context=arena_contexts.get(agent_name),
+                sentiment=sentiment,
+                positions=agent_positions.get(agent_name, []),  # 传递当前持仓
+                balance_info=agent_balances.get(agent_name, {})  # 传递余额信息
+            )
+            for agent_name in self.agents
+        ])
         
-        for agent_name in self.agents:
-            try:
-                agent = self._get_agent(agent_name)
-                arena_ctx = arena_contexts.get(agent_name)
-                positions = agent_positions.get(agent_name, [])
-                balance_info = agent_balances.get(agent_name, {})
-                
-                # 调用批量分析（传递持仓和余额信息）
-                decisions = await agent.get_batch_decisions(
-                    contexts=contexts,
-                    user_prompt=user_prompt,
-                    arena_context=arena_ctx,
-                    sentiment=sentiment,
-                    positions=positions,  # 传递当前持仓
-                    balance_info=balance_info  # 新增：传递余额信息
+        # 按 agents 顺序整理决策，整轮在一个事务内落库，保证结果顺序稳定
+        from ai.ai_db_manager import AIDecision
+        import json as json_module
+        
+        indicators_snapshots = {
+            symbol: json_module.dumps(market_data.get('indicators', {}))
+            for symbol, market_data in symbol_data_map.items()
+        }
+        pending = []  # [(agent_name, ctx, decision, AIDecision)]
+        for agent_name, decisions in zip(self.agents, agent_outcomes):
+            if not decisions:
+                continue
+            for ctx, decision in zip(contexts, decisions):
+                pending.append((agent_name, ctx, decision, AIDecision(
+                    timestamp=timestamp,
+                    agent_name=agent_name,
+                    symbol=ctx.symbol,
+                    signal=decision.signal,
+                    price=ctx.current_price,
+                    confidence=decision.confidence,
+                    reasoning=decision.reasoning,
+                    thinking=decision.thinking or '',
+                    user_prompt_snapshot=user_prompt,
+                    indicators_snapshot=indicators_snapshots.get(ctx.symbol, '{}'),
+                    timeframe=timeframe,
+                    latency_ms=decision.latency_ms
+                )))
+        
+        decision_ids = await self._save_decisions(adb, [item[3] for item in pending])
+        
+        results_by_symbol = {}
+        for (agent_name, ctx, decision, _), decision_id in zip(pending, decision_ids):
+            if decision_id is None:
+                continue  # 保存失败的决策不参与执行
+            
+            # 构建决策字典
+            d = {
+                'agent_name': agent_name,
+                'signal': decision.signal,
+                'confidence': decision.confidence,
+                'reasoning': decision.reasoning,
+                'thinking': decision.thinking or '',
+                'stop_loss': decision.stop_loss,
+                'take_profit': decision.take_profit,
+                'position_size_usd': decision.position_size_usd,
+                'leverage': decision.leverage,
+                'latency_ms': decision.latency_ms,
+                'decision_id': decision_id,
+                'error': decision.error
+            }
+            
+            # 查找或创建该币种的 BattleResult
+            existing = results_by_symbol.get(ctx.symbol)
+            if existing:
+                existing.decisions.append(d)
+            else:
+                results_by_symbol[ctx.symbol] = BattleResult(
+                    timestamp=timestamp,
+                    symbol=ctx.symbol,
+                    timeframe=timeframe,
+                    current_price=ctx.current_price,
+                    decisions=[d],
+                    consensus=None,
+                    latency_ms=0
                 )
-                
-                # 重置失败计数
-                self._api_failure_counts[agent_name] = 0
-                
-                # 保存每个币种的决策到数据库
-                from ai.ai_db_manager import AIDecision
-                import json as json_module
-                
-                for i, decision in enumerate(decisions):
-                    if i >= len(contexts):
-                        break
-                    
-                    ctx = contexts[i]
-                    symbol = ctx.symbol
-                    market_data = symbol_data_map.get(symbol, {})
-                    
-                    # 保存到数据库
-                    db_decision = AIDecision(
-                        timestamp=timestamp,
-                        agent_name=agent_name,
-                        symbol=symbol,
-                        signal=decision.signal,
-                        price=ctx.current_price,
-                        confidence=decision.confidence,
-                        reasoning=decision.reasoning,
-                        thinking=decision.thinking or '',
-                        user_prompt_snapshot=user_prompt,
-                        indicators_snapshot=json_module.dumps(market_data.get('indicators', {})),
-                        timeframe=timeframe,
-                        latency_ms=decision.latency_ms
-                    )
-                    decision_id = db.save_decision(db_decision)
-                    
-                    # 构建决策字典
-                    d = {
-                        'agent_name': agent_name,
-                        'signal': decision.signal,
-                        'confidence': decision.confidence,
-                        'reasoning': decision.reasoning,
-                        'thinking': decision.thinking or '',
-                        'stop_loss': decision.stop_loss,
-                        'take_profit': decision.take_profit,
-                        'position_size_usd': decision.position_size_usd,
-                        'leverage': decision.leverage,
-                        'latency_ms': decision.latency_ms,
-                        'decision_id': decision_id,
-                        'error': decision.error
-                    }
-                    
-                    # 查找或创建该币种的 BattleResult
-                    existing = next((r for r in all_results if r.symbol == symbol), None)
-                    if existing:
-                        existing.decisions.append(d)
-                    else:
-                        all_results.append(BattleResult(
-                            timestamp=timestamp,
-                            symbol=symbol,
-                            timeframe=timeframe,
-                            current_price=ctx.current_price,
-                            decisions=[d],
-                            consensus=None,
-                            latency_ms=0
-                        ))
-                
-            except Exception as e:
-                logger.error(f"[Arena] {agent_name} 批量分析失败: {e}")
-                self._api_failure_counts[agent_name] = self._api_failure_counts.get(agent_name, 0) + 1
+        all_results = list(results_by_symbol.values())
         
         # 5. 计算每个币种的共识
         for result in all_results:
@@ -701,6 +759,79 @@ class ArenaScheduler:
         self._successful_cycles += 1
         return all_results
     
+    @staticmethod
+    async def _save_decisions(adb, decisions: List) -> List[Optional[int]]:
+        """
+        一个事务保存整轮决策；整批失败时逐条重试，失败的决策 ID 为 None
+        
+        adb 为数据库管理器的异步代理，写入在数据库线程池执行
+        """
+        if not decisions:
+            return []
+        try:
+            return await adb.save_decisions_batch(decisions)
+        except Exception as e:
+            logger.error(f"[Arena] 批量保存决策失败，逐条重试: {e}")
+        
+        decision_ids = []
+        for decision in decisions:
+            try:
+                decision_ids.append(await adb.save_decision(decision))
+            except Exception as e:
+                logger.error(f"[Arena] {decision.agent_name} {decision.symbol} 决策保存失败: {e}")
+                decision_ids.append(None)
+        return decision_ids
+    
+    async def _call_batch_agent(self, agent_name: str, **kwargs) -> Optional[List]:
+        """
+        带超时的单个 AI 批量调用（并发 fan-out 用）
+        
+        超时会取消该 AI 的请求；失败或超时返回 None，由调用方跳过该 AI（部分结果照常处理）。
+        同时记录延迟直方图和连续失败计数。
+        """
+        start = time.perf_counter()
+        try:
+            agent = self._get_agent(agent_name)
+            decisions = await asyncio.wait_for(
+                agent.get_batch_decisions(**kwargs),
+                timeout=self.agent_timeout
+            )
+        except asyncio.TimeoutError:
+            elapsed = time.perf_counter() - start
+            self._record_agent_latency(agent_name, elapsed, timed_out=True)
+            self._record_agent_failure(agent_name, f"超时 {elapsed:.0f}s")
+            logger.warning(f"[Arena] {agent_name} 批量分析超时（{self.agent_timeout:.0f}秒），本轮跳过")
+            return None
+        except Exception as e:
+            self._record_agent_latency(agent_name, time.perf_counter() - start, error=True)
+            self._record_agent_failure(agent_name, str(e))
+            logger.error(f"[Arena] {agent_name} 批量分析失败: {e}")
+            return None
+        
+        elapsed = time.perf_counter() - start
+        # get_batch_decisions 内部吞掉异常，全部决策带 error 视为本次调用失败
+        failed = bool(decisions) and all(getattr(d, 'error', None) for d in decisions)
+        self._record_agent_latency(agent_name, elapsed, error=failed)
+        if failed:
+            self._record_agent_failure(agent_name, decisions[0].error)
+        else:
+            # 重置失败计数
+            self._api_failure_counts[agent_name] = 0
+        return decisions
+    
+    def _record_agent_latency(self, agent_name: str, seconds: float, timed_out: bool = False, error: bool = False):
+        hist = self._agent_latency.get(agent_name)
+        if hist is None:
+            hist = self._agent_latency[agent_name] = LatencyHistogram()
+        hist.observe(seconds, timed_out=timed_out, error=error)
+    
+    def _record_agent_failure(self, agent_name: str, error: str):
+        self._api_failure_counts[agent_name] = self._api_failure_counts.get(agent_name, 0) + 1
+        fail_count = self._api_failure_counts[agent_name]
+        if fail_count >= 3:
+            logger.warning(f"[告警] {agent_name} 连续 API 失败 {fail_count} 次!")
+            self._last_error = f"{agent_name} 连续失败 {fail_count} 次: {error}"
+    
     def _calculate_consensus(self, decisions: List[Dict]) -> Optional[str]:
         """计算共识信号"""
         buy_count, sell_count = 0, 0
@@ -1080,6 +1211,8 @@ class PrecisionScheduler:
                     break
                 
                 # 使用带超时的批量分析
+                # 单个 AI 的超时由 ArenaScheduler.agent_timeout 控制，这里只兜底数据拉取 + 落库
+                cycle_timeout = max(120, self._scheduler.agent_timeout + 30)
                 try:
                     results = self._loop.run_until_complete(
                         asyncio.wait_for(
@@ -1090,11 +1223,11 @@ class PrecisionScheduler:
                                 user_prompt=self.user_prompt,
                                 kline_count=100
                             ),
-                            timeout=120  # 2 分钟超时
+                            timeout=cycle_timeout
                         )
                     )
                 except asyncio.TimeoutError:
-                    logger.warning("[Arena] 批量分析超时（120秒），跳过本轮")
+                    logger.warning(f"[Arena] 批量分析超时（{cycle_timeout:.0f}秒），跳过本轮")
                     continue
                 
                 # 执行完成后再次检查停止信号
@@ -1132,6 +1265,11 @@ class PrecisionScheduler:
                 time.sleep(5)
         
         if self._loop:
+            try:
+                from ai.ai_providers import aclose_http_clients
+                self._loop.run_until_complete(aclose_http_clients())
+            except Exception:
+                pass
             self._loop.close()
         logger.info("[Arena] 已停止")
     
@@ -1352,6 +1490,8 @@ def run_battle_sync(
             scheduler.run_battle_cycle(symbol, timeframe, user_prompt)
         )
     finally:
+        from ai.ai_providers import aclose_http_clients
+        loop.run_until_complete(aclose_http_clients())
         loop.close()
 
 
@@ -71,13 +71,14 @@ except Exception as e:
 # 导入项目模块
 try:
     from database.db_bridge import (
-        get_engine_status, get_control_flags, 
-        get_bot_config, update_bot_config, set_control_flags,
+        update_bot_config, set_control_flags,
         init_db,
         get_paper_balance, get_paper_positions, get_hedge_positions,
         get_trade_stats, get_trade_history  # 交易统计
     )
     from database.db_bridge import get_bootstrap_state, get_credentials_status, verify_credentials_and_snapshot
+    # 每次 rerun 都读取的单行配置表走进程内快照
+    from database.config_snapshot import get_engine_status, get_control_flags, get_bot_config
 except ImportError as e:
     st.error(f"❌ 导入数据库模块失败: {str(e)[:200]}")
     st.info("请检查所有 Python 依赖是否已安装")
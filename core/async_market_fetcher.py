@@ -40,6 +40,8 @@ from dataclasses import dataclass
 # 使用 ccxt 异步支持
 import ccxt.async_support as ccxt_async
 
+from core.rate_limiter import get_rate_limiter, is_rate_limit_error
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,6 +52,7 @@ class FetchTask:
     timeframe: str
     limit: int = 50
     since: Optional[int] = None
+    params: Optional[Dict] = None  # 交易所特有参数（如 OKX 倒序分页的 after）
 
 
 @dataclass
@@ -147,7 +150,7 @@ class AsyncMarketFetcher:
             await self.close()
             raise
         
-        # 初始化并发控制信号量
+        # 初始化并发控制信号量（速率由全局限流器控制，与同步调用方共享额度）
         self._semaphore = asyncio.Semaphore(self.max_concurrent)
         
         logger.info(f"[AsyncFetcher] 初始化完成 | 最大并发: {self.max_concurrent}")
@@ -193,11 +196,13 @@ class AsyncMarketFetcher:
         
         async with self._semaphore:  # 并发控制
             try:
+                await get_rate_limiter().acquire_async('candles')  # 速率控制（K线按 IP 限速）
                 data = await self.exchange.fetch_ohlcv(
                     symbol=symbol,
                     timeframe=task.timeframe,
                     limit=task.limit,
                     since=task.since,
+                    params=task.params or {},
                 )
                 
                 latency = (time.perf_counter() - start_time) * 1000
@@ -212,6 +217,8 @@ class AsyncMarketFetcher:
             except Exception as e:
                 latency = (time.perf_counter() - start_time) * 1000
                 error_msg = f"{type(e).__name__}: {str(e)}"
+                if is_rate_limit_error(e):
+                    get_rate_limiter().penalize('candles')
                 logger.warning(f"[AsyncFetcher] 获取失败 {task.symbol} {task.timeframe}: {error_msg}")
                 
                 return FetchResult(
@@ -436,8 +443,13 @@ async def _get_or_create_fetcher(
 
 # ============ 同步兼容接口 ============
 
+# 同步接口每块的并发轮数与超时（秒）：任务数再多，单块的等待时间也有上限
+SYNC_CHUNK_WAVES = int(os.getenv("ASYNC_FETCH_CHUNK_WAVES", "4"))
+SYNC_CHUNK_TIMEOUT = float(os.getenv("ASYNC_FETCH_CHUNK_TIMEOUT", "30"))
+
+
 def fetch_batch_ohlcv_sync(
-    tasks: List[Tuple[str, str, int]],  # [(symbol, timeframe, limit), ...]
+    tasks: List[Tuple],  # [(symbol, timeframe, limit), ...]，可附带 since、params
     api_key: str = "",
     api_secret: str = "",
     passphrase: str = "",
@@ -454,8 +466,12 @@ def fetch_batch_ohlcv_sync(
     
     首次调用会初始化连接（约 0.5-1s），后续调用直接复用（约 0.2-0.4s）
     
+    任务按块提交（每块 max_concurrent × SYNC_CHUNK_WAVES 个），每块单独计时，
+    超时或失败的块返回 None，其余块的结果照常返回。
+    
     Args:
-        tasks: [(symbol, timeframe, limit), ...]
+        tasks: [(symbol, timeframe, limit), ...]，可附带第 4 项 since（增量拉取）
+               和第 5 项 params（如 {'after': ts}，倒序分页拉取历史）
         api_key, api_secret, passphrase: API 凭证
         sandbox: 是否沙盒模式
         market_type: 市场类型 (swap/spot)
@@ -465,7 +481,7 @@ def fetch_batch_ohlcv_sync(
         {(symbol, timeframe): ohlcv_data or None, ...}
     """
     
-    async def _run():
+    async def _run(chunk):
         # 使用连接池获取复用的 fetcher
         fetcher = await _get_or_create_fetcher(
             api_key=api_key,
@@ -477,8 +493,10 @@ def fetch_batch_ohlcv_sync(
         )
         
         fetch_tasks = [
-            FetchTask(symbol=sym, timeframe=tf, limit=lim)
-            for sym, tf, lim in tasks
+            FetchTask(symbol=task[0], timeframe=task[1], limit=task[2],
+                      since=task[3] if len(task) > 3 else None,
+                      params=task[4] if len(task) > 4 else None)
+            for task in chunk
         ]
         return await fetcher.fetch_batch_ohlcv(fetch_tasks)
     
@@ -487,37 +505,38 @@ def fetch_batch_ohlcv_sync(
     loop = _get_or_create_loop()
     t1 = time.perf_counter()
     
-    # 在后台循环中执行异步任务
-    future = asyncio.run_coroutine_threadsafe(_run(), loop)
-    t2 = time.perf_counter()
+    # 按块提交：每块最多 SYNC_CHUNK_WAVES 轮并发，超时只丢弃该块，已完成的块保留
+    chunk_size = max(1, max_concurrent * SYNC_CHUNK_WAVES)
+    output: Dict[Tuple[str, str], Any] = {}
     
-    try:
-        # 等待结果，设置超时
-        results = future.result(timeout=30)
-        t3 = time.perf_counter()
-        
-        # 详细计时日志
-        loop_time = (t1 - t0) * 1000
-        submit_time = (t2 - t1) * 1000
-        wait_time = (t3 - t2) * 1000
-        total_time = (t3 - t0) * 1000
-        
-        if loop_time > 5 or submit_time > 5:  # 只在有明显开销时打印
-            logger.debug(
-                f"[AsyncFetcher] 同步调用耗时 | "
-                f"获取循环: {loop_time:.1f}ms | 提交任务: {submit_time:.1f}ms | "
-                f"等待结果: {wait_time:.1f}ms | 总计: {total_time:.1f}ms"
+    for start in range(0, len(tasks), chunk_size):
+        chunk = tasks[start:start + chunk_size]
+        future = asyncio.run_coroutine_threadsafe(_run(chunk), loop)
+        try:
+            # 等待结果，设置超时
+            results = future.result(timeout=SYNC_CHUNK_TIMEOUT)
+        except Exception as e:
+            future.cancel()
+            logger.error(
+                f"[AsyncFetcher] 批量获取失败 ({start + 1}-{start + len(chunk)}/{len(tasks)}): "
+                f"{type(e).__name__}: {e}"
             )
-    except Exception as e:
-        logger.error(f"[AsyncFetcher] 批量获取失败: {e}")
-        # 返回空结果
-        return {(sym, tf): None for sym, tf, _ in tasks}
+            output.update({(task[0], task[1]): None for task in chunk})
+            continue
+        output.update({(r.symbol, r.timeframe): r.data for r in results})
     
-    # 转换为字典格式
-    return {
-        (r.symbol, r.timeframe): r.data
-        for r in results
-    }
+    t2 = time.perf_counter()
+    
+    # 详细计时日志
+    loop_time = (t1 - t0) * 1000
+    total_time = (t2 - t0) * 1000
+    if loop_time > 5:  # 只在有明显开销时打印
+        logger.debug(
+            f"[AsyncFetcher] 同步调用耗时 | "
+            f"获取循环: {loop_time:.1f}ms | 总计: {total_time:.1f}ms | 任务: {len(tasks)}"
+        )
+    
+    return output
 
 
 def close_global_fetcher():
@@ -23,6 +23,8 @@ from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
+from core.rate_limiter import get_rate_limiter, is_rate_limit_error, ohlcv_endpoint
+
 load_dotenv()
 
 
@@ -38,6 +40,7 @@ class BacktestConfig:
     slippage_rate: float = 0.0001   # 滑点 0.01%
     leverage: int = 5
     position_pct: float = 2.0       # 仓位比例 %
+    simulation_mode: str = "incremental"  # incremental: 增量 walk-forward / legacy: 逐 bar 复制切片
 
 
 @dataclass
@@ -56,6 +59,51 @@ class Trade:
     exit_reason: str = ""
 
 
+@dataclass
+class EquityCurve:
+    """权益曲线（预分配 NumPy 列，避免逐 bar 追加 dict）"""
+    timestamps: np.ndarray
+    equity: np.ndarray
+    capital: np.ndarray
+    unrealized_pnl: np.ndarray
+    
+    @classmethod
+    def allocate(cls, timestamps: np.ndarray, size: int) -> 'EquityCurve':
+        """按 bar 数预分配"""
+        return cls(
+            timestamps=timestamps[:size],
+            equity=np.zeros(size, dtype=np.float64),
+            capital=np.zeros(size, dtype=np.float64),
+            unrealized_pnl=np.zeros(size, dtype=np.float64),
+        )
+    
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'EquityCurve':
+        """从旧版 list[dict] 权益曲线构建"""
+        return cls(
+            timestamps=np.array([r['timestamp'] for r in records]),
+            equity=np.array([r['equity'] for r in records], dtype=np.float64),
+            capital=np.array([r['capital'] for r in records], dtype=np.float64),
+            unrealized_pnl=np.array([r['unrealized_pnl'] for r in records], dtype=np.float64),
+        )
+    
+    def __len__(self) -> int:
+        return len(self.equity)
+    
+    def to_records(self) -> List[Dict]:
+        """转换为 list[dict]（UI 图表使用）"""
+        timestamps = pd.to_datetime(self.timestamps)
+        return [
+            {
+                'timestamp': ts,
+                'equity': float(eq),
+                'capital': float(cap),
+                'unrealized_pnl': float(upnl),
+            }
+            for ts, eq, cap, upnl in zip(timestamps, self.equity, self.capital, self.unrealized_pnl)
+        ]
+
+
 @dataclass
 class BacktestResult:
     """回测结果"""
@@ -189,6 +237,9 @@ class BacktestEngine:
         """
         获取历史 K 线数据
         
+        优先读取本地列式K线库（database.ohlcv_store），只从交易所下载未覆盖的缺口，
+        重复回测同一区间不产生网络请求。
+        
         Args:
             symbol: 交易对
             timeframe: 时间周期
@@ -198,31 +249,62 @@ class BacktestEngine:
         Returns:
             DataFrame with columns: timestamp, open, high, low, close, volume
         """
-        if not self.exchange:
-            raise Exception("交易所未连接，请检查网络和代理配置")
+        from database.ohlcv_store import get_ohlcv_store, rows_to_frame, last_closed_bar_ts
         
         # 标准化 symbol 格式
-        original_symbol = symbol
         if '/' not in symbol:
             symbol = f"{symbol}/USDT:USDT"
         elif ':' not in symbol:
             symbol = f"{symbol}:USDT"
         
-        tf_ms = self._get_timeframe_ms(timeframe)
         start_ts = int(start_date.timestamp() * 1000)
         end_ts = int(end_date.timestamp() * 1000)
         
+        print(f"📊 [回测引擎] 获取历史数据: {symbol} {timeframe}")
+        print(f"   时间范围: {start_date.strftime('%Y-%m-%d %H:%M')} ~ {end_date.strftime('%Y-%m-%d %H:%M')}")
+        
+        store = get_ohlcv_store()
+        gaps = store.missing_ranges(symbol, timeframe, start_ts, min(end_ts, last_closed_bar_ts(timeframe)))
+        if gaps and not self.exchange:
+            raise Exception("交易所未连接，请检查网络和代理配置")
+        if not gaps:
+            print(f"   💾 本地K线库已覆盖该区间，无需下载")
+        
+        rows = store.ensure(symbol, timeframe, start_ts, end_ts,
+                            download=self._download_range if self.exchange else None)
+        
+        print(f"\n   ✅ 共获取 {len(rows)} 根K线")
+        
+        if len(rows) == 0:
+            print(f"   ❌ 未能获取任何数据，可能原因：")
+            print(f"      1. 网络无法连接 OKX（需要代理）")
+            print(f"      2. 交易对 {symbol} 不存在")
+            print(f"      3. 时间范围内没有数据")
+            return pd.DataFrame()
+        
+        return rows_to_frame(rows)
+    
+    def _download_range(self, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> Tuple[List[List], bool]:
+        """
+        从交易所分页下载 [start_ts, end_ts] 的K线
+        
+        Returns:
+            (K线列表, 是否完整下载) - 中途网络 / 交易所错误时为 False，缺口下次重试
+        """
         all_candles = []
         current_since = start_ts
         page_size = 300  # OKX 单次最多 300 根
         retry_count = 0
         max_retries = 3
-        
-        print(f"📊 [回测引擎] 获取历史数据: {symbol} {timeframe}")
-        print(f"   时间范围: {start_date.strftime('%Y-%m-%d %H:%M')} ~ {end_date.strftime('%Y-%m-%d %H:%M')}")
+        complete = True
+        limiter = get_rate_limiter()
+        tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
         
         while current_since < end_ts:
+            # 早于最近 1440 根的分页命中 history-candles（20 次 / 2 秒），与其他调用方共享额度
+            endpoint = ohlcv_endpoint(current_since, tf_ms)
             try:
+                limiter.acquire(endpoint)
                 data = self.exchange.fetch_ohlcv(
                     symbol, timeframe,
                     since=current_since,
@@ -250,13 +332,12 @@ class BacktestEngine:
                 current_since = max_ts + 1
                 
                 # 进度显示
-                progress = (current_since - start_ts) / (end_ts - start_ts) * 100
+                progress = (current_since - start_ts) / max(end_ts - start_ts, 1) * 100
                 print(f"   进度: {min(progress, 100):.1f}% ({len(all_candles)} 根K线)", end='\r')
                 
-                # 避免限流
-                time.sleep(0.1)
-                
             except ccxt.NetworkError as e:
+                if is_rate_limit_error(e):
+                    limiter.penalize(endpoint)
                 print(f"\n   ❌ 网络错误: {e}")
                 print(f"   请检查：1) 网络连接 2) 代理配置 (HTTP_PROXY 环境变量)")
                 if retry_count < max_retries:
@@ -264,11 +345,13 @@ class BacktestEngine:
                     print(f"   重试 {retry_count}/{max_retries}...")
                     time.sleep(2)
                     continue
+                complete = False
                 break
             except ccxt.ExchangeError as e:
                 print(f"\n   ❌ 交易所错误: {e}")
                 if "symbol" in str(e).lower():
                     print(f"   交易对 {symbol} 可能不存在，请检查输入")
+                complete = False
                 break
             except Exception as e:
                 print(f"\n   ⚠️ 获取数据出错: {type(e).__name__}: {e}")
@@ -276,23 +359,10 @@ class BacktestEngine:
                     retry_count += 1
                     time.sleep(1)
                     continue
+                complete = False
                 break
         
-        print(f"\n   ✅ 共获取 {len(all_candles)} 根K线")
-        
-        if not all_candles:
-            print(f"   ❌ 未能获取任何数据，可能原因：")
-            print(f"      1. 网络无法连接 OKX（需要代理）")
-            print(f"      2. 交易对 {symbol} 不存在")
-            print(f"      3. 时间范围内没有数据")
-            return pd.DataFrame()
-        
-        # 转换为 DataFrame
-        df = pd.DataFrame(all_candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp').reset_index(drop=True)
-        
-        return df
+        return all_candles, complete
     
     def run_backtest(
         self, 
@@ -461,8 +531,151 @@ class BacktestEngine:
         df: pd.DataFrame, 
         config: BacktestConfig,
         progress_callback=None
+    ) -> Tuple[List[Trade], 'EquityCurve']:
+        """模拟交易 - 按 config.simulation_mode 选择增量或旧版逐 bar 切片模式"""
+        if config.simulation_mode == 'legacy':
+            return self._simulate_trading_legacy(strategy, df, config, progress_callback)
+        return self._simulate_trading_incremental(strategy, df, config, progress_callback)
+    
+    def _prepare_strategy(self, strategy, capital: float) -> bool:
+        """检测并初始化高级策略（有内部持仓管理），返回是否为高级策略"""
+        is_advanced_strategy = hasattr(strategy, 'position') and hasattr(strategy, 'set_equity')
+        
+        if is_advanced_strategy:
+            # 高级策略：设置初始权益，禁用时间过滤（回测不需要）
+            strategy.set_equity(capital)
+            if hasattr(strategy, 'risk'):
+                strategy.risk.allowed_hours = [(0, 24)]  # 全天可交易
+            print(f"📊 [回测] 检测到高级策略，使用策略内置风控")
+        
+        return is_advanced_strategy
+    
+    def _simulate_trading_incremental(
+        self, 
+        strategy, 
+        df: pd.DataFrame, 
+        config: BacktestConfig,
+        progress_callback=None
+    ) -> Tuple[List[Trade], 'EquityCurve']:
+        """
+        增量模拟交易（walk-forward）
+        
+        - 指标只在开始前计算一次
+        - 策略拿到的是零拷贝切片视图；实现了 check_signals_at 的策略直接拿到 bar 索引，
+          实现了 check_signals_vectorized 的策略一次性算出全部信号
+        - 权益曲线写入预分配的 NumPy 数组
+        
+        交易结果与 _simulate_trading_legacy 一致。
+        """
+        trades = []
+        
+        capital = config.initial_capital
+        position = None
+        
+        total_bars = len(df)
+        start_idx = 200  # 需要足够的历史数据计算指标
+        
+        has_analyze = hasattr(strategy, 'analyze')
+        has_check_signals = hasattr(strategy, 'check_signals')
+        has_check_signals_at = hasattr(strategy, 'check_signals_at')
+        has_check_signals_vectorized = hasattr(strategy, 'check_signals_vectorized')
+        has_calculate_indicators = hasattr(strategy, 'calculate_indicators')
+        
+        is_advanced_strategy = self._prepare_strategy(strategy, capital)
+        
+        # 指标只计算一次
+        df_with_indicators = df
+        if has_calculate_indicators and has_check_signals:
+            try:
+                df_with_indicators = strategy.calculate_indicators(df.copy())
+            except Exception as e:
+                print(f"计算指标失败: {e}")
+        
+        # 预提取列，循环内只做标量访问
+        close_values = df['close'].to_numpy(dtype=np.float64)
+        ts_values = df['timestamp'].to_numpy()
+        
+        # 支持向量化的策略：一次算出全部 bar 的信号
+        signal_frame = None
+        if not has_analyze and has_check_signals_vectorized:
+            try:
+                signal_frame = strategy.check_signals_vectorized(df_with_indicators, config.timeframe)
+            except Exception as e:
+                print(f"向量化信号计算失败，回退逐 bar 计算: {e}")
+        if signal_frame is not None:
+            signal_actions = signal_frame['action'].to_numpy()
+            signal_columns = {c: signal_frame[c].to_numpy() for c in signal_frame.columns}
+        
+        n_eval = max(total_bars - start_idx, 0)
+        curve = EquityCurve.allocate(ts_values[start_idx:], n_eval)
+        
+        for i in range(start_idx, total_bars):
+            # 进度更新
+            if progress_callback and i % 100 == 0:
+                progress = 20 + (i - start_idx) / (total_bars - start_idx) * 70
+                progress_callback(int(progress), 100, f"回测进度: {i}/{total_bars}")
+            
+            current_price = close_values[i]
+            
+            # 记录权益
+            unrealized_pnl = 0
+            if position:
+                if position['side'] == 'LONG':
+                    unrealized_pnl = (current_price - position['entry_price']) * position['quantity']
+                else:
+                    unrealized_pnl = (position['entry_price'] - current_price) * position['quantity']
+            
+            k = i - start_idx
+            curve.equity[k] = capital + unrealized_pnl
+            curve.capital[k] = capital
+            curve.unrealized_pnl[k] = unrealized_pnl
+            
+            # 更新高级策略的权益
+            if is_advanced_strategy:
+                strategy.set_equity(capital + unrealized_pnl)
+            
+            # 调用策略
+            signal = None
+            try:
+                if has_analyze:
+                    signal = strategy.analyze(df.iloc[:i+1], config.symbol, config.timeframe)
+                elif signal_frame is not None:
+                    if signal_actions[i] == 'HOLD':
+                        continue
+                    signal = {c: values[i] for c, values in signal_columns.items()}
+                elif has_check_signals_at:
+                    signal = strategy.check_signals_at(df_with_indicators, i, config.timeframe)
+                elif has_check_signals:
+                    signal = strategy.check_signals(df_with_indicators.iloc[:i+1], config.timeframe)
+                else:
+                    continue
+            except Exception as e:
+                continue
+            
+            if not signal or signal.get('action', 'HOLD') == 'HOLD':
+                continue
+            
+            position, capital = self._apply_signal(
+                signal, position, capital, current_price, pd.Timestamp(ts_values[i]),
+                config, is_advanced_strategy, trades
+            )
+        
+        # 如果还有持仓，强制平仓
+        if position:
+            capital += self._force_close(
+                position, close_values[-1], pd.Timestamp(ts_values[-1]), config, trades
+            )
+        
+        return trades, curve
+    
+    def _simulate_trading_legacy(
+        self, 
+        strategy, 
+        df: pd.DataFrame, 
+        config: BacktestConfig,
+        progress_callback=None
     ) -> Tuple[List[Trade], List[Dict]]:
-        """模拟交易 - 支持简单策略和高级策略"""
+        """模拟交易（旧版：每根 K 线复制一次历史切片，仅用于对照验证）"""
         trades = []
         equity_curve = []
         
@@ -477,15 +690,7 @@ class BacktestEngine:
         has_check_signals = hasattr(strategy, 'check_signals')
         has_calculate_indicators = hasattr(strategy, 'calculate_indicators')
         
-        # 检测是否为高级策略（有内部持仓管理）
-        is_advanced_strategy = hasattr(strategy, 'position') and hasattr(strategy, 'set_equity')
-        
-        if is_advanced_strategy:
-            # 高级策略：设置初始权益，禁用时间过滤（回测不需要）
-            strategy.set_equity(capital)
-            if hasattr(strategy, 'risk'):
-                strategy.risk.allowed_hours = [(0, 24)]  # 全天可交易
-            print(f"📊 [回测] 检测到高级策略，使用策略内置风控")
+        is_advanced_strategy = self._prepare_strategy(strategy, capital)
         
         # 对于内置策略，需要先计算指标
         df_with_indicators = df.copy()
@@ -543,213 +748,239 @@ class BacktestEngine:
             if not signal:
                 continue
             
-            action = signal.get('action', 'HOLD')
-            
-            # 处理信号
-            if position is None:
-                # 无持仓，检查开仓信号
-                if action in ['LONG', 'SHORT']:
-                    # 高级策略使用信号中的仓位大小
-                    if is_advanced_strategy and 'position_size_usd' in signal:
-                        position_value = signal['position_size_usd']
-                        leverage = signal.get('leverage', config.leverage)
-                    else:
-                        # 简单策略使用配置的仓位
-                        position_value = capital * (config.position_pct / 100) * config.leverage
-                        leverage = config.leverage
-                    
-                    quantity = position_value / current_price
-                    
-                    # 计算手续费
-                    commission = position_value * config.commission_rate
-                    
-                    # 计算滑点
-                    slippage = current_price * config.slippage_rate
-                    entry_price = current_price + slippage if action == 'LONG' else current_price - slippage
-                    
-                    # 保存止损止盈信息（高级策略）
-                    stop_loss = signal.get('stop_loss', 0)
-                    take_profit_1 = signal.get('take_profit_1', 0)
-                    take_profit_2 = signal.get('take_profit_2', 0)
-                    
-                    position = {
-                        'side': action,
-                        'entry_price': entry_price,
-                        'entry_time': current_time,
-                        'quantity': quantity,
-                        'initial_quantity': quantity,
-                        'commission': commission,
-                        'reason': signal.get('reason', ''),
-                        'stop_loss': stop_loss,
-                        'take_profit_1': take_profit_1,
-                        'take_profit_2': take_profit_2,
-                        'tp1_hit': False,
-                        'tp2_hit': False,
-                    }
-                    
-                    capital -= commission
-            else:
-                # 有持仓，检查平仓信号
-                should_close = False
-                close_pct = 1.0  # 默认全部平仓
-                exit_reason = ""
-                
-                # 检查平仓信号
-                if action in ['CLOSE_LONG', 'CLOSE_SHORT']:
-                    if (position['side'] == 'LONG' and action == 'CLOSE_LONG') or \
-                       (position['side'] == 'SHORT' and action == 'CLOSE_SHORT'):
-                        should_close = True
-                        close_pct = signal.get('close_pct', 1.0)
-                        exit_reason = signal.get('reason', '平仓信号')
-                
-                # 反向信号平仓
-                elif (position['side'] == 'LONG' and action == 'SHORT') or \
-                     (position['side'] == 'SHORT' and action == 'LONG'):
-                    should_close = True
-                    exit_reason = signal.get('reason', '反向信号')
-                
-                if should_close:
-                    # 计算平仓数量
-                    close_quantity = position['quantity'] * close_pct
-                    
-                    # 计算滑点
-                    slippage = current_price * config.slippage_rate
-                    exit_price = current_price - slippage if position['side'] == 'LONG' else current_price + slippage
-                    
-                    # 计算盈亏
-                    if position['side'] == 'LONG':
-                        pnl = (exit_price - position['entry_price']) * close_quantity
-                    else:
-                        pnl = (position['entry_price'] - exit_price) * close_quantity
-                    
-                    # 扣除平仓手续费
-                    exit_commission = close_quantity * exit_price * config.commission_rate
-                    pnl -= exit_commission
-                    
-                    pnl_pct = pnl / (position['entry_price'] * close_quantity) * 100
-                    
-                    # 记录交易
-                    trade = Trade(
-                        entry_time=position['entry_time'],
-                        exit_time=current_time,
-                        side=position['side'],
-                        entry_price=position['entry_price'],
-                        exit_price=exit_price,
-                        quantity=close_quantity,
-                        pnl=pnl,
-                        pnl_pct=pnl_pct,
-                        commission=position['commission'] * close_pct + exit_commission,
-                        reason=position['reason'],
-                        exit_reason=exit_reason,
-                    )
-                    trades.append(trade)
-                    
-                    capital += pnl
-                    
-                    # 更新剩余仓位
-                    position['quantity'] -= close_quantity
-                    position['commission'] *= (1 - close_pct)
-                    
-                    if position['quantity'] <= 0.0001:
-                        position = None
+            position, capital = self._apply_signal(
+                signal, position, capital, current_price, current_time,
+                config, is_advanced_strategy, trades
+            )
         
         # 如果还有持仓，强制平仓
         if position:
-            current_price = df.iloc[-1]['close']
-            current_time = df.iloc[-1]['timestamp']
-            
-            if position['side'] == 'LONG':
-                pnl = (current_price - position['entry_price']) * position['quantity']
-            else:
-                pnl = (position['entry_price'] - current_price) * position['quantity']
-            
-            exit_commission = position['quantity'] * current_price * config.commission_rate
-            pnl -= exit_commission
-            pnl_pct = pnl / (position['entry_price'] * position['quantity']) * 100
-            
-            trade = Trade(
-                entry_time=position['entry_time'],
-                exit_time=current_time,
-                side=position['side'],
-                entry_price=position['entry_price'],
-                exit_price=current_price,
-                quantity=position['quantity'],
-                pnl=pnl,
-                pnl_pct=pnl_pct,
-                commission=position['commission'] + exit_commission,
-                reason=position['reason'],
-                exit_reason="回测结束强制平仓",
+            capital += self._force_close(
+                position, df.iloc[-1]['close'], df.iloc[-1]['timestamp'], config, trades
             )
-            trades.append(trade)
-            capital += pnl
         
         return trades, equity_curve
     
+    def _apply_signal(
+        self,
+        signal: Dict[str, Any],
+        position: Optional[Dict],
+        capital: float,
+        current_price: float,
+        current_time,
+        config: BacktestConfig,
+        is_advanced_strategy: bool,
+        trades: List[Trade]
+    ) -> Tuple[Optional[Dict], float]:
+        """处理单根 K 线的信号，返回 (新持仓, 新资金)"""
+        action = signal.get('action', 'HOLD')
+        
+        # 处理信号
+        if position is None:
+            # 无持仓，检查开仓信号
+            if action in ['LONG', 'SHORT']:
+                # 高级策略使用信号中的仓位大小
+                if is_advanced_strategy and 'position_size_usd' in signal:
+                    position_value = signal['position_size_usd']
+                    leverage = signal.get('leverage', config.leverage)
+                else:
+                    # 简单策略使用配置的仓位
+                    position_value = capital * (config.position_pct / 100) * config.leverage
+                    leverage = config.leverage
+                
+                quantity = position_value / current_price
+                
+                # 计算手续费
+                commission = position_value * config.commission_rate
+                
+                # 计算滑点
+                slippage = current_price * config.slippage_rate
+                entry_price = current_price + slippage if action == 'LONG' else current_price - slippage
+                
+                # 保存止损止盈信息（高级策略）
+                stop_loss = signal.get('stop_loss', 0)
+                take_profit_1 = signal.get('take_profit_1', 0)
+                take_profit_2 = signal.get('take_profit_2', 0)
+                
+                position = {
+                    'side': action,
+                    'entry_price': entry_price,
+                    'entry_time': current_time,
+                    'quantity': quantity,
+                    'initial_quantity': quantity,
+                    'commission': commission,
+                    'reason': signal.get('reason', ''),
+                    'stop_loss': stop_loss,
+                    'take_profit_1': take_profit_1,
+                    'take_profit_2': take_profit_2,
+                    'tp1_hit': False,
+                    'tp2_hit': False,
+                }
+                
+                capital -= commission
+        else:
+            # 有持仓，检查平仓信号
+            should_close = False
+            close_pct = 1.0  # 默认全部平仓
+            exit_reason = ""
+            
+            # 检查平仓信号
+            if action in ['CLOSE_LONG', 'CLOSE_SHORT']:
+                if (position['side'] == 'LONG' and action == 'CLOSE_LONG') or \
+                   (position['side'] == 'SHORT' and action == 'CLOSE_SHORT'):
+                    should_close = True
+                    close_pct = signal.get('close_pct', 1.0)
+                    exit_reason = signal.get('reason', '平仓信号')
+            
+            # 反向信号平仓
+            elif (position['side'] == 'LONG' and action == 'SHORT') or \
+                 (position['side'] == 'SHORT' and action == 'LONG'):
+                should_close = True
+                exit_reason = signal.get('reason', '反向信号')
+            
+            if should_close:
+                # 计算平仓数量
+                close_quantity = position['quantity'] * close_pct
+                
+                # 计算滑点
+                slippage = current_price * config.slippage_rate
+                exit_price = current_price - slippage if position['side'] == 'LONG' else current_price + slippage
+                
+                # 计算盈亏
+                if position['side'] == 'LONG':
+                    pnl = (exit_price - position['entry_price']) * close_quantity
+                else:
+                    pnl = (position['entry_price'] - exit_price) * close_quantity
+                
+                # 扣除平仓手续费
+                exit_commission = close_quantity * exit_price * config.commission_rate
+                pnl -= exit_commission
+                
+                pnl_pct = pnl / (position['entry_price'] * close_quantity) * 100
+                
+                # 记录交易
+                trade = Trade(
+                    entry_time=position['entry_time'],
+                    exit_time=current_time,
+                    side=position['side'],
+                    entry_price=position['entry_price'],
+                    exit_price=exit_price,
+                    quantity=close_quantity,
+                    pnl=pnl,
+                    pnl_pct=pnl_pct,
+                    commission=position['commission'] * close_pct + exit_commission,
+                    reason=position['reason'],
+                    exit_reason=exit_reason,
+                )
+                trades.append(trade)
+                
+                capital += pnl
+                
+                # 更新剩余仓位
+                position['quantity'] -= close_quantity
+                position['commission'] *= (1 - close_pct)
+                
+                if position['quantity'] <= 0.0001:
+                    position = None
+        
+        return position, capital
+    
+    def _force_close(
+        self,
+        position: Dict,
+        current_price: float,
+        current_time,
+        config: BacktestConfig,
+        trades: List[Trade]
+    ) -> float:
+        """回测结束强制平仓，返回已实现盈亏"""
+        if position['side'] == 'LONG':
+            pnl = (current_price - position['entry_price']) * position['quantity']
+        else:
+            pnl = (position['entry_price'] - current_price) * position['quantity']
+        
+        exit_commission = position['quantity'] * current_price * config.commission_rate
+        pnl -= exit_commission
+        pnl_pct = pnl / (position['entry_price'] * position['quantity']) * 100
+        
+        trade = Trade(
+            entry_time=position['entry_time'],
+            exit_time=current_time,
+            side=position['side'],
+            entry_price=position['entry_price'],
+            exit_price=current_price,
+            quantity=position['quantity'],
+            pnl=pnl,
+            pnl_pct=pnl_pct,
+            commission=position['commission'] + exit_commission,
+            reason=position['reason'],
+            exit_reason="回测结束强制平仓",
+        )
+        trades.append(trade)
+        return pnl
+    
     def _calculate_metrics(
         self, 
         trades: List[Trade], 
-        equity_curve: List[Dict],
+        equity_curve,
         config: BacktestConfig,
         result: BacktestResult
     ) -> BacktestResult:
-        """计算回测指标"""
+        """计算回测指标（equity_curve 可以是 EquityCurve 或旧版 list[dict]）"""
+        if not isinstance(equity_curve, EquityCurve):
+            equity_curve = EquityCurve.from_records(equity_curve)
+        
         result.trades = trades
-        result.equity_curve = equity_curve
+        result.equity_curve = equity_curve.to_records()
         
-        if not equity_curve:
+        if len(equity_curve) == 0:
             return result
         
+        equity_values = equity_curve.equity
+        
         # 最终资金
-        result.final_capital = equity_curve[-1]['equity']
+        result.final_capital = float(equity_values[-1])
         result.total_return = result.final_capital - result.initial_capital
         result.total_return_pct = (result.total_return / result.initial_capital) * 100
         
         # 年化收益率
         if len(equity_curve) > 1:
-            start_time = equity_curve[0]['timestamp']
-            end_time = equity_curve[-1]['timestamp']
+            start_time = pd.Timestamp(equity_curve.timestamps[0])
+            end_time = pd.Timestamp(equity_curve.timestamps[-1])
             days = (end_time - start_time).total_seconds() / 86400
             if days > 0:
                 result.annualized_return = ((result.final_capital / result.initial_capital) ** (365 / days) - 1) * 100
         
-        # 最大回撤
-        equity_values = [e['equity'] for e in equity_curve]
-        peak = equity_values[0]
-        max_dd = 0
+        # 最大回撤（向量化：累计峰值）
+        peaks = np.maximum.accumulate(equity_values)
+        drawdowns = peaks - equity_values
+        max_dd_idx = int(np.argmax(drawdowns))
+        max_dd = float(drawdowns[max_dd_idx])
         max_dd_pct = 0
-        
-        for equity in equity_values:
-            if equity > peak:
-                peak = equity
-            dd = peak - equity
-            dd_pct = dd / peak * 100 if peak > 0 else 0
-            if dd > max_dd:
-                max_dd = dd
-                max_dd_pct = dd_pct
+        if max_dd > 0 and peaks[max_dd_idx] > 0:
+            max_dd_pct = max_dd / peaks[max_dd_idx] * 100
         
         result.max_drawdown = max_dd
         result.max_drawdown_pct = max_dd_pct
         
         # 夏普比率（假设无风险利率为 0）
         if len(equity_curve) > 1:
-            returns = []
-            for i in range(1, len(equity_curve)):
-                prev_equity = equity_curve[i-1]['equity']
-                curr_equity = equity_curve[i]['equity']
-                if prev_equity > 0:
-                    returns.append((curr_equity - prev_equity) / prev_equity)
-            
-            if returns:
+            prev_equity = equity_values[:-1]
+            curr_equity = equity_values[1:]
+            valid = prev_equity > 0
+            returns = (curr_equity[valid] - prev_equity[valid]) / prev_equity[valid]
+            
+            if len(returns) > 0:
                 avg_return = np.mean(returns)
                 std_return = np.std(returns)
+                tf_per_year = 365 * 24 * 60 / self._get_timeframe_minutes(config.timeframe)
                 if std_return > 0:
-                    # 年化夏普比率（假设每天 96 个 15 分钟 K 线）
-                    tf_per_year = 365 * 24 * 60 / self._get_timeframe_minutes(config.timeframe)
+                    # 年化夏普比率
                     result.sharpe_ratio = avg_return / std_return * np.sqrt(tf_per_year)
                 
                 # Sortino 比率（只考虑下行波动）
-                negative_returns = [r for r in returns if r < 0]
-                if negative_returns:
+                negative_returns = returns[returns < 0]
+                if len(negative_returns) > 0:
                     downside_std = np.std(negative_returns)
                     if downside_std > 0:
                         result.sortino_ratio = avg_return / downside_std * np.sqrt(tf_per_year)
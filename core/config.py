@@ -116,7 +116,7 @@ TRADE_SYMBOLS = parse_symbols(SYMBOLS)
 DB_PATH = "quant_system.db"
 
 # 日志配置
-LOG_DIR = "logs"
+LOG_DIR = os.getenv("LOG_DIR", "logs")
 RUNNER_LOG_FILE = "runner.log"
 
 # 控制标志默认值
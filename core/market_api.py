@@ -46,6 +46,8 @@ if _project_root not in sys.path:
 # 加载环境变量
 load_dotenv()
 
+from core.rate_limiter import get_rate_limiter, is_rate_limit_error, ohlcv_endpoint
+
 # ============ FastAPI 应用 ============
 try:
     from fastapi import FastAPI, Query, HTTPException
@@ -185,65 +187,75 @@ class OKXClient:
             
             if limit <= OKX_PAGE_SIZE:
                 # 单次请求即可
-                return self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+                return self._request_ohlcv(symbol, timeframe, limit=limit)
             
-            # 分页拉取逻辑
+            # 最新一页实时拉取（包含未收盘K线），更早的历史走本地K线库，只补缺口
+            latest = self._request_ohlcv(symbol, timeframe, limit=OKX_PAGE_SIZE)
+            if not latest or len(latest) >= limit:
+                return latest[-limit:] if latest else latest
+
+            from database.ohlcv_store import get_ohlcv_store
             tf_ms = self._get_timeframe_ms(timeframe)
-            all_candles = []
-            seen_timestamps = set()
-            
-            # 计算起始时间（从过去开始向后拉取）
-            now_ms = int(time.time() * 1000)
-            start_ts = now_ms - (limit + 50) * tf_ms  # 多拉一些确保足够
-            
-            current_since = start_ts
-            max_pages = (limit // OKX_PAGE_SIZE) + 3  # 最多拉取的页数
-            
-            for page in range(max_pages):
-                if len(all_candles) >= limit:
-                    break
-                
-                data = self.exchange.fetch_ohlcv(
-                    symbol, timeframe, 
-                    since=current_since, 
-                    limit=OKX_PAGE_SIZE
-                )
-                
-                if not data:
-                    break
-                
-                # 去重并添加
-                new_count = 0
-                max_ts = 0
-                for candle in data:
-                    ts = candle[0]
-                    if ts not in seen_timestamps:
-                        seen_timestamps.add(ts)
-                        all_candles.append(candle)
-                        new_count += 1
-                    if ts > max_ts:
-                        max_ts = ts
-                
-                if new_count == 0:
-                    break
-                
-                # 检查是否已拉取到最新
-                if max_ts >= now_ms - tf_ms:
-                    break
-                
-                # 更新 since 为本页最大时间戳 + 1ms
-                current_since = max_ts + 1
-                
-                # 短暂延迟避免限流
-                time.sleep(0.05)
-            
-            # 按时间戳排序并截取
-            all_candles.sort(key=lambda x: x[0])
-            return all_candles[-limit:] if len(all_candles) > limit else all_candles
-            
+            first_ts = int(latest[0][0])
+            history_start = first_ts - (limit - len(latest)) * tf_ms
+            history = get_ohlcv_store().ensure(
+                symbol, timeframe, history_start, first_ts - 1,
+                download=self._download_range
+            )
+
+            candles = [[int(row[0]), *map(float, row[1:])] for row in history]
+            candles.extend(latest)
+            return candles[-limit:]
+
         except Exception as e:
             raise Exception(f"获取K线失败: {e}")
     
+    def _request_ohlcv(self, symbol: str, timeframe: str, **kwargs) -> List[List]:
+        """经全局限流器请求K线（与交易引擎等 REST 调用方共享额度；早于最近 1440 根的分页走 history_candles 桶）"""
+        limiter = get_rate_limiter()
+        endpoint = ohlcv_endpoint(kwargs.get('since'), self._get_timeframe_ms(timeframe))
+        limiter.acquire(endpoint)
+        try:
+            return self.exchange.fetch_ohlcv(symbol, timeframe, **kwargs)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                limiter.penalize(endpoint)
+            raise
+    
+    def _download_range(self, symbol: str, timeframe: str, start_ms: int, end_ms: int):
+        """
+        分页下载 [start_ms, end_ms] 的K线（本地K线库的 downloader）
+
+        返回: (candles, complete)
+        """
+        OKX_PAGE_SIZE = 300
+        all_candles = []
+        current_since = start_ms
+
+        while current_since <= end_ms:
+            try:
+                data = self._request_ohlcv(
+                    symbol, timeframe,
+                    since=current_since,
+                    limit=OKX_PAGE_SIZE
+                )
+            except Exception as e:
+                print(f"[market_api] 分页拉取K线失败 {symbol} {timeframe}: {e}")
+                return all_candles, False
+
+            if not data:
+                break
+
+            max_ts = max(candle[0] for candle in data)
+            all_candles.extend(candle for candle in data if current_since <= candle[0] <= end_ms)
+            if max_ts < current_since:
+                break
+
+            # 更新 since 为本页最大时间戳 + 1ms（请求间隔由限流器控制）
+            current_since = max_ts + 1
+
+        return all_candles, True
+
     def _get_timeframe_ms(self, timeframe: str) -> int:
         """将时间周期转换为毫秒"""
         tf_map = {
@@ -336,20 +348,40 @@ def _calculate_strategy_markers(ohlcv: List[List], symbol: str, timeframe: str,
         hold_count = 0
         error_count = 0
         
+        # 支持向量化的策略：一次算出所有 K线的信号，避免逐根切片
+        signal_frame = None
+        if hasattr(strategy, 'check_signals_vectorized'):
+            try:
+                signal_frame = strategy.check_signals_vectorized(df_with_indicators, timeframe=timeframe)
+                signal_actions = signal_frame['action'].to_numpy()
+                signal_types = signal_frame['type'].to_numpy()
+                signal_reasons = signal_frame['reason'].to_numpy()
+            except Exception as e:
+                signal_frame = None
+                print(f"[market_api] 向量化信号计算失败，回退逐根计算: {str(e)[:100]}")
+        
         for i in range(start_idx, len(df) - 2):
             # 00秒确认模式：策略使用 df.iloc[-2] 作为"当前K线"
             # 所以我们需要传入截止到 i+2 的数据（让 iloc[-2] 指向第 i 根）
             # 即：sub_df.iloc[-2] = df.iloc[i]，sub_df.iloc[-1] = df.iloc[i+1]
             # 需要 i+2 < len(df)，所以循环到 len(df) - 2
-            sub_df = df_with_indicators.iloc[:i+3].copy()
-            
-            # 确保有足够的数据（至少4根K线用于 iloc[-2], [-3], [-4]）
-            if len(sub_df) < 4:
-                continue
-            
             try:
-                # 调用策略的信号检查方法
-                signal = strategy.check_signals(sub_df, timeframe=timeframe)
+                if signal_frame is not None:
+                    # 第 i+2 行等价于 check_signals(df.iloc[:i+3])
+                    signal = {
+                        "action": signal_actions[i + 2],
+                        "type": signal_types[i + 2],
+                        "reason": signal_reasons[i + 2],
+                    }
+                else:
+                    sub_df = df_with_indicators.iloc[:i+3]
+                    
+                    # 确保有足够的数据（至少4根K线用于 iloc[-2], [-3], [-4]）
+                    if len(sub_df) < 4:
+                        continue
+                    
+                    # 调用策略的信号检查方法
+                    signal = strategy.check_signals(sub_df, timeframe=timeframe)
                 
                 if signal and signal.get('action') in ['LONG', 'SHORT']:
                     # 修复：信号计数和 marker 创建应该在 LONG/SHORT 分支内
@@ -544,6 +576,7 @@ if FASTAPI_AVAILABLE:
             if not okx_client.exchange:
                 raise Exception("交易所未连接")
             
+            await get_rate_limiter().acquire_async('ticker')
             ticker = okx_client.exchange.fetch_ticker(symbol)
             
             return {
@@ -576,6 +609,7 @@ if FASTAPI_AVAILABLE:
                 raise Exception("交易所未连接")
             
             # 获取所有永续合约的 tickers
+            await get_rate_limiter().acquire_async('tickers')
             tickers = okx_client.exchange.fetch_tickers()
             
             # 筛选 USDT 永续合约并按成交量排序
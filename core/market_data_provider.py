@@ -26,10 +26,16 @@ import threading
 import logging
 import random
 from collections import defaultdict
-from typing import Dict, Any, Optional, Tuple, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, NamedTuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 
+import numpy as np
+import pandas as pd
+
+from core.rate_limiter import get_rate_limiter, api_key_of, is_rate_limit_error
+
 logger = logging.getLogger(__name__)
 
 # 双通道K线数据支持
@@ -48,16 +54,190 @@ except ImportError:
 
 
 # ============  智能K线缓存数据结构 ============
+# 列式K线：int64 时间戳 + float64 OHLCV
+OHLCV_DTYPE = np.dtype([
+    ('ts', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+])
+OHLCV_FRAME_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+def _to_structured(candles) -> np.ndarray:
+    """[[ts, o, h, l, c, v], ...] / (n, 6) 数组 / 结构化数组 -> OHLCV_DTYPE 结构化数组"""
+    if isinstance(candles, np.ndarray) and candles.dtype == OHLCV_DTYPE:
+        return candles
+    if isinstance(candles, np.ndarray):
+        matrix = np.asarray(candles[:, :6], dtype=np.float64)
+    else:
+        matrix = np.array([c[:6] for c in candles if len(c) >= 6], dtype=np.float64).reshape(-1, 6)
+    rows = np.empty(len(matrix), dtype=OHLCV_DTYPE)
+    rows['ts'] = matrix[:, 0].astype(np.int64)
+    for i, name in enumerate(OHLCV_DTYPE.names[1:], start=1):
+        rows[name] = matrix[:, i]
+    return rows
+
+
+def _sorted_unique(rows: np.ndarray) -> np.ndarray:
+    """按时间戳升序去重，同一时间戳保留最后出现的一行（新数据覆盖旧数据）"""
+    ts = rows['ts']
+    if len(rows) < 2 or (ts[1:] > ts[:-1]).all():
+        return rows
+    rows = rows[np.argsort(ts, kind='stable')]
+    keep = np.ones(len(rows), dtype=bool)
+    keep[:-1] = rows['ts'][1:] != rows['ts'][:-1]
+    return rows[keep]
+
+
+class OHLCVBars:
+    """
+    单个 (symbol, timeframe) 的列式K线存储
+    
+    布局与 okx_websocket.CandleRingBuffer 一致：2 * capacity 行的结构化数组（OHLCV_DTYPE），
+    有效范围 [start, end)：
+    - 追加新K线：向量化写入尾部，超出 capacity 时只移动 start；写满后把最近 capacity 行
+      复制到新数组（均摊 O(1)）
+    - 更新形成中的K线（时间戳等于最后一根）：原地覆盖最后一行
+    - 覆盖更早的K线或调整容量：换用新数组重建
+    
+    to_list() / to_frame() 按版本号缓存，每次合并后最多构建一次。
+    写入方需持有 MarketDataProvider.locks[key]；读取方只读取已发布的 (storage, start, end) 元组，
+    已发出的视图中只有最后一根K线可能被原地更新。
+    """
+    
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.version = 0
+        self._storage = np.empty(capacity * 2, dtype=OHLCV_DTYPE)
+        self._start = 0
+        self._end = 0
+        self._published = (self._storage, 0, 0)
+        self._list_cache: Tuple[int, Optional[list]] = (-1, None)
+        self._frame_cache: Tuple[int, Optional[pd.DataFrame]] = (-1, None)
+    
+    def __len__(self) -> int:
+        _, start, end = self._published
+        return end - start
+    
+    @property
+    def last_ts(self) -> int:
+        """最新一根K线的时间戳（无数据时为 0）"""
+        storage, start, end = self._published
+        return int(storage['ts'][end - 1]) if end > start else 0
+    
+    def merge(self, candles, limit: Optional[int] = None) -> int:
+        """
+        合并K线，时间戳相同时新数据覆盖旧数据，保留最新的 limit 根
+        
+        参数:
+        - candles: [[ts, o, h, l, c, v], ...]、(n, 6) 数组或结构化数组
+        - limit: 保留数量（None=当前容量）
+        
+        返回:
+        - 新增的K线数量（时间戳大于原最新K线的根数）
+        """
+        rows = _sorted_unique(_to_structured(candles))
+        if len(rows) == 0:
+            return 0
+        
+        resized = bool(limit) and limit != self.capacity
+        if resized:
+            self.capacity = limit
+        
+        if self._end == self._start:
+            older, newer = rows[:0], rows
+        else:
+            last = self._storage['ts'][self._end - 1]
+            split = int(np.searchsorted(rows['ts'], last, side='right'))
+            older, newer = rows[:split], rows[split:]
+        
+        if resized or len(older) > 1 or (len(older) == 1 and older['ts'][0] != self._storage['ts'][self._end - 1]):
+            self._reset(_sorted_unique(np.concatenate([self.arrays(), rows])))
+        else:
+            if len(older):
+                self._storage[self._end - 1] = older[0]
+            if len(newer):
+                self._append(newer)
+        
+        self._published = (self._storage, self._start, self._end)
+        self.version += 1
+        return len(newer)
+    
+    def arrays(self, limit: Optional[int] = None) -> np.ndarray:
+        """返回最近 limit 根K线的只读结构化数组视图（不拷贝）"""
+        storage, start, end = self._published
+        if limit and end - start > limit:
+            start = end - limit
+        view = storage[start:end]
+        view.flags.writeable = False
+        return view
+    
+    def to_list(self) -> list:
+        """[[ts, o, h, l, c, v], ...]（按版本缓存，调用方不应修改）"""
+        version, data = self._list_cache
+        if version != self.version:
+            view = self.arrays()
+            prices = np.column_stack([view[name] for name in OHLCV_DTYPE.names[1:]]).tolist()
+            data = [[ts, *row] for ts, row in zip(view['ts'].tolist(), prices)]
+            self._list_cache = (self.version, data)
+        return data
+    
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame 视图（列为 OHLCV_FRAME_COLUMNS，timestamp 为 datetime）
+        
+        每个版本只构建一次，返回副本，调用方可随意修改。
+        """
+        version, frame = self._frame_cache
+        if version != self.version:
+            view = self.arrays()
+            frame = pd.DataFrame({
+                'timestamp': pd.to_datetime(view['ts'], unit='ms'),
+                **{name: view[name] for name in OHLCV_DTYPE.names[1:]},
+            })
+            self._frame_cache = (self.version, frame)
+        return frame.copy()
+    
+    def _append(self, rows: np.ndarray) -> None:
+        if self._end + len(rows) > len(self._storage):
+            self._reset(np.concatenate([self._storage[self._start:self._end], rows]))
+            return
+        self._storage[self._end:self._end + len(rows)] = rows
+        self._end += len(rows)
+        self._start = max(self._start, self._end - self.capacity)
+    
+    def _reset(self, rows: np.ndarray) -> None:
+        """换用新数组并写入最近 capacity 行"""
+        rows = rows[-self.capacity:]
+        storage = np.empty(self.capacity * 2, dtype=OHLCV_DTYPE)
+        storage[:len(rows)] = rows
+        self._storage = storage
+        self._start = 0
+        self._end = len(rows)
+
+
 @dataclass
 class OHLCVCacheEntry:
     """K线缓存条目 - 基于时间戳增长的智能缓存"""
-    data: list                    # K线数据 [[ts, o, h, l, c, v], ...]
-    last_max_ts: int              # data 中最大的时间戳 (ms)
+    bars: OHLCVBars               # 列式K线存储
+    last_max_ts: int              # 最大的时间戳 (ms)
     fetched_at_ms: int            # 拉取时刻的 UTC ms
     is_stale: bool = False        # 是否判定为陈旧（交易所未更新）
     stale_count: int = 0          # 连续陈旧次数
-    bars_count: int = 0           # K线数量
     is_initialized: bool = False  # 是否已完成全量初始化（1000根）
+    
+    @property
+    def bars_count(self) -> int:
+        """K线数量"""
+        return len(self.bars)
+    
+    @property
+    def data(self) -> list:
+        """K线数据 [[ts, o, h, l, c, v], ...]（按版本缓存的列表）"""
+        return self.bars.to_list()
 
 
 # ============  缓存配置常量 ============
@@ -65,6 +245,51 @@ OHLCV_TARGET_BARS = 1000          # 目标K线数量
 OHLCV_INCREMENTAL_LIMIT = 50      # 增量拉取数量
 OHLCV_PAGE_SIZE = 100             # OKX 单次返回上限（保守值）
 OHLCV_MAX_PAGES = 15              # 最大分页次数（防止无限循环）
+OHLCV_SAFETY_MS = 1500            # 新K线判定的安全边际 1.5 秒
+OHLCV_BATCH_WORKERS = int(os.getenv("OHLCV_BATCH_WORKERS", "10"))  # 批量拉取的线程回退并发数
+
+# 请求端点 -> 限流器端点族
+RATE_LIMIT_ENDPOINTS = {
+    "ohlcv": "candles",
+    "ticker": "ticker",
+    "balance": "balance",
+    "positions": "positions",
+}
+
+
+class OHLCVBatchResult(NamedTuple):
+    """get_ohlcv_many 中单个 (symbol, timeframe) 的结果"""
+    data: Any                     # K线数据（列表或结构化数组），失败时为 None
+    is_stale: bool                # 是否为陈旧数据
+    error: Optional[str] = None   # 失败原因
+
+
+def _async_batch_fetcher():
+    """
+    异步批量拉取器（ccxt.async_support 可用且 USE_ASYNC_FETCHER 未关闭时）
+    
+    与整点扫描共用 async_market_fetcher 的全局实例（凭证、并发数一致，避免实例反复重建）。
+    """
+    if os.getenv("USE_ASYNC_FETCHER", "true").lower() != "true":
+        return None
+    try:
+        from core.async_market_fetcher import fetch_batch_ohlcv_sync
+        from core.config import OKX_SANDBOX, OKX_MARKET_TYPE
+    except ImportError:
+        return None
+    
+    def fetch(tasks):
+        # 沙盒 / 市场类型以 core.config 为准（OKX_SANDBOX 已强制关闭），凭证可能在运行时注入环境变量
+        return fetch_batch_ohlcv_sync(
+            tasks=tasks,
+            api_key=os.getenv("OKX_API_KEY", ""),
+            api_secret=os.getenv("OKX_API_SECRET", ""),
+            passphrase=os.getenv("OKX_API_PASSPHRASE", ""),
+            sandbox=OKX_SANDBOX,
+            market_type=OKX_MARKET_TYPE,
+            max_concurrent=20,
+        )
+    return fetch
 
 
 def _get_timeframe_ms(timeframe: str) -> int:
@@ -82,16 +307,28 @@ def _get_timeframe_ms(timeframe: str) -> int:
         '1h': 60 * 60 * 1000,
         '4h': 4 * 60 * 60 * 1000,
         '1d': 24 * 60 * 60 * 1000,
+        '1D': 24 * 60 * 60 * 1000,
+        '1Dutc': 24 * 60 * 60 * 1000,
     }
     return tf_map.get(timeframe, 60 * 1000)
 
 class MarketDataProvider:
     def __init__(self, exchange_adapter, timeframe, ohlcv_limit,
                  ohlcv_ttl_sec=None, ticker_ttl_sec=None,
-                 balance_ttl_sec=None, positions_ttl_sec=None):
+                 balance_ttl_sec=None, positions_ttl_sec=None,
+                 batch_fetcher=None):
         # 交易所适配器
         self.exchange = exchange_adapter
         
+        # 批量增量拉取器：tasks [(symbol, tf, limit, since), ...] -> {(symbol, tf): data 或 None}
+        # None=懒加载异步拉取器，不可用时回退到线程池逐个拉取
+        self.batch_fetcher = batch_fetcher
+        self._batch_fetcher_resolved = batch_fetcher is not None
+        
+        # 全局 REST 限流器（与其他 REST 调用方共享额度，私有接口按 API Key 区分）
+        self.rate_limiter = get_rate_limiter()
+        self._api_key = api_key_of(exchange_adapter)
+        
         # 默认参数
         self.timeframe = timeframe
         self.ohlcv_limit = ohlcv_limit
@@ -149,8 +386,11 @@ class MarketDataProvider:
         base_delay = 0.2  # 基础延迟时间（秒）
         max_delay = 1.0   # 最大延迟时间（秒）
         
+        rate_endpoint = RATE_LIMIT_ENDPOINTS.get(endpoint, endpoint)
+        
         for retry in range(max_retries):
             try:
+                self.rate_limiter.acquire(rate_endpoint, self._api_key)
                 start_time = time.time()
                 result = func(*args, **kwargs)
                 api_latency = (time.time() - start_time) * 1000
@@ -164,6 +404,9 @@ class MarketDataProvider:
                 # 记录错误
                 self.metrics["errors"] += 1
                 self.record_error(endpoint, symbol, str(e))
+                if is_rate_limit_error(e):
+                    # 429：清空共享额度，所有调用方一起退避
+                    self.rate_limiter.penalize(rate_endpoint, self._api_key)
                 
                 # 如果是最后一次重试，抛出异常
                 if retry == max_retries - 1:
@@ -182,7 +425,8 @@ class MarketDataProvider:
         # 理论上不会到达这里，但为了类型安全
         raise Exception("重试次数耗尽")
 
-    def get_ohlcv(self, symbol, timeframe=None, limit=None, force_fetch=False) -> Tuple[list, bool]:
+    def get_ohlcv(self, symbol, timeframe=None, limit=None, force_fetch=False,
+                  as_arrays=False) -> Tuple[Any, bool]:
         """
         获取K线数据 - 首次全量分页拉取 + 后续轻量增量更新 + 缓存固定长度
         
@@ -191,10 +435,11 @@ class MarketDataProvider:
         - timeframe: 时间周期
         - limit: 数量限制（目标K线数量，默认1000）
         - force_fetch: 强制拉取最新数据（00秒扫描时使用）
+        - as_arrays: 返回只读结构化数组（OHLCV_DTYPE），不构建列表
         
         返回:
         - (K线数据, is_stale) 元组
-          - K线数据: [[ts, o, h, l, c, v], ...]
+          - K线数据: [[ts, o, h, l, c, v], ...]，as_arrays=True 时为结构化数组
           - is_stale: 是否为陈旧数据（交易所未更新）
         """
         timeframe = timeframe or self.timeframe
@@ -204,7 +449,6 @@ class MarketDataProvider:
         
         # 获取时间周期毫秒数
         tf_ms = _get_timeframe_ms(timeframe)
-        safety_ms = 1500  # 安全边际 1.5 秒
         
         # 检查熔断
         if self.is_circuit_broken("ohlcv", symbol):
@@ -212,81 +456,19 @@ class MarketDataProvider:
                 entry = self.ohlcv_cache[key]
                 logger.debug(f"[md-circuit] {symbol} {timeframe} 熔断中，使用缓存")
                 self.metrics["cache_hits"] += 1
-                return entry.data, True  # 熔断时标记为 stale
+                return self._entry_result(entry, as_arrays), True  # 熔断时标记为 stale
             raise Exception(f"[熔断中] 无缓存K线数据: {symbol} {timeframe}")
         
         # 单航班去重锁
         with self.locks[key]:
-            # ========== 检查是否需要全量初始化 ==========
-            need_full_init = False
-            if key not in self.ohlcv_cache:
-                need_full_init = True
-            elif not self.ohlcv_cache[key].is_initialized:
-                # 缓存存在但未完成初始化（可能之前拉取失败）
-                need_full_init = True
-            elif self.ohlcv_cache[key].bars_count < 200:
-                # K线数量严重不足，需要重新初始化
-                need_full_init = True
-                logger.debug(f"[md-reinit] {symbol} {timeframe} K线不足，重新初始化")
-            
             # ========== 全量分页拉取（首次初始化）==========
-            if need_full_init:
+            if self._needs_full_init(key, now_ms):
                 try:
                     data = self._fetch_full_history(symbol, timeframe, limit)
-                    
-                    # 修复：接受较少的K线数据（新上线币种可能数据不足）
-                    # 最低要求：至少 50 根 K 线才能进行基本的技术分析
-                    MIN_BARS_REQUIRED = 50
-                    
-                    if data and len(data) >= MIN_BARS_REQUIRED:
-                        max_ts = max(candle[0] for candle in data)
-                        
-                        # 创建缓存条目
-                        self.ohlcv_cache[key] = OHLCVCacheEntry(
-                            data=data,
-                            last_max_ts=max_ts,
-                            fetched_at_ms=now_ms,
-                            is_stale=False,
-                            stale_count=0,
-                            bars_count=len(data),
-                            is_initialized=True
-                        )
-                        
-                        # 从待初始化队列移除
-                        if key in self.pending_init:
-                            del self.pending_init[key]
-                        
-                        # 如果数据不足目标数量，打印警告但不失败
-                        if len(data) < limit:
-                            logger.debug(f"[md-init] {symbol} {timeframe} 数据不足目标 ({len(data)}/{limit} bars)")
-                        else:
-                            logger.debug(f"[md-init] {symbol} {timeframe} 全量拉取完成 {len(data)} bars")
-                        
-                        self.reset_circuit_breaker("ohlcv", symbol)
-                        return data, False
-                    elif data and len(data) > 0:
-                        # 数据太少（< 50 根），记录警告但仍然缓存
-                        max_ts = max(candle[0] for candle in data)
-                        self.ohlcv_cache[key] = OHLCVCacheEntry(
-                            data=data,
-                            last_max_ts=max_ts,
-                            fetched_at_ms=now_ms,
-                            is_stale=False,
-                            stale_count=0,
-                            bars_count=len(data),
-                            is_initialized=True  # 标记为已初始化，避免重复拉取
-                        )
-                        logger.debug(f"[md-init] {symbol} {timeframe} K线数量过少 ({len(data)} bars)")
-                        return data, False
-                    else:
-                        raise Exception(f"全量拉取返回空数据: {symbol} {timeframe}")
-                        
+                    entry = self._install_full_history(key, data, limit, now_ms)
+                    return self._entry_result(entry, as_arrays), False
                 except Exception as e:
-                    # 记录到待初始化队列
-                    retry_count = self.pending_init.get(key, 0) + 1
-                    self.pending_init[key] = retry_count
-                    logger.error(f"[md-init-fail] {symbol} {timeframe} 全量拉取失败 (重试次数: {retry_count}): {e}")
-                    self.update_circuit_breaker("ohlcv", symbol)
+                    self._record_init_failure(key, e)
                     raise
             
             # ========== 增量更新（已初始化的缓存）==========
@@ -296,64 +478,367 @@ class MarketDataProvider:
             expected_new_ts = entry.last_max_ts + tf_ms
             
             # force_fetch=True 时跳过缓存新鲜度检查，强制拉取
-            if not force_fetch and now_ms < expected_new_ts + safety_ms:
+            if not force_fetch and now_ms < expected_new_ts + OHLCV_SAFETY_MS:
                 # 未到新 K线时间，直接返回缓存（仍新鲜）
                 self.metrics["cache_hits"] += 1
                 logger.debug(f"[md-fresh] {symbol} {timeframe} 缓存新鲜，距新K线 {(expected_new_ts - now_ms)/1000:.1f}s")
-                return entry.data, False
+                return self._entry_result(entry, as_arrays), False
             
             # 执行增量拉取（只拉取最新的几十根）
             try:
-                new_data = self._fetch_incremental(symbol, timeframe, entry.last_max_ts)
-                
+                new_data = self._fetch_incremental(
+                    symbol, timeframe, entry.last_max_ts,
+                    limit=self._incremental_limit(entry.last_max_ts, tf_ms, now_ms)
+                )
                 self.metrics["cache_misses"] += 1
-                
-                if new_data and len(new_data) > 0:
-                    new_max_ts = max(candle[0] for candle in new_data)
-                    
-                    if new_max_ts > entry.last_max_ts:
-                        # 有新 K线，合并数据并保持固定长度
-                        bars_added = sum(1 for c in new_data if c[0] > entry.last_max_ts)
-                        merged_data = self._merge_ohlcv(entry.data, new_data, limit)
-                        
-                        # 更新缓存
-                        self.ohlcv_cache[key] = OHLCVCacheEntry(
-                            data=merged_data,
-                            last_max_ts=new_max_ts,
-                            fetched_at_ms=now_ms,
-                            is_stale=False,
-                            stale_count=0,
-                            bars_count=len(merged_data),
-                            is_initialized=True
-                        )
-                        
-                        logger.debug(f"[md-incr] {symbol} {timeframe} +{bars_added} bars, total={len(merged_data)}")
-                        self.reset_circuit_breaker("ohlcv", symbol)
-                        return merged_data, False
-                    else:
-                        # 交易所还没更新，标记为 stale
-                        entry.stale_count += 1
-                        entry.is_stale = True
-                        entry.fetched_at_ms = now_ms
-                        
-                        if entry.stale_count >= 3:
-                            logger.warning(f"[md-warn] {symbol} {timeframe} stale_count={entry.stale_count} (交易所延迟)")
-                        else:
-                            logger.debug(f"[md-stale] {symbol} {timeframe} stale_count={entry.stale_count}")
-                        
-                        return entry.data, True
-                else:
-                    # 增量拉取返回空数据
-                    entry.stale_count += 1
-                    entry.is_stale = True
-                    logger.debug(f"[md-stale] {symbol} {timeframe} 增量拉取返回空数据")
-                    return entry.data, True
+                is_stale = self._apply_incremental(symbol, timeframe, entry, new_data, limit, now_ms)
+                return self._entry_result(entry, as_arrays), is_stale
                     
             except Exception as e:
                 # 增量拉取失败，返回旧缓存
                 logger.warning(f"[md-error] {symbol} {timeframe} 增量拉取失败: {e}，使用旧缓存")
                 self.update_circuit_breaker("ohlcv", symbol)
-                return entry.data, True
+                return self._entry_result(entry, as_arrays), True
+    
+    def get_ohlcv_many(self, keys, limit=None, force_fetch=False,
+                       as_arrays=False) -> Dict[Tuple[str, str], OHLCVBatchResult]:
+        """
+        批量获取多个 (symbol, timeframe) 的K线（整点扫描一次调用）
+        
+        1. 逐个判断缓存：新鲜的直接返回，熔断中的返回旧缓存（stale）
+        2. 需要增量更新的 key 一次性交给批量拉取器并发请求（异步拉取器，共享速率预算），
+           结果在各自的 key 锁内合并
+        3. 未初始化的 key 走 get_ohlcv 的全量分页拉取（只在启动 / 新币种时发生）
+        
+        参数:
+        - keys: [(symbol, timeframe), ...]
+        - limit / force_fetch / as_arrays: 同 get_ohlcv
+        
+        返回:
+        - {(symbol, timeframe): OHLCVBatchResult(data, is_stale, error)}
+        """
+        limit = limit or OHLCV_TARGET_BARS
+        now_ms = int(time.time() * 1000)
+        results: Dict[Tuple[str, str], OHLCVBatchResult] = {}
+        incremental: Dict[Tuple[str, str], Tuple[int, int]] = {}  # key -> (since, 拉取根数)
+        need_init = []
+        
+        for key in dict.fromkeys(keys):
+            symbol, timeframe = key
+            with self.locks[key]:
+                entry = self.ohlcv_cache.get(key)
+                if self.is_circuit_broken("ohlcv", symbol):
+                    if entry is not None:
+                        self.metrics["cache_hits"] += 1
+                        results[key] = OHLCVBatchResult(self._entry_result(entry, as_arrays), True)
+                    else:
+                        results[key] = OHLCVBatchResult(None, True, f"[熔断中] 无缓存K线数据: {symbol} {timeframe}")
+                elif self._needs_full_init(key, now_ms):
+                    need_init.append(key)
+                elif not force_fetch and now_ms < entry.last_max_ts + _get_timeframe_ms(timeframe) + OHLCV_SAFETY_MS:
+                    self.metrics["cache_hits"] += 1
+                    results[key] = OHLCVBatchResult(self._entry_result(entry, as_arrays), False)
+                else:
+                    tf_ms = _get_timeframe_ms(timeframe)
+                    incremental[key] = (entry.last_max_ts, self._incremental_limit(entry.last_max_ts, tf_ms, now_ms))
+        
+        if incremental:
+            fetched = self._fetch_incremental_many(incremental)
+            retry = []
+            for key in incremental:
+                symbol, timeframe = key
+                data = fetched.get(key)
+                with self.locks[key]:
+                    entry = self.ohlcv_cache.get(key)
+                    if entry is None:
+                        # 拉取期间缓存被清空（invalidate_ohlcv），改走单个获取
+                        retry.append(key)
+                    elif data is None:
+                        logger.warning(f"[md-error] {symbol} {timeframe} 批量增量拉取失败，使用旧缓存")
+                        self.update_circuit_breaker("ohlcv", symbol)
+                        results[key] = OHLCVBatchResult(self._entry_result(entry, as_arrays), True)
+                    else:
+                        self.metrics["cache_misses"] += 1
+                        is_stale = self._apply_incremental(
+                            symbol, timeframe, entry, data, limit, int(time.time() * 1000)
+                        )
+                        results[key] = OHLCVBatchResult(self._entry_result(entry, as_arrays), is_stale)
+            need_init.extend(retry)
+        
+        if need_init and self._get_batch_fetcher() is not None:
+            # 所有 key 的倒序分页并发进行：每一轮为每个未拉满的 key 请求一页
+            histories = self._fetch_full_history_many(need_init, limit)
+            for key in need_init:
+                with self.locks[key]:
+                    try:
+                        entry = self._install_full_history(key, histories.get(key), limit, int(time.time() * 1000))
+                        results[key] = OHLCVBatchResult(self._entry_result(entry, as_arrays), False)
+                    except Exception as e:
+                        self._record_init_failure(key, e)
+                        results[key] = OHLCVBatchResult(None, True, str(e))
+        elif need_init:
+            # 回退：线程池逐个全量拉取
+            def init_task(key):
+                try:
+                    data, is_stale = self.get_ohlcv(key[0], key[1], limit, as_arrays=as_arrays)
+                    return key, OHLCVBatchResult(data, is_stale)
+                except Exception as e:
+                    return key, OHLCVBatchResult(None, True, str(e))
+            
+            with ThreadPoolExecutor(max_workers=max(1, min(len(need_init), OHLCV_BATCH_WORKERS))) as executor:
+                results.update(executor.map(init_task, need_init))
+        
+        return results
+    
+    def _fetch_full_history_many(self, keys, target_bars: int) -> Dict[Tuple[str, str], list]:
+        """
+        并发倒序分页拉取多个 key 的全量历史（_fetch_full_history 的批量版本）
+        
+        每一轮为所有未拉满的 key 各请求一页（一个批次），页数与单个 key 相同，
+        总耗时约等于单个 key 的分页耗时。
+        
+        返回:
+        - {(symbol, timeframe): K线数据（按时间升序，最多 target_bars 根）}
+        """
+        seen: Dict[Tuple[str, str], Dict[int, list]] = {key: {} for key in keys}
+        cursor: Dict[Tuple[str, str], Optional[int]] = {key: None for key in keys}
+        active = list(keys)
+        
+        for page in range(1, OHLCV_MAX_PAGES + 1):
+            if not active:
+                break
+            tasks = [
+                (symbol, timeframe, OHLCV_PAGE_SIZE, None,
+                 {'after': str(cursor[(symbol, timeframe)])} if cursor[(symbol, timeframe)] is not None else None)
+                for symbol, timeframe in active
+            ]
+            fetched = self._call_batch_fetcher(tasks)
+            
+            next_active = []
+            for key in active:
+                data = fetched.get(key)
+                if not data:
+                    # 失败或已到达历史最早，停止该 key 的分页
+                    continue
+                candles = seen[key]
+                before = len(candles)
+                for candle in data:
+                    candles.setdefault(candle[0], candle)
+                if len(candles) == before:
+                    continue
+                cursor[key] = min(candle[0] for candle in data)
+                if len(candles) < target_bars:
+                    next_active.append(key)
+            
+            logger.debug(f"[md-full] 批量分页第{page}页: {len(active)} keys, 未拉满 {len(next_active)}")
+            active = next_active
+        
+        return {
+            key: sorted(candles.values(), key=lambda c: c[0])[-target_bars:]
+            for key, candles in seen.items()
+        }
+    
+    def _install_full_history(self, key, data, limit: int, now_ms: int) -> OHLCVCacheEntry:
+        """
+        把全量拉取结果写入缓存（调用方需持有 self.locks[key]）
+        
+        返回:
+        - 新的缓存条目；数据为空时抛出异常
+        """
+        symbol, timeframe = key
+        
+        # 修复：接受较少的K线数据（新上线币种可能数据不足）
+        # 最低要求：至少 50 根 K 线才能进行基本的技术分析
+        MIN_BARS_REQUIRED = 50
+        
+        if not data:
+            raise Exception(f"全量拉取返回空数据: {symbol} {timeframe}")
+        
+        # 数据太少（< 50 根）时仍然缓存（标记为已初始化，避免重复拉取）
+        entry = self._new_entry(data, limit, now_ms)
+        self.ohlcv_cache[key] = entry
+        
+        if len(data) < MIN_BARS_REQUIRED:
+            logger.debug(f"[md-init] {symbol} {timeframe} K线数量过少 ({len(data)} bars)")
+            return entry
+        
+        # 从待初始化队列移除
+        if key in self.pending_init:
+            del self.pending_init[key]
+        
+        # 如果数据不足目标数量，打印警告但不失败
+        if len(data) < limit:
+            logger.debug(f"[md-init] {symbol} {timeframe} 数据不足目标 ({len(data)}/{limit} bars)")
+        else:
+            logger.debug(f"[md-init] {symbol} {timeframe} 全量拉取完成 {len(data)} bars")
+        
+        self.reset_circuit_breaker("ohlcv", symbol)
+        return entry
+    
+    def _record_init_failure(self, key, error: Exception):
+        """记录全量拉取失败（加入待初始化队列，下一轮优先重试）"""
+        retry_count = self.pending_init.get(key, 0) + 1
+        self.pending_init[key] = retry_count
+        logger.error(f"[md-init-fail] {key[0]} {key[1]} 全量拉取失败 (重试次数: {retry_count}): {error}")
+        self.update_circuit_breaker("ohlcv", key[0])
+    
+    @staticmethod
+    def _incremental_limit(last_max_ts: int, tf_ms: int, now_ms: int) -> int:
+        """
+        增量拉取根数：缓存最新K线（可能在拉取时还未收盘）+ 之后新产生的K线
+        
+        整点扫描时通常为 2 根；交易所返回 since 之后最新的 limit 根，根数覆盖缺口才不会漏K线。
+        """
+        return max(1, min(OHLCV_INCREMENTAL_LIMIT, (now_ms - last_max_ts) // tf_ms + 1))
+    
+    def _fetch_incremental_many(self, incremental: Dict[Tuple[str, str], Tuple[int, int]]) -> Dict[Tuple[str, str], Optional[list]]:
+        """
+        并发增量拉取多个 key
+        
+        参数:
+        - incremental: {(symbol, timeframe): (since_ts, 拉取根数)}
+        
+        返回:
+        - {(symbol, timeframe): K线数据}，失败为 None
+        """
+        if self._get_batch_fetcher() is not None:
+            return self._call_batch_fetcher([
+                (sym, tf, count, since) for (sym, tf), (since, count) in incremental.items()
+            ])
+        
+        # 回退：线程池逐个拉取
+        def fetch_task(item):
+            (symbol, timeframe), (since, count) = item
+            try:
+                return (symbol, timeframe), self._fetch_incremental(symbol, timeframe, since, limit=count)
+            except Exception:
+                return (symbol, timeframe), None
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(len(incremental), OHLCV_BATCH_WORKERS))) as executor:
+            return dict(executor.map(fetch_task, incremental.items()))
+    
+    def _get_batch_fetcher(self):
+        """批量拉取器（懒加载，不可用时为 None）"""
+        if not self._batch_fetcher_resolved:
+            self.batch_fetcher = _async_batch_fetcher()
+            self._batch_fetcher_resolved = True
+        return self.batch_fetcher
+    
+    def _call_batch_fetcher(self, tasks) -> Dict[Tuple[str, str], Optional[list]]:
+        """执行一个批次（失败的 key 为 None），并记录指标"""
+        start_time = time.time()
+        try:
+            fetched = self.batch_fetcher(tasks)
+        except Exception as e:
+            logger.warning(f"[md-batch] 批量拉取失败: {e}")
+            fetched = {}
+        self.metrics["api_calls"] += len(tasks)
+        self.metrics["api_latency_ms"].append((time.time() - start_time) * 1000)
+        return fetched
+    
+    def _needs_full_init(self, key, now_ms: int) -> bool:
+        """是否需要全量初始化（调用方需持有 self.locks[key]）"""
+        entry = self.ohlcv_cache.get(key)
+        if entry is None or not entry.is_initialized:
+            # 无缓存，或缓存存在但未完成初始化（可能之前拉取失败）
+            return True
+        if entry.bars_count < 200:
+            # K线数量严重不足，需要重新初始化
+            logger.debug(f"[md-reinit] {key[0]} {key[1]} K线不足，重新初始化")
+            return True
+        if (now_ms - entry.last_max_ts) // _get_timeframe_ms(key[1]) >= OHLCV_INCREMENTAL_LIMIT:
+            # 缺口超过单次增量拉取的根数（长时间未更新），增量合并会留下空洞
+            logger.debug(f"[md-reinit] {key[0]} {key[1]} 缓存缺口过大，重新初始化")
+            return True
+        return False
+    
+    def _apply_incremental(self, symbol, timeframe, entry: OHLCVCacheEntry, new_data, limit, now_ms) -> bool:
+        """
+        把增量拉取结果合并进缓存条目（调用方需持有 self.locks[key]）
+        
+        返回:
+        - is_stale: 交易所是否未更新（没有比缓存更新的K线）
+        """
+        new_rows = _to_structured(new_data) if new_data is not None and len(new_data) > 0 else None
+        
+        if new_rows is not None and len(new_rows) > 0:
+            new_max_ts = int(new_rows['ts'].max())
+            
+            if new_max_ts > entry.last_max_ts:
+                # 有新 K线，合并数据并保持固定长度（原地追加，不重建整个缓存）
+                bars_added = entry.bars.merge(new_rows, limit)
+                
+                # 更新缓存
+                entry.last_max_ts = entry.bars.last_ts
+                entry.fetched_at_ms = now_ms
+                entry.is_stale = False
+                entry.stale_count = 0
+                
+                logger.debug(f"[md-incr] {symbol} {timeframe} +{bars_added} bars, total={entry.bars_count}")
+                self.reset_circuit_breaker("ohlcv", symbol)
+                return False
+            
+            # 交易所还没更新，标记为 stale
+            entry.stale_count += 1
+            entry.is_stale = True
+            entry.fetched_at_ms = now_ms
+            
+            if entry.stale_count >= 3:
+                logger.warning(f"[md-warn] {symbol} {timeframe} stale_count={entry.stale_count} (交易所延迟)")
+            else:
+                logger.debug(f"[md-stale] {symbol} {timeframe} stale_count={entry.stale_count}")
+            return True
+        
+        # 增量拉取返回空数据
+        entry.stale_count += 1
+        entry.is_stale = True
+        logger.debug(f"[md-stale] {symbol} {timeframe} 增量拉取返回空数据")
+        return True
+    
+    def get_ohlcv_frame(self, symbol, timeframe=None, limit=None, force_fetch=False) -> Tuple[Optional[pd.DataFrame], bool]:
+        """
+        获取K线 DataFrame（列: timestamp, open, high, low, close, volume）
+        
+        DataFrame 由缓存条目按版本构建，每根新K线最多构建一次，同一根K线内的重复调用只做拷贝。
+        
+        返回:
+        - (DataFrame, is_stale) 元组，无数据时 DataFrame 为 None
+        """
+        timeframe = timeframe or self.timeframe
+        _, is_stale = self.get_ohlcv(symbol, timeframe, limit, force_fetch=force_fetch, as_arrays=True)
+        return self.get_cached_ohlcv_frame(symbol, timeframe), is_stale
+    
+    def get_cached_ohlcv_frame(self, symbol, timeframe=None) -> Optional[pd.DataFrame]:
+        """
+        只读取缓存，返回K线 DataFrame（不触发拉取，缓存不存在时返回 None）
+        
+        用于已通过 get_ohlcv 拉取过列表的调用方，避免再把列表转换为 DataFrame。
+        """
+        timeframe = timeframe or self.timeframe
+        key = (symbol, timeframe)
+        with self.locks[key]:
+            entry = self.ohlcv_cache.get(key)
+            if entry is None or entry.bars_count == 0:
+                return None
+            return entry.bars.to_frame()
+    
+    @staticmethod
+    def _new_entry(data, limit: int, now_ms: int) -> OHLCVCacheEntry:
+        """由全量拉取结果创建缓存条目"""
+        bars = OHLCVBars(capacity=limit)
+        bars.merge(data)
+        return OHLCVCacheEntry(
+            bars=bars,
+            last_max_ts=bars.last_ts,
+            fetched_at_ms=now_ms,
+            is_stale=False,
+            stale_count=0,
+            is_initialized=True
+        )
+    
+    @staticmethod
+    def _entry_result(entry: OHLCVCacheEntry, as_arrays: bool):
+        return entry.bars.arrays() if as_arrays else entry.data
     
     def _fetch_full_history(self, symbol: str, timeframe: str, target_bars: int) -> list:
         """
@@ -436,12 +921,9 @@ class MarketDataProvider:
                     logger.debug(f"[md-full] {symbol} {timeframe} 无新数据，停止分页")
                     break
                 
-                # 更新 end_ts 为本页最小时间戳，用于下一页请求
+                # 更新 end_ts 为本页最小时间戳，用于下一页请求（请求间隔由限流器控制）
                 current_end_ts = min_ts_in_page
                 
-                # 短暂延迟，避免触发限流
-                time.sleep(0.1)
-                
             except Exception as e:
                 logger.error(f"[md-full] {symbol} {timeframe} 第{page_count}页拉取失败: {e}")
                 break
@@ -457,16 +939,18 @@ class MarketDataProvider:
         
         return all_candles
     
-    def _fetch_incremental(self, symbol: str, timeframe: str, since_ts: int) -> list:
+    def _fetch_incremental(self, symbol: str, timeframe: str, since_ts: int,
+                           limit: int = OHLCV_INCREMENTAL_LIMIT) -> list:
         """
          增量拉取最新K线
         
-        只请求 since_ts 之后的数据，数量限制为 OHLCV_INCREMENTAL_LIMIT
+        只请求 since_ts 之后的数据，数量限制为 limit（默认 OHLCV_INCREMENTAL_LIMIT）
         
         参数:
         - symbol: 交易对
         - timeframe: 时间周期
         - since_ts: 起始时间戳（毫秒）
+        - limit: 拉取根数
         
         返回:
         - 新K线数据列表
@@ -478,7 +962,7 @@ class MarketDataProvider:
                     symbol=symbol,
                     timeframe=timeframe,
                     since=since_ts,
-                    limit=OHLCV_INCREMENTAL_LIMIT
+                    limit=limit
                 )
             )
             return data if data else []
@@ -486,34 +970,6 @@ class MarketDataProvider:
             logger.warning(f"[md-incr] {symbol} {timeframe} 增量拉取失败: {e}")
             raise
     
-    def _merge_ohlcv(self, cached_data: list, new_data: list, limit: int) -> list:
-        """
-        合并K线数据，去重并保留最新的 limit 根（固定长度缓存）
-        
-        参数:
-        - cached_data: 缓存的K线数据
-        - new_data: 新拉取的K线数据
-        - limit: 保留数量（默认1000）
-        
-        返回:
-        - 合并后的K线数据（固定长度）
-        """
-        # 使用时间戳作为 key 去重
-        ts_map = {}
-        for candle in cached_data:
-            ts_map[candle[0]] = candle
-        for candle in new_data:
-            ts_map[candle[0]] = candle  # 新数据覆盖旧数据
-        
-        # 按时间戳排序
-        sorted_candles = sorted(ts_map.values(), key=lambda x: x[0])
-        
-        # 关键：执行 tail(limit) 保持缓存长度恒定，丢弃过期数据
-        if len(sorted_candles) > limit:
-            sorted_candles = sorted_candles[-limit:]
-        
-        return sorted_candles
-    
     def get_pending_init_symbols(self) -> list:
         """
         获取待初始化的币种列表
@@ -970,7 +1426,8 @@ class MarketDataProvider:
             "cache_misses": self.metrics["cache_misses"],
             "cache_hit_rate": round(cache_hit_rate, 4),
             "errors": self.metrics["errors"],
-            "circuit_breakers": len(self.circuit_breakers)
+            "circuit_breakers": len(self.circuit_breakers),
+            "rate_limit": self.rate_limiter.stats()
         }
     
     def reset_metrics(self):
@@ -1302,6 +1759,33 @@ class WebSocketMarketDataProvider:
         
         return success
     
+    def subscribe_many(self, symbols: List[str], timeframes: List[str]) -> bool:
+        """
+        批量订阅 K线数据（symbols × timeframes，合并为多参数订阅请求帧）
+        
+        Args:
+            symbols: 交易对列表
+            timeframes: 时间周期列表
+        
+        Returns:
+            是否全部订阅成功
+        """
+        if not self.ws_client or not symbols or not timeframes:
+            return False
+        
+        # 确保连接
+        if not self.ws_client.is_connected():
+            if not self.ws_client.start():
+                logger.warning(f"[WS-Provider] 无法连接，订阅失败: {len(symbols)} 个币种")
+                return False
+        
+        success = self.ws_client.subscribe_candles_many(symbols, timeframes)
+        if success:
+            for symbol in symbols:
+                self._subscribed_symbols[symbol] = timeframes[-1]
+        
+        return success
+    
     def unsubscribe(self, symbol: str) -> bool:
         """取消订阅"""
         if not self.ws_client:
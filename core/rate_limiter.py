@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+#
+#    _   _  __   __ __        __  _____ ___  ____   _   _  ___ 
+#   | | | | \ \ / / \ \      / / | ____||_ _|/ ___| | | | ||_ _|
+#   | |_| |  \ V /   \ \ /\ / /  |  _|   | | \___ \ | |_| | | | 
+#   |  _  |   | |     \ V  V /   | |___  | |  ___) ||  _  | | | 
+#   |_| |_|   |_|      \_/\_/    |_____||___||____/ |_| |_||___|
+#
+#                         何 以 为 势
+#                  Quantitative Trading System
+#
+#   Copyright (c) 2024-2025 HyWeiShi. All Rights Reserved.
+#   License: AGPL-3.0
+#
+# ============================================================================
+"""
+OKX REST 限流器（令牌桶）
+
+交易引擎的 MarketDataProvider、AI 专用 Key 的 MarketDataProvider、AsyncMarketFetcher、
+持仓价格刷新和 Market API 都直接请求 OKX，彼此不协调，只靠零散的 time.sleep 退避。
+本模块按「端点族 + 限速维度」集中限流：
+
+- 公共行情接口（K线 / 行情）按 IP 限速：同一进程内所有调用方共享一个桶
+- 私有接口（余额 / 持仓 / 下单）按 API Key 限速：每个 Key 一个桶
+- 令牌桶采用预约模式：扣除令牌后返回需要等待的秒数，线程（time.sleep）和 asyncio（asyncio.sleep）
+  都可以使用，等待期间不持有锁，不阻塞其他调用方
+- 设置 RATE_LIMIT_SHARED_DB 后，桶状态保存在 SQLite 小表中，多个进程（交易引擎 / Market API /
+  AI 竞技场）共享同一份额度
+- 收到 429（RateLimitExceeded / OKX 50011）时调用 penalize 清空对应桶，所有调用方一起退避
+
+每个端点族记录请求数、等待次数和等待时间（stats()），用于观察限流是否成为瓶颈。
+
+用法:
+    limiter = get_rate_limiter()
+    limiter.acquire('candles')                      # 同步
+    await limiter.acquire_async('candles')          # 异步
+    limiter.acquire('balance', api_key=api_key)     # 私有接口按 Key 限速
+    limiter.acquire(ohlcv_endpoint(since, tf_ms))   # 按 since 区分 candles / history_candles
+
+环境变量：
+- RATE_LIMIT: 是否启用限流（默认 1）
+- RATE_LIMIT_HEADROOM: 使用官方额度的比例（默认 0.9，留出余量避免 429）
+- RATE_LIMIT_SHARED_DB: 跨进程共享的 SQLite 文件路径（默认空，只在进程内共享）
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# OKX REST 限速（官方文档，2 秒窗口）：端点族 -> (请求数, 窗口秒数, 限速维度)
+OKX_ENDPOINT_LIMITS: Dict[str, Tuple[int, float, str]] = {
+    'candles': (40, 2.0, 'ip'),           # GET /api/v5/market/candles
+    'history_candles': (20, 2.0, 'ip'),   # GET /api/v5/market/history-candles
+    'ticker': (20, 2.0, 'ip'),            # GET /api/v5/market/ticker
+    'tickers': (20, 2.0, 'ip'),           # GET /api/v5/market/tickers
+    'balance': (10, 2.0, 'key'),          # GET /api/v5/account/balance
+    'positions': (10, 2.0, 'key'),        # GET /api/v5/account/positions
+    'order': (60, 2.0, 'key'),            # POST /api/v5/trade/order
+}
+DEFAULT_ENDPOINT_LIMIT = (10, 2.0, 'key')
+
+# ccxt okx.fetch_ohlcv：since 早于最近 1440 根K线时改为请求 /market/history-candles
+OKX_RECENT_CANDLES = 1440
+
+
+def ohlcv_endpoint(since: Optional[int], timeframe_ms: int, now_ms: Optional[int] = None) -> str:
+    """K线请求实际命中的端点族（与 ccxt okx.fetch_ohlcv 的切换规则一致）"""
+    if since is None:
+        return 'candles'
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    history_border = now_ms - (OKX_RECENT_CANDLES - 1) * timeframe_ms
+    return 'history_candles' if since < history_border else 'candles'
+
+
+def _reserve(level: float, updated: float, now: float, capacity: float, rate: float,
+             tokens: float) -> Tuple[float, float]:
+    """
+    令牌桶预约：补充令牌后扣除 tokens（允许透支）
+
+    返回:
+    - (需要等待的秒数, 扣除后的令牌数)
+    """
+    level = min(capacity, level + max(0.0, now - updated) * rate)
+    level -= tokens
+    return (-level / rate if level < 0 else 0.0), level
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """是否为限流错误（ccxt.RateLimitExceeded / DDoSProtection，或响应中的 OKX 错误码 50011 / HTTP 429）"""
+    if type(exc).__name__ in ('RateLimitExceeded', 'DDoSProtection'):
+        return True
+    message = str(exc)
+    return '"50011"' in message or 'Too Many Requests' in message
+
+
+def api_key_of(exchange: Any) -> Optional[str]:
+    """从 ccxt 实例或交易所适配器中取出 API Key（取不到时返回 None）"""
+    for obj in (exchange, getattr(exchange, 'exchange', None), getattr(exchange, 'cfg', None)):
+        if obj is None:
+            continue
+        for attr in ('apiKey', 'api_key'):
+            value = getattr(obj, attr, None)
+            if isinstance(value, str) and value:
+                return value
+    return None
+
+
+class SQLiteBucketStore:
+    """跨进程共享的令牌桶状态（一张小表，BEGIN IMMEDIATE 串行化预约）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, name: str, capacity: float, rate: float, tokens: float) -> float:
+        """预约令牌，返回需要等待的秒数"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+            level, updated = row if row else (capacity, now)
+            wait, level = _reserve(level, updated, now, capacity, rate, tokens)
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                         (name, level, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def set_level(self, name: str, level: float) -> None:
+        """直接设置令牌数（用于 429 后清空额度）"""
+        self._conn().execute("INSERT OR REPLACE INTO rate_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                             (name, level, time.time()))
+
+
+class TokenBucket:
+    """
+    令牌桶（线程安全；可选跨进程共享）
+
+    reserve() 只做计算和扣减，等待由调用方完成，同一个桶可以同时被线程和事件循环使用。
+    """
+
+    def __init__(self, name: str, capacity: float, rate: float, store: Optional[SQLiteBucketStore] = None):
+        """
+        Args:
+            name: 桶名称（跨进程共享时作为主键）
+            capacity: 桶容量（允许的突发请求数）
+            rate: 每秒补充的令牌数
+            store: 跨进程共享存储（None=进程内）
+        """
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self._store = store
+        self._lock = threading.Lock()
+        self._level = float(capacity)
+        self._updated = time.monotonic()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """预约 tokens 个令牌，返回需要等待的秒数（令牌已扣除，等待结束后即可发出请求）"""
+        if self._store is not None:
+            try:
+                return self._store.reserve(self.name, self.capacity, self.rate, tokens)
+            except sqlite3.Error as e:
+                logger.debug(f"[rate-limit] 共享限流状态不可用，使用进程内令牌桶: {e}")
+        with self._lock:
+            now = time.monotonic()
+            wait, self._level = _reserve(self._level, self._updated, now, self.capacity, self.rate, tokens)
+            self._updated = now
+        return wait
+
+    def drain(self, seconds: float) -> None:
+        """清空额度，seconds 秒内不再放行（收到 429 时调用）"""
+        level = -seconds * self.rate
+        if self._store is not None:
+            try:
+                self._store.set_level(self.name, level)
+                return
+            except sqlite3.Error as e:
+                logger.debug(f"[rate-limit] 共享限流状态不可用: {e}")
+        with self._lock:
+            self._level = min(self._level, level)
+            self._updated = time.monotonic()
+
+
+class RateLimiter:
+    """
+    按端点族和限速维度（IP / API Key）管理令牌桶，并记录等待时间
+    """
+
+    def __init__(self, enabled: bool = True, headroom: float = 0.9,
+                 store: Optional[SQLiteBucketStore] = None,
+                 limits: Optional[Dict[str, Tuple[int, float, str]]] = None):
+        """
+        Args:
+            enabled: 是否启用（关闭时只统计请求数）
+            headroom: 使用官方额度的比例
+            store: 跨进程共享存储（None=进程内）
+            limits: 端点族限速表（默认 OKX_ENDPOINT_LIMITS）
+        """
+        self.enabled = enabled
+        self.headroom = headroom
+        self.limits = dict(limits or OKX_ENDPOINT_LIMITS)
+        self._store = store
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    def bucket(self, endpoint: str, api_key: Optional[str] = None) -> TokenBucket:
+        """获取端点族对应的令牌桶（私有接口按 API Key 区分）"""
+        count, window, scope = self.limits.get(endpoint, DEFAULT_ENDPOINT_LIMIT)
+        if scope == 'ip':
+            name = f"{endpoint}:ip"
+        else:
+            key_id = hashlib.sha1(api_key.encode()).hexdigest()[:12] if api_key else 'anonymous'
+            name = f"{endpoint}:{key_id}"
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(name)
+                if bucket is None:
+                    capacity = max(1.0, count * self.headroom)
+                    bucket = self._buckets[name] = TokenBucket(
+                        name, capacity, count * self.headroom / window, store=self._store
+                    )
+        return bucket
+
+    def acquire(self, endpoint: str, api_key: Optional[str] = None, tokens: float = 1.0) -> float:
+        """同步获取令牌（必要时在当前线程等待），返回等待秒数"""
+        wait = self._reserve(endpoint, api_key, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, endpoint: str, api_key: Optional[str] = None, tokens: float = 1.0) -> float:
+        """异步获取令牌（等待期间不阻塞事件循环），返回等待秒数"""
+        if self._store is not None:
+            # 共享存储的 BEGIN IMMEDIATE 可能等待 SQLite 写锁，放到线程池执行
+            loop = asyncio.get_running_loop()
+            wait = await loop.run_in_executor(None, self._reserve, endpoint, api_key, tokens)
+        else:
+            wait = self._reserve(endpoint, api_key, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, endpoint: str, api_key: Optional[str] = None, seconds: Optional[float] = None) -> None:
+        """收到 429 后清空对应桶（默认退避一个限速窗口）"""
+        _, window, _ = self.limits.get(endpoint, DEFAULT_ENDPOINT_LIMIT)
+        self.bucket(endpoint, api_key).drain(window if seconds is None else seconds)
+        with self._lock:
+            self._endpoint_metrics(endpoint)['penalties'] += 1
+        logger.warning(f"[rate-limit] {endpoint} 触发限流，退避 {window if seconds is None else seconds:.1f}s")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """各端点族的请求数、等待次数和等待时间"""
+        with self._lock:
+            result = {}
+            for endpoint, m in self._metrics.items():
+                result[endpoint] = {
+                    **m,
+                    'wait_ms': round(m['wait_ms'], 2),
+                    'max_wait_ms': round(m['max_wait_ms'], 2),
+                    'avg_wait_ms': round(m['wait_ms'] / m['requests'], 3) if m['requests'] else 0.0,
+                }
+            return result
+
+    def _reserve(self, endpoint: str, api_key: Optional[str], tokens: float) -> float:
+        wait = self.bucket(endpoint, api_key).reserve(tokens) if self.enabled else 0.0
+        with self._lock:
+            m = self._endpoint_metrics(endpoint)
+            m['requests'] += 1
+            if wait > 0:
+                m['throttled'] += 1
+                m['wait_ms'] += wait * 1000
+                m['max_wait_ms'] = max(m['max_wait_ms'], wait * 1000)
+        return wait
+
+    def _endpoint_metrics(self, endpoint: str) -> Dict[str, float]:
+        m = self._metrics.get(endpoint)
+        if m is None:
+            m = self._metrics[endpoint] = {
+                'requests': 0, 'throttled': 0, 'wait_ms': 0.0, 'max_wait_ms': 0.0, 'penalties': 0,
+            }
+        return m
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取全局限流器（懒加载，配置来自环境变量）"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                enabled = os.getenv("RATE_LIMIT", "1").strip().lower() not in ("0", "false", "no", "off")
+                try:
+                    headroom = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))
+                except ValueError:
+                    headroom = 0.9
+                store = None
+                shared_db = os.getenv("RATE_LIMIT_SHARED_DB", "").strip()
+                if shared_db:
+                    try:
+                        store = SQLiteBucketStore(shared_db)
+                    except sqlite3.Error as e:
+                        logger.warning(f"[rate-limit] 无法打开共享限流库 {shared_db}，只在进程内限流: {e}")
+                _rate_limiter = RateLimiter(enabled=enabled, headroom=headroom, store=store)
+    return _rate_limiter
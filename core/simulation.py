@@ -495,16 +495,24 @@ class BacktestEngine:
         # 模拟实盘逻辑：对每个时间周期都从交易所拉取完整数据
         tf_data = {}  # {tf: df_with_indicators}
         
+        # 调用方传入 df 且不从交易所拉取时以 df 为准，本地K线库只替代交易所下载
+        use_caller_df = df is not None and not (fetch_klines_func and api_key)
+        
         for tf in timeframes:
             try:
+                # 本地K线库已覆盖整个日期区间时直接读取，不访问交易所
+                stored_df = None if use_caller_df else self._load_from_store(symbol, tf, start_date, end_date)
+                if stored_df is not None:
+                    df_tf = stored_df
+                    print(f"💾 {tf} 使用本地K线库: {len(df_tf)} 根K线")
+
                 # 直接从交易所拉取该周期的完整数据
-                if fetch_klines_func and api_key:
+                elif fetch_klines_func and api_key:
                     print(f"📥 正在拉取 {tf} 周期数据...")
                     
                     # 根据日期范围计算需要拉取的K线数量
                     if start_date and end_date:
                         # 计算日期跨度
-                        import pandas as pd
                         start_dt = pd.to_datetime(start_date)
                         end_dt = pd.to_datetime(end_date)
                         days_diff = (end_dt - start_dt).days
@@ -561,6 +569,7 @@ class BacktestEngine:
                         # 按时间排序并去重
                         df_tf = df_tf.sort_values('timestamp').drop_duplicates(subset=['timestamp'], keep='first').reset_index(drop=True)
                         print(f"    {tf} 周期总共拉取: {len(df_tf)} 根K线")
+                        self._save_to_store(symbol, tf, df_tf)
                     else:
                         print(f"   ⚠️ {tf} 数据拉取失败，跳过")
                         continue
@@ -591,8 +600,8 @@ class BacktestEngine:
                     print(f"   ⚠️ {tf} 数据不足 ({len(df_tf)} < 200)，跳过")
                     continue
                 
-                # 计算技术指标
-                df_with_indicators = self.strategy.calculate_indicators(df_tf)
+                # 计算技术指标（重置索引，保证对齐表中的位置与行号一致）
+                df_with_indicators = self.strategy.calculate_indicators(df_tf.reset_index(drop=True))
                 tf_data[tf] = df_with_indicators
                 print(f"    {tf} 指标计算完成 | K线数: {len(df_with_indicators)}")
                 
@@ -622,26 +631,47 @@ class BacktestEngine:
         base_tf = min(tf_data.keys(), key=lambda x: self._tf_to_minutes(x))
         base_df = tf_data[base_tf]
         
+        # 预计算时间对齐表：base 第 i 根K线 -> 各周期最后一根已开盘K线的位置
+        alignment = self._build_alignment_table(base_df, tf_data)
+        
+        # 预计算各周期的信号（支持向量化的策略一次算完，否则逐 bar 按索引计算）
+        tf_signal_frames = {}
+        if hasattr(self.strategy, 'check_signals_vectorized'):
+            for tf, df_tf in tf_data.items():
+                try:
+                    frame = self.strategy.check_signals_vectorized(df_tf, timeframe=tf)
+                    tf_signal_frames[tf] = {c: frame[c].to_numpy() for c in frame.columns}
+                except Exception as e:
+                    print(f"   ⚠️ {tf} 向量化信号计算失败，回退逐 bar 计算: {e}")
+        tf_timestamps = {tf: df_tf['timestamp'].to_numpy() for tf, df_tf in tf_data.items()}
+        has_check_signals_at = hasattr(self.strategy, 'check_signals_at')
+        
+        base_close = base_df['close'].to_numpy()
+        base_timestamps = base_df['timestamp'].to_numpy()
+        
         # 使用 iloc[-1] 模拟实盘的激进模式（基于当前K线判断）
         for i in range(200, len(base_df)):  # 确保有足够的历史数据
-            current_bar = base_df.iloc[i]
-            timestamp = current_bar.get('timestamp', i)
-            close_price = current_bar['close']
+            timestamp = pd.Timestamp(base_timestamps[i])
+            close_price = base_close[i]
             
             # 检查所有周期的信号
             signals = []  # [(tf, signal, action, signal_type), ...]
             
             for tf, df_tf in tf_data.items():
                 # 找到对应的时间点
-                tf_idx = self._find_closest_index(df_tf, timestamp)
-                if tf_idx is None or tf_idx < 3:
+                tf_idx = int(alignment[tf][i])
+                if tf_idx < 3:
                     continue
                 
-                # 提供到当前时间点的所有数据（模拟实时数据）
-                signal_df = df_tf.iloc[:tf_idx+1]
-                
                 try:
-                    signal = self.strategy.check_signals(signal_df, timeframe=tf)
+                    # 只使用到当前时间点的数据（模拟实时数据）
+                    if tf in tf_signal_frames:
+                        frame = tf_signal_frames[tf]
+                        signal = {c: values[tf_idx] for c, values in frame.items()}
+                    elif has_check_signals_at:
+                        signal = self.strategy.check_signals_at(df_tf, tf_idx, timeframe=tf)
+                    else:
+                        signal = self.strategy.check_signals(df_tf.iloc[:tf_idx+1], timeframe=tf)
                     action = signal.get('action', 'HOLD')
                     signal_type = signal.get('type', 'NONE')
                     
@@ -655,7 +685,7 @@ class BacktestEngine:
                     
                     if action != 'HOLD':
                         # K线去重检查
-                        candle_time = signal_df.iloc[-1].get('timestamp')
+                        candle_time = tf_timestamps[tf][tf_idx]
                         candle_key = (action, tf)
                         
                         if candle_key in self.last_signal_candle and self.last_signal_candle[candle_key] == candle_time:
@@ -912,10 +942,11 @@ class BacktestEngine:
         - 重采样后的 DataFrame
         """
         # 转换为 pandas 采样频率格式
+        # 统一用分钟别名（'T'/'H' 在新版 pandas 中已移除）
         freq_map = {
-            '1m': '1T', '3m': '3T', '5m': '5T', 
-            '15m': '15T', '30m': '30T', '1h': '1H',
-            '2h': '2H', '4h': '4H', '1d': '1D'
+            '1m': '1min', '3m': '3min', '5m': '5min', 
+            '15m': '15min', '30m': '30min', '1h': '60min',
+            '2h': '120min', '4h': '240min', '1d': '1D'
         }
         
         if timeframe not in freq_map:
@@ -940,24 +971,70 @@ class BacktestEngine:
         
         return df_result
     
-    def _find_closest_index(self, df: pd.DataFrame, target_timestamp) -> Optional[int]:
+    def _build_alignment_table(self, base_df: pd.DataFrame, tf_data: Dict[str, pd.DataFrame]) -> Dict[str, np.ndarray]:
         """
-        找到最接近目标时间戳的索引
+        构建多周期时间对齐表
         
-        参数：
-        - df: 带 timestamp 列的 DataFrame
-        - target_timestamp: 目标时间戳
+        对 base 周期的每根K线 i，给出各周期中 timestamp <= base 时间的最后一根K线位置
+        （check_signals 的 00 秒确认模式会再取其前一根作为已收盘K线）。
+        使用 int64 时间戳 + searchsorted，整体 O(n log m)。
         
         返回：
-        - 最接近的索引，如果找不到返回 None
+        - {tf: positions}，positions[i] 为 -1 表示该周期尚无数据
         """
+        base_ns = self._timestamps_to_ns(base_df['timestamp'])
+        alignment = {}
+        for tf, df_tf in tf_data.items():
+            tf_ns = self._timestamps_to_ns(df_tf['timestamp'])
+            alignment[tf] = np.searchsorted(tf_ns, base_ns, side='right') - 1
+        return alignment
+    
+    @staticmethod
+    def _timestamps_to_ns(timestamps: pd.Series) -> np.ndarray:
+        """时间列转换为 int64 纳秒（统一精度，带时区的转为 UTC）"""
+        ts = pd.to_datetime(timestamps)
+        if ts.dt.tz is not None:
+            ts = ts.dt.tz_convert('UTC').dt.tz_localize(None)
+        return ts.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    
+    @staticmethod
+    def _load_from_store(symbol: str, tf: str, start_date: Optional[str], end_date: Optional[str]) -> Optional[pd.DataFrame]:
+        """本地K线库完整覆盖 [start_date, end_date] 时返回数据，否则返回 None"""
+        if not start_date or not end_date:
+            return None
         try:
-            # 找到小于或等于目标时间的最后一个索引
-            idx = df[df['timestamp'] <= target_timestamp].index[-1]
-            return idx
-        except:
+            from database.ohlcv_store import get_ohlcv_store, rows_to_frame, last_closed_bar_ts
+            store = get_ohlcv_store()
+            start_ms = int(pd.to_datetime(start_date).timestamp() * 1000)
+            end_ms = int(pd.to_datetime(end_date).timestamp() * 1000)
+            if store.missing_ranges(symbol, tf, start_ms, min(end_ms, last_closed_bar_ts(tf))):
+                return None
+            rows = store.read(symbol, tf, start_ms, end_ms)
+            return rows_to_frame(rows) if len(rows) else None
+        except Exception as e:
+            print(f"   ⚠️ 读取本地K线库失败: {e}")
             return None
-    
+
+    @staticmethod
+    def _save_to_store(symbol: str, tf: str, df_tf: pd.DataFrame) -> None:
+        """把从交易所拉取的已收盘K线写入本地K线库（连续区间标记为已覆盖）"""
+        try:
+            from database.ohlcv_store import get_ohlcv_store, OHLCV_COLUMNS, TIMEFRAME_MS, last_closed_bar_ts
+            store = get_ohlcv_store()
+            tf_ms = TIMEFRAME_MS.get(tf, 60 * 1000)
+            rows = df_tf[OHLCV_COLUMNS].copy()
+            rows['timestamp'] = BacktestEngine._timestamps_to_ns(rows['timestamp']) // 1_000_000
+            rows = rows.to_numpy(dtype=np.float64)
+            rows = rows[rows[:, 0] <= last_closed_bar_ts(tf)]
+            if len(rows) == 0:
+                return
+            store.write(symbol, tf, rows)
+            # 只有连续的数据才标记覆盖，中间有缺口时不标记，下次仍走交易所
+            if len(rows) == 1 or np.all(np.diff(rows[:, 0]) == tf_ms):
+                store.mark_covered(symbol, tf, int(rows[0, 0]), int(rows[-1, 0]) + tf_ms - 1)
+        except Exception as e:
+            print(f"   ⚠️ 写入本地K线库失败: {e}")
+
     def _tf_to_minutes(self, tf: str) -> int:
         """将时间周期转换为分钟数"""
         tf_minutes = {
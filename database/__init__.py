@@ -20,7 +20,8 @@ from .db_bridge import (
     get_bootstrap_state,
     get_credentials_status,
     verify_credentials_and_snapshot,
-    get_pooled_connection
+    get_pooled_connection,
+    get_db_pool_stats
 )
 from .db_config import (
     get_db_config_from_env_and_secrets,
@@ -36,7 +37,32 @@ from .db_utils import (
 )
 from .connection_pool import (
     ConnectionPool,
-    get_global_pool
+    get_global_pool,
+    get_pool_for_config
+)
+from .write_behind import (
+    WriteBehindQueue,
+    get_write_behind,
+    flush_writes
+)
+from .ohlcv_store import (
+    OHLCVStore,
+    get_ohlcv_store
+)
+from .maintenance import (
+    RetentionPolicy,
+    DatabaseMaintenance,
+    get_maintenance
+)
+from .config_snapshot import (
+    ConfigSnapshot,
+    get_config_snapshot
+)
+from .async_db import (
+    AsyncDBProxy,
+    AsyncDatabase,
+    get_async_db,
+    get_async_bridge
 )
 
 __all__ = [
@@ -45,12 +71,22 @@ __all__ = [
     'update_bot_config', 'set_control_flags', 'get_paper_balance',
     'get_paper_positions', 'get_hedge_positions', 'get_trade_stats',
     'get_trade_history', 'get_bootstrap_state', 'get_credentials_status',
-    'verify_credentials_and_snapshot', 'get_pooled_connection',
+    'verify_credentials_and_snapshot', 'get_pooled_connection', 'get_db_pool_stats',
     # db_config
     'get_db_config_from_env_and_secrets', 'PROJECT_ROOT', 'DATA_DIR',
     # db_utils
     'get_db_connection', 'update_engine_status', 'update_control_flags',
     'insert_performance_metrics', 'get_recent_performance_metrics',
     # connection_pool
-    'ConnectionPool', 'get_global_pool'
+    'ConnectionPool', 'get_global_pool', 'get_pool_for_config',
+    # write_behind
+    'WriteBehindQueue', 'get_write_behind', 'flush_writes',
+    # ohlcv_store
+    'OHLCVStore', 'get_ohlcv_store',
+    # maintenance
+    'RetentionPolicy', 'DatabaseMaintenance', 'get_maintenance',
+    # config_snapshot
+    'ConfigSnapshot', 'get_config_snapshot',
+    # async_db
+    'AsyncDBProxy', 'AsyncDatabase', 'get_async_db', 'get_async_bridge'
 ]
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+异步数据库访问层
+
+AI 竞技场跑在 asyncio 事件循环上，而 ai_db_manager / db_bridge 的调用都是阻塞的，
+一次慢写入会卡住整个事件循环（所有 AI 的处理一起等待）。本模块提供与同步接口一致的异步封装：
+
+- AsyncDBProxy: 把任意同步数据库对象 / 模块的方法包装为协程，在专用线程池中执行
+  （await proxy.get_stats(agent) 与 manager.get_stats(agent) 参数、返回值一致）
+- AsyncDatabase: 原始 SQL 的 fetch / fetchone / execute / executemany（SQL 统一使用 ? 占位符，引号内的 ? 不替换）
+  - PostgreSQL 且安装了 asyncpg: 使用 asyncpg 连接池，不占用线程
+  - 其他情况（SQLite，或未安装 asyncpg）: 在线程池中通过 db_bridge 连接池执行
+
+用法:
+    adb = get_async_bridge()
+    config = await adb.get_bot_config()
+
+    db = get_async_db()
+    rows = await db.fetch("SELECT * FROM signal_events WHERE symbol = ?", (symbol,))
+
+环境变量：
+- DB_ASYNC_WORKERS: 数据库线程池大小（默认 4）
+- DB_ASYNC_PG_POOL_MAX: asyncpg 连接池最大连接数（默认 10）
+"""
+import os
+import re
+import asyncio
+import logging
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 尝试导入 asyncpg（可选依赖）
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    asyncpg = None
+    ASYNCPG_AVAILABLE = False
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """获取数据库专用线程池（懒加载，与事件循环默认线程池隔离）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, _env_int("DB_ASYNC_WORKERS", 4)),
+                    thread_name_prefix="db-async",
+                )
+    return _executor
+
+
+class AsyncDBProxy:
+    """
+    同步数据库接口的异步代理
+
+    方法调用在数据库线程池中执行；非可调用属性直接返回。
+    """
+
+    def __init__(self, target: Any, executor: Optional[ThreadPoolExecutor] = None):
+        self._target = target
+        self._executor = executor
+
+    @property
+    def target(self) -> Any:
+        return self._target
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor or get_db_executor(), functools.partial(attr, *args, **kwargs)
+            )
+        return call
+
+
+# 单引号字符串（'' 转义）、双引号标识符原样保留，只替换其外的 ?
+_PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|\?")
+
+
+def _replace_placeholders(sql: str, make) -> str:
+    """把引号之外的 ? 占位符替换为 make(序号)（序号从 1 开始）"""
+    counter = iter(range(1, 10 ** 6))
+    return _PLACEHOLDER.sub(lambda m: make(next(counter)) if m.group() == "?" else m.group(), sql)
+
+
+def _to_asyncpg(sql: str) -> str:
+    """? 占位符 -> $1, $2, ..."""
+    return _replace_placeholders(sql, lambda i: f"${i}")
+
+
+class AsyncDatabase:
+    """原始 SQL 的异步执行"""
+
+    def __init__(self, db_config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            db_config: 数据库配置（None=默认数据库，与 db_bridge 一致）
+        """
+        self.db_config = db_config
+        # 数据库类型只解析一次（默认配置来自环境变量 / secrets，不在每次查询时重读）
+        self._db_kind, self._resolved_config = self._config()
+        self._pg_pool = None
+        self._pg_pool_loop = None
+        # 每个事件循环一把锁（asyncio.Lock 不能跨循环使用）
+        self._pg_pool_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = \
+            weakref.WeakKeyDictionary()
+
+    def _config(self):
+        if self.db_config is None:
+            from database.db_config import get_db_config_from_env_and_secrets
+            return get_db_config_from_env_and_secrets()
+        return self.db_config.get("kind", "sqlite"), self.db_config
+
+    @property
+    def uses_asyncpg(self) -> bool:
+        return ASYNCPG_AVAILABLE and self._db_kind == "postgres"
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    async def fetch(self, sql: str, params: Sequence = ()) -> List[Dict[str, Any]]:
+        """查询多行，返回 dict 列表"""
+        if self.uses_asyncpg:
+            pool = await self._get_pg_pool()
+            rows = await pool.fetch(_to_asyncpg(sql), *params)
+            return [dict(row) for row in rows]
+        return await self._offload(self._run_sync, sql, params, 'fetch')
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[Dict[str, Any]]:
+        """查询单行，没有结果时返回 None"""
+        if self.uses_asyncpg:
+            pool = await self._get_pg_pool()
+            row = await pool.fetchrow(_to_asyncpg(sql), *params)
+            return dict(row) if row is not None else None
+        return await self._offload(self._run_sync, sql, params, 'fetchone')
+
+    async def execute(self, sql: str, params: Sequence = ()) -> None:
+        """执行单条写入（自动提交）"""
+        if self.uses_asyncpg:
+            pool = await self._get_pg_pool()
+            await pool.execute(_to_asyncpg(sql), *params)
+            return
+        await self._offload(self._run_sync, sql, params, 'execute')
+
+    async def executemany(self, sql: str, seq_of_params: Sequence[Sequence]) -> None:
+        """同一条 SQL 批量写入，单个事务"""
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            return
+        if self.uses_asyncpg:
+            pool = await self._get_pg_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(_to_asyncpg(sql), seq_of_params)
+            return
+        await self._offload(self._run_sync, sql, seq_of_params, 'executemany')
+
+    async def close(self) -> None:
+        """关闭 asyncpg 连接池"""
+        if self._pg_pool is not None:
+            pool, self._pg_pool, self._pg_pool_loop = self._pg_pool, None, None
+            await pool.close()
+
+    # ------------------------------------------------------------------
+    # 实现
+    # ------------------------------------------------------------------
+
+    async def _offload(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args))
+
+    async def _get_pg_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._pg_pool is not None and self._pg_pool_loop is loop:
+            return self._pg_pool
+        lock = self._pg_pool_locks.get(loop)
+        if lock is None:
+            lock = self._pg_pool_locks[loop] = asyncio.Lock()
+        async with lock:
+            if self._pg_pool is not None and self._pg_pool_loop is loop:
+                # 等锁期间已由同一循环的其他调用方创建
+                return self._pg_pool
+            if self._pg_pool is not None:
+                # 连接池绑定创建时的事件循环，换循环（如多次 asyncio.run）时重建
+                self._pg_pool.terminate()
+                self._pg_pool = None
+            self._pg_pool = await asyncpg.create_pool(
+                dsn=self._resolved_config["url"], min_size=1, max_size=max(1, _env_int("DB_ASYNC_PG_POOL_MAX", 10)),
+            )
+            self._pg_pool_loop = loop
+            logger.debug("asyncpg 连接池已创建")
+        return self._pg_pool
+
+    def _run_sync(self, sql: str, params, mode: str):
+        from database.db_bridge import _get_connection
+        conn, db_kind = _get_connection(self.db_config)
+        try:
+            if db_kind == "postgres":
+                sql = _replace_placeholders(sql, lambda _: "%s")
+            cursor = conn.cursor()
+            if mode == 'executemany':
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, tuple(params))
+            if mode in ('fetch', 'fetchone'):
+                columns = [d[0] for d in cursor.description]
+                rows = cursor.fetchall() if mode == 'fetch' else [cursor.fetchone()]
+                result = [
+                    dict(row) if isinstance(row, dict) else dict(zip(columns, row))
+                    for row in rows if row is not None
+                ]
+                return result if mode == 'fetch' else (result[0] if result else None)
+            conn.commit()
+            return None
+        finally:
+            conn.close()
+
+
+_async_db: Optional[AsyncDatabase] = None
+_async_bridge: Optional[AsyncDBProxy] = None
+_async_lock = threading.Lock()
+
+
+def get_async_db() -> AsyncDatabase:
+    """获取默认数据库的异步 SQL 执行器（懒加载）"""
+    global _async_db
+    if _async_db is None:
+        with _async_lock:
+            if _async_db is None:
+                _async_db = AsyncDatabase()
+    return _async_db
+
+
+def get_async_bridge() -> AsyncDBProxy:
+    """获取 db_bridge 的异步代理（接口与 db_bridge 模块函数一致）"""
+    global _async_bridge
+    if _async_bridge is None:
+        with _async_lock:
+            if _async_bridge is None:
+                from database import db_bridge
+                _async_bridge = AsyncDBProxy(db_bridge)
+    return _async_bridge
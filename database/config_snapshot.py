@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+单行配置表的内存快照（bot_config / control_flags / engine_status）
+
+交易主循环、background_balance_syncer 每轮（甚至每个币种）都要读 bot_config 和 control_flags，
+Streamlit UI 每次 rerun 都读 engine_status，每次读取都要取一次连接、执行一次查询。
+这三张表很少变化，本模块在进程内保存快照：
+
+- 写入方（db_bridge.update_bot_config / set_control_flags / update_engine_status）在同一事务内
+  递增 config_versions 表中对应的版本号
+- 读取方最多每 CONFIG_SNAPSHOT_POLL_MS 轮询一次 config_versions（一条很小的查询），
+  只有版本号变化的表才重新读取；其余读取直接返回内存快照的副本
+- 本进程内的写入通过回调立即失效对应快照（写后读一致）；其他进程的写入最迟在一个轮询间隔后可见
+
+get_bot_config / get_control_flags / get_engine_status 与 db_bridge 同名函数签名一致，可直接替换导入。
+
+环境变量：
+- CONFIG_SNAPSHOT: 是否启用快照（默认 1，设为 0 时直接读数据库）
+- CONFIG_SNAPSHOT_POLL_MS: 版本号轮询间隔（默认 500ms）
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from database import db_bridge
+from database.db_bridge import CONFIG_VERSION_TABLES
+
+logger = logging.getLogger(__name__)
+
+# 表名 -> db_bridge 读取函数名
+_LOADERS = {
+    'bot_config': 'get_bot_config',
+    'control_flags': 'get_control_flags',
+    'engine_status': 'get_engine_status',
+}
+
+
+class ConfigSnapshot:
+    """
+    单个数据库的配置快照
+
+    Usage:
+        snapshot = ConfigSnapshot()
+        config = snapshot.get('bot_config')
+    """
+
+    def __init__(self, db_config: Optional[Dict[str, Any]] = None, poll_interval: float = 0.5):
+        """
+        Args:
+            db_config: 数据库配置（None=默认数据库）
+            poll_interval: 版本号轮询间隔（秒）
+        """
+        self.db_config = db_config
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._stale = set(CONFIG_VERSION_TABLES)
+        self._last_poll = 0.0
+
+        self._hits = 0
+        self._polls = 0
+        self._reloads = 0
+
+        db_bridge.add_config_change_listener(self._on_local_change)
+
+    def get(self, table_name: str) -> Dict[str, Any]:
+        """读取单行配置表（返回副本，调用方可随意修改）"""
+        with self._lock:
+            if time.monotonic() - self._last_poll >= self.poll_interval:
+                self._poll()
+            if table_name in self._stale or table_name not in self._data:
+                self._data[table_name] = getattr(db_bridge, _LOADERS[table_name])(self.db_config)
+                self._stale.discard(table_name)
+                self._reloads += 1
+            else:
+                self._hits += 1
+            return dict(self._data[table_name])
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """失效快照（None=全部），下次读取时重新加载"""
+        with self._lock:
+            self._stale.update([table_name] if table_name else CONFIG_VERSION_TABLES)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """获取快照统计"""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'polls': self._polls,
+                'reloads': self._reloads,
+                'versions': dict(self._versions),
+            }
+
+    def _poll(self):
+        """读取版本号，标记版本变化的表（先读版本再读数据，不会漏掉更新）"""
+        self._last_poll = time.monotonic()
+        self._polls += 1
+        try:
+            versions = db_bridge.get_config_versions(self.db_config)
+        except Exception as e:
+            # 版本表不可用（未执行 init_db 的旧库）：按轮询间隔整体重新加载
+            logger.debug(f"[config-snapshot] 读取版本号失败，重新加载全部配置: {e}")
+            self._stale.update(CONFIG_VERSION_TABLES)
+            return
+        for table_name in CONFIG_VERSION_TABLES:
+            version = versions.get(table_name)
+            if version is None or version != self._versions.get(table_name):
+                self._stale.add(table_name)
+                self._versions[table_name] = version
+
+    def _on_local_change(self, table_name: str, db_config: Optional[Dict[str, Any]]):
+        if db_config == self.db_config:
+            with self._lock:
+                self._stale.add(table_name)
+
+
+def _env_enabled() -> bool:
+    return os.getenv("CONFIG_SNAPSHOT", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _env_poll_interval() -> float:
+    try:
+        return float(os.getenv("CONFIG_SNAPSHOT_POLL_MS", 500)) / 1000.0
+    except ValueError:
+        return 0.5
+
+
+_snapshots: Dict[Optional[Tuple], ConfigSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_config_snapshot(db_config: Optional[Dict[str, Any]] = None) -> ConfigSnapshot:
+    """获取数据库对应的全局配置快照（懒加载）"""
+    key = tuple(sorted(db_config.items())) if db_config else None
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(key)
+            if snapshot is None:
+                snapshot = _snapshots[key] = ConfigSnapshot(db_config, poll_interval=_env_poll_interval())
+    return snapshot
+
+
+def get_bot_config(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """获取机器人配置（快照）"""
+    if not _env_enabled():
+        return db_bridge.get_bot_config(db_config)
+    return get_config_snapshot(db_config).get('bot_config')
+
+
+def get_control_flags(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """获取控制标志（快照）"""
+    if not _env_enabled():
+        return db_bridge.get_control_flags(db_config)
+    return get_config_snapshot(db_config).get('control_flags')
+
+
+def get_engine_status(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """获取引擎状态（快照）"""
+    if not _env_enabled():
+        return db_bridge.get_engine_status(db_config)
+    return get_config_snapshot(db_config).get('engine_status')
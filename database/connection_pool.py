@@ -20,11 +20,12 @@
 提高高频数据库操作的性能。
 """
 
+import os
 import sqlite3
 import threading
 import time
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from queue import Queue, Empty
 from contextlib import contextmanager
 
@@ -43,16 +44,26 @@ class ConnectionPool:
     数据库连接池
     
     支持 SQLite 和 PostgreSQL，提供连接复用以提高性能。
+    
+    - 空闲超过 validate_idle_after 秒的连接取出时才做 SELECT 1 校验，
+      热连接直接复用，不额外多一次往返
+    - 归还时回滚未提交事务（PostgreSQL 的只读查询也会开启事务），回滚失败则丢弃连接
+    - SQLite 连接开启较大的语句缓存（cached_statements），同一连接上重复执行的 SQL 复用已编译语句
+    - stats 提供命中 / 新建 / 等待次数和等待耗时
     """
     
     DEFAULT_POOL_SIZE = 5
     DEFAULT_TIMEOUT = 30.0  # 秒
+    DEFAULT_STATEMENT_CACHE_SIZE = 256
+    DEFAULT_VALIDATE_IDLE_AFTER = 30.0  # 秒
     
     def __init__(
         self,
         db_config: Dict[str, Any],
         pool_size: Optional[int] = None,
-        timeout: Optional[float] = None
+        timeout: Optional[float] = None,
+        statement_cache_size: Optional[int] = None,
+        validate_idle_after: Optional[float] = None
     ):
         """
         初始化连接池
@@ -61,17 +72,31 @@ class ConnectionPool:
             db_config: 数据库配置，包含 kind, path/url 等
             pool_size: 连接池大小，默认 5
             timeout: 获取连接超时时间（秒），默认 30
+            statement_cache_size: SQLite 每个连接的语句缓存条数，默认 256
+            validate_idle_after: 空闲超过该秒数的连接取出时先校验，默认 30
         """
         self.db_config = db_config
         self.db_kind = db_config.get("kind", "sqlite")
         self.pool_size = pool_size or self.DEFAULT_POOL_SIZE
         self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.statement_cache_size = statement_cache_size or self.DEFAULT_STATEMENT_CACHE_SIZE
+        self.validate_idle_after = (
+            self.DEFAULT_VALIDATE_IDLE_AFTER if validate_idle_after is None else validate_idle_after
+        )
         
-        # 连接队列
+        # 连接队列：(连接, 归还时间)
         self._pool: Queue = Queue(maxsize=self.pool_size)
         self._lock = threading.Lock()
         self._created_count = 0
         
+        # 统计
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+        
         logger.info(
             f"ConnectionPool 初始化 | 类型: {self.db_kind} | "
             f"池大小: {self.pool_size} | 超时: {self.timeout}s"
@@ -96,7 +121,11 @@ class ConnectionPool:
             return conn
         else:
             path = self.db_config.get("path")
-            conn = sqlite3.connect(path, check_same_thread=False)
+            conn = sqlite3.connect(
+                path,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
             logger.debug(f"创建新的 SQLite 连接: {path}")
             return conn
     
@@ -120,6 +149,40 @@ class ConnectionPool:
             logger.warning(f"连接验证失败: {e}")
             return False
     
+    def _discard(self, conn: Any) -> None:
+        """关闭并丢弃失效连接"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created_count = max(0, self._created_count - 1)
+            self._discarded += 1
+    
+    def _checkout(self, item: Tuple[Any, float]) -> Optional[Any]:
+        """从队列取出的连接：空闲过久则先校验，失效返回 None"""
+        conn, returned_at = item
+        if time.time() - returned_at >= self.validate_idle_after and not self._validate_connection(conn):
+            self._discard(conn)
+            return None
+        return conn
+    
+    def _try_create(self) -> Optional[Any]:
+        """未达到上限时创建新连接"""
+        with self._lock:
+            if self._created_count >= self.pool_size:
+                return None
+            self._created_count += 1
+        try:
+            conn = self._create_connection()
+        except Exception:
+            with self._lock:
+                self._created_count -= 1
+            raise
+        with self._lock:
+            self._misses += 1
+        return conn
+    
     def get_connection(self, timeout: Optional[float] = None) -> Any:
         """
         获取数据库连接
@@ -138,55 +201,46 @@ class ConnectionPool:
         timeout = timeout or self.timeout
         
         # 尝试从池中获取
-        try:
-            conn = self._pool.get(block=False)
-            if self._validate_connection(conn):
-                logger.debug("从池中获取有效连接")
-                return conn
-            else:
-                # 连接无效，关闭并创建新的
-                try:
-                    conn.close()
-                except:
-                    pass
+        while True:
+            try:
+                conn = self._checkout(self._pool.get(block=False))
+            except Empty:
+                break
+            if conn is not None:
                 with self._lock:
-                    self._created_count -= 1
-        except Empty:
-            pass
+                    self._hits += 1
+                return conn
         
         # 池空，尝试创建新连接
-        with self._lock:
-            if self._created_count < self.pool_size:
-                self._created_count += 1
-                try:
-                    conn = self._create_connection()
-                    return conn
-                except Exception as e:
-                    self._created_count -= 1
-                    raise
+        conn = self._try_create()
+        if conn is not None:
+            return conn
         
         # 池满，等待连接归还
         start_time = time.time()
         while time.time() - start_time < timeout:
             try:
-                conn = self._pool.get(block=True, timeout=1.0)
-                if self._validate_connection(conn):
-                    return conn
-                else:
-                    try:
-                        conn.close()
-                    except:
-                        pass
-                    with self._lock:
-                        self._created_count -= 1
-                    # 创建新连接替代
-                    with self._lock:
-                        if self._created_count < self.pool_size:
-                            self._created_count += 1
-                            return self._create_connection()
+                item = self._pool.get(block=True, timeout=min(1.0, timeout))
             except Empty:
-                continue
+                # 期间有连接被丢弃时可以补建
+                conn = self._try_create()
+                if conn is None:
+                    continue
+            else:
+                conn = self._checkout(item)
+                if conn is None:
+                    conn = self._try_create()
+                    if conn is None:
+                        continue
+            with self._lock:
+                self._hits += 1
+                self._waits += 1
+                self._wait_time += time.time() - start_time
+            return conn
         
+        with self._lock:
+            self._timeouts += 1
+            self._wait_time += time.time() - start_time
         raise TimeoutError(f"获取数据库连接超时 ({timeout}s)")
     
     def return_connection(self, conn: Any) -> None:
@@ -200,25 +254,19 @@ class ConnectionPool:
             return
         
         try:
-            # 验证连接是否有效
-            if self._validate_connection(conn):
-                try:
-                    self._pool.put(conn, block=False)
-                    logger.debug("连接已归还到池")
-                except:
-                    # 池满，关闭连接
-                    conn.close()
-                    with self._lock:
-                        self._created_count -= 1
-            else:
-                # 连接无效，关闭
-                conn.close()
-                with self._lock:
-                    self._created_count -= 1
+            # 回滚未提交的事务；连接已断开时回滚会失败，直接丢弃
+            conn.rollback()
         except Exception as e:
-            logger.warning(f"归还连接时出错: {e}")
-            with self._lock:
-                self._created_count = max(0, self._created_count - 1)
+            logger.warning(f"归还连接时回滚失败，丢弃连接: {e}")
+            self._discard(conn)
+            return
+        
+        try:
+            self._pool.put((conn, time.time()), block=False)
+            logger.debug("连接已归还到池")
+        except Exception:
+            # 池满，关闭连接
+            self._discard(conn)
     
     @contextmanager
     def connection(self):
@@ -243,7 +291,7 @@ class ConnectionPool:
         logger.info("关闭连接池中的所有连接")
         while True:
             try:
-                conn = self._pool.get(block=False)
+                conn, _ = self._pool.get(block=False)
                 try:
                     conn.close()
                 except:
@@ -257,16 +305,43 @@ class ConnectionPool:
     @property
     def stats(self) -> Dict[str, Any]:
         """获取连接池统计信息"""
-        return {
-            "pool_size": self.pool_size,
-            "created_count": self._created_count,
-            "available_count": self._pool.qsize(),
-            "db_kind": self.db_kind
-        }
+        with self._lock:
+            checkouts = self._hits + self._misses
+            return {
+                "pool_size": self.pool_size,
+                "created_count": self._created_count,
+                "available_count": self._pool.qsize(),
+                "db_kind": self.db_kind,
+                "checkouts": checkouts,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / checkouts, 4) if checkouts else 0.0,
+                "waits": self._waits,
+                "wait_time_ms": round(self._wait_time * 1000, 2),
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "statement_cache_size": self.statement_cache_size if self.db_kind == "sqlite" else 0,
+            }
+
+
+def _pool_size_from_env() -> Optional[int]:
+    try:
+        size = int(os.getenv("DB_POOL_SIZE", "0"))
+    except ValueError:
+        size = 0
+    return size if size > 0 else None
+
+
+def _pool_key(db_config: Dict[str, Any]) -> Tuple[str, str]:
+    kind = db_config.get("kind", "sqlite")
+    if kind == "postgres":
+        return kind, str(db_config.get("url") or "")
+    return kind, os.path.abspath(str(db_config.get("path") or ""))
 
 
 # 全局连接池实例（懒加载）
 _global_pool: Optional[ConnectionPool] = None
+_pools: Dict[Tuple[str, str], ConnectionPool] = {}
 _pool_lock = threading.Lock()
 
 
@@ -288,6 +363,42 @@ def get_global_pool(db_config: Optional[Dict[str, Any]] = None) -> ConnectionPoo
                 if db_config is None:
                     from database.db_config import get_db_config_from_env_and_secrets
                     _, db_config = get_db_config_from_env_and_secrets()
-                _global_pool = ConnectionPool(db_config)
+                _global_pool = _pools.get(_pool_key(db_config))
+                if _global_pool is None:
+                    _global_pool = ConnectionPool(db_config, pool_size=_pool_size_from_env())
+                    _pools[_pool_key(db_config)] = _global_pool
     
     return _global_pool
+
+
+def get_pool_for_config(db_config: Dict[str, Any]) -> ConnectionPool:
+    """
+    按数据库配置获取连接池（同一个 SQLite 文件 / PostgreSQL URL 共用一个池）
+    
+    Args:
+        db_config: 数据库配置
+    
+    Returns:
+        ConnectionPool: 对应的连接池实例
+    """
+    key = _pool_key(db_config)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(db_config, pool_size=_pool_size_from_env())
+                _pools[key] = pool
+    return pool
+
+
+def get_all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有连接池的统计信息（PostgreSQL URL 不含密码）"""
+    with _pool_lock:
+        pools = list(_pools.items())
+    result = {}
+    for (kind, target), pool in pools:
+        if kind == "postgres" and "@" in target:
+            target = target.split("@", 1)[1]
+        result[f"{kind}:{target}"] = pool.stats
+    return result
@@ -23,6 +23,7 @@ import os
 import time
 import sys
 import logging
+import threading
 import traceback
 from typing import Dict, Any, Optional, Tuple, List
 from contextlib import contextmanager
@@ -48,22 +49,101 @@ from datetime import datetime
 # 使用 DATA_DIR 作为基准路径
 DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'quant_system.db')
 
-# 连接池支持（懒加载）
-_connection_pool = None
-_use_connection_pool = True  # 可通过环境变量禁用
+# 连接池开关（DB_CONNECTION_POOL=0 时每次调用直接新建连接）
+_use_connection_pool = os.getenv("DB_CONNECTION_POOL", "1").strip().lower() not in ("0", "false", "no", "off")
 
 
-def _get_pool():
-    """获取全局连接池实例（懒加载）"""
-    global _connection_pool
-    if _connection_pool is None and _use_connection_pool:
+class _PooledConnection:
+    """
+    池化连接代理
+    
+    行为与原始连接一致，close() 改为归还到连接池（重复调用无副作用）。
+    db_bridge 中沿用 `conn, db_kind = _get_connection()` + `finally: conn.close()` 的写法即可走池化路径。
+    """
+    
+    __slots__ = ('_conn', '_pool')
+    
+    def __init__(self, conn: Any, pool: Any):
+        self._conn = conn
+        self._pool = pool
+    
+    def __getattr__(self, name: str) -> Any:
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+    
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.return_connection(conn)
+    
+    def __del__(self):
+        # 调用方忘记 close 时兜底归还，避免池中连接泄漏
         try:
-            from database.connection_pool import get_global_pool
-            _connection_pool = get_global_pool()
-            logger.info("数据库连接池已启用")
-        except Exception as e:
-            logger.warning(f"连接池初始化失败，将使用直接连接: {e}")
-    return _connection_pool
+            self.close()
+        except Exception:
+            pass
+
+
+class _BatchConnection:
+    """
+    批量事务中的连接代理
+    
+    commit() / close() 为空操作，由 batched_writes 在批次结束时统一提交并归还连接。
+    """
+    
+    __slots__ = ('_conn',)
+    
+    def __init__(self, conn: Any):
+        self._conn = conn
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+    
+    def commit(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+
+
+# 当前线程正在进行的批量事务：(连接代理, db_kind, db_config)
+_batch_local = threading.local()
+
+
+@contextmanager
+def batched_writes(db_config: Optional[Dict[str, Any]] = None):
+    """
+    把当前线程内的多次 db_bridge 写操作合并为一个事务
+    
+    块内以相同 db_config 调用的 db_bridge 函数共用同一个连接，各自的 commit() 被推迟到块结束时统一提交；
+    块内抛出异常则整体回滚。供写后台线程（write_behind）批量落库使用。
+    
+    Usage:
+        with batched_writes():
+            set_signal_cache(...)
+            update_engine_status(...)
+    """
+    if getattr(_batch_local, 'active', None) is not None:
+        # 已在批量事务中，直接复用
+        yield
+        return
+    
+    conn, db_kind = _get_connection(db_config)
+    _batch_local.active = (_BatchConnection(conn), db_kind, db_config)
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        _batch_local.active = None
+        conn.close()
 
 
 @contextmanager
@@ -78,25 +158,17 @@ def get_pooled_connection(db_config: Optional[Dict[str, Any]] = None):
             cursor = conn.cursor()
             ...
     """
-    pool = _get_pool()
-    
-    if pool is not None:
-        # 使用连接池
-        conn = None
-        try:
-            conn = pool.get_connection()
-            db_kind = pool.db_kind
-            yield conn, db_kind
-        finally:
-            if conn is not None:
-                pool.return_connection(conn)
-    else:
-        # 回退到直接连接
-        conn, db_kind = _get_connection(db_config)
-        try:
-            yield conn, db_kind
-        finally:
-            conn.close()
+    conn, db_kind = _get_connection(db_config)
+    try:
+        yield conn, db_kind
+    finally:
+        conn.close()
+
+
+def get_db_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取连接池统计（命中 / 新建 / 等待次数、等待耗时），按数据库分组"""
+    from database.connection_pool import get_all_pool_stats
+    return get_all_pool_stats()
 
 
 def debug_db_identity(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -139,6 +211,9 @@ def debug_db_identity(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, A
 def _get_connection(db_config: Optional[Dict[str, Any]] = None) -> Tuple[Any, str]:
     """获取数据库连接，支持SQLite和PostgreSQL
     
+    默认从按配置划分的连接池中取连接，返回的连接调用 close() 即归还到池；
+    连接池被禁用或不可用时直接新建连接。
+    
     Args:
         db_config: 数据库配置，如果为None则自动从环境获取
     
@@ -152,11 +227,44 @@ def _get_connection(db_config: Optional[Dict[str, Any]] = None) -> Tuple[Any, st
         ValueError: PostgreSQL URL 未提供
         TypeError: SQLite 路径类型错误
     """
+    batch = getattr(_batch_local, 'active', None)
+    if batch is not None and batch[2] == db_config:
+        return batch[0], batch[1]
+    
     if db_config is None:
         db_kind, db_config = get_db_config_from_env_and_secrets()
     else:
         db_kind = db_config.get("kind", "sqlite")
     
+    if _use_connection_pool:
+        pool = _get_pool_for(db_kind, db_config)
+        if pool is not None:
+            return _PooledConnection(pool.get_connection(), pool), pool.db_kind
+    
+    return _connect_direct(db_kind, db_config)
+
+
+def _get_pool_for(db_kind: str, db_config: Dict[str, Any]):
+    """按配置获取连接池，配置无效或初始化失败时返回 None（回退到直接连接）"""
+    if db_kind == "postgres":
+        if not PSYCOPG2_AVAILABLE or not db_config.get("url"):
+            return None
+        pool_config = {"kind": "postgres", "url": db_config["url"]}
+    else:
+        path = db_config.get("path", DEFAULT_DB_PATH)
+        if not isinstance(path, (str, os.PathLike)):
+            return None
+        pool_config = {"kind": "sqlite", "path": os.fspath(path)}
+    try:
+        from database.connection_pool import get_pool_for_config
+        return get_pool_for_config(pool_config)
+    except Exception as e:
+        logger.warning(f"连接池初始化失败，将使用直接连接: {e}")
+        return None
+
+
+def _connect_direct(db_kind: str, db_config: Dict[str, Any]) -> Tuple[Any, str]:
+    """不经过连接池，直接新建数据库连接"""
     try:
         if db_kind == "postgres":
             if not PSYCOPG2_AVAILABLE:
@@ -199,11 +307,53 @@ def _get_connection(db_config: Optional[Dict[str, Any]] = None) -> Tuple[Any, st
         )
         raise
 
+# 单行配置表：写入时在同一事务内递增 config_versions 中的版本号
+CONFIG_VERSION_TABLES = ('bot_config', 'control_flags', 'engine_status')
+
+# 本进程内的配置写入回调（config_snapshot 注册，写入后立即失效本地快照）
+_config_change_listeners: List[Any] = []
+
+
+def add_config_change_listener(callback) -> None:
+    """注册本进程配置写入回调 callback(table_name, db_config)"""
+    if callback not in _config_change_listeners:
+        _config_change_listeners.append(callback)
+
+
+def _bump_config_version(cursor, db_kind: str, table_name: str) -> None:
+    """在当前事务内递增配置表版本号"""
+    if db_kind == "postgres":
+        cursor.execute('UPDATE config_versions SET version = version + 1 WHERE name = %s', (table_name,))
+    else:
+        cursor.execute('UPDATE config_versions SET version = version + 1 WHERE name = ?', (table_name,))
+
+
+def _notify_config_change(table_name: str, db_config: Optional[Dict[str, Any]]) -> None:
+    for callback in list(_config_change_listeners):
+        try:
+            callback(table_name, db_config)
+        except Exception as e:
+            logger.debug(f"配置变更回调失败: {e}")
+
+
+def get_config_versions(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """读取所有单行配置表的版本号 {table_name: version}"""
+    conn, db_kind = _get_connection(db_config)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, version FROM config_versions')
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
 def init_db(db_config: Optional[Dict[str, Any]] = None) -> None:
     """初始化数据库表结构"""
     conn, db_kind = _get_connection(db_config)
     try:
         if db_kind == "sqlite":
+            # 只对新建的库生效（建表前设置），已有库由 database.maintenance 提示一次性 VACUUM 转换
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL;')
             conn.execute('PRAGMA journal_mode=WAL;')
             conn.execute('PRAGMA synchronous=NORMAL;')
         
@@ -322,6 +472,24 @@ def init_db(db_config: Optional[Dict[str, Any]] = None) -> None:
             VALUES (1, 0, ?)
             ''', (current_ts,))
         
+        # 创建config_versions表（单行配置表的变更版本号，供 config_snapshot 廉价轮询）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS config_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER DEFAULT 0
+        )
+        ''')
+        for table_name in CONFIG_VERSION_TABLES:
+            if db_kind == "postgres":
+                cursor.execute('''
+                INSERT INTO config_versions (name, version) VALUES (%s, 0)
+                ON CONFLICT (name) DO NOTHING
+                ''', (table_name,))
+            else:
+                cursor.execute('''
+                INSERT OR IGNORE INTO config_versions (name, version) VALUES (?, 0)
+                ''', (table_name,))
+        
         # 创建performance_metrics表
         if db_kind == "postgres":
             cursor.execute('''
@@ -850,14 +1018,17 @@ def get_bootstrap_state(db_config: Optional[Dict[str, Any]] = None) -> Dict[str,
     # try sentiment table if exists
     try:
         conn, db_kind = _get_connection(db_config)
-        cursor = conn.cursor()
-        if db_kind == 'postgres':
-            cursor.execute("SELECT value, classification, ts FROM sentiment ORDER BY ts DESC LIMIT 1")
-        else:
-            cursor.execute("SELECT value, classification, ts FROM sentiment ORDER BY ts DESC LIMIT 1")
-        row = cursor.fetchone()
-        if row:
-            boot['last_sentiment'] = {'value': row[0], 'classification': row[1], 'ts': row[2]}
+        try:
+            cursor = conn.cursor()
+            if db_kind == 'postgres':
+                cursor.execute("SELECT value, classification, ts FROM sentiment ORDER BY ts DESC LIMIT 1")
+            else:
+                cursor.execute("SELECT value, classification, ts FROM sentiment ORDER BY ts DESC LIMIT 1")
+            row = cursor.fetchone()
+            if row:
+                boot['last_sentiment'] = {'value': row[0], 'classification': row[1], 'ts': row[2]}
+        finally:
+            conn.close()
     except Exception:
         pass
 
@@ -1114,10 +1285,11 @@ def update_bot_config(db_config: Optional[Dict[str, Any]] = None, **fields) -> N
         if not isinstance(v, (str, int, float, bool, type(None))):
             raise TypeError(f"字段 {k} 的值必须是基本类型，获取到: {type(v).__name__}")
     
+    # 先读取当前version（避免持有连接时再从池中取第二个连接）
+    current = get_bot_config(db_config)
+    
     conn, db_kind = _get_connection(db_config)
     try:
-        # 获取当前version
-        current = get_bot_config(db_config)
         new_version = current.get('version', 1) + 1
         
         filtered_fields['updated_at'] = int(time.time())
@@ -1142,9 +1314,11 @@ def update_bot_config(db_config: Optional[Dict[str, Any]] = None, **fields) -> N
             
             cursor.execute(f'''UPDATE bot_config SET {placeholders} WHERE id = ?''', values)
         
+        _bump_config_version(cursor, db_kind, 'bot_config')
         conn.commit()
     finally:
         conn.close()
+    _notify_config_change('bot_config', db_config)
 
 def get_control_flags(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """获取控制标志"""
@@ -1184,9 +1358,11 @@ def set_control_flags(db_config: Optional[Dict[str, Any]] = None, **flags) -> No
             
             cursor.execute(f'''UPDATE control_flags SET {placeholders} WHERE id = ?''', values)
         
+        _bump_config_version(cursor, db_kind, 'control_flags')
         conn.commit()
     finally:
         conn.close()
+    _notify_config_change('control_flags', db_config)
 
 def get_engine_status(db_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """获取引擎状态"""
@@ -1226,9 +1402,11 @@ def update_engine_status(db_config: Optional[Dict[str, Any]] = None, **status) -
             
             cursor.execute(f'''UPDATE engine_status SET {placeholders} WHERE id = ?''', values)
         
+        _bump_config_version(cursor, db_kind, 'engine_status')
         conn.commit()
     finally:
         conn.close()
+    _notify_config_change('engine_status', db_config)
 
 
 def update_ws_status(
@@ -1351,13 +1529,13 @@ def update_paper_balance(
     - equity: 动态权益（如果提供则直接使用，否则计算）
     - available: 可用保证金（如果提供则直接使用，否则计算）
     """
+    # 获取当前余额（避免持有连接时再从池中取第二个连接）
+    balance = get_paper_balance(db_config)
+    
     conn, db_kind = _get_connection(db_config)
     try:
         cursor = conn.cursor()
         
-        # 获取当前余额
-        balance = get_paper_balance(db_config)
-        
         # 更新字段
         if wallet_balance is not None:
             balance['wallet_balance'] = wallet_balance
@@ -1478,13 +1656,13 @@ def update_paper_position(symbol: str, pos_side: str, qty: Optional[float] = Non
         created_at:  入场时间戳（毫秒精度），仅在新建仓位时设置
         db_config: 数据库配置
     """
+    # 获取当前持仓（避免持有连接时再从池中取第二个连接）
+    current_pos = get_paper_position(symbol, pos_side, db_config)
+    
     conn, db_kind = _get_connection(db_config)
     try:
         cursor = conn.cursor()
         
-        # 获取当前持仓
-        current_pos = get_paper_position(symbol, pos_side, db_config)
-        
         # 准备更新数据
         if current_pos:
             # 更新现有记录（不更新 created_at，保持入场时间不变）
@@ -1718,48 +1896,81 @@ def insert_performance_metrics(metrics: Dict[str, Any], db_config: Optional[Dict
         conn.close()
 
 
-def upsert_ohlcv(symbol: str, timeframe: str, ohlcv_data: list, db_config: Optional[Dict[str, Any]] = None) -> None:
+# SQLite 多行 VALUES 每批行数（8 列 × 100 行 = 800 个参数，低于旧版 SQLite 的 999 上限）
+_OHLCV_SQLITE_BATCH_ROWS = 100
+
+
+def upsert_ohlcv(symbol: str, timeframe: str, ohlcv_data: list, db_config: Optional[Dict[str, Any]] = None) -> int:
     """插入或更新OHLCV数据到ohlcv_cache表
     
+    只写入时间戳不早于已持久化最后一根K线的数据（最后一根可能是未收盘K线，需要覆盖），
+    每次扫描通常只写 1~2 行，而不是整段重写。
+    
+    - PostgreSQL: psycopg2.extras.execute_values 单条多行 INSERT ... ON CONFLICT
+    - SQLite: 单事务内多行 VALUES 的 INSERT ... ON CONFLICT DO UPDATE
+    
     Args:
         symbol: 交易对符号
         timeframe: 时间周期
         ohlcv_data: OHLCV数据列表，每个元素为 (ts, open, high, low, close, volume)
         db_config: 数据库配置
+    
+    Returns:
+        int: 实际写入的行数
     """
     if not ohlcv_data:
-        return
+        return 0
     
     conn, db_kind = _get_connection(db_config)
     try:
         cursor = conn.cursor()
         
+        # 已持久化的最后一根K线（主键索引，O(log n)）
         if db_kind == "postgres":
-            # PostgreSQL upsert
-            sql = '''
+            cursor.execute("SELECT MAX(ts) FROM ohlcv_cache WHERE symbol = %s AND timeframe = %s", (symbol, timeframe))
+        else:
+            cursor.execute("SELECT MAX(ts) FROM ohlcv_cache WHERE symbol = ? AND timeframe = ?", (symbol, timeframe))
+        row = cursor.fetchone()
+        last_ts = row[0] if row and row[0] is not None else None
+        
+        # 同一 ts 只保留最后一条：PostgreSQL 单条 INSERT ... ON CONFLICT 内主键重复会报 CardinalityViolation
+        deduped = {}
+        for ts, open, high, low, close, volume in ohlcv_data:
+            if last_ts is None or ts >= last_ts:
+                deduped[int(ts)] = (symbol, timeframe, int(ts), open, high, low, close, volume)
+        values = list(deduped.values())
+        if not values:
+            return 0
+        
+        if db_kind == "postgres":
+            from psycopg2.extras import execute_values
+            execute_values(cursor, '''
             INSERT INTO ohlcv_cache (symbol, timeframe, ts, open, high, low, close, volume)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES %s
             ON CONFLICT (symbol, timeframe, ts) DO UPDATE SET
                 open = EXCLUDED.open,
                 high = EXCLUDED.high,
                 low = EXCLUDED.low,
                 close = EXCLUDED.close,
                 volume = EXCLUDED.volume
-            '''
-            values = [(symbol, timeframe, ts, open, high, low, close, volume) 
-                     for ts, open, high, low, close, volume in ohlcv_data]
-            cursor.executemany(sql, values)
+            ''', values, page_size=len(values))
         else:
-            # SQLite upsert
-            sql = '''
-            INSERT OR REPLACE INTO ohlcv_cache (symbol, timeframe, ts, open, high, low, close, volume)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            '''
-            values = [(symbol, timeframe, ts, open, high, low, close, volume) 
-                     for ts, open, high, low, close, volume in ohlcv_data]
-            cursor.executemany(sql, values)
+            for start in range(0, len(values), _OHLCV_SQLITE_BATCH_ROWS):
+                batch = values[start:start + _OHLCV_SQLITE_BATCH_ROWS]
+                placeholders = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * len(batch))
+                cursor.execute(f'''
+                INSERT INTO ohlcv_cache (symbol, timeframe, ts, open, high, low, close, volume)
+                VALUES {placeholders}
+                ON CONFLICT (symbol, timeframe, ts) DO UPDATE SET
+                    open = excluded.open,
+                    high = excluded.high,
+                    low = excluded.low,
+                    close = excluded.close,
+                    volume = excluded.volume
+                ''', [v for row in batch for v in row])
         
         conn.commit()
+        return len(values)
     finally:
         conn.close()
 
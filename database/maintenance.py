@@ -0,0 +1,629 @@
+# -*- coding: utf-8 -*-
+"""
+数据库后台维护：保留策略、降采样、归档与增量 VACUUM
+
+ohlcv_cache、signal_events、performance_metrics、ai_decisions、sentiment_history 等表
+只增不减，查询延迟随之上升。本模块按表配置保留策略，在交易扫描周期的空闲时间里分块执行：
+
+- delete: 删除超过保留期的行（按自增 id 顺序分块，只扫描最旧的一段）
+- archive: 先把旧行写入 gzip 压缩的 JSONL 文件（DATA_DIR/archive/<表名>/），再删除
+- downsample: 把旧的 1m K线聚合为 1h（已存在的 1h K线保留交易所原始数据），再删除 1m
+- expire_series: 按 (symbol, timeframe) 沿主键删除超过保留期的K线
+- 增量 VACUUM: auto_vacuum=INCREMENTAL 的 SQLite 库逐步归还空闲页
+
+每轮维护记录各表删除 / 归档 / 降采样行数、回收的空间，以及维护前后的查询耗时。
+
+用法:
+    maintenance = get_maintenance()
+    maintenance.offer_idle(next_scan_at - 1.0)   # 主循环空闲时调用，不阻塞
+    maintenance.run_pass()                       # 命令行 / 测试：同步跑完一轮
+
+环境变量：
+- DB_MAINTENANCE: 是否启用后台维护（默认 0；会删除 / 降采样历史数据，需显式开启）
+- DB_MAINTENANCE_INTERVAL_SEC: 两轮维护的最小间隔（默认 3600）
+- DB_MAINTENANCE_MIN_IDLE_SEC: 空闲窗口至少多长才开始工作（默认 0.5）
+- RETENTION_<策略名>_DAYS: 覆盖单个策略的保留天数，如 RETENTION_SIGNAL_EVENTS_DAYS=14
+"""
+import os
+import gzip
+import json
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+HOUR_MS = 60 * 60 * 1000
+
+# 每块处理的行数（单块耗时控制在几十毫秒内，空闲窗口很短时也能推进）
+_CHUNK_ROWS = 2000
+# 增量 VACUUM 每次归还的页数
+_VACUUM_PAGES = 256
+
+
+@dataclass
+class RetentionPolicy:
+    """单表保留策略"""
+    name: str              # 策略名（环境变量 RETENTION_<NAME>_DAYS 可覆盖 keep_days）
+    database: str          # 'quant' | 'arena'
+    table: str
+    ts_column: str
+    keep_days: float
+    action: str = 'delete'  # delete | archive | downsample | expire_series
+    ts_unit: str = 'ms'     # ms | s
+    timeframe: str = ''     # downsample 的源周期
+    keep_where: str = ''    # 额外条件：满足该条件的过期行仍保留
+
+    def expired_clause(self) -> str:
+        clause = f"{self.ts_column} < ?"
+        return f"{clause} AND NOT ({self.keep_where})" if self.keep_where else clause
+
+    def cutoff(self, now: Optional[float] = None) -> int:
+        """早于该时间戳（与 ts_column 同单位）的行过期"""
+        days = _env_float(f"RETENTION_{self.name.upper()}_DAYS", self.keep_days)
+        cutoff_ms = int((now if now is not None else time.time()) * 1000 - days * DAY_MS)
+        return cutoff_ms // 1000 if self.ts_unit == 's' else cutoff_ms
+
+
+DEFAULT_POLICIES: List[RetentionPolicy] = [
+    RetentionPolicy('ohlcv_1m', 'quant', 'ohlcv_cache', 'ts', 7, action='downsample', timeframe='1m'),
+    RetentionPolicy('ohlcv_cache', 'quant', 'ohlcv_cache', 'ts', 365, action='expire_series'),
+    RetentionPolicy('signal_events', 'quant', 'signal_events', 'ts', 30),
+    RetentionPolicy('performance_metrics', 'quant', 'performance_metrics', 'ts', 7, ts_unit='s'),
+    # 仍被未平仓仓位引用的决策不归档
+    RetentionPolicy('ai_decisions', 'arena', 'ai_decisions', 'timestamp', 30, action='archive',
+                    keep_where="id IN (SELECT decision_id FROM ai_positions "
+                               "WHERE status = 'open' AND decision_id IS NOT NULL)"),
+    RetentionPolicy('sentiment_history', 'arena', 'sentiment_history', 'timestamp', 7, ts_unit='s'),
+]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class _Target:
+    """一个数据库（quant_system.db 经 db_bridge 连接，arena.db 直连）"""
+
+    def __init__(self, name: str, connect: Callable[[], Tuple[Any, str]], path: Optional[str]):
+        self.name = name
+        self._connect = connect
+        self.path = path  # SQLite 文件路径（postgres 为 None）
+
+    def connect(self) -> Tuple[Any, str]:
+        return self._connect()
+
+    def exists(self) -> bool:
+        return self.path is None or os.path.exists(self.path)
+
+
+def _quant_target(db_config: Optional[Dict[str, Any]] = None) -> _Target:
+    from database.db_bridge import _get_connection
+    from database.db_config import get_db_config_from_env_and_secrets
+    if db_config is None:
+        kind, config = get_db_config_from_env_and_secrets()
+    else:
+        kind, config = db_config.get('kind', 'sqlite'), db_config
+    path = config.get('path') if kind == 'sqlite' else None
+    return _Target('quant', lambda: _get_connection(db_config), path)
+
+
+def _arena_target(db_path: Optional[str] = None) -> _Target:
+    if db_path is None:
+        from ai.ai_db_manager import ARENA_DB_PATH
+        db_path = ARENA_DB_PATH
+    return _Target('arena', lambda: (sqlite3.connect(db_path, timeout=10), 'sqlite'), db_path)
+
+
+def _sql(db_kind: str, sql: str) -> str:
+    return sql.replace('?', '%s') if db_kind == 'postgres' else sql
+
+
+def _table_exists(conn, db_kind: str, table: str) -> bool:
+    cursor = conn.cursor()
+    if db_kind == 'postgres':
+        cursor.execute("SELECT to_regclass(%s)", (table,))
+        return cursor.fetchone()[0] is not None
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+@dataclass
+class _TableReport:
+    rows_before: int = 0
+    rows_after: int = 0
+    deleted: int = 0
+    archived: int = 0
+    downsampled: int = 0
+    query_ms_before: float = 0.0
+    query_ms_after: float = 0.0
+
+
+@dataclass
+class MaintenanceReport:
+    """一轮维护的结果"""
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    tables: Dict[str, _TableReport] = field(default_factory=dict)
+    reclaimed_bytes: Dict[str, int] = field(default_factory=dict)
+    file_bytes_before: Dict[str, int] = field(default_factory=dict)
+    file_bytes_after: Dict[str, int] = field(default_factory=dict)
+    archive_files: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'tables': {name: vars(report) for name, report in self.tables.items()},
+            'reclaimed_bytes': dict(self.reclaimed_bytes),
+            'file_bytes_before': dict(self.file_bytes_before),
+            'file_bytes_after': dict(self.file_bytes_after),
+            'archive_files': list(self.archive_files),
+        }
+
+    def summary(self) -> str:
+        parts = []
+        for name, t in self.tables.items():
+            changed = t.deleted + t.archived + t.downsampled
+            if changed:
+                parts.append(
+                    f"{name}: -{changed} 行 ({t.rows_before}→{t.rows_after}) "
+                    f"查询 {t.query_ms_before:.1f}→{t.query_ms_after:.1f}ms"
+                )
+        for db_name, reclaimed in self.reclaimed_bytes.items():
+            if reclaimed:
+                parts.append(f"{db_name} 回收 {reclaimed / 1024 / 1024:.1f}MB")
+        return " | ".join(parts) if parts else "无过期数据"
+
+
+class DatabaseMaintenance:
+    """
+    数据库维护调度器
+
+    一轮维护被拆成若干可中断的步骤（统计 → 各表策略 → 增量 VACUUM → 统计），
+    后台线程只在 offer_idle() 给出的空闲窗口内推进，窗口结束时停在块边界，下次继续。
+    """
+
+    def __init__(self, policies: Optional[List[RetentionPolicy]] = None,
+                 targets: Optional[Dict[str, _Target]] = None,
+                 interval: float = 3600.0, min_idle: float = 0.5,
+                 archive_dir: Optional[str] = None):
+        self.policies = list(DEFAULT_POLICIES if policies is None else policies)
+        self._targets = targets
+        self.interval = interval
+        self.min_idle = min_idle
+        if archive_dir is None:
+            from database.db_config import DATA_DIR
+            archive_dir = os.path.join(DATA_DIR, "archive")
+        self.archive_dir = archive_dir
+
+        self.last_report: Optional[MaintenanceReport] = None
+        self._report: Optional[MaintenanceReport] = None
+        self._steps: List[Callable[[float], bool]] = []
+        self._last_pass_end = 0.0
+        self._full_vacuum_hinted = set()
+        self._measured = set()
+
+        self._cond = threading.Condition()
+        self._idle_until = 0.0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def targets(self) -> Dict[str, _Target]:
+        if self._targets is None:
+            self._targets = {'quant': _quant_target(), 'arena': _arena_target()}
+        return self._targets
+
+    def log_policies(self) -> None:
+        """启动时列出生效的保留策略（这些策略会删除 / 归档 / 降采样历史数据）"""
+        for policy in self.policies:
+            days = _env_float(f"RETENTION_{policy.name.upper()}_DAYS", policy.keep_days)
+            logger.warning(
+                f"[maintenance] 数据库维护已启用: {policy.database}.{policy.table} "
+                f"{policy.action} 超过 {days:g} 天的数据"
+                + (f" (周期 {policy.timeframe})" if policy.timeframe else "")
+            )
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+
+    def offer_idle(self, until: float) -> None:
+        """告知后台线程可以工作到 until（time.time()），不阻塞调用方"""
+        if until - time.time() < self.min_idle:
+            return
+        with self._cond:
+            if until <= self._idle_until:
+                return
+            self._idle_until = until
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止后台线程（当前块执行完后退出）"""
+        with self._cond:
+            self._stopping = True
+            self._idle_until = 0.0
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._stopping = False
+
+    def run_pass(self, deadline: Optional[float] = None, full_vacuum: bool = False) -> Optional[MaintenanceReport]:
+        """
+        同步推进维护直到完成一轮或到达 deadline
+
+        Args:
+            deadline: 截止时间（time.time()），None 表示跑完整轮
+            full_vacuum: 对未开启增量 VACUUM 的 SQLite 库执行一次完整 VACUUM 并开启
+
+        Returns:
+            完成一轮时返回报告，否则返回 None
+        """
+        if not self._steps:
+            self._start_pass(full_vacuum)
+        while self._steps:
+            if deadline is not None and time.time() >= deadline:
+                return None
+            step = self._steps[0]
+            try:
+                done = step(deadline if deadline is not None else float('inf'))
+            except Exception as e:
+                logger.warning(f"[maintenance] 维护步骤失败，跳过: {e}")
+                done = True
+            if done:
+                self._steps.pop(0)
+        return self.last_report
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and self._idle_until - time.time() < self.min_idle:
+                    self._cond.wait(timeout=max(self._idle_until - time.time(), 1.0))
+                if self._stopping:
+                    return
+                deadline = self._idle_until
+            if not self._steps and time.time() - self._last_pass_end < self.interval:
+                # 本轮已完成且未到下一轮，等到本窗口结束
+                with self._cond:
+                    self._cond.wait(timeout=max(deadline - time.time(), 0.0))
+                continue
+            self.run_pass(deadline)
+
+    # ------------------------------------------------------------------
+    # 一轮维护
+    # ------------------------------------------------------------------
+
+    def _start_pass(self, full_vacuum: bool):
+        self._report = MaintenanceReport(started_at=time.time())
+        self._measured = set()
+        self._steps = [lambda deadline: self._measure(deadline, before=True)]
+        for policy in self.policies:
+            self._steps.append(self._policy_step(policy))
+        for target_name in self._active_targets():
+            self._steps.append(self._vacuum_step(target_name, full_vacuum))
+        self._steps.append(lambda deadline: self._measure(deadline, before=False))
+        self._steps.append(lambda deadline: self._finish_pass())
+
+    def _active_targets(self) -> List[str]:
+        names = {p.database for p in self.policies}
+        return [name for name in self.targets if name in names and self.targets[name].exists()]
+
+    def _finish_pass(self) -> bool:
+        report = self._report
+        report.finished_at = time.time()
+        self.last_report = report
+        self._last_pass_end = report.finished_at
+        logger.info(f"[maintenance] 维护完成 ({report.finished_at - report.started_at:.1f}s): {report.summary()}")
+        return True
+
+    def _measure(self, deadline: float, before: bool) -> bool:
+        """
+        记录各表行数、全表计数查询耗时和库文件大小
+
+        逐表检查 deadline：窗口用完时返回 False，下个窗口从未统计的表继续
+        """
+        report = self._report
+        for policy in self.policies:
+            key = (before, policy.database, policy.table)
+            if key in self._measured:
+                continue
+            if time.time() >= deadline:
+                return False
+            self._measured.add(key)
+            target = self.targets.get(policy.database)
+            if target is None or not target.exists():
+                continue
+            table_report = report.tables.setdefault(policy.table, _TableReport())
+            conn, db_kind = target.connect()
+            try:
+                if not _table_exists(conn, db_kind, policy.table):
+                    continue
+                cursor = conn.cursor()
+                start = time.perf_counter()
+                cursor.execute(f"SELECT COUNT(*) FROM {policy.table}")
+                rows = cursor.fetchone()[0]
+                cost = (time.perf_counter() - start) * 1000
+            finally:
+                conn.close()
+            if before:
+                table_report.rows_before, table_report.query_ms_before = rows, cost
+            else:
+                table_report.rows_after, table_report.query_ms_after = rows, cost
+
+        sizes = report.file_bytes_before if before else report.file_bytes_after
+        for name in self._active_targets():
+            path = self.targets[name].path
+            if path:
+                sizes[name] = os.path.getsize(path)
+        return True
+
+    def _policy_step(self, policy: RetentionPolicy) -> Callable[[float], bool]:
+        handlers = {
+            'delete': self._delete_expired,
+            'archive': self._archive_expired,
+            'downsample': self._downsample,
+            'expire_series': self._expire_series,
+        }
+        handler = handlers[policy.action]
+
+        def step(deadline: float) -> bool:
+            target = self.targets.get(policy.database)
+            if target is None or not target.exists():
+                return True
+            conn, db_kind = target.connect()
+            try:
+                if not _table_exists(conn, db_kind, policy.table):
+                    return True
+                return handler(conn, db_kind, policy, deadline)
+            finally:
+                conn.close()
+        return step
+
+    # ------------------------------------------------------------------
+    # 策略实现
+    # ------------------------------------------------------------------
+
+    def _delete_expired(self, conn, db_kind: str, policy: RetentionPolicy, deadline: float) -> bool:
+        """按 id 顺序分块删除（只增表的 id 与时间同序，每块只扫描最旧的一段）"""
+        cutoff = policy.cutoff()
+        table_report = self._report.tables.setdefault(policy.table, _TableReport())
+        cursor = conn.cursor()
+        while time.time() < deadline:
+            cursor.execute(_sql(db_kind, f"""
+                DELETE FROM {policy.table} WHERE id IN (
+                    SELECT id FROM {policy.table} WHERE {policy.expired_clause()} ORDER BY id LIMIT ?
+                )
+            """), (cutoff, _CHUNK_ROWS))
+            deleted = cursor.rowcount
+            conn.commit()
+            table_report.deleted += max(deleted, 0)
+            if deleted < _CHUNK_ROWS:
+                return True
+        return False
+
+    def _archive_expired(self, conn, db_kind: str, policy: RetentionPolicy, deadline: float) -> bool:
+        """先写入 gzip JSONL 归档文件（fsync 后）再删除同一批行"""
+        cutoff = policy.cutoff()
+        table_report = self._report.tables.setdefault(policy.table, _TableReport())
+        cursor = conn.cursor()
+        while time.time() < deadline:
+            cursor.execute(_sql(db_kind, f"""
+                SELECT * FROM {policy.table} WHERE {policy.expired_clause()} ORDER BY id LIMIT ?
+            """), (cutoff, _CHUNK_ROWS))
+            rows = cursor.fetchall()
+            if not rows:
+                return True
+            columns = [d[0] for d in cursor.description]
+            records = [dict(zip(columns, row)) for row in rows]
+            path = self._write_archive(policy.table, records)
+            ids = [r['id'] for r in records]
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(_sql(db_kind, f"DELETE FROM {policy.table} WHERE id IN ({placeholders})"), ids)
+            conn.commit()
+            table_report.archived += len(ids)
+            self._report.archive_files.append(path)
+            if len(rows) < _CHUNK_ROWS:
+                return True
+        return False
+
+    def _write_archive(self, table: str, records: List[Dict[str, Any]]) -> str:
+        directory = os.path.join(self.archive_dir, table)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(directory, f"{stamp}_{records[0]['id']}-{records[-1]['id']}.jsonl.gz")
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str))
+                f.write('\n')
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return path
+
+    def _series(self, conn, db_kind: str, table: str, timeframe: str = '') -> List[Tuple[str, str]]:
+        cursor = conn.cursor()
+        if timeframe:
+            cursor.execute(_sql(db_kind, f"SELECT DISTINCT symbol, timeframe FROM {table} WHERE timeframe = ?"), (timeframe,))
+        else:
+            cursor.execute(f"SELECT DISTINCT symbol, timeframe FROM {table}")
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def _downsample(self, conn, db_kind: str, policy: RetentionPolicy, deadline: float) -> bool:
+        """
+        把过期的 1m K线按小时聚合写入 1h，然后删除这些 1m K线
+
+        截止时间对齐到整点，只聚合完整的小时；每块处理一个 symbol 的 24 小时（沿主键读取）。
+        """
+        cutoff = policy.cutoff() // HOUR_MS * HOUR_MS
+        table_report = self._report.tables.setdefault(policy.table, _TableReport())
+        cursor = conn.cursor()
+        conflict = "ON CONFLICT (symbol, timeframe, ts) DO NOTHING"
+
+        for symbol, timeframe in self._series(conn, db_kind, policy.table, policy.timeframe):
+            while True:
+                if time.time() >= deadline:
+                    return False
+                cursor.execute(_sql(db_kind, f"""
+                    SELECT MIN(ts) FROM {policy.table} WHERE symbol = ? AND timeframe = ? AND ts < ?
+                """), (symbol, timeframe, cutoff))
+                first = cursor.fetchone()[0]
+                if first is None:
+                    break
+                window_start = int(first) // HOUR_MS * HOUR_MS
+                window_end = min(window_start + 24 * HOUR_MS, cutoff)
+
+                cursor.execute(_sql(db_kind, f"""
+                    SELECT ts, open, high, low, close, volume FROM {policy.table}
+                    WHERE symbol = ? AND timeframe = ? AND ts >= ? AND ts < ?
+                    ORDER BY ts
+                """), (symbol, timeframe, window_start, window_end))
+                bars = cursor.fetchall()
+
+                hourly = []
+                for hour, group in groupby(bars, key=lambda bar: int(bar[0]) // HOUR_MS * HOUR_MS):
+                    group = list(group)
+                    hourly.append((
+                        symbol, '1h', hour,
+                        group[0][1], max(b[2] for b in group), min(b[3] for b in group),
+                        group[-1][4], sum(b[5] or 0 for b in group),
+                    ))
+                if hourly:
+                    # 已存在的 1h K线（交易所原始数据）优先
+                    cursor.executemany(_sql(db_kind, f"""
+                        INSERT INTO {policy.table} (symbol, timeframe, ts, open, high, low, close, volume)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?) {conflict}
+                    """), hourly)
+                cursor.execute(_sql(db_kind, f"""
+                    DELETE FROM {policy.table} WHERE symbol = ? AND timeframe = ? AND ts >= ? AND ts < ?
+                """), (symbol, timeframe, window_start, window_end))
+                conn.commit()
+                table_report.downsampled += len(bars)
+        return True
+
+    def _expire_series(self, conn, db_kind: str, policy: RetentionPolicy, deadline: float) -> bool:
+        """按 (symbol, timeframe) 沿主键删除过期K线"""
+        cutoff = policy.cutoff()
+        table_report = self._report.tables.setdefault(policy.table, _TableReport())
+        cursor = conn.cursor()
+        for symbol, timeframe in self._series(conn, db_kind, policy.table):
+            if time.time() >= deadline:
+                return False
+            cursor.execute(_sql(db_kind, f"""
+                DELETE FROM {policy.table} WHERE symbol = ? AND timeframe = ? AND ts < ?
+            """), (symbol, timeframe, cutoff))
+            table_report.deleted += max(cursor.rowcount, 0)
+            conn.commit()
+        return True
+
+    # ------------------------------------------------------------------
+    # 空间回收
+    # ------------------------------------------------------------------
+
+    def _vacuum_step(self, target_name: str, full_vacuum: bool) -> Callable[[float], bool]:
+        def step(deadline: float) -> bool:
+            target = self.targets[target_name]
+            conn, db_kind = target.connect()
+            try:
+                if db_kind != 'sqlite':
+                    return True  # PostgreSQL 由 autovacuum 负责
+                return self._incremental_vacuum(target_name, conn, deadline, full_vacuum)
+            finally:
+                conn.close()
+        return step
+
+    def _incremental_vacuum(self, target_name: str, conn, deadline: float, full_vacuum: bool) -> bool:
+        cursor = conn.cursor()
+
+        def pragma(sql: str):
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+        page_size = pragma("PRAGMA page_size")
+        freelist = pragma("PRAGMA freelist_count")
+        if freelist == 0:
+            return True
+
+        if pragma("PRAGMA auto_vacuum") != 2:  # 2 = INCREMENTAL
+            if not full_vacuum:
+                if target_name not in self._full_vacuum_hinted:
+                    self._full_vacuum_hinted.add(target_name)
+                    logger.info(
+                        f"[maintenance] {target_name} 未开启增量 VACUUM（{freelist} 个空闲页），"
+                        f"请在停机时运行 python scripts/db_maintenance.py --full-vacuum"
+                    )
+                return True
+            # 一次性转换：设置 auto_vacuum 后必须完整 VACUUM 才生效
+            conn.commit()
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cursor.execute("VACUUM")
+            self._add_reclaimed(target_name, freelist * page_size)
+            return True
+
+        while time.time() < deadline:
+            cursor.execute(f"PRAGMA incremental_vacuum({_VACUUM_PAGES})")
+            cursor.fetchall()
+            conn.commit()
+            remaining = pragma("PRAGMA freelist_count")
+            self._add_reclaimed(target_name, (freelist - remaining) * page_size)
+            freelist = remaining
+            if remaining == 0:
+                if pragma("PRAGMA journal_mode") == 'wal':
+                    pragma("PRAGMA wal_checkpoint(TRUNCATE)")
+                return True
+        return False
+
+    def _add_reclaimed(self, target_name: str, nbytes: int):
+        reclaimed = self._report.reclaimed_bytes
+        reclaimed[target_name] = reclaimed.get(target_name, 0) + max(nbytes, 0)
+
+
+_maintenance: Optional[DatabaseMaintenance] = None
+_maintenance_lock = threading.Lock()
+
+
+class _DisabledMaintenance:
+    """DB_MAINTENANCE=0 时的空实现"""
+    last_report = None
+
+    def offer_idle(self, until: float) -> None:
+        pass
+
+    def stop(self, timeout: float = 5.0) -> None:
+        pass
+
+
+def get_maintenance():
+    """获取全局维护调度器（懒加载）"""
+    global _maintenance
+    if _maintenance is None:
+        with _maintenance_lock:
+            if _maintenance is None:
+                if os.getenv("DB_MAINTENANCE", "0").strip().lower() not in ("1", "true", "yes", "on"):
+                    _maintenance = _DisabledMaintenance()
+                else:
+                    _maintenance = DatabaseMaintenance(
+                        interval=_env_float("DB_MAINTENANCE_INTERVAL_SEC", 3600),
+                        min_idle=_env_float("DB_MAINTENANCE_MIN_IDLE_SEC", 0.5),
+                    )
+                    _maintenance.log_policies()
+    return _maintenance
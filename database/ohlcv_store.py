@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+本地列式 K 线历史存储
+
+回测每次都从 OKX 分页重新下载历史（每页 300 根 + 0.1s 限流），而 ohlcv_cache 表
+只保存实盘循环顺手写入的数据。本模块提供按 symbol / timeframe 划分的本地 K 线库：
+
+- 存储格式：float64 [n, 6]（ts_ms, open, high, low, close, volume）的 .npy 文件，
+  按月分区：<root>/<SYMBOL>/<timeframe>/<YYYY-MM>.npy
+- 读取：np.load(mmap_mode='r') 内存映射；范围落在单个月份内时直接返回只读视图（零拷贝），
+  跨月时拼接一次
+- 覆盖区间：<root>/<SYMBOL>/<timeframe>/coverage.json 记录已经向交易所确认过的时间段
+  （包括交易所本身没有数据的时段），重复回测同一区间不再产生网络请求
+- 增量补缺：ensure() 只下载未覆盖的缺口；只保存已收盘 K 线，未收盘 K 线不落盘
+
+环境变量：
+- OHLCV_STORE_DIR: 存储目录（默认 DATA_DIR/ohlcv_store）
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+TIMEFRAME_MS = {
+    '1m': 60 * 1000,
+    '3m': 3 * 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '30m': 30 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '2h': 2 * 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '6h': 6 * 60 * 60 * 1000,
+    '12h': 12 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+    '1w': 7 * 24 * 60 * 60 * 1000,
+}
+
+# download(symbol, timeframe, start_ms, end_ms) -> (candles, complete)
+# complete=False 表示中途失败，只有已返回的部分会被标记为已覆盖
+Downloader = Callable[[str, str, int, int], Tuple[List[List[float]], bool]]
+
+_EMPTY = np.empty((0, len(OHLCV_COLUMNS)), dtype=np.float64)
+_EMPTY.setflags(write=False)
+
+# Windows 上目标文件被其他读者内存映射时 os.replace 抛 PermissionError，退避重试等映射释放
+_REPLACE_RETRIES = 8
+_REPLACE_RETRY_DELAY = 0.05
+
+
+def _replace_file(tmp: str, path: str) -> None:
+    """os.replace(tmp, path)，目标被占用时指数退避重试；最终失败时删除临时文件并抛出"""
+    delay = _REPLACE_RETRY_DELAY
+    for attempt in range(_REPLACE_RETRIES):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if attempt == _REPLACE_RETRIES - 1:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+
+def _month_key(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m')
+
+
+def _month_range(start_ms: int, end_ms: int) -> List[str]:
+    """[start_ms, end_ms] 涉及的所有月份"""
+    months = []
+    start = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc)
+    end = datetime.fromtimestamp(end_ms / 1000, tz=timezone.utc)
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _merge_intervals(intervals: List[List[int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def last_closed_bar_ts(timeframe: str) -> int:
+    """最后一根已收盘K线的开盘时间（毫秒）"""
+    tf_ms = TIMEFRAME_MS.get(timeframe, 60 * 1000)
+    return (int(time.time() * 1000) // tf_ms - 1) * tf_ms
+
+
+def rows_to_frame(rows: np.ndarray) -> pd.DataFrame:
+    """float64 [n, 6] -> DataFrame（timestamp 转为 datetime64[ms]，与回测引擎的格式一致）"""
+    df = pd.DataFrame(rows, columns=OHLCV_COLUMNS, copy=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+class OHLCVStore:
+    """按月分区的本地 K 线存储"""
+
+    def __init__(self, root: Optional[str] = None):
+        if root is None:
+            from database.db_config import DATA_DIR
+            root = os.getenv("OHLCV_STORE_DIR", os.path.join(DATA_DIR, "ohlcv_store"))
+        self.root = root
+        self._locks: Dict[Tuple[str, str], threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {'reads': 0, 'downloads': 0, 'downloaded_bars': 0, 'written_bars': 0}
+
+    # ------------------------------------------------------------------
+    # 路径与锁
+    # ------------------------------------------------------------------
+
+    def _dir(self, symbol: str, timeframe: str) -> str:
+        safe = symbol.replace('/', '_').replace(':', '_')
+        return os.path.join(self.root, safe, timeframe)
+
+    def _partition_path(self, symbol: str, timeframe: str, month: str) -> str:
+        return os.path.join(self._dir(symbol, timeframe), f"{month}.npy")
+
+    def _lock(self, symbol: str, timeframe: str) -> threading.RLock:
+        key = (symbol, timeframe)
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.RLock()
+            return lock
+
+    # ------------------------------------------------------------------
+    # 覆盖区间
+    # ------------------------------------------------------------------
+
+    def _coverage_path(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self._dir(symbol, timeframe), "coverage.json")
+
+    def get_coverage(self, symbol: str, timeframe: str) -> List[List[int]]:
+        """已覆盖的时间区间 [[start_ms, end_ms], ...]（闭区间，按开始时间排序）"""
+        path = self._coverage_path(symbol, timeframe)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return [list(map(int, iv)) for iv in json.load(f)]
+        except Exception as e:
+            logger.warning(f"[ohlcv_store] 覆盖区间文件损坏，将重新下载: {path} ({e})")
+            return []
+
+    def mark_covered(self, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> None:
+        """标记 [start_ms, end_ms] 已向交易所确认（即使该时段没有K线）"""
+        if end_ms < start_ms:
+            return
+        with self._lock(symbol, timeframe):
+            coverage = _merge_intervals(self.get_coverage(symbol, timeframe) + [[int(start_ms), int(end_ms)]])
+            os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+            path = self._coverage_path(symbol, timeframe)
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(coverage, f)
+            _replace_file(tmp, path)
+
+    def missing_ranges(self, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """[start_ms, end_ms] 中尚未覆盖的缺口"""
+        gaps = []
+        cursor = start_ms
+        for cov_start, cov_end in self.get_coverage(symbol, timeframe):
+            if cov_end < cursor:
+                continue
+            if cov_start > end_ms:
+                break
+            if cov_start > cursor:
+                gaps.append((cursor, cov_start - 1))
+            cursor = max(cursor, cov_end + 1)
+            if cursor > end_ms:
+                break
+        if cursor <= end_ms:
+            gaps.append((cursor, end_ms))
+        return gaps
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+
+    def _load_partition(self, path: str) -> np.ndarray:
+        if not os.path.exists(path):
+            return _EMPTY
+        return np.load(path, mmap_mode='r')
+
+    def read(self, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> np.ndarray:
+        """
+        读取 [start_ms, end_ms] 内的K线
+
+        返回只读 float64 [n, 6]；范围在单个月份内时是内存映射上的视图（零拷贝）。
+        Windows 上持有视图期间该分区无法被替换，写入方会退避重试。
+        """
+        self.stats['reads'] += 1
+        parts = []
+        for month in _month_range(start_ms, end_ms):
+            rows = self._load_partition(self._partition_path(symbol, timeframe, month))
+            if len(rows) == 0:
+                continue
+            ts = rows[:, 0]
+            lo = int(np.searchsorted(ts, start_ms, side='left'))
+            hi = int(np.searchsorted(ts, end_ms, side='right'))
+            if hi > lo:
+                parts.append(rows[lo:hi])
+        if not parts:
+            return _EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        merged = np.concatenate(parts)
+        merged.setflags(write=False)
+        return merged
+
+    def write(self, symbol: str, timeframe: str, rows) -> int:
+        """
+        合并写入K线（按时间戳去重，新数据覆盖旧数据）
+
+        返回: 写入的行数
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or len(rows) == 0:
+            return 0
+        rows = rows[:, :len(OHLCV_COLUMNS)]
+        months = np.array([_month_key(int(ts)) for ts in rows[:, 0]])
+
+        with self._lock(symbol, timeframe):
+            os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+            for month in np.unique(months):
+                path = self._partition_path(symbol, timeframe, month)
+                incoming = rows[months == month]
+                existing = self._load_partition(path)
+                if len(existing):
+                    combined = np.concatenate([incoming, np.asarray(existing)])
+                else:
+                    combined = incoming
+                # np.unique 保留每个时间戳第一次出现的行，incoming 在前即新数据优先
+                _, first = np.unique(combined[:, 0], return_index=True)
+                merged = np.ascontiguousarray(combined[first])
+                del existing
+                tmp = f"{path}.tmp.npy"
+                np.save(tmp, merged)
+                _replace_file(tmp, path)
+        self.stats['written_bars'] += len(rows)
+        return len(rows)
+
+    def ensure(self, symbol: str, timeframe: str, start_ms: int, end_ms: int,
+               download: Optional[Downloader] = None) -> np.ndarray:
+        """
+        保证 [start_ms, end_ms] 已在本地，然后读取
+
+        只下载未覆盖的缺口，并且只保存 / 标记已收盘的K线；download 为 None 时只读本地。
+        """
+        tf_ms = TIMEFRAME_MS.get(timeframe, 60 * 1000)
+        closed_end = min(end_ms, last_closed_bar_ts(timeframe))
+
+        if download is not None and closed_end >= start_ms:
+            with self._lock(symbol, timeframe):
+                for gap_start, gap_end in self.missing_ranges(symbol, timeframe, start_ms, closed_end):
+                    self._fill_gap(symbol, timeframe, gap_start, gap_end, tf_ms, download)
+
+        return self.read(symbol, timeframe, start_ms, end_ms)
+
+    def _fill_gap(self, symbol: str, timeframe: str, gap_start: int, gap_end: int,
+                  tf_ms: int, download: Downloader) -> None:
+        self.stats['downloads'] += 1
+        try:
+            candles, complete = download(symbol, timeframe, gap_start, gap_end)
+        except Exception as e:
+            logger.warning(f"[ohlcv_store] 下载失败 {symbol} {timeframe}: {e}")
+            return
+        rows = np.asarray(candles, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS)) if candles else _EMPTY
+        if len(rows):
+            rows = rows[(rows[:, 0] >= gap_start) & (rows[:, 0] <= gap_end)]
+        self.stats['downloaded_bars'] += len(rows)
+        try:
+            self.write(symbol, timeframe, rows)
+        except OSError as e:
+            # 分区仍被占用（Windows 内存映射）：不标记覆盖，下次重新下载
+            logger.warning(f"[ohlcv_store] 写入失败 {symbol} {timeframe}: {e}")
+            return
+        if complete:
+            self.mark_covered(symbol, timeframe, gap_start, gap_end)
+        elif len(rows):
+            # 中途失败：只标记连续拿到的部分，其余下次重试
+            self.mark_covered(symbol, timeframe, gap_start, int(rows[:, 0].max()) + tf_ms - 1)
+
+
+_ohlcv_store: Optional[OHLCVStore] = None
+_ohlcv_store_lock = threading.Lock()
+
+
+def get_ohlcv_store() -> OHLCVStore:
+    """获取全局K线存储（懒加载）"""
+    global _ohlcv_store
+    if _ohlcv_store is None:
+        with _ohlcv_store_lock:
+            if _ohlcv_store is None:
+                _ohlcv_store = OHLCVStore()
+    return _ohlcv_store
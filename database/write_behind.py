@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+写后台持久化队列（write-behind）
+
+交易主循环里的遥测 / 缓存类写入（信号缓存、K线缓存、引擎状态、性能指标、WS 状态）
+原本同步落库，数据库延迟直接叠加到“信号 -> 下单”的链路上。本模块把这类写入交给
+专用写线程：
+
+- 有界队列：待写操作数达到上限时丢弃新的写入并计数（只用于可丢失的遥测 / 缓存数据）
+- 合并：同一个 key 的待写操作只保留最新一次（引擎状态等按字段合并）
+- 批量：写线程每轮把积压的操作放进一个事务（db_bridge.batched_writes）提交，
+  批次失败时回滚并逐条重试，单条失败不影响其他写入
+- 显式 flush：下单前、停机时调用 flush_writes()，保证之前的写入已落库
+
+订单、成交等关键写入不要走这里，继续同步调用 db_bridge，保证持久性。
+
+环境变量：
+- DB_WRITE_BEHIND: 是否启用（默认 1，设为 0 时 submit 直接同步执行）
+- DB_WRITE_BEHIND_MAX_PENDING: 最大待写操作数（默认 10000）
+- DB_WRITE_BEHIND_LINGER_MS: 写线程攒批等待时间（默认 50ms）
+"""
+import os
+import time
+import atexit
+import logging
+import threading
+import itertools
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingWrite:
+    __slots__ = ('func', 'args', 'kwargs', 'merge')
+
+    def __init__(self, func: Callable, args: tuple, kwargs: Dict[str, Any], merge: bool):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.merge = merge
+
+    def run(self):
+        self.func(*self.args, **self.kwargs)
+
+
+class WriteBehindQueue:
+    """
+    写后台队列
+
+    Usage:
+        queue = WriteBehindQueue()
+        queue.submit(('signal', symbol, tf, action), set_signal_cache, symbol, tf, action, candle_time)
+        queue.flush()  # 下单前
+    """
+
+    def __init__(self, max_pending: int = 10000, linger: float = 0.05,
+                 db_config: Optional[Dict[str, Any]] = None, enabled: bool = True):
+        """
+        Args:
+            max_pending: 最大待写操作数（合并后）
+            linger: 写线程攒批等待时间（秒）
+            db_config: 批量事务使用的数据库配置（None=默认数据库）
+            enabled: False 时 submit 直接同步执行
+        """
+        self.max_pending = max_pending
+        self.linger = linger
+        self.db_config = db_config
+        self.enabled = enabled
+
+        self._pending: "OrderedDict[Hashable, _PendingWrite]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._seq = 0            # 已提交的写入序号
+        self._written_seq = 0    # 已落库的写入序号
+        self._flush_requested = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._unique = itertools.count()
+
+        # 统计
+        self._submitted = 0
+        self._coalesced = 0
+        self._dropped = 0
+        self._written = 0
+        self._failed = 0
+        self._batches = 0
+        self._batch_time = 0.0
+
+    # ------------------------------------------------------------------
+    # 生产者
+    # ------------------------------------------------------------------
+
+    def submit(self, key: Optional[Hashable], func: Callable, *args,
+               merge_kwargs: bool = False, **kwargs) -> bool:
+        """
+        提交一次写入（不等待落库）
+
+        Args:
+            key: 合并键，同 key 的待写操作只保留最新一次；None 表示不合并（如追加型指标）
+            func: db_bridge 写函数
+            merge_kwargs: True 时与同 key 的待写操作按关键字参数合并（后写覆盖先写）
+
+        Returns:
+            bool: 是否已接收（队列满被丢弃时返回 False）
+        """
+        if not self.enabled:
+            func(*args, **kwargs)
+            return True
+
+        self._ensure_thread()
+        if key is None:
+            key = ('__append__', next(self._unique))
+
+        with self._cond:
+            self._submitted += 1
+            existing = self._pending.get(key)
+            if existing is not None:
+                self._coalesced += 1
+                if merge_kwargs and existing.merge:
+                    kwargs = {**existing.kwargs, **kwargs}
+                self._pending[key] = _PendingWrite(func, args, kwargs, merge_kwargs)
+            elif len(self._pending) >= self.max_pending:
+                self._dropped += 1
+                if self._dropped % 1000 == 1:
+                    logger.warning(f"[write-behind] 待写队列已满（{self.max_pending}），丢弃写入，累计 {self._dropped} 次")
+                return False
+            else:
+                self._pending[key] = _PendingWrite(func, args, kwargs, merge_kwargs)
+            self._seq += 1
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        等待此前提交的写入全部落库
+
+        Returns:
+            bool: 是否在超时前完成
+        """
+        if not self.enabled or self._thread is None:
+            return True
+        deadline = time.time() + timeout
+        with self._cond:
+            target = self._seq
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._written_seq < target:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._thread.is_alive():
+                    logger.warning(f"[write-behind] flush 超时，仍有 {len(self._pending)} 个待写操作")
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """落库剩余写入并停止写线程"""
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._cond:
+            self._stopping = False
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """获取队列统计"""
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'pending': len(self._pending),
+                'submitted': self._submitted,
+                'coalesced': self._coalesced,
+                'dropped': self._dropped,
+                'written': self._written,
+                'failed': self._failed,
+                'batches': self._batches,
+                'avg_batch_ms': round(self._batch_time / self._batches * 1000, 2) if self._batches else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # 写线程
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending and self._stopping:
+                    return
+                # 攒批：等待 linger 或直到有 flush 请求（submit 的 notify 不打断攒批）
+                deadline = time.time() + self.linger
+                while not self._flush_requested and not self._stopping:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = list(self._pending.values())
+                self._pending.clear()
+                batch_seq = self._seq
+                self._flush_requested = False
+
+            start = time.perf_counter()
+            written, failed = self._write_batch(batch)
+            cost = time.perf_counter() - start
+
+            with self._cond:
+                self._written += written
+                self._failed += failed
+                self._batches += 1
+                self._batch_time += cost
+                self._written_seq = batch_seq
+                self._cond.notify_all()
+
+    def _write_batch(self, batch) -> tuple:
+        """单事务写入整批；失败时回滚并逐条重试"""
+        from database.db_bridge import batched_writes
+        try:
+            with batched_writes(self.db_config):
+                for item in batch:
+                    item.run()
+            return len(batch), 0
+        except Exception as e:
+            logger.debug(f"[write-behind] 批量写入失败，逐条重试: {e}")
+
+        written = failed = 0
+        for item in batch:
+            try:
+                item.run()
+                written += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(f"[write-behind] 写入失败 {getattr(item.func, '__name__', item.func)}: {e}")
+        return written, failed
+
+
+def _env_enabled() -> bool:
+    return os.getenv("DB_WRITE_BEHIND", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_write_behind: Optional[WriteBehindQueue] = None
+_write_behind_lock = threading.Lock()
+
+
+def get_write_behind() -> WriteBehindQueue:
+    """获取全局写后台队列（懒加载）"""
+    global _write_behind
+    if _write_behind is None:
+        with _write_behind_lock:
+            if _write_behind is None:
+                _write_behind = WriteBehindQueue(
+                    max_pending=int(_env_number("DB_WRITE_BEHIND_MAX_PENDING", 10000)),
+                    linger=_env_number("DB_WRITE_BEHIND_LINGER_MS", 50) / 1000.0,
+                    enabled=_env_enabled(),
+                )
+                atexit.register(_write_behind.shutdown)
+    return _write_behind
+
+
+# ============================================================================
+# 交易主循环使用的延迟写入函数（签名与 db_bridge 对应函数一致）
+# ============================================================================
+
+def defer_set_signal_cache(symbol: str, timeframe: str, action: str, candle_time: int) -> bool:
+    """延迟写入信号缓存（同一信号键只保留最新K线时间）"""
+    from database.db_bridge import set_signal_cache
+    return get_write_behind().submit(('signal_cache', symbol, timeframe, action),
+                                     set_signal_cache, symbol, timeframe, action, candle_time)
+
+
+def defer_upsert_ohlcv(symbol: str, timeframe: str, ohlcv_data: list) -> bool:
+    """延迟写入K线缓存（同一 symbol/timeframe 只保留最新窗口）"""
+    from database.db_bridge import upsert_ohlcv
+    return get_write_behind().submit(('ohlcv', symbol, timeframe), upsert_ohlcv, symbol, timeframe, ohlcv_data)
+
+
+def defer_update_engine_status(**status) -> bool:
+    """延迟更新引擎状态（多次更新按字段合并）"""
+    from database.db_bridge import update_engine_status
+    return get_write_behind().submit(('engine_status',), update_engine_status, merge_kwargs=True, **status)
+
+
+def defer_update_ws_status(**status) -> bool:
+    """延迟更新 WebSocket 状态（只保留最新一次）"""
+    from database.db_bridge import update_ws_status
+    return get_write_behind().submit(('ws_status',), update_ws_status, **status)
+
+
+def defer_insert_performance_metrics(metrics: Dict[str, Any]) -> bool:
+    """延迟插入性能指标（追加型，不合并）"""
+    from database.db_bridge import insert_performance_metrics
+    metrics = dict(metrics)
+    metrics.setdefault('ts', int(time.time()))  # 以提交时间为准
+    return get_write_behind().submit(None, insert_performance_metrics, metrics)
+
+
+def flush_writes(timeout: float = 10.0) -> bool:
+    """等待已提交的延迟写入全部落库（下单前 / 停机时调用）"""
+    if _write_behind is None:
+        return True
+    return _write_behind.flush(timeout)
+
+
+def shutdown_writes(timeout: float = 10.0) -> None:
+    """落库剩余写入并停止写线程"""
+    if _write_behind is not None:
+        _write_behind.shutdown(timeout)
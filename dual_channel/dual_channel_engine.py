@@ -22,7 +22,7 @@
 # - 支持三种执行模式: intrabar / confirmed / both
 
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import pandas as pd
 import time
 import logging
@@ -139,38 +139,81 @@ class DualChannelSignalEngine:
         self.config.execution_mode = mode
         logger.info(f"Execution mode set to: {mode}")
     
-    def calculate_intrabar_signal(
+    def calculate_shared_indicators(
         self,
         data: DualChannelOHLCV
-    ) -> Optional[Signal]:
+    ) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame]]:
         """
-        计算盘中执行信号（使用 forming_candle）
+        共享前缀计算双通道指标
+        
+        两个通道共享除 forming_candle 外的全部K线：已收线前缀只计算一次，
+        盘中通道由前缀状态推进 forming_candle 得到（同一根收线K线内的多次扫描复用前缀）。
+        策略不支持（没有 calculate_indicators_with_forming）或数据不足时返回 (None, None)，
+        由各通道自行全量计算。
         
         Args:
             data: DualChannelOHLCV 数据
         
         Returns:
-            Signal 对象，如果无信号则返回 None
+            (收线通道 DataFrame, 盘中通道 DataFrame)
         """
+        if not hasattr(self.strategy, 'calculate_indicators_with_forming'):
+            return None, None
+        
+        candles = data.get_candles_with_forming()
+        if len(candles) < 201:
+            return None, None
+        
         try:
-            # 使用包含 forming_candle 的所有K线
-            candles = data.get_candles_with_forming()
-            
-            if len(candles) < 200:
-                logger.debug(
-                    f"Insufficient data for intrabar signal: "
-                    f"{data.symbol}/{data.timeframe} ({len(candles)} candles)"
-                )
-                return None
-            
-            # 转换为 DataFrame
             df = pd.DataFrame(
                 candles,
                 columns=['ts', 'open', 'high', 'low', 'close', 'volume']
             )
-            
-            # 计算指标
-            df = self.strategy.calculate_indicators(df)
+            return self.strategy.calculate_indicators_with_forming(df, data.symbol, data.timeframe)
+        except Exception as e:
+            logger.debug(
+                f"Shared prefix indicators failed for "
+                f"{data.symbol}/{data.timeframe}, fallback to per-channel: {e}"
+            )
+            return None, None
+    
+    def calculate_intrabar_signal(
+        self,
+        data: DualChannelOHLCV,
+        indicators_df: Optional[pd.DataFrame] = None
+    ) -> Optional[Signal]:
+        """
+        计算盘中执行信号（使用 forming_candle）
+        
+        Args:
+            data: DualChannelOHLCV 数据
+            indicators_df: 已计算好的盘中通道指标（来自 calculate_shared_indicators），None 则全量计算
+        
+        Returns:
+            Signal 对象，如果无信号则返回 None
+        """
+        try:
+            if indicators_df is not None:
+                df = indicators_df
+            else:
+                # 使用包含 forming_candle 的所有K线
+                candles = data.get_candles_with_forming()
+                
+                if len(candles) < 200:
+                    logger.debug(
+                        f"Insufficient data for intrabar signal: "
+                        f"{data.symbol}/{data.timeframe} ({len(candles)} candles)"
+                    )
+                    return None
+                
+                # 转换为 DataFrame
+                df = pd.DataFrame(
+                    candles,
+                    columns=['ts', 'open', 'high', 'low', 'close', 'volume']
+                )
+                
+                # 计算指标
+                df = self.strategy.calculate_indicators(df)
             
             # 检查信号
             signal_result = self.strategy.check_signals(df, data.timeframe)
@@ -214,13 +257,15 @@ class DualChannelSignalEngine:
     
     def calculate_confirmed_signal(
         self,
-        data: DualChannelOHLCV
+        data: DualChannelOHLCV,
+        indicators_df: Optional[pd.DataFrame] = None
     ) -> Optional[Signal]:
         """
         计算收线确认信号（使用 last_closed_candle，不含 forming_candle）
         
         Args:
             data: DualChannelOHLCV 数据
+            indicators_df: 已计算好的收线通道指标（来自 calculate_shared_indicators），None 则全量计算
         
         Returns:
             Signal 对象，如果无信号则返回 None
@@ -232,24 +277,27 @@ class DualChannelSignalEngine:
             ):
                 return None
             
-            # 使用不含 forming_candle 的已收线K线
-            candles = data.get_closed_candles()
-            
-            if len(candles) < 200:
-                logger.debug(
-                    f"Insufficient data for confirmed signal: "
-                    f"{data.symbol}/{data.timeframe} ({len(candles)} candles)"
+            if indicators_df is not None:
+                df = indicators_df
+            else:
+                # 使用不含 forming_candle 的已收线K线
+                candles = data.get_closed_candles()
+                
+                if len(candles) < 200:
+                    logger.debug(
+                        f"Insufficient data for confirmed signal: "
+                        f"{data.symbol}/{data.timeframe} ({len(candles)} candles)"
+                    )
+                    return None
+                
+                # 转换为 DataFrame
+                df = pd.DataFrame(
+                    candles,
+                    columns=['ts', 'open', 'high', 'low', 'close', 'volume']
                 )
-                return None
-            
-            # 转换为 DataFrame
-            df = pd.DataFrame(
-                candles,
-                columns=['ts', 'open', 'high', 'low', 'close', 'volume']
-            )
-            
-            # 计算指标
-            df = self.strategy.calculate_indicators(df)
+                
+                # 计算指标
+                df = self.strategy.calculate_indicators(df)
             
             # 检查信号
             signal_result = self.strategy.check_signals(df, data.timeframe)
@@ -311,16 +359,23 @@ class DualChannelSignalEngine:
             closed_ts=data.closed_ts
         )
         
+        # 两个通道共享已收线前缀，只计算一次；
+        # 只算收线通道时不走共享计算（收线通道仅在新K线收线时才计算，其余扫描直接跳过）
+        if self.config.should_calculate_intrabar():
+            closed_df, forming_df = self.calculate_shared_indicators(data)
+        else:
+            closed_df, forming_df = None, None
+        
         # 计算盘中信号
         if self.config.should_calculate_intrabar():
-            intrabar_signal = self.calculate_intrabar_signal(data)
+            intrabar_signal = self.calculate_intrabar_signal(data, forming_df)
             if intrabar_signal:
                 result.intrabar_signals.append(intrabar_signal)
                 result.intrabar_fired_count += 1
         
         # 计算收线信号
         if self.config.should_calculate_confirmed():
-            confirmed_signal = self.calculate_confirmed_signal(data)
+            confirmed_signal = self.calculate_confirmed_signal(data, closed_df)
             if confirmed_signal:
                 result.confirmed_signals.append(confirmed_signal)
                 result.confirmed_new_count += 1
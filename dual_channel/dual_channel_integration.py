@@ -23,7 +23,9 @@
 
 from typing import Dict, List, Optional, Any
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
 
 # 导入双通道组件
 from .dual_channel_ohlcv import DualChannelOHLCV, get_incremental_fetcher
@@ -34,6 +36,21 @@ from utils.beijing_time_converter import BeijingTimeConverter
 
 logger = logging.getLogger(__name__)
 
+# 多币种扫描线程池（全局复用，避免重复创建）
+_scan_executor: Optional[ThreadPoolExecutor] = None
+_SCAN_EXECUTOR_WORKERS = int(os.getenv("DUAL_CHANNEL_SCAN_WORKERS", "4"))
+
+
+def get_scan_executor() -> ThreadPoolExecutor:
+    """获取双通道多币种扫描线程池（懒加载）"""
+    global _scan_executor
+    if _scan_executor is None:
+        _scan_executor = ThreadPoolExecutor(
+            max_workers=_SCAN_EXECUTOR_WORKERS,
+            thread_name_prefix="dual_channel_"
+        )
+    return _scan_executor
+
 
 class DualChannelIntegration:
     """
@@ -82,8 +99,10 @@ class DualChannelIntegration:
         if scan_time is None:
             scan_time = datetime.now().strftime('%H:%M:%S')
         
-        # 获取双通道K线数据
+        # 获取双通道K线数据（MarketDataProvider 返回 (data, is_stale) 元组）
         dual_channel = provider.get_dual_channel_ohlcv(symbol, timeframe)
+        if isinstance(dual_channel, tuple):
+            dual_channel = dual_channel[0]
         
         if dual_channel is None:
             logger.warning(f"No dual channel data for {symbol}/{timeframe}")
@@ -124,8 +143,20 @@ class DualChannelIntegration:
         first_forming_ts = 0
         first_closed_ts = 0
         
-        for symbol in symbols:
-            result = self.process_scan(provider, symbol, timeframe, scan_time)
+        # 各币种并行拉取数据 + 计算信号，结果按 symbols 顺序汇总
+        def scan_one(symbol):
+            try:
+                return self.process_scan(provider, symbol, timeframe, scan_time)
+            except Exception as e:
+                logger.error(f"Dual channel scan failed for {symbol}/{timeframe}: {e}")
+                return None
+        
+        if len(symbols) > 1:
+            scan_results = list(get_scan_executor().map(scan_one, symbols))
+        else:
+            scan_results = [scan_one(symbol) for symbol in symbols]
+        
+        for symbol, result in zip(symbols, scan_results):
             if result:
                 results[symbol] = result
                 total_intrabar_fired += result.intrabar_fired_count
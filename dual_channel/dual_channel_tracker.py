@@ -23,6 +23,7 @@
 from dataclasses import dataclass
 from typing import Dict, Tuple, Optional, List
 import logging
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -91,6 +92,8 @@ class IntrabarSignalTracker:
     def __init__(self):
         # {(symbol, timeframe, action): forming_ts}
         self._fired_intrabar_ts: Dict[Tuple[str, str, str], int] = {}
+        # 多币种并行扫描时保护记录字典
+        self._lock = threading.RLock()
     
     def should_fire(
         self,
@@ -112,7 +115,8 @@ class IntrabarSignalTracker:
             True 如果应该触发（未重复），False 如果已触发过
         """
         key = (symbol, timeframe, action)
-        last_ts = self._fired_intrabar_ts.get(key, 0)
+        with self._lock:
+            last_ts = self._fired_intrabar_ts.get(key, 0)
         
         # 如果 forming_ts 与上次相同，说明是同一根K线，不应重复触发
         if forming_ts == last_ts:
@@ -141,15 +145,16 @@ class IntrabarSignalTracker:
             forming_ts: forming_candle 的时间戳
         """
         key = (symbol, timeframe, action)
-        self._fired_intrabar_ts[key] = forming_ts
+        with self._lock:
+            self._fired_intrabar_ts[key] = forming_ts
+            
+            # 清理过期记录
+            self._cleanup_old_records()
         
         logger.debug(
             f"Intrabar signal recorded: "
             f"{symbol}/{timeframe} {action} forming_ts={forming_ts}"
         )
-        
-        # 清理过期记录
-        self._cleanup_old_records()
     
     def _cleanup_old_records(self) -> None:
         """清理过期的记录"""
@@ -187,21 +192,22 @@ class IntrabarSignalTracker:
             symbol: 指定交易对，None 表示全部
             timeframe: 指定时间周期，None 表示全部
         """
-        if symbol is None and timeframe is None:
-            self._fired_intrabar_ts.clear()
-            logger.info("Cleared all intrabar signal records")
-        else:
-            keys_to_remove = [
-                k for k in self._fired_intrabar_ts
-                if (symbol is None or k[0] == symbol) and
-                   (timeframe is None or k[1] == timeframe)
-            ]
-            for k in keys_to_remove:
-                del self._fired_intrabar_ts[k]
-            logger.info(
-                f"Cleared intrabar signals for "
-                f"symbol={symbol}, timeframe={timeframe}"
-            )
+        with self._lock:
+            if symbol is None and timeframe is None:
+                self._fired_intrabar_ts.clear()
+                logger.info("Cleared all intrabar signal records")
+            else:
+                keys_to_remove = [
+                    k for k in self._fired_intrabar_ts
+                    if (symbol is None or k[0] == symbol) and
+                       (timeframe is None or k[1] == timeframe)
+                ]
+                for k in keys_to_remove:
+                    del self._fired_intrabar_ts[k]
+                logger.info(
+                    f"Cleared intrabar signals for "
+                    f"symbol={symbol}, timeframe={timeframe}"
+                )
     
     def get_fired_count(self) -> int:
         """获取已触发信号的数量"""
@@ -225,6 +231,8 @@ class ConfirmedSignalTracker:
     def __init__(self):
         # {(symbol, timeframe): closed_ts}
         self._last_confirmed_ts: Dict[Tuple[str, str], int] = {}
+        # 多币种并行扫描时保护记录字典
+        self._lock = threading.RLock()
     
     def should_calculate(
         self,
@@ -244,7 +252,8 @@ class ConfirmedSignalTracker:
             True 如果应该计算（新K线），False 如果已计算过
         """
         key = (symbol, timeframe)
-        last_ts = self._last_confirmed_ts.get(key, 0)
+        with self._lock:
+            last_ts = self._last_confirmed_ts.get(key, 0)
         
         # 如果 closed_ts 与上次相同，说明没有新的收线K线
         if closed_ts == last_ts:
@@ -279,7 +288,8 @@ class ConfirmedSignalTracker:
             closed_ts: last_closed_candle 的时间戳
         """
         key = (symbol, timeframe)
-        self._last_confirmed_ts[key] = closed_ts
+        with self._lock:
+            self._last_confirmed_ts[key] = closed_ts
         
         logger.debug(
             f"Confirmed signal recorded: "
@@ -303,21 +313,22 @@ class ConfirmedSignalTracker:
             symbol: 指定交易对，None 表示全部
             timeframe: 指定时间周期，None 表示全部
         """
-        if symbol is None and timeframe is None:
-            self._last_confirmed_ts.clear()
-            logger.info("Cleared all confirmed signal records")
-        else:
-            keys_to_remove = [
-                k for k in self._last_confirmed_ts
-                if (symbol is None or k[0] == symbol) and
-                   (timeframe is None or k[1] == timeframe)
-            ]
-            for k in keys_to_remove:
-                del self._last_confirmed_ts[k]
-            logger.info(
-                f"Cleared confirmed signals for "
-                f"symbol={symbol}, timeframe={timeframe}"
-            )
+        with self._lock:
+            if symbol is None and timeframe is None:
+                self._last_confirmed_ts.clear()
+                logger.info("Cleared all confirmed signal records")
+            else:
+                keys_to_remove = [
+                    k for k in self._last_confirmed_ts
+                    if (symbol is None or k[0] == symbol) and
+                       (timeframe is None or k[1] == timeframe)
+                ]
+                for k in keys_to_remove:
+                    del self._last_confirmed_ts[k]
+                logger.info(
+                    f"Cleared confirmed signals for "
+                    f"symbol={symbol}, timeframe={timeframe}"
+                )
     
     def get_calculated_count(self) -> int:
         """获取已计算信号的数量"""
@@ -19,16 +19,29 @@
 OKX WebSocket 客户端
 
 支持订阅 K线数据的实时推送
+
+订阅按频道分片到多条连接，每条连接的订阅 / 重连后的重新订阅合并为多参数请求帧；
+一条连接断开只影响它承载的频道，各连接的重连时间相互错开。
+get_cache_stats()["connections"] 给出每条连接从重连到全部频道重新订阅确认的耗时。
+
+环境变量：
+- WS_CHANNELS_PER_CONN: 每条连接承载的频道数（默认 100）
+- WS_MAX_CONNECTIONS: 最大连接数（默认 10，达到后新频道分配给频道最少的连接）
+- WS_SUBSCRIBE_BATCH: 每个订阅请求帧的频道数（默认 50）
+- WS_RECONNECT_STAGGER: 第 i 条连接的首次建连 / 重连额外延迟 i * 该值（秒，默认 0.5）
 """
+import os
 import json
 import time
 import threading
 import logging
 import queue
 from typing import Dict, List, Callable, Optional, Any
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import datetime
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # WebSocket 依赖检查
@@ -39,6 +52,363 @@ except ImportError:
     WEBSOCKET_AVAILABLE = False
     logger.warning("websocket-client 未安装，WebSocket 功能不可用。请运行: pip install websocket-client")
 
+# 订阅分片配置
+WS_CHANNELS_PER_CONN = int(os.getenv("WS_CHANNELS_PER_CONN", "100"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10"))
+WS_SUBSCRIBE_BATCH = int(os.getenv("WS_SUBSCRIBE_BATCH", "50"))
+WS_RECONNECT_STAGGER = float(os.getenv("WS_RECONNECT_STAGGER", "0.5"))
+
+
+class ContentionLock:
+    """
+    带争用统计的互斥锁
+    
+    先尝试非阻塞获取，失败才计为一次争用并统计等待时间。
+    统计字段只在持锁期间修改，因此是精确值。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0  # 秒
+        self.wait_max = 0.0    # 秒
+    
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            wait_start = time.perf_counter()
+            self._lock.acquire()
+            waited = time.perf_counter() - wait_start
+            self.contended += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+        self.acquisitions += 1
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._lock.release()
+        return False
+
+
+class CandleRingBuffer:
+    """
+    固定容量 K线环形缓冲（单个 instId:timeframe）
+    
+    存储为 (2 * capacity, 6) 的 float64 数组，行格式 [ts, o, h, l, c, vol]：
+    - 更新形成中的 K线：O(1) 原地写入最后一行
+    - 追加新 K线：O(1)，写满后把最近 capacity 行复制到新数组（均摊 O(1)）
+    - snapshot() 返回连续的只读视图，不做深拷贝
+    
+    并发模型：
+    - 写入方（upsert/load）需持有 self.lock（每个 key 一把锁）
+    - 读取方无锁：写入方每次修改后把 (storage, start, end) 作为一个元组发布，
+      读取方只读取已发布的元组。已发布范围内只有最后一根（形成中）K线会被原地更新，
+      乱序更新 / 插入和压缩都换用新数组而不是原地修改，已发出的视图不会被覆盖。
+    
+    ts 为毫秒时间戳，在 float64 中可精确表示。
+    """
+    
+    COLUMNS = 6
+    
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.lock = ContentionLock()
+        self._storage = np.empty((capacity * 2, self.COLUMNS), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._published = (self._storage, 0, 0)
+    
+    def __len__(self) -> int:
+        _, start, end = self._published
+        return end - start
+    
+    @property
+    def last_ts(self) -> Optional[int]:
+        """最新一根 K线的时间戳"""
+        storage, start, end = self._published
+        if end == start:
+            return None
+        return int(storage[end - 1, 0])
+    
+    def upsert(self, candle) -> None:
+        """更新或追加一根 K线 [ts, o, h, l, c, vol]"""
+        ts = candle[0]
+        if self._end == self._start or ts > self._storage[self._end - 1, 0]:
+            self._append(candle)
+        elif ts == self._storage[self._end - 1, 0]:
+            self._storage[self._end - 1] = candle
+        else:
+            # 乱序推送（较旧的 K线），二分查找；更新和插入都写到新数组，不改动已发布的视图
+            ts_col = self._storage[self._start:self._end, 0]
+            pos = int(np.searchsorted(ts_col, ts))
+            if ts_col[pos] == ts:
+                rows = self.snapshot().copy()
+                rows[pos] = candle
+            else:
+                rows = np.insert(self.snapshot(), pos, candle, axis=0)
+            self._reset(rows)
+    
+    def load(self, rows: np.ndarray) -> int:
+        """
+        批量载入 K线（预热），已存在的时间戳保留原值
+        
+        Returns:
+            新增的 K线数量
+        """
+        if len(rows) == 0:
+            return 0
+        existing = self.snapshot()
+        if len(existing):
+            rows = rows[~np.isin(rows[:, 0], existing[:, 0])]
+            if len(rows) == 0:
+                return 0
+        merged = np.concatenate([existing, rows])
+        merged = merged[np.argsort(merged[:, 0], kind='stable')]
+        # 去重（稳定排序保证已存在的行排在前面）
+        keep = np.ones(len(merged), dtype=bool)
+        keep[1:] = np.diff(merged[:, 0]) != 0
+        merged = merged[keep]
+        added = len(merged) - len(existing)
+        self._reset(merged)
+        return added
+    
+    def snapshot(self, limit: Optional[int] = None) -> np.ndarray:
+        """返回最近 limit 根 K线的只读视图（无锁）"""
+        storage, start, end = self._published
+        if limit and end - start > limit:
+            start = end - limit
+        view = storage[start:end]
+        view.flags.writeable = False
+        return view
+    
+    def _append(self, candle) -> None:
+        if self._end == len(self._storage):
+            self._reset(self._storage[self._start:self._end])
+        self._storage[self._end] = candle
+        self._end += 1
+        if self._end - self._start > self.capacity:
+            self._start += 1
+        self._published = (self._storage, self._start, self._end)
+    
+    def _reset(self, rows: np.ndarray) -> None:
+        """换用新数组并写入最近 capacity 行"""
+        rows = rows[-self.capacity:]
+        storage = np.empty((self.capacity * 2, self.COLUMNS), dtype=np.float64)
+        storage[:len(rows)] = rows
+        self._storage = storage
+        self._start = 0
+        self._end = len(rows)
+        self._published = (self._storage, self._start, self._end)
+
+
+class WSConnection:
+    """
+    单条 WebSocket 连接（订阅分片）
+    
+    每条连接只承载分配给它的频道：建立连接后把这些频道按批次重新订阅，断开后独立重连，
+    一条连接掉线只影响它自己的频道，其他分片照常推送。收到的消息统一放入客户端的消息队列。
+    
+    重连退避在指数退避之上叠加 index * reconnect_stagger，多条连接同时断开（网络抖动）时
+    错开重连与重新订阅，避免同时打满 OKX 的建连频率限制。
+    """
+    
+    def __init__(self, client: "OKXWebSocketClient", index: int):
+        self.client = client
+        self.index = index
+        self.name = f"WS#{index}"
+        
+        self.ws: Optional[websocket.WebSocketApp] = None
+        self.ws_lock = threading.Lock()  # 保护 ws.send() / ws.close() 的并发访问
+        self.thread: Optional[threading.Thread] = None
+        self.connected = False
+        self.reconnect_attempts = 0
+        self.reconnects = 0
+        
+        # 本连接承载的频道 {channel_key: 订阅参数}
+        self.lock = threading.Lock()
+        self.channels: Dict[str, Dict] = {}
+        
+        # 重连 -> 全部频道重新订阅确认 的耗时
+        self._resub_pending: set = set()
+        self._resub_started = 0.0
+        self.resubscribe_ms: deque = deque(maxlen=100)
+    
+    def start(self):
+        """启动连接线程（含自动重连循环）"""
+        self.thread = threading.Thread(
+            target=self._connection_loop,
+            daemon=True,
+            name=f"OKX-WebSocket-{self.index}"
+        )
+        self.thread.start()
+    
+    def close(self):
+        """安全关闭 WebSocket（吞掉异常）"""
+        with self.ws_lock:
+            if self.ws:
+                try:
+                    self.ws.close()
+                except Exception:
+                    pass
+        self.connected = False
+    
+    def join(self, timeout: float = 5):
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+    
+    def reconnect_delay(self) -> float:
+        """指数退避 + 分片错开：1s, 2s, 4s... 最大 max_reconnect_delay，再加 index * reconnect_stagger"""
+        client = self.client
+        delay = min(
+            client.base_reconnect_delay * (2 ** max(self.reconnect_attempts - 1, 0)),
+            client.max_reconnect_delay
+        )
+        return delay + self.index * client.reconnect_stagger
+    
+    def _connection_loop(self):
+        """
+        连接主循环（带指数退避重连）
+        
+        模式：While-True-Try-Except，连接断开后自动重连
+        """
+        stop_event = self.client.stop_event
+        
+        # 后建的分片错开首次建连
+        if self.index and stop_event.wait(timeout=self.index * self.client.reconnect_stagger):
+            return
+        
+        while not stop_event.is_set():
+            try:
+                # 创建新的 WebSocket 实例
+                self.ws = websocket.WebSocketApp(
+                    self.client.ws_url,
+                    on_open=self._on_open,
+                    on_message=self.client._on_message,
+                    on_error=self.client._on_error,
+                    on_close=self._on_close
+                )
+                self.ws.run_forever(**self.client._run_kwargs())
+            except Exception as e:
+                logger.error(f"[{self.name}] 运行异常: {e}")
+            
+            # 连接断开，准备重连
+            self.connected = False
+            
+            if stop_event.is_set():
+                break
+            
+            self.reconnect_attempts += 1
+            delay = self.reconnect_delay()
+            logger.debug(f"[{self.name}] 将在 {delay:.1f}s 后重连 (第 {self.reconnect_attempts} 次)")
+            
+            # 可中断的等待
+            if stop_event.wait(timeout=delay):
+                break
+        
+        logger.debug(f"[{self.name}] 连接循环已退出")
+    
+    def _on_open(self, ws):
+        """连接建立回调"""
+        if self.reconnect_attempts:
+            self.reconnects += 1
+        self.connected = True
+        self.reconnect_attempts = 0  # 重置重连计数
+        logger.info(f"[{self.name}] 连接已建立")  # 保留：连接成功是重要事件
+        
+        # 重新订阅本连接的频道
+        self.resubscribe_all()
+    
+    def _on_close(self, ws, close_status_code, close_msg):
+        """连接关闭回调"""
+        self.connected = False
+        logger.debug(f"[{self.name}] 连接关闭: {close_status_code} - {close_msg}")
+    
+    def resubscribe_all(self):
+        """按批次重新订阅本连接的全部频道，并开始计时（所有频道收到订阅确认时结束）"""
+        with self.lock:
+            args = list(self.channels.values())
+            self._resub_pending = set(self.channels)
+            self._resub_started = time.perf_counter()
+        
+        if not args:
+            logger.debug(f"[{self.name}] 无待重新订阅的频道")
+            return
+        
+        frames = -(-len(args) // self.client.subscribe_batch)
+        logger.debug(f"[{self.name}] 开始重新订阅 {len(args)} 个频道（{frames} 帧）")
+        self.send_subscribe(args)
+    
+    def send_subscribe(self, args: List[Dict], op: str = "subscribe") -> bool:
+        """
+        把订阅参数按 client.subscribe_batch 合并成多参数请求帧发送
+        
+        Returns:
+            是否全部发送成功
+        """
+        batch = self.client.subscribe_batch
+        ok = True
+        for start in range(0, len(args), batch):
+            ok = self.send(json.dumps({"op": op, "args": args[start:start + batch]})) and ok
+        return ok
+    
+    def on_subscribe_ack(self, channel_key: str):
+        """订阅确认：重新订阅的频道全部确认后记录耗时"""
+        with self.lock:
+            if channel_key not in self._resub_pending:
+                return
+            self._resub_pending.discard(channel_key)
+            if self._resub_pending:
+                return
+            elapsed_ms = (time.perf_counter() - self._resub_started) * 1000
+            self.resubscribe_ms.append(elapsed_ms)
+            count = len(self.channels)
+        logger.info(f"[{self.name}] 重新订阅完成: {count} 个频道，耗时 {elapsed_ms:.0f}ms")
+    
+    def send(self, message: str) -> bool:
+        """
+        线程安全的消息发送
+        
+        使用 ws_lock 保护 ws.send() 调用，防止并发写入导致的 Broken Pipe
+        
+        Args:
+            message: 要发送的消息字符串
+            
+        Returns:
+            是否发送成功
+        """
+        with self.ws_lock:
+            if self.ws and self.connected:
+                try:
+                    self.ws.send(message)
+                    # 调试：打印发送的消息（仅订阅请求）
+                    if '"op": "subscribe"' in message or '"op":"subscribe"' in message:
+                        logger.debug(f"[{self.name}] 发送订阅请求: {message[:200]}")
+                    return True
+                except Exception as e:
+                    logger.warning(f"[{self.name}] 发送失败: {e}")
+                    return False
+            else:
+                logger.warning(f"[{self.name}] 无法发送: ws={self.ws is not None} connected={self.connected}")
+        return False
+    
+    def stats(self) -> Dict:
+        """连接统计"""
+        with self.lock:
+            channels = len(self.channels)
+            pending = len(self._resub_pending)
+            samples = list(self.resubscribe_ms)
+        return {
+            "index": self.index,
+            "connected": self.connected,
+            "channels": channels,
+            "reconnects": self.reconnects,
+            "reconnect_attempts": self.reconnect_attempts,
+            "resubscribe_pending": pending,
+            "last_resubscribe_ms": samples[-1] if samples else None,
+            "max_resubscribe_ms": max(samples) if samples else None,
+        }
+
 
 class OKXWebSocketClient:
     """
@@ -47,13 +417,16 @@ class OKXWebSocketClient:
     功能：
     - 订阅 K线数据 (candle)
     - 订阅实时行情 (ticker)
-    - 自动重连（指数退避）
+    - 订阅分片到多条连接（每条最多 channels_per_conn 个频道），订阅 / 重新订阅合并为多参数请求帧
+    - 自动重连（指数退避，分片之间错开）
     - 内置心跳保活
     
     线程安全机制：
-    - ws_lock: 保护 WebSocket 对象的并发访问（send/close）
-    - msg_queue: 生产者-消费者模式，解耦网络线程与消息处理
+    - WSConnection.ws_lock: 保护每条连接 WebSocket 对象的并发访问（send/close）
+    - msg_queue: 生产者-消费者模式，解耦网络线程与消息处理（所有连接共用）
     - stop_event: 优雅关闭信号
+    - subs_lock: 保护订阅记录与频道 -> 连接的分配
+    - candle_cache: 每个 instId:timeframe 一把写锁，读取方无锁读取已发布的快照
     """
     
     # OKX WebSocket 地址
@@ -74,11 +447,8 @@ class OKXWebSocketClient:
         
         # 使用 Business 端点（K线数据需要此端点）
         self.ws_url = self.WS_BUSINESS_URL_AWS if use_aws else self.WS_BUSINESS_URL
-        self.ws: Optional[websocket.WebSocketApp] = None
-        self.ws_thread: Optional[threading.Thread] = None
         
         # 代理配置（复用 env_validator 的自动检测逻辑）
-        import os
         self.http_proxy = os.getenv('HTTP_PROXY') or os.getenv('http_proxy')
         self.https_proxy = os.getenv('HTTPS_PROXY') or os.getenv('https_proxy')
         
@@ -96,9 +466,6 @@ class OKXWebSocketClient:
             logger.info(f"[WS] 使用代理: {self.https_proxy}")
         
         # ========== 线程安全机制 ==========
-        # [Fix #1] WebSocket 锁：保护 ws.send() / ws.close() 的并发访问
-        self.ws_lock = threading.Lock()
-        
         # [Fix #2] 消息队列：生产者-消费者模式，解耦网络 I/O 与业务处理
         self.msg_queue: queue.Queue = queue.Queue(maxsize=10000)
         self.queue_worker_thread: Optional[threading.Thread] = None
@@ -106,24 +473,42 @@ class OKXWebSocketClient:
         # [Fix #5] 停止事件：优雅关闭信号
         self.stop_event = threading.Event()
         
-        # 连接状态
-        self.connected = False
+        # 连接分片
+        self.channels_per_conn = max(1, WS_CHANNELS_PER_CONN)
+        self.max_connections = max(1, WS_MAX_CONNECTIONS)
+        self.subscribe_batch = max(1, WS_SUBSCRIBE_BATCH)
+        self.reconnect_stagger = max(0.0, WS_RECONNECT_STAGGER)
+        self.connections: List[WSConnection] = []
+        self._channel_conn: Dict[str, WSConnection] = {}  # {channel_key: 承载该频道的连接}
+        self._started = False
         
         # 订阅管理
+        self.subs_lock = threading.Lock()
         self.subscriptions: Dict[str, Dict] = {}  # {channel_key: subscription_info}
         self.callbacks: Dict[str, List[Callable]] = defaultdict(list)  # {channel_key: [callbacks]}
         
         # K线数据缓存
-        self.candle_cache: Dict[str, List] = {}  # {inst_id:timeframe: [[ts, o, h, l, c, v], ...]}
-        self.candle_cache_lock = threading.Lock()
+        # 每个 key 的缓冲自带写锁，读取无锁；candle_cache_lock 只在新建 key 时使用
+        self.candle_cache: Dict[str, CandleRingBuffer] = {}  # {inst_id:timeframe: 环形缓冲 [[ts, o, h, l, c, v], ...]}
+        self.candle_cache_capacity = 1000
+        self.candle_cache_lock = ContentionLock()
         
-        # 行情数据缓存
+        # 行情数据缓存（每次推送整体替换字典条目，读取无锁）
         self.ticker_cache: Dict[str, Dict] = {}  # {inst_id: ticker_data}
         
         # [Fix #3] 重连配置（指数退避）
         self.base_reconnect_delay = 1  # 初始重连延迟（秒）
         self.max_reconnect_delay = 60  # 最大重连延迟（秒）
-        self.reconnect_attempts = 0
+    
+    @property
+    def connected(self) -> bool:
+        """任一连接在线即视为已连接（单条连接重连期间其他分片继续推送）"""
+        return any(conn.connected for conn in self.connections)
+    
+    @property
+    def reconnect_attempts(self) -> int:
+        """各连接当前连续重连次数之和"""
+        return sum(conn.reconnect_attempts for conn in self.connections)
     
     def start(self) -> bool:
         """
@@ -131,7 +516,7 @@ class OKXWebSocketClient:
         
         启动流程：
         1. 启动消息队列消费者线程
-        2. 启动 WebSocket 连接线程（含自动重连循环）
+        2. 启动各分片连接线程（含自动重连循环），至少一条连接
         
         Returns:
             是否启动成功
@@ -151,18 +536,19 @@ class OKXWebSocketClient:
             )
             self.queue_worker_thread.start()
             
-            # 启动 WebSocket 连接线程
-            self.ws_thread = threading.Thread(
-                target=self._connection_loop,
-                daemon=True,
-                name="OKX-WebSocket"
-            )
-            self.ws_thread.start()
+            # 启动所有分片连接（启动前已记录的订阅可能已经分配了多条连接）
+            with self.subs_lock:
+                self._started = True
+                if not self.connections:
+                    self.connections.append(WSConnection(self, 0))
+                connections = list(self.connections)
+            for conn in connections:
+                conn.start()
             
             # 等待连接建立
             for _ in range(100):  # 最多等待 10 秒
                 if self.connected:
-                    logger.info(f"[WS] 连接成功: {self.ws_url}")
+                    logger.info(f"[WS] 连接成功: {self.ws_url}（{len(connections)} 条连接）")
                     return True
                 time.sleep(0.1)
             
@@ -179,25 +565,22 @@ class OKXWebSocketClient:
         
         停止流程：
         1. 设置停止事件信号
-        2. 安全关闭 WebSocket（吞掉异常）
+        2. 安全关闭所有连接（吞掉异常）
         3. 等待工作线程结束
         """
         logger.debug("[WS] 正在停止...")
         self.stop_event.set()
         
-        # 安全关闭 WebSocket
-        with self.ws_lock:
-            if self.ws:
-                try:
-                    self.ws.close()
-                except Exception:
-                    pass  # 吞掉关闭时的异常
+        with self.subs_lock:
+            self._started = False
+            connections = list(self.connections)
         
-        self.connected = False
+        for conn in connections:
+            conn.close()
         
         # 等待线程结束
-        if self.ws_thread and self.ws_thread.is_alive():
-            self.ws_thread.join(timeout=5)
+        for conn in connections:
+            conn.join(timeout=5)
         if self.queue_worker_thread and self.queue_worker_thread.is_alive():
             # 放入哨兵值唤醒队列消费者
             self.msg_queue.put(None)
@@ -205,88 +588,40 @@ class OKXWebSocketClient:
         
         logger.debug("[WS] 已停止")
     
-    def _connection_loop(self):
+    def _run_kwargs(self) -> Dict[str, Any]:
         """
-        [Fix #3] WebSocket 连接主循环（带指数退避重连）
+        run_forever 参数
         
-        模式：While-True-Try-Except
-        - 连接断开后自动重连
-        - 使用指数退避算法：1s, 2s, 4s, 8s... 最大 60s
+        [Fix #4] 使用内置心跳，移除自定义心跳线程
+        ping_interval: 每 25 秒自动发送 Ping
+        ping_timeout: 10 秒内未收到 Pong 则断开
         """
-        while not self.stop_event.is_set():
-            try:
-                # 创建新的 WebSocket 实例
-                self.ws = websocket.WebSocketApp(
-                    self.ws_url,
-                    on_open=self._on_open,
-                    on_message=self._on_message,
-                    on_error=self._on_error,
-                    on_close=self._on_close
-                )
-                
-                # [Fix #4] 使用内置心跳，移除自定义心跳线程
-                # ping_interval: 每 25 秒自动发送 Ping
-                # ping_timeout: 10 秒内未收到 Pong 则断开
-                
-                # 代理支持：解析代理URL并传递给 run_forever
-                run_kwargs = {
-                    "ping_interval": 25,
-                    "ping_timeout": 10
-                }
-                
-                proxy_url = self.https_proxy or self.http_proxy
-                if proxy_url:
-                    from urllib.parse import urlparse
-                    parsed = urlparse(proxy_url)
-                    if parsed.hostname and parsed.port:
-                        run_kwargs["http_proxy_host"] = parsed.hostname
-                        run_kwargs["http_proxy_port"] = parsed.port
-                        # 关键：必须指定 proxy_type，否则会报错
-                        # 根据代理URL的scheme确定类型
-                        scheme = parsed.scheme.lower()
-                        if scheme in ('socks5', 'socks5h'):
-                            run_kwargs["proxy_type"] = "socks5"
-                        elif scheme in ('socks4', 'socks4a'):
-                            run_kwargs["proxy_type"] = "socks4"
-                        else:
-                            # http/https 代理
-                            run_kwargs["proxy_type"] = "http"
-                        logger.info(f"[WS] 使用代理连接: {run_kwargs['proxy_type']}://{parsed.hostname}:{parsed.port}")
-                
-                self.ws.run_forever(**run_kwargs)
-                
-            except Exception as e:
-                logger.error(f"[WS] 运行异常: {e}")
-            
-            # 连接断开，准备重连
-            self.connected = False
-            
-            if self.stop_event.is_set():
-                break
-            
-            # [Fix #3] 指数退避重连
-            self.reconnect_attempts += 1
-            delay = min(
-                self.base_reconnect_delay * (2 ** (self.reconnect_attempts - 1)),
-                self.max_reconnect_delay
-            )
-            logger.debug(f"[WS] 将在 {delay:.1f}s 后重连 (第 {self.reconnect_attempts} 次)")
-            
-            # 可中断的等待
-            if self.stop_event.wait(timeout=delay):
-                break  # 收到停止信号，退出循环
-        
-        logger.debug("[WS] 连接循环已退出")
-    
-    def _on_open(self, ws):
-        """连接建立回调"""
-        self.connected = True
-        self.reconnect_attempts = 0  # 重置重连计数
-        logger.info("[WS] 连接已建立")  # 保留：连接成功是重要事件
+        # 代理支持：解析代理URL并传递给 run_forever
+        run_kwargs = {
+            "ping_interval": 25,
+            "ping_timeout": 10
+        }
         
-        # 重新订阅之前的频道
-        self._resubscribe_all()
-        # [Fix #4] 移除自定义心跳线程，使用 run_forever 内置心跳
+        proxy_url = self.https_proxy or self.http_proxy
+        if proxy_url:
+            from urllib.parse import urlparse
+            parsed = urlparse(proxy_url)
+            if parsed.hostname and parsed.port:
+                run_kwargs["http_proxy_host"] = parsed.hostname
+                run_kwargs["http_proxy_port"] = parsed.port
+                # 关键：必须指定 proxy_type，否则会报错
+                # 根据代理URL的scheme确定类型
+                scheme = parsed.scheme.lower()
+                if scheme in ('socks5', 'socks5h'):
+                    run_kwargs["proxy_type"] = "socks5"
+                elif scheme in ('socks4', 'socks4a'):
+                    run_kwargs["proxy_type"] = "socks4"
+                else:
+                    # http/https 代理
+                    run_kwargs["proxy_type"] = "http"
+                logger.info(f"[WS] 使用代理连接: {run_kwargs['proxy_type']}://{parsed.hostname}:{parsed.port}")
+        
+        return run_kwargs
     
     def _on_message(self, ws, message):
         """
@@ -354,6 +689,7 @@ class OKXWebSocketClient:
             # 处理订阅确认
             if data.get("event") == "subscribe":
                 logger.debug(f"[WS]  订阅确认: {data.get('arg', {})}")
+                self._on_subscribe_ack(data.get("arg", {}))
                 return
             
             # 处理错误
@@ -382,68 +718,6 @@ class OKXWebSocketClient:
         else:
             logger.error(f"[WS] 连接异常: {error}")
     
-    def _on_close(self, ws, close_status_code, close_msg):
-        """连接关闭回调"""
-        self.connected = False
-        logger.debug(f"[WS] 连接关闭: {close_status_code} - {close_msg}")
-    
-    def _resubscribe_all(self):
-        """重新订阅所有频道"""
-        if not self.subscriptions:
-            logger.debug("[WS] 无待重新订阅的频道")
-            return
-        
-        logger.debug(f"[WS] 开始重新订阅 {len(self.subscriptions)} 个频道")
-        for channel_key, sub_info in self.subscriptions.items():
-            try:
-                self._send_subscribe(sub_info["channel"], sub_info["inst_id"], sub_info.get("extra_args", {}))
-                logger.debug(f"[WS] 重新订阅: {channel_key}")
-            except Exception as e:
-                logger.error(f"[WS] 重新订阅失败 {channel_key}: {e}")
-    
-    def _send_subscribe(self, channel: str, inst_id: str, extra_args: Dict = None):
-        """发送订阅请求"""
-        args = {
-            "channel": channel,
-            "instId": inst_id
-        }
-        if extra_args:
-            args.update(extra_args)
-        
-        msg = {
-            "op": "subscribe",
-            "args": [args]
-        }
-        
-        self._safe_send(json.dumps(msg))
-    
-    def _safe_send(self, message: str) -> bool:
-        """
-        [Fix #1] 线程安全的消息发送
-        
-        使用 ws_lock 保护 ws.send() 调用，防止并发写入导致的 Broken Pipe
-        
-        Args:
-            message: 要发送的消息字符串
-            
-        Returns:
-            是否发送成功
-        """
-        with self.ws_lock:
-            if self.ws and self.connected:
-                try:
-                    self.ws.send(message)
-                    # 调试：打印发送的消息（仅订阅请求）
-                    if '"op": "subscribe"' in message or '"op":"subscribe"' in message:
-                        logger.debug(f"[WS] 发送订阅请求: {message[:200]}")
-                    return True
-                except Exception as e:
-                    logger.warning(f"[WS] 发送失败: {e}")
-                    return False
-            else:
-                logger.warning(f"[WS] 无法发送: ws={self.ws is not None} connected={self.connected}")
-        return False
-    
     def _handle_data_push(self, data: Dict):
         """处理数据推送"""
         arg = data.get("arg", {})
@@ -475,38 +749,30 @@ class OKXWebSocketClient:
         timeframe = channel.replace("candle", "")
         cache_key = f"{inst_id}:{timeframe}"
         
-        with self.candle_cache_lock:
-            if cache_key not in self.candle_cache:
-                self.candle_cache[cache_key] = []
-            
+        buffer = self._get_or_create_buffer(cache_key)
+        with buffer.lock:
             for candle in candles:
                 # OKX 格式: [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]
-                # 转换为标准格式: [ts, o, h, l, c, vol]
-                ts = int(candle[0])
-                o = float(candle[1])
-                h = float(candle[2])
-                l = float(candle[3])
-                c = float(candle[4])
-                vol = float(candle[5])
-                
-                standard_candle = [ts, o, h, l, c, vol]
-                
-                # 更新或追加
-                existing = self.candle_cache[cache_key]
-                updated = False
-                for i, ec in enumerate(existing):
-                    if ec[0] == ts:
-                        existing[i] = standard_candle
-                        updated = True
-                        break
-                
-                if not updated:
-                    existing.append(standard_candle)
-                    # 保持排序
-                    existing.sort(key=lambda x: x[0])
-                    # 限制缓存大小
-                    if len(existing) > 1000:
-                        self.candle_cache[cache_key] = existing[-1000:]
+                # 转换为标准格式: [ts, o, h, l, c, vol]，更新或追加
+                buffer.upsert((
+                    int(candle[0]),
+                    float(candle[1]),
+                    float(candle[2]),
+                    float(candle[3]),
+                    float(candle[4]),
+                    float(candle[5]),
+                ))
+    
+    def _get_or_create_buffer(self, cache_key: str) -> CandleRingBuffer:
+        """获取 key 对应的缓冲，不存在则创建（双重检查，只有新建时才加全局锁）"""
+        buffer = self.candle_cache.get(cache_key)
+        if buffer is None:
+            with self.candle_cache_lock:
+                buffer = self.candle_cache.get(cache_key)
+                if buffer is None:
+                    buffer = CandleRingBuffer(self.candle_cache_capacity)
+                    self.candle_cache[cache_key] = buffer
+        return buffer
     
     def _handle_ticker_data(self, inst_id: str, tickers: List):
         """处理行情数据"""
@@ -536,45 +802,33 @@ class OKXWebSocketClient:
         Returns:
             是否订阅成功
         """
-        # 转换 symbol 格式: "BTC/USDT:USDT" -> "BTC-USDT-SWAP"
-        inst_id = self._convert_symbol(symbol)
-        
-        # OKX WebSocket K线频道格式
-        tf_normalized = self._normalize_timeframe(timeframe)
-        channel = f"candle{tf_normalized}"
-        channel_key = f"{channel}:{inst_id}"
-        
-        # 去重检查：如果已订阅，只添加回调，不重复发送请求
-        already_subscribed = channel_key in self.subscriptions
-        
-        # 记录订阅信息
-        self.subscriptions[channel_key] = {
-            "channel": channel,
-            "inst_id": inst_id,
-            "timeframe": timeframe
-        }
+        return self.subscribe_candles_many([symbol], [timeframe], callback)
+    
+    def subscribe_candles_many(self, symbols: List[str], timeframes: List[str],
+                               callback: Callable = None) -> bool:
+        """
+        批量订阅 K线数据（symbols × timeframes）
         
-        # 注册回调
-        if callback:
-            self.callbacks[channel_key].append(callback)
+        新频道按连接分组，每条连接合并为 subscribe_batch 个参数一帧发送，
+        避免每个频道一个请求帧（OKX 对每条连接的订阅请求次数有限制）。
         
-        # 已订阅则跳过发送
-        if already_subscribed:
-            logger.debug(f"[WS] 已订阅，跳过重复请求: {channel_key}")
-            return True
+        Args:
+            symbols: 交易对列表
+            timeframes: 时间周期列表
+            callback: 数据回调函数（可选，注册到每个频道）
         
-        # 发送订阅请求（使用线程安全方法）
-        if self.connected:
-            if self._safe_send(json.dumps({
-                "op": "subscribe",
-                "args": [{"channel": channel, "instId": inst_id}]
-            })):
-                logger.debug(f"[WS] 订阅 K线: {inst_id} {timeframe}")
-                return True
-            return False
-        else:
-            logger.debug(f"[WS] 未连接，订阅将在连接后自动执行: {inst_id} {timeframe}")
-            return False
+        Returns:
+            是否全部订阅成功（未连接时订阅将在连接后自动执行，返回 False）
+        """
+        items = []
+        for symbol in symbols:
+            # 转换 symbol 格式: "BTC/USDT:USDT" -> "BTC-USDT-SWAP"
+            inst_id = self._convert_symbol(symbol)
+            for timeframe in timeframes:
+                # OKX WebSocket K线频道格式
+                channel = f"candle{self._normalize_timeframe(timeframe)}"
+                items.append((channel, inst_id, {"timeframe": timeframe}))
+        return self._subscribe(items, callback, "K线")
     
     def subscribe_ticker(self, symbol: str, callback: Callable = None) -> bool:
         """
@@ -588,39 +842,78 @@ class OKXWebSocketClient:
             是否订阅成功
         """
         inst_id = self._convert_symbol(symbol)
-        channel = "tickers"
-        channel_key = f"{channel}:{inst_id}"
-        
-        # 去重检查：如果已订阅，只添加回调，不重复发送请求
-        already_subscribed = channel_key in self.subscriptions
-        
-        # 记录订阅信息
-        self.subscriptions[channel_key] = {
-            "channel": channel,
-            "inst_id": inst_id
-        }
+        return self._subscribe([("tickers", inst_id, {})], callback, "行情")
+    
+    def _subscribe(self, items: List, callback: Optional[Callable], label: str) -> bool:
+        """
+        记录订阅、分配连接并批量发送
         
-        # 注册回调
-        if callback:
-            self.callbacks[channel_key].append(callback)
+        Args:
+            items: [(channel, inst_id, 额外订阅信息), ...]
+            callback: 数据回调函数（可选）
+            label: 日志中的频道类型
+        """
+        pending: Dict[WSConnection, List[Dict]] = defaultdict(list)
         
-        # 已订阅则跳过发送
-        if already_subscribed:
-            logger.debug(f"[WS] 已订阅，跳过重复请求: {channel_key}")
-            return True
+        with self.subs_lock:
+            for channel, inst_id, extra in items:
+                channel_key = f"{channel}:{inst_id}"
+                
+                # 注册回调
+                if callback:
+                    self.callbacks[channel_key].append(callback)
+                
+                # 去重检查：如果已订阅，只添加回调，不重复发送请求
+                if channel_key in self.subscriptions:
+                    logger.debug(f"[WS] 已订阅，跳过重复请求: {channel_key}")
+                    continue
+                
+                # 记录订阅信息
+                self.subscriptions[channel_key] = {"channel": channel, "inst_id": inst_id, **extra}
+                args = {"channel": channel, "instId": inst_id}
+                conn = self._assign_connection(channel_key)
+                with conn.lock:
+                    conn.channels[channel_key] = args
+                pending[conn].append(args)
+        
+        ok = True
+        for conn, args in pending.items():
+            # 发送订阅请求（使用线程安全方法）
+            if not conn.connected:
+                logger.debug(f"[{conn.name}] 未连接，{len(args)} 个{label}订阅将在连接后自动执行")
+                ok = False
+            elif not conn.send_subscribe(args):
+                ok = False
+            else:
+                logger.debug(f"[{conn.name}] 订阅 {label}: {len(args)} 个频道")
+        return ok
+    
+    def _assign_connection(self, channel_key: str) -> WSConnection:
+        """
+        为新频道分配连接（调用方需持有 subs_lock）
         
-        # 发送订阅请求（使用线程安全方法）
-        if self.connected:
-            if self._safe_send(json.dumps({
-                "op": "subscribe",
-                "args": [{"channel": channel, "instId": inst_id}]
-            })):
-                logger.debug(f"[WS] 订阅行情: {inst_id}")
-                return True
-            return False
-        else:
-            logger.debug(f"[WS] 未连接，订阅将在连接后自动执行: {inst_id}")
-            return False
+        依次填满每条连接的 channels_per_conn 个频道，都满时新建连接；
+        连接数达到 max_connections 后分配给频道最少的连接。
+        """
+        conn = next((c for c in self.connections if len(c.channels) < self.channels_per_conn), None)
+        if conn is None:
+            if len(self.connections) < self.max_connections:
+                conn = WSConnection(self, len(self.connections))
+                self.connections.append(conn)
+                if self._started:
+                    conn.start()
+                logger.info(f"[WS] 新建订阅分片 {conn.name}（共 {len(self.connections)} 条连接）")
+            else:
+                conn = min(self.connections, key=lambda c: len(c.channels))
+        self._channel_conn[channel_key] = conn
+        return conn
+    
+    def _on_subscribe_ack(self, arg: Dict):
+        """订阅确认：转发给承载该频道的连接（用于统计重新订阅耗时）"""
+        channel_key = f"{arg.get('channel', '')}:{arg.get('instId', '')}"
+        conn = self._channel_conn.get(channel_key)
+        if conn is not None:
+            conn.on_subscribe_ack(channel_key)
     
     def unsubscribe(self, symbol: str, channel_type: str = "candle", timeframe: str = "1m") -> bool:
         """
@@ -644,23 +937,18 @@ class OKXWebSocketClient:
         channel_key = f"{channel}:{inst_id}"
         
         # 移除订阅记录
-        if channel_key in self.subscriptions:
-            del self.subscriptions[channel_key]
-        
-        # 移除回调
-        if channel_key in self.callbacks:
-            del self.callbacks[channel_key]
+        with self.subs_lock:
+            self.subscriptions.pop(channel_key, None)
+            self.callbacks.pop(channel_key, None)
+            conn = self._channel_conn.pop(channel_key, None)
+            if conn is not None:
+                with conn.lock:
+                    conn.channels.pop(channel_key, None)
+                    conn._resub_pending.discard(channel_key)
         
         # 发送取消订阅请求（使用线程安全方法）
-        if self.connected:
-            msg = {
-                "op": "unsubscribe",
-                "args": [{
-                    "channel": channel,
-                    "instId": inst_id
-                }]
-            }
-            if self._safe_send(json.dumps(msg)):
+        if conn is not None and conn.connected:
+            if conn.send_subscribe([{"channel": channel, "instId": inst_id}], op="unsubscribe"):
                 logger.debug(f"[WS] 取消订阅: {channel_key}")
                 return True
             else:
@@ -681,15 +969,37 @@ class OKXWebSocketClient:
         Returns:
             K线数据列表 [[ts, o, h, l, c, vol], ...]
         """
+        return self._candles_to_list(self.get_candles_array(symbol, timeframe, limit))
+    
+    def get_candles_array(self, symbol: str, timeframe: str = "1m", limit: int = 500) -> np.ndarray:
+        """
+        获取缓存的 K线数据（只读 NumPy 视图，无深拷贝）
+        
+        Args:
+            symbol: 交易对
+            timeframe: 时间周期
+            limit: 返回数量限制
+        
+        Returns:
+            shape (n, 6) 的 float64 数组，列为 [ts, o, h, l, c, vol]
+        """
         inst_id = self._convert_symbol(symbol)
         tf_normalized = self._normalize_timeframe(timeframe)
         cache_key = f"{inst_id}:{tf_normalized}"
         
-        with self.candle_cache_lock:
-            data = self.candle_cache.get(cache_key, [])
-            if limit and len(data) > limit:
-                return data[-limit:]
-            return data.copy()
+        # 无锁读取：字典查找和快照发布在 GIL 下都是原子的
+        buffer = self.candle_cache.get(cache_key)
+        if buffer is None:
+            return np.empty((0, CandleRingBuffer.COLUMNS), dtype=np.float64)
+        return buffer.snapshot(limit)
+    
+    @staticmethod
+    def _candles_to_list(candles: np.ndarray) -> List:
+        """NumPy K线数组 -> [[ts(int), o, h, l, c, vol], ...]"""
+        rows = candles.tolist()
+        for row in rows:
+            row[0] = int(row[0])
+        return rows
     
     def get_ticker(self, symbol: str) -> Optional[Dict]:
         """
@@ -729,17 +1039,41 @@ class OKXWebSocketClient:
     
     def get_cache_stats(self) -> Dict:
         """获取缓存统计信息"""
-        with self.candle_cache_lock:
-            candle_stats = {
-                key: len(data) for key, data in self.candle_cache.items()
-            }
+        buffers = list(self.candle_cache.items())
+        candle_stats = {key: len(buffer) for key, buffer in buffers}
         
         return {
             "connected": self.connected,
             "subscriptions": len(self.subscriptions),
             "candle_cache": candle_stats,
             "ticker_cache": len(self.ticker_cache),
-            "reconnect_attempts": self.reconnect_attempts
+            "reconnect_attempts": self.reconnect_attempts,
+            "connections": [conn.stats() for conn in list(self.connections)],
+            "lock_contention": self._get_lock_contention_stats(buffers),
+        }
+    
+    def _get_lock_contention_stats(self, buffers: List) -> Dict:
+        """
+        汇总缓存写锁的争用情况
+        
+        读取路径无锁，因此这里只统计写入方（消息消费线程 / warmup_cache）之间的争用。
+        """
+        locks = [buffer.lock for _, buffer in buffers]
+        acquisitions = sum(lock.acquisitions for lock in locks)
+        contended = sum(lock.contended for lock in locks)
+        wait_total = sum(lock.wait_total for lock in locks)
+        wait_max = max((lock.wait_max for lock in locks), default=0.0)
+        registry = self.candle_cache_lock
+        
+        return {
+            "key_locks": len(locks),
+            "acquisitions": acquisitions,
+            "contended": contended,
+            "contention_rate": contended / acquisitions if acquisitions else 0.0,
+            "wait_ms_total": wait_total * 1000,
+            "wait_ms_max": wait_max * 1000,
+            "registry_acquisitions": registry.acquisitions,
+            "registry_contended": registry.contended,
         }
     
     def warmup_cache(self, symbol: str, timeframe: str, ohlcv_data: List) -> int:
@@ -764,50 +1098,24 @@ class OKXWebSocketClient:
         tf_normalized = self._normalize_timeframe(timeframe)
         cache_key = f"{inst_id}:{tf_normalized}"
         
-        with self.candle_cache_lock:
-            # 如果缓存已存在，合并数据（去重）
-            if cache_key in self.candle_cache:
-                existing = self.candle_cache[cache_key]
-                existing_ts = {candle[0] for candle in existing}
-                
-                # 只添加不存在的 K线
-                new_candles = [c for c in ohlcv_data if c[0] not in existing_ts]
-                if new_candles:
-                    existing.extend(new_candles)
-                    # 按时间戳排序
-                    existing.sort(key=lambda x: x[0])
-                    # 限制缓存大小
-                    if len(existing) > 1000:
-                        self.candle_cache[cache_key] = existing[-1000:]
-                    
-                    logger.debug(f"[WS] 预热合并: {cache_key} +{len(new_candles)} bars, total={len(self.candle_cache[cache_key])}")
-                    return len(new_candles)
-                return 0
-            else:
-                # 缓存不存在，直接设置
-                # 确保数据格式正确：[[ts, o, h, l, c, vol], ...]
-                normalized_data = []
-                for candle in ohlcv_data:
-                    if len(candle) >= 6:
-                        normalized_data.append([
-                            int(candle[0]),    # ts
-                            float(candle[1]),  # open
-                            float(candle[2]),  # high
-                            float(candle[3]),  # low
-                            float(candle[4]),  # close
-                            float(candle[5])   # volume
-                        ])
-                
-                # 按时间戳排序
-                normalized_data.sort(key=lambda x: x[0])
-                
-                # 限制缓存大小
-                if len(normalized_data) > 1000:
-                    normalized_data = normalized_data[-1000:]
-                
-                self.candle_cache[cache_key] = normalized_data
-                logger.info(f"[WS] 预热完成: {cache_key} = {len(normalized_data)} bars")
-                return len(normalized_data)
+        # 确保数据格式正确：[[ts, o, h, l, c, vol], ...]
+        rows = np.array(
+            [candle[:6] for candle in ohlcv_data if len(candle) >= 6],
+            dtype=np.float64
+        ).reshape(-1, CandleRingBuffer.COLUMNS)
+        
+        buffer = self._get_or_create_buffer(cache_key)
+        with buffer.lock:
+            is_new = len(buffer) == 0
+            added = buffer.load(rows)
+            total = len(buffer)
+        
+        if is_new:
+            logger.info(f"[WS] 预热完成: {cache_key} = {total} bars")
+            return total
+        if added:
+            logger.debug(f"[WS] 预热合并: {cache_key} +{added} bars, total={total}")
+        return added
     
     def get_cache_count(self, symbol: str, timeframe: str) -> int:
         """
@@ -824,8 +1132,8 @@ class OKXWebSocketClient:
         tf_normalized = self._normalize_timeframe(timeframe)
         cache_key = f"{inst_id}:{tf_normalized}"
         
-        with self.candle_cache_lock:
-            return len(self.candle_cache.get(cache_key, []))
+        buffer = self.candle_cache.get(cache_key)
+        return len(buffer) if buffer is not None else 0
     
     def _normalize_timeframe(self, timeframe: str) -> str:
         """
@@ -265,7 +265,7 @@ class SafeStreamHandler(logging.StreamHandler):
 
 
 # 配置日志
-log_dir = "logs"
+log_dir = os.getenv("LOG_DIR", "logs")
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+#
+#    _   _  __   __ __        __  _____ ___  ____   _   _  ___ 
+#   | | | | \ \ / / \ \      / / | ____||_ _|/ ___| | | | ||_ _|
+#   | |_| |  \ V /   \ \ /\ / /  |  _|   | | \___ \ | |_| | | | 
+#   |  _  |   | |     \ V  V /   | |___  | |  ___) ||  _  | | | 
+#   |_| |_|   |_|      \_/\_/    |_____||___||____/ |_| |_||___|
+#
+#                         何 以 为 势
+#                  Quantitative Trading System
+#
+#   Copyright (c) 2024-2025 HyWeiShi. All Rights Reserved.
+#   License: AGPL-3.0
+#
+# ============================================================================
+"""
+回填 AI 风险聚合数据
+
+ai_stats 的峰值资金、回撤、连亏、单日 PnL 等字段在平仓时增量维护。
+旧数据库升级时 AIDBManager 会自动回填一次；统计与平仓记录不一致时也可手动运行，
+从 ai_positions 的已平仓记录重算全部统计。
+
+用法:
+    python scripts/backfill_ai_stats.py [arena.db 路径]
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.ai_db_manager import AIDBManager, ARENA_DB_PATH
+
+
+def backfill_ai_stats(db_path: str = ARENA_DB_PATH):
+    """重算所有 AI 的统计与风险聚合"""
+    print("=" * 50)
+    print(f"回填 AI 统计数据: {db_path}")
+    print("=" * 50)
+    
+    manager = AIDBManager(db_path)
+    counts = manager.backfill_stats()
+    
+    print(f"\n{'AI':<12} {'平仓数':<8} {'总PnL':<12} {'最大回撤%':<10} {'当前回撤%':<10} {'连亏':<6}")
+    for stats in manager.get_all_stats():
+        print(
+            f"{stats.agent_name:<12} {counts.get(stats.agent_name, 0):<8} "
+            f"{stats.total_pnl:<12.2f} {stats.max_drawdown:<10.2f} "
+            f"{stats.current_drawdown:<10.2f} {stats.consecutive_losses:<6}"
+        )
+    
+    print("\n回填完成")
+
+
+if __name__ == "__main__":
+    backfill_ai_stats(sys.argv[1] if len(sys.argv) > 1 else ARENA_DB_PATH)
@@ -112,6 +112,227 @@ def benchmark_indicators():
     return timeit(test, iterations=50)
 
 
+def _benchmark_db_bridge(use_pool: bool):
+    """db_bridge 单次调用延迟（临时 SQLite 库，模拟交易循环的高频读写）"""
+    import tempfile
+    from database import db_bridge
+    
+    db_config = {"kind": "sqlite", "path": os.path.join(tempfile.mkdtemp(), "benchmark.db")}
+    db_bridge.init_db(db_config)
+    db_bridge.update_paper_position("BTC/USDT:USDT", "long", qty=1.0, entry_price=50000.0, db_config=db_config)
+    
+    previous = db_bridge._use_connection_pool
+    db_bridge._use_connection_pool = use_pool
+    
+    def test():
+        db_bridge.get_paper_position("BTC/USDT:USDT", "long", db_config)
+        db_bridge.get_hedge_positions("BTC/USDT:USDT", db_config)
+        db_bridge.set_signal_cache("BTC/USDT:USDT", "1m", "BUY", 1704067200000, db_config)
+        db_bridge.get_signal_cache("BTC/USDT:USDT", "1m", "BUY", db_config)
+    
+    try:
+        return timeit(test, iterations=200)
+    finally:
+        db_bridge._use_connection_pool = previous
+
+
+def benchmark_db_direct():
+    """数据库桥接层基准：每次调用新建连接"""
+    return _benchmark_db_bridge(use_pool=False)
+
+
+def benchmark_db_pooled():
+    """数据库桥接层基准：连接池 + 语句缓存"""
+    return _benchmark_db_bridge(use_pool=True)
+
+
+def _benchmark_config_reads(snapshot: bool):
+    """交易循环每轮的配置读取（bot_config + control_flags）"""
+    import tempfile
+    from database import db_bridge
+    from database.config_snapshot import ConfigSnapshot
+    
+    db_config = {"kind": "sqlite", "path": os.path.join(tempfile.mkdtemp(), "benchmark.db")}
+    db_bridge.init_db(db_config)
+    cache = ConfigSnapshot(db_config)
+    
+    def test():
+        if snapshot:
+            cache.get('bot_config')
+            cache.get('control_flags')
+        else:
+            db_bridge.get_bot_config(db_config)
+            db_bridge.get_control_flags(db_config)
+    
+    return timeit(test, iterations=1000)
+
+
+def benchmark_config_direct():
+    """配置读取基准：每次查询数据库"""
+    return _benchmark_config_reads(snapshot=False)
+
+
+def benchmark_config_snapshot():
+    """配置读取基准：进程内快照 + 版本号轮询"""
+    return _benchmark_config_reads(snapshot=True)
+
+
+def _benchmark_ohlcv_scan(columnar: bool):
+    """扫描路径：1000 根K线缓存合并一根新K线 + 取 DataFrame，之后同一根K线内再读 4 次"""
+    import pandas as pd
+    from core.market_data_provider import OHLCVBars
+    
+    minute = 60 * 1000
+    candles = [[i * minute, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(1000)]
+    bars = OHLCVBars(capacity=1000)
+    bars.merge(candles)
+    state = {'ts': 1000 * minute, 'list': candles}
+    
+    def test():
+        new = [[state['ts'], 1.0, 2.0, 0.5, 1.5, 10.0]]
+        state['ts'] += minute
+        for _ in range(5):
+            if columnar:
+                if new:
+                    bars.merge(new)
+                    new = None
+                bars.to_frame()
+            else:
+                if new:
+                    ts_map = {c[0]: c for c in state['list']}
+                    ts_map.update((c[0], c) for c in new)
+                    state['list'] = sorted(ts_map.values(), key=lambda x: x[0])[-1000:]
+                    new = None
+                df = pd.DataFrame(state['list'], columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    
+    return timeit(test, iterations=200)
+
+
+def benchmark_ohlcv_list():
+    """K线缓存基准：列表合并 + 每次转换 DataFrame"""
+    return _benchmark_ohlcv_scan(columnar=False)
+
+
+def benchmark_ohlcv_columnar():
+    """K线缓存基准：结构化数组追加 + 按版本缓存的 DataFrame"""
+    return _benchmark_ohlcv_scan(columnar=True)
+
+
+_arena_bench_manager = None
+_ARENA_BENCH_AGENTS = ['deepseek', 'qwen', 'perplexity', 'gpt', 'claude']
+
+
+def _arena_bench_db():
+    """构造合成竞技场库：ARENA_BENCH_POSITIONS 笔持仓（默认 100 万），平仓时间分布在过去一年"""
+    global _arena_bench_manager
+    if _arena_bench_manager is not None:
+        return _arena_bench_manager
+    
+    import random
+    import sqlite3
+    import tempfile
+    from ai.ai_db_manager import AIDBManager
+    
+    total = int(os.getenv("ARENA_BENCH_POSITIONS", "1000000"))
+    path = os.path.join(tempfile.mkdtemp(), "arena_benchmark.db")
+    manager = AIDBManager(path)
+    
+    rng = random.Random(42)
+    now_ms = int(time.time() * 1000)
+    year_ms = 365 * 86400 * 1000
+    
+    def rows():
+        for i in range(total):
+            agent = _ARENA_BENCH_AGENTS[i % len(_ARENA_BENCH_AGENTS)]
+            created = now_ms - rng.randrange(year_ms)
+            if i % 1000 == 0:
+                yield (agent, "BTC/USDT:USDT", "long", 100.0, 50000.0, created, "open", None, None, None)
+            else:
+                exit_time = created + rng.randrange(3600 * 1000)
+                yield (agent, "BTC/USDT:USDT", "long", 100.0, 50000.0, created,
+                       "closed", 50100.0, exit_time, rng.uniform(-5, 5))
+    
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO ai_positions
+        (agent_name, symbol, side, qty, entry_price, created_at, status, exit_price, exit_time, pnl)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows())
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    
+    _arena_bench_manager = manager
+    return manager
+
+
+def _benchmark_arena_cycle(indexed: bool):
+    """竞技场每轮的持仓查询（每个 AI：未平仓 / 单日 PnL / 回撤 / 连亏 / 交易历史）"""
+    import sqlite3
+    from ai.ai_db_manager import _POSITION_INDEXES
+    
+    manager = _arena_bench_db()
+    if not indexed:
+        conn = sqlite3.connect(manager.db_path)
+        for index_name in _POSITION_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        conn.commit()
+        conn.close()
+    
+    def test():
+        for agent in _ARENA_BENCH_AGENTS:
+            manager.get_open_positions(agent)
+            manager.get_daily_pnl(agent)
+            manager.get_max_drawdown(agent)
+            manager.get_consecutive_losses(agent)
+            manager.get_trade_history(agent, limit=20)
+    
+    return timeit(test, iterations=20 if indexed else 3)
+
+
+def benchmark_arena_indexed():
+    """竞技场持仓查询基准：复合索引"""
+    return _benchmark_arena_cycle(indexed=True)
+
+
+def benchmark_arena_full_scan():
+    """竞技场持仓查询基准：无索引（全表扫描，对照组）"""
+    return _benchmark_arena_cycle(indexed=False)
+
+
+def _benchmark_arena_decisions(batched: bool):
+    """一轮竞技场决策落库（5 个 AI × 30 个币种）"""
+    import tempfile
+    from ai.ai_db_manager import AIDBManager, AIDecision
+    
+    manager = AIDBManager(os.path.join(tempfile.mkdtemp(), "arena_decisions.db"))
+    decisions = [
+        AIDecision(agent_name=agent, symbol=f"SYM{i}/USDT:USDT", signal="HOLD", price=1.0,
+                   reasoning="benchmark", indicators_snapshot="{}", timeframe="5m")
+        for agent in _ARENA_BENCH_AGENTS for i in range(30)
+    ]
+    
+    def test():
+        if batched:
+            manager.save_decisions_batch(decisions)
+        else:
+            for decision in decisions:
+                manager.save_decision(decision)
+    
+    return timeit(test, iterations=20)
+
+
+def benchmark_arena_decisions_single():
+    """竞技场决策落库基准：逐条提交"""
+    return _benchmark_arena_decisions(batched=False)
+
+
+def benchmark_arena_decisions_batch():
+    """竞技场决策落库基准：整轮一个事务"""
+    return _benchmark_arena_decisions(batched=True)
+
+
 def main():
     print("=" * 60)
     print("何以为势 - 性能基准测试")
@@ -123,6 +344,16 @@ def main():
         ("策略注册表 (500 次)", benchmark_strategy_registry),
         ("AI 服务商 (500 次)", benchmark_ai_providers),
         ("技术指标 (50 次)", benchmark_indicators),
+        ("数据库直连 (200 次)", benchmark_db_direct),
+        ("数据库连接池 (200 次)", benchmark_db_pooled),
+        ("配置直读 (1000 次)", benchmark_config_direct),
+        ("配置快照 (1000 次)", benchmark_config_snapshot),
+        ("K线列表缓存 (200 次)", benchmark_ohlcv_list),
+        ("K线列式缓存 (200 次)", benchmark_ohlcv_columnar),
+        ("竞技场持仓查询 (20 轮)", benchmark_arena_indexed),
+        ("竞技场全表扫描 (3 轮)", benchmark_arena_full_scan),
+        ("决策逐条保存 (20 轮)", benchmark_arena_decisions_single),
+        ("决策批量保存 (20 轮)", benchmark_arena_decisions_batch),
     ]
     
     results = []
@@ -158,6 +389,16 @@ def main():
         "策略注册表": 1.0,    # 单次 < 1ms
         "AI 服务商": 0.5,     # 单次 < 0.5ms
         "技术指标": 50.0,     # 单次 < 50ms
+        "数据库直连": 20.0,   # 4 次调用 < 20ms
+        "数据库连接池": 2.0,  # 4 次调用 < 2ms
+        "配置直读": float("inf"),  # 对照组，不设阈值
+        "配置快照": 0.05,  # 2 次读取 < 0.05ms（只在版本号变化时回源）
+        "K线列表缓存": float("inf"),  # 对照组，不设阈值
+        "K线列式缓存": 2.0,  # 1 次合并 + 5 次取 DataFrame < 2ms
+        "竞技场持仓查询": 100.0,  # 100 万笔持仓，5 个 AI 每轮 < 100ms
+        "竞技场全表扫描": float("inf"),  # 对照组，不设阈值
+        "决策逐条保存": float("inf"),  # 对照组，不设阈值
+        "决策批量保存": 20.0,  # 150 条决策一个事务 < 20ms
     }
     
     all_pass = True
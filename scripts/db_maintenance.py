@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+#
+#    _   _  __   __ __        __  _____ ___  ____   _   _  ___ 
+#   | | | | \ \ / / \ \      / / | ____||_ _|/ ___| | | | ||_ _|
+#   | |_| |  \ V /   \ \ /\ / /  |  _|   | | \___ \ | |_| | | | 
+#   |  _  |   | |     \ V  V /   | |___  | |  ___) ||  _  | | | 
+#   |_| |_|   |_|      \_/\_/    |_____||___||____/ |_| |_||___|
+#
+#                         何 以 为 势
+#                  Quantitative Trading System
+#
+#   Copyright (c) 2024-2025 HyWeiShi. All Rights Reserved.
+#   License: AGPL-3.0
+#
+# ============================================================================
+"""
+数据库维护：按保留策略清理 / 降采样 / 归档，并回收空间
+
+交易引擎运行时会在扫描间隙自动执行（见 database.maintenance），本脚本用于手动跑完整一轮。
+--full-vacuum 对尚未开启增量 VACUUM 的旧库执行一次完整 VACUUM（会锁库，请在停机时运行）。
+
+用法:
+    python scripts/db_maintenance.py [--full-vacuum]
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.maintenance import DatabaseMaintenance
+
+
+def run_maintenance(full_vacuum: bool = False):
+    """跑完整一轮维护并打印报告"""
+    print("=" * 50)
+    print("数据库维护" + ("（完整 VACUUM）" if full_vacuum else ""))
+    print("=" * 50)
+    
+    report = DatabaseMaintenance().run_pass(full_vacuum=full_vacuum)
+    
+    print(f"\n{'表':<22} {'维护前':<10} {'维护后':<10} {'删除':<8} {'归档':<8} {'降采样':<8} {'查询ms 前→后':<14}")
+    for table, t in report.tables.items():
+        print(
+            f"{table:<22} {t.rows_before:<10} {t.rows_after:<10} {t.deleted:<8} "
+            f"{t.archived:<8} {t.downsampled:<8} {t.query_ms_before:.1f}→{t.query_ms_after:.1f}"
+        )
+    
+    print()
+    for name, before in report.file_bytes_before.items():
+        after = report.file_bytes_after.get(name, before)
+        reclaimed = report.reclaimed_bytes.get(name, 0)
+        print(f"{name}: 文件 {before / 1024 / 1024:.1f}MB → {after / 1024 / 1024:.1f}MB，回收空闲页 {reclaimed / 1024 / 1024:.1f}MB")
+    for path in report.archive_files:
+        print(f"归档: {path}")
+    
+    print("\n维护完成")
+
+
+if __name__ == "__main__":
+    run_maintenance(full_vacuum="--full-vacuum" in sys.argv[1:])
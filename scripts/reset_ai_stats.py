@@ -57,7 +57,15 @@ def reset_ai_stats():
             current_streak = 0,
             best_trade = 0.0,
             worst_trade = 0.0,
-            avg_pnl = 0.0
+            avg_pnl = 0.0,
+            peak_equity = 10000.0,
+            max_drawdown = 0.0,
+            current_drawdown = 0.0,
+            consecutive_losses = 0,
+            max_win_streak = 0,
+            max_loss_streak = 0,
+            daily_pnl = 0.0,
+            daily_pnl_date = ''
     """)
     conn.commit()
     print(f"\n 已重置 {cursor.rowcount} 条统计记录")
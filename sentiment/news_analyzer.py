@@ -289,10 +289,24 @@ class SmartNewsAnalyzer:
         self._cache = NewsAnalysisCache(db_path)
         self._last_long_short_ratio: Optional[float] = None
         self._ai_provider: str = "deepseek"
+        self._ai_client = None
     
     def set_ai_provider(self, provider: str):
         """设置 AI 服务商"""
         self._ai_provider = provider
+        self._ai_client = None
+    
+    def _get_ai_client(self):
+        """获取 AI 客户端（复用实例，底层走共享 HTTP 连接池）"""
+        if self._ai_client is None:
+            from ai.ai_providers import create_client, get_provider
+            
+            provider = get_provider(self._ai_provider)
+            if not provider:
+                logger.warning(f"[SmartNewsAnalyzer] 未找到 AI 服务商: {self._ai_provider}")
+                return None
+            self._ai_client = create_client(provider.id)
+        return self._ai_client
     
     def _hash_news(self, title: str) -> str:
         """生成新闻唯一标识"""
@@ -332,14 +346,7 @@ class SmartNewsAnalyzer:
     async def analyze_news_with_ai(self, news: NewsItem) -> Optional[NewsDigest]:
         """使用 AI 分析单条新闻，生成压缩摘要"""
         try:
-            from ai.ai_providers import create_client, get_provider
-            
-            provider = get_provider(self._ai_provider)
-            if not provider:
-                logger.warning(f"[SmartNewsAnalyzer] 未找到 AI 服务商: {self._ai_provider}")
-                return None
-            
-            client = create_client(provider)
+            client = self._get_ai_client()
             if not client:
                 return None
             
@@ -356,7 +363,7 @@ class SmartNewsAnalyzer:
 JSON 格式回复：
 {{"summary": "简短摘要", "impact": "bullish/bearish/neutral", "score": 0}}"""
 
-            response = await client.chat(prompt)
+            response = await client.chat_async(prompt)
             
             # 解析响应
             content = response
@@ -381,13 +388,7 @@ JSON 格式回复：
     async def analyze_long_short_with_ai(self, ratio: float, symbol: str = "BTC") -> Optional[MarketSignal]:
         """使用 AI 分析多空比"""
         try:
-            from ai.ai_providers import create_client, get_provider
-            
-            provider = get_provider(self._ai_provider)
-            if not provider:
-                return None
-            
-            client = create_client(provider)
+            client = self._get_ai_client()
             if not client:
                 return None
             
@@ -400,7 +401,7 @@ JSON 格式回复：
 
 直接回复解读，不要其他内容。"""
 
-            response = await client.chat(prompt)
+            response = await client.chat_async(prompt)
             interpretation = response.strip()[:30]
             
             return MarketSignal(
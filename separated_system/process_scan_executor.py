@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+多进程策略扫描执行器
+
+策略指标计算主要是 pandas/NumPy 运算，线程池受 GIL 限制，
+币种多时基本只能用满一个核心。本模块提供可选的进程池后端：
+
+- 每个工作进程在启动时实例化一次策略（常驻热实例），后续扫描直接复用
+- 币种按名称哈希固定分配到工作进程，子进程内的逐币种状态跨扫描保留
+- K线数据打包进一块共享内存（float64 [n, 6]），子进程按偏移量读取，不再 pickle DataFrame
+- 结果按提交顺序（币种顺序）合并
+- 返回分阶段耗时（打包 / 计算 / 进程通信 / 合并），供 render_scan_block 的 debug_timing 使用
+
+通过环境变量选择后端：
+- STRATEGY_SCAN_BACKEND: thread（默认）| process
+- STRATEGY_SCAN_WORKERS: 进程数（默认 CPU 核心数）
+"""
+import os
+import time
+import zlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# 工作进程内的常驻策略实例
+_worker_strategy = None
+_worker_strategy_id = None
+
+
+def get_scan_backend() -> str:
+    """读取扫描后端配置（thread / process）"""
+    backend = os.getenv("STRATEGY_SCAN_BACKEND", "thread").strip().lower()
+    return backend if backend in ("thread", "process") else "thread"
+
+
+def get_scan_workers() -> int:
+    """读取扫描进程数配置"""
+    try:
+        workers = int(os.getenv("STRATEGY_SCAN_WORKERS", "0"))
+    except ValueError:
+        workers = 0
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _init_scan_worker(strategy_id: str):
+    """工作进程初始化：实例化一次策略并常驻"""
+    global _worker_strategy, _worker_strategy_id
+    from strategies.strategy_registry import get_strategy_registry
+    _worker_strategy = get_strategy_registry().instantiate_strategy(strategy_id)
+    _worker_strategy_id = strategy_id
+
+
+def _frame_to_rows(df: pd.DataFrame) -> np.ndarray:
+    """DataFrame -> float64 [n, 6]，时间戳转为毫秒（float64 可精确表示毫秒时间戳）"""
+    rows = np.empty((len(df), len(OHLCV_COLUMNS)), dtype=np.float64)
+    ts = df['timestamp']
+    if pd.api.types.is_datetime64_any_dtype(ts):
+        rows[:, 0] = ts.values.astype('datetime64[ms]').astype(np.int64)
+    else:
+        rows[:, 0] = ts.to_numpy(dtype=np.float64)
+    for j, col in enumerate(OHLCV_COLUMNS[1:], start=1):
+        rows[:, j] = df[col].to_numpy(dtype=np.float64)
+    return rows
+
+
+def _rows_to_frame(rows: np.ndarray) -> pd.DataFrame:
+    """float64 [n, 6] -> DataFrame（复制出共享内存，策略可自由写列）"""
+    df = pd.DataFrame(rows, columns=OHLCV_COLUMNS, copy=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(np.int64), unit='ms')
+    return df
+
+
+def _analyze_chunk(shm_name: str, total_rows: int, timeframe: str,
+                   jobs: List[Tuple[int, str, int, int]]):
+    """
+    子进程：分析一批币种
+
+    参数:
+    - shm_name: 共享内存名称
+    - total_rows: 共享内存中的总行数
+    - timeframe: 扫描周期
+    - jobs: [(任务序号, symbol, 行偏移, 行数), ...]
+
+    返回: ([(任务序号, symbol, scan_results), ...], 计算耗时)
+    """
+    start = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((total_rows, len(OHLCV_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+        results = []
+        for task_idx, symbol, offset, rows in jobs:
+            try:
+                df = _rows_to_frame(block[offset:offset + rows])
+                scan_results = _worker_strategy.run_analysis_with_data(symbol, {timeframe: df}, [timeframe])
+                results.append((task_idx, symbol, scan_results))
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"[process] {symbol} 分析失败: {e}")
+        del block
+    finally:
+        shm.close()
+    return results, time.perf_counter() - start
+
+
+class ProcessScanExecutor:
+    """
+    进程池扫描执行器
+
+    每个工作进程是一个单进程池，币种按名称哈希固定分配到同一个进程，
+    子进程内按 (symbol, timeframe) 保留的策略状态（如增量指标引擎）跨扫描有效。
+    策略 ID 变化时重建全部进程；超时只放弃本轮结果，进程保留；
+    只有进程崩溃（BrokenProcessPool）时才重建该进程。
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or get_scan_workers()
+        self._pools: List[Optional[ProcessPoolExecutor]] = [None] * self.workers
+        self._strategy_id: Optional[str] = None
+
+    def _ensure_pool(self, strategy_id: str, slot: int) -> ProcessPoolExecutor:
+        if self._strategy_id != strategy_id:
+            self.shutdown()
+            self._strategy_id = strategy_id
+            logger.info(f"[process] 扫描进程池已启动 | 策略: {strategy_id} | 进程数: {self.workers}")
+        if self._pools[slot] is None:
+            self._pools[slot] = ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_scan_worker,
+                initargs=(strategy_id,)
+            )
+        return self._pools[slot]
+
+    def _recycle(self, slot: int, reason: Exception):
+        """工作进程崩溃：丢弃该进程池，下次扫描重新启动"""
+        logger.warning(f"[process] 扫描进程 #{slot} 已崩溃，将重新启动: {reason}")
+        pool, self._pools[slot] = self._pools[slot], None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def worker_for(self, symbol: str) -> int:
+        """币种固定分配到的工作进程序号（跨扫描、跨进程稳定）"""
+        return zlib.crc32(symbol.encode('utf-8')) % self.workers
+
+    def run(self, strategy_id: str, timeframe: str,
+            tasks: List[Tuple[str, pd.DataFrame]],
+            timeout: float = 10) -> Tuple[List[Tuple[str, list]], Dict[str, float], List[str]]:
+        """
+        并行分析多个币种
+
+        参数:
+        - strategy_id: 策略 ID（子进程按 ID 实例化策略）
+        - timeframe: 扫描周期
+        - tasks: [(symbol, DataFrame), ...]
+        - timeout: 等待结果的超时时间（秒）
+
+        返回: ([(symbol, scan_results), ...] 按 tasks 顺序, 分阶段耗时, 未拿到结果的币种)
+        超时或进程崩溃的批次计入未完成币种，由调用方决定是否补算。
+        """
+        timing = {'scan_pack': 0.0, 'scan_compute': 0.0, 'scan_ipc': 0.0, 'scan_merge': 0.0}
+        if not tasks:
+            return [], timing, []
+
+        # 1. 打包：所有币种的K线拼接进一块共享内存
+        t0 = time.perf_counter()
+        arrays = [_frame_to_rows(df) for _, df in tasks]
+        total_rows = sum(len(a) for a in arrays)
+        shm = shared_memory.SharedMemory(create=True, size=max(total_rows * len(OHLCV_COLUMNS) * 8, 1))
+        chunk_results = []
+        missing = []
+        try:
+            block = np.ndarray((total_rows, len(OHLCV_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+            chunks: Dict[int, List[Tuple[int, str, int, int]]] = {}
+            offset = 0
+            for idx, ((symbol, _), arr) in enumerate(zip(tasks, arrays)):
+                block[offset:offset + len(arr)] = arr
+                chunks.setdefault(self.worker_for(symbol), []).append((idx, symbol, offset, len(arr)))
+                offset += len(arr)
+            del block
+            timing['scan_pack'] = time.perf_counter() - t0
+
+            # 2. 计算：每个工作进程一批
+            t1 = time.perf_counter()
+            futures = {}
+            for slot, chunk in chunks.items():
+                try:
+                    pool = self._ensure_pool(strategy_id, slot)
+                    futures[slot] = pool.submit(_analyze_chunk, shm.name, total_rows, timeframe, chunk)
+                except BrokenProcessPool as e:
+                    self._recycle(slot, e)
+                    missing.extend(symbol for _, symbol, _, _ in chunk)
+            compute_max = 0.0
+            deadline = t1 + timeout
+            for slot, future in futures.items():
+                try:
+                    results, compute_cost = future.result(timeout=max(deadline - time.perf_counter(), 0))
+                except FutureTimeoutError:
+                    logger.warning(f"[process] 扫描进程 #{slot} 超时，本轮 {len(chunks[slot])} 个币种待补算")
+                    missing.extend(symbol for _, symbol, _, _ in chunks[slot])
+                    continue
+                except BrokenProcessPool as e:
+                    self._recycle(slot, e)
+                    missing.extend(symbol for _, symbol, _, _ in chunks[slot])
+                    continue
+                chunk_results.append(results)
+                compute_max = max(compute_max, compute_cost)
+            wall = time.perf_counter() - t1
+            timing['scan_compute'] = compute_max
+            timing['scan_ipc'] = max(wall - compute_max, 0.0)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # 3. 合并：按任务序号恢复币种顺序
+        t2 = time.perf_counter()
+        ordered = sorted((item for results in chunk_results for item in results), key=lambda item: item[0])
+        merged = [(symbol, scan_results) for _, symbol, scan_results in ordered]
+        timing['scan_merge'] = time.perf_counter() - t2
+        return merged, timing, missing
+
+    def shutdown(self):
+        """关闭全部工作进程"""
+        for slot, pool in enumerate(self._pools):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pools[slot] = None
+        self._strategy_id = None
+
+
+_process_scan_executor: Optional[ProcessScanExecutor] = None
+
+
+def get_process_scan_executor() -> ProcessScanExecutor:
+    """获取全局进程池扫描执行器（懒加载）"""
+    global _process_scan_executor
+    if _process_scan_executor is None:
+        _process_scan_executor = ProcessScanExecutor()
+    return _process_scan_executor
@@ -29,13 +29,6 @@ from datetime import datetime
 from typing import Dict, Any, List
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# 异步市场数据获取器
-try:
-    from core.async_market_fetcher import fetch_batch_ohlcv_sync, FetchTask
-    ASYNC_FETCHER_AVAILABLE = True
-except ImportError:
-    ASYNC_FETCHER_AVAILABLE = False
-
 # 加载环境变量
 try:
     from dotenv import load_dotenv
@@ -126,8 +119,8 @@ from core.config import (
     EXIT_ON_FATAL, MAX_CYCLE_ERRORS
 )
 from database.db_bridge import (
-    init_db, get_engine_status, get_control_flags,
-    get_bot_config, set_control_flags, update_engine_status,
+    init_db, get_engine_status,
+    set_control_flags, update_engine_status,
     insert_performance_metrics, upsert_ohlcv, insert_signal_event,
     get_paper_balance, update_paper_balance,
     get_paper_positions, get_paper_position, update_paper_position,
@@ -144,9 +137,19 @@ from database.db_bridge import (
     # WebSocket 状态同步
     update_ws_status
 )
+# 遥测 / 缓存类写入走写后台队列，不阻塞扫描；订单、成交仍同步落库
+from database.write_behind import (
+    defer_set_signal_cache, defer_upsert_ohlcv, defer_update_engine_status,
+    defer_update_ws_status, defer_insert_performance_metrics,
+    flush_writes, shutdown_writes
+)
+from database.maintenance import get_maintenance
+# 配置 / 控制标志每轮（每个币种）都要读，走进程内快照，只在版本号变化时回源
+from database.config_snapshot import get_bot_config, get_control_flags
 from utils.logging_utils import setup_logger, get_logger, render_scan_block, render_idle_block, render_risk_check
 from exchange_adapters.factory import ExchangeAdapterFactory
 from core.market_data_provider import MarketDataProvider
+from core.rate_limiter import get_rate_limiter
 
 # WebSocket 数据源支持
 try:
@@ -187,6 +190,9 @@ from strategies.strategy_registry import (
 _ohlcv_cache: Dict[str, Any] = {}  # {(symbol, timeframe): {'data': df, 'ts': timestamp}}
 _OHLCV_CACHE_TTL = 30  # 缓存有效期（秒）
 
+# 多进程策略扫描后端（STRATEGY_SCAN_BACKEND=process 时启用）
+from separated_system.process_scan_executor import get_scan_backend, get_process_scan_executor
+
 # 并行策略分析的线程池（全局复用，避免重复创建）
 _strategy_executor = None
 _STRATEGY_EXECUTOR_WORKERS = 4  # 并行工作线程数
@@ -199,6 +205,50 @@ def get_strategy_executor():
     return _strategy_executor
 
 
+def _is_analyzable(symbol, ticker, symbol_data, timeframe, ohlcv_lag_dict, ohlcv_stale_dict) -> bool:
+    """分析前置检查：价格有效、K线存在且未滞后/未 stale"""
+    if not ticker or ticker.get("last", 0) <= 0:
+        return False
+    
+    if symbol_data is None:
+        return False
+    
+    # 检查 K线数据是否存在
+    if symbol_data.get(timeframe) is None:
+        return False
+    
+    # 检查 K线数据是否滞后
+    if ohlcv_lag_dict.get(symbol, {}).get(timeframe, False):
+        return False
+    
+    # 检查 K线数据是否为 stale
+    if ohlcv_stale_dict.get(symbol, {}).get(timeframe, False):
+        return False
+    
+    return True
+
+
+def _analyze_symbols_in_processes(analysis_tasks, strategy_id, timeframe, timeout=10):
+    """
+    多进程策略分析（STRATEGY_SCAN_BACKEND=process）
+    
+    参数: analysis_tasks 同 _analyze_symbol 的参数元组列表
+    返回: ([(symbol, scan_results, curr_price), ...] 按币种顺序, 分阶段耗时, 超时/崩溃未完成的币种)
+    """
+    prices = {}
+    process_tasks = []
+    for symbol, ticker, symbol_data, tf, ohlcv_lag_dict, ohlcv_stale_dict, _ in analysis_tasks:
+        if not _is_analyzable(symbol, ticker, symbol_data, tf, ohlcv_lag_dict, ohlcv_stale_dict):
+            continue
+        prices[symbol] = ticker.get("last")
+        process_tasks.append((symbol, symbol_data[tf]))
+    
+    merged, stage_timing, missing = get_process_scan_executor().run(
+        strategy_id, timeframe, process_tasks, timeout=timeout
+    )
+    return [(symbol, scan_results, prices[symbol]) for symbol, scan_results in merged], stage_timing, missing
+
+
 def _analyze_symbol(args):
     """
     单个币种的策略分析（用于并行执行）
@@ -211,25 +261,7 @@ def _analyze_symbol(args):
     symbol, ticker, symbol_data, timeframe, ohlcv_lag_dict, ohlcv_stale_dict, strategy_engine = args
     
     try:
-        if not ticker or ticker.get("last", 0) <= 0:
-            return None
-        
-        if symbol_data is None:
-            return None
-        
-        # 检查 K线数据是否存在
-        _df = symbol_data.get(timeframe)
-        if _df is None:
-            return None
-        
-        # 检查 K线数据是否滞后
-        is_lag = ohlcv_lag_dict.get(symbol, {}).get(timeframe, False)
-        if is_lag:
-            return None
-        
-        # 检查 K线数据是否为 stale
-        is_stale = ohlcv_stale_dict.get(symbol, {}).get(timeframe, False)
-        if is_stale:
+        if not _is_analyzable(symbol, ticker, symbol_data, timeframe, ohlcv_lag_dict, ohlcv_stale_dict):
             return None
         
         curr_price = ticker.get("last")
@@ -309,7 +341,7 @@ def should_execute_signal(symbol: str, timeframe: str, action: str, candle_time:
     
     # P2修复: 同时持久化到数据库
     try:
-        set_signal_cache(symbol, timeframe, action, candle_time)
+        defer_set_signal_cache(symbol, timeframe, action, candle_time)
     except Exception:
         pass  # 数据库写入失败不影响交易
     
@@ -382,10 +414,12 @@ def fetch_prices_for_holdings(exchange, force: bool = False) -> Dict[str, Dict]:
     if not position_symbols:
         return _holdings_price_cache
     
-    # 直接调用 ccxt API 获取最新价格
+    # 直接调用 ccxt API 获取最新价格（经全局限流器，与其他 REST 调用方共享行情额度）
     new_prices = {}
+    limiter = get_rate_limiter()
     for symbol in position_symbols:
         try:
+            limiter.acquire('ticker')
             ticker = exchange.fetch_ticker(symbol)
             if ticker:
                 new_prices[symbol] = ticker
@@ -907,9 +941,7 @@ def main():
     
     # WebSocket 订阅（在币种验证之后执行）
     if ws_provider is not None and ws_provider.is_connected():
-        for sym in TRADE_SYMBOLS:
-            for tf in ['1m', '3m', '5m']:  # 订阅常用周期
-                ws_provider.subscribe(sym, tf)
+        ws_provider.subscribe_many(TRADE_SYMBOLS, ['1m', '3m', '5m'])  # 订阅常用周期（批量订阅帧）
         logger.info(f"[WS] 已订阅 {len(TRADE_SYMBOLS)} 个已验证币种的 K线数据")
         
         # 混合模式核心：用 REST API 预热 WebSocket 缓存 
@@ -1469,6 +1501,10 @@ def main():
     WS_REALTIME_SCAN_INTERVAL = 1  # 每1秒扫描一次（真正的实时模式）
     last_ws_scan_time = 0  # 上次 WebSocket 扫描时间
     
+    # 数据库保留 / 降采样 / 增量 VACUUM 只在扫描间隙运行，下次扫描前预留余量
+    db_maintenance = get_maintenance()
+    DB_MAINTENANCE_IDLE_MARGIN_SEC = 0.2
+    
     while True:
         # 极速监听系统时间
         now = datetime.now()
@@ -1489,12 +1525,14 @@ def main():
                 should_scan = True
                 scan_mode = "WebSocket"
                 last_ws_scan_time = current_time
+            next_scan_at = last_ws_scan_time + WS_REALTIME_SCAN_INTERVAL
         else:
             # REST 整点扫描模式：每分钟 00-02 秒触发
             if 0 <= now.second <= 2 and now.minute != last_trigger_minute:
                 should_scan = True
                 scan_mode = "REST"
                 last_trigger_minute = now.minute
+            next_scan_at = time.time() + 60 - now.second - now.microsecond / 1e6
         
         if should_scan:
             cycle_id += 1  # 递增周期ID
@@ -1519,13 +1557,13 @@ def main():
             trading_enabled = enable_trading == 1 and pause_trading != 1
             
             if enable_trading != 1:
-                update_engine_status(alive=1, pause_trading=0)
+                defer_update_engine_status(alive=1, pause_trading=0)
                 if previous_state != "idle":
                     render_idle_block(now.strftime('%H:%M:%S'), "交易功能已禁用，扫描已停止", logger)
                     previous_state = "idle"
                 _prev_enable_trading = 0
             elif pause_trading == 1:
-                update_engine_status(alive=1, pause_trading=1)
+                defer_update_engine_status(alive=1, pause_trading=1)
                 if previous_state != "paused":
                     render_idle_block(now.strftime('%H:%M:%S'), "交易已暂停，扫描已停止", logger)
                     previous_state = "paused"
@@ -1637,7 +1675,7 @@ def main():
                 print(f"\n{'='*70}")
                 print(f"🛑 [{now.strftime('%H:%M:%S')}] 收到停止信号，正在停止引擎...")
                 print(f"{'='*70}")
-                update_engine_status(alive=0)
+                defer_update_engine_status(alive=0)
                 break
             
             # 检查并处理紧急平仓
@@ -1646,6 +1684,7 @@ def main():
                 print(f"\n{'='*70}")
                 print(f"🚨 [{now.strftime('%H:%M:%S')}] 执行紧急平仓...")
                 print(f"{'='*70}")
+                flush_writes()
                 try:
                     if run_mode == "live":
                         # 实盘模式：从交易所获取真实持仓
@@ -1930,7 +1969,7 @@ def main():
                             logger.error(f"更新账户余额失败: {e}")
                 except Exception as e:
                     logger.error(f"执行紧急平仓操作失败: {e}")
-                    update_engine_status(last_error=str(e))
+                    defer_update_engine_status(last_error=str(e))
                 finally:
                     set_control_flags(emergency_flatten=0)
                     print(f"    紧急平仓操作完成")
@@ -2000,7 +2039,7 @@ def main():
                                     # 更新 WebSocket 状态到数据库
                                     try:
                                         ws_stats = ws_provider.ws_client.get_cache_stats() if ws_provider.ws_client else {}
-                                        update_ws_status(
+                                        defer_update_ws_status(
                                             connected=True,
                                             subscriptions=ws_stats.get('subscriptions', 0),
                                             candle_cache_count=len(ws_stats.get('candle_cache', {}))
@@ -2020,7 +2059,7 @@ def main():
                                 logger.info("[WS] WebSocket 数据源已停止（静默热加载）")
                                 # 更新 WebSocket 状态到数据库
                                 try:
-                                    update_ws_status(connected=False, subscriptions=0, candle_cache_count=0)
+                                    defer_update_ws_status(connected=False, subscriptions=0, candle_cache_count=0)
                                 except Exception:
                                     pass
                             except Exception:
@@ -2030,7 +2069,7 @@ def main():
                         data_source_mode = new_data_source_mode
                     
                     last_config_updated_at = new_bot_config.get('updated_at', 0)
-                    update_engine_status(run_mode=run_mode)
+                    defer_update_engine_status(run_mode=run_mode)
                 except Exception as e:
                     logger.error(f"配置重载失败: {e}")
         
@@ -2090,9 +2129,7 @@ def main():
                     
                     # WebSocket 订阅（在币种验证之后执行）
                     if ws_provider is not None and ws_provider.is_connected():
-                        for sym in TRADE_SYMBOLS:
-                            for tf in ['1m', '3m', '5m']:
-                                ws_provider.subscribe(sym, tf)
+                        ws_provider.subscribe_many(TRADE_SYMBOLS, ['1m', '3m', '5m'])
                         logger.info(f"[WS] 已订阅 {len(TRADE_SYMBOLS)} 个已验证币种的 K线数据（热加载）")
                         
                         # 混合模式：预热 WebSocket 缓存 
@@ -2113,7 +2150,7 @@ def main():
                         # 立即更新 WebSocket 状态到数据库（供 UI 读取）
                         try:
                             ws_stats = ws_provider.ws_client.get_cache_stats() if ws_provider.ws_client else {}
-                            update_ws_status(
+                            defer_update_ws_status(
                                 connected=True,
                                 subscriptions=ws_stats.get('subscriptions', 0),
                                 candle_cache_count=len(ws_stats.get('candle_cache', {}))
@@ -2214,12 +2251,12 @@ def main():
                 for symbol in current_symbols:
                     for tf in due_timeframes:
                         try:
-                            # 直接从缓存读取 K 线数据
-                            ohlcv_data = ws_client.get_candles(symbol, tf, limit=1000)
+                            # 直接从缓存读取 K 线数据（只读 NumPy 视图，无逐行转换）
+                            ohlcv_data = ws_client.get_candles_array(symbol, tf, limit=1000)
                             
-                            if ohlcv_data and len(ohlcv_data) > 0:
+                            if len(ohlcv_data) > 0:
                                 # 转换为 DataFrame
-                                df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                                df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'], copy=True)
                                 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
                                 
                                 # 存入预加载数据
@@ -2259,34 +2296,27 @@ def main():
             else:
                 # REST 整点扫描模式：使用原有的并行拉取逻辑
                 
-                # 定义并行拉取任务（带重试）
-                def fetch_ohlcv_task(symbol: str, tf: str, retry_count: int = 0):
-                    """并行拉取单个币种单个周期的K线数据"""
-                    max_retries = 2
-                    last_error = None
+                def fetch_ohlcv_batch():
+                    """通过 MarketDataProvider 一次性获取所有币种 / 周期的K线（缓存判断 + 增量并发拉取）"""
+                    if provider is None:
+                        # 模拟数据
+                        mock_data = [[expected_closed_candle_ts, 45000, 45100, 44900, 45050, 1000]]
+                        return [(symbol, tf, mock_data, None, False, None)
+                                for symbol in current_symbols for tf in due_timeframes]
                     
                     # 日线格式转换：1D -> 1Dutc（与 TradingView 对齐）
-                    actual_tf = normalize_daily_timeframe(tf)
-                    
-                    for attempt in range(max_retries + 1):
-                        try:
-                            # REST 数据源
-                            if provider is not None:
-                                ohlcv_data, is_stale = provider.get_ohlcv(
-                                    symbol, timeframe=actual_tf, limit=1000
-                                )
-                                return symbol, tf, ohlcv_data, is_stale, None
-                            else:
-                                # 模拟数据
-                                mock_data = [[expected_closed_candle_ts, 45000, 45100, 44900, 45050, 1000]]
-                                return symbol, tf, mock_data, False, None
-                        except Exception as e:
-                            last_error = str(e)
-                            if attempt < max_retries:
-                                time.sleep(0.2 * (attempt + 1))  # 指数退避
-                            continue
-                    
-                    return symbol, tf, None, False, last_error
+                    key_tf = {
+                        (symbol, normalize_daily_timeframe(tf)): tf
+                        for symbol in current_symbols for tf in due_timeframes
+                    }
+                    batch = provider.get_ohlcv_many(list(key_tf), limit=1000)
+                    fetched = []
+                    for (symbol, actual_tf), result in batch.items():
+                        # 复用 provider 按K线版本缓存的 DataFrame，避免每轮重新转换
+                        ohlcv_df = provider.get_cached_ohlcv_frame(symbol, actual_tf) if result.data else None
+                        fetched.append((symbol, key_tf[(symbol, actual_tf)], result.data, ohlcv_df,
+                                        result.is_stale, result.error))
+                    return fetched
                 
                 # 优先处理待初始化的币种（上一轮失败的）
                 if provider is not None:
@@ -2294,62 +2324,36 @@ def main():
                     if pending_symbols:
                         logger.info(f"[scan] 发现 {len(pending_symbols)} 个待初始化币种，优先处理")
                 
-                # 异步并发获取（推荐）vs 同步串行获取
-                use_async_fetcher = ASYNC_FETCHER_AVAILABLE and os.getenv("USE_ASYNC_FETCHER", "true").lower() == "true"
+                # MarketDataProvider 批量获取：首次全量分页拉取（ccxt 异步拉取器可用时所有币种并发），
+                # 之后只增量拉取最新 1~3 根K线合并进缓存（USE_ASYNC_FETCHER=false 时回退到线程池）
+                logger.debug("[scan] 使用 MarketDataProvider 批量获取模式")
                 
-                if use_async_fetcher:
-                    # 异步并发模式：真正的并发，耗时 < 1 秒
-                    logger.debug("[scan] 使用异步并发获取模式")
-                    
-                    # 构建异步任务列表（日线格式转换：1D -> 1Dutc）
-                    async_tasks = [
-                        (symbol, normalize_daily_timeframe(tf), 50)  # (symbol, timeframe, limit)
-                        for symbol in current_symbols
-                        for tf in due_timeframes
-                    ]
-                    
-                    # 获取 API 凭证
-                    api_key = os.getenv("OKX_API_KEY", "")
-                    api_secret = os.getenv("OKX_API_SECRET", "")
-                    passphrase = os.getenv("OKX_API_PASSPHRASE", "")
-                    sandbox = os.getenv("OKX_SANDBOX", "false").lower() == "true"
-                    
-                    # 执行异步批量获取
-                    async_results = fetch_batch_ohlcv_sync(
-                        tasks=async_tasks,
-                        api_key=api_key,
-                        api_secret=api_secret,
-                        passphrase=passphrase,
-                        sandbox=sandbox,
-                        market_type="swap",
-                        max_concurrent=20,
-                    )
-                    
-                    # 处理异步结果（需要将 1Dutc 映射回 1D）
-                    for (sym, actual_tf), ohlcv_data in async_results.items():
-                        # 将 1Dutc 映射回 1D（用于存储和后续处理）
-                        tf = '1D' if actual_tf == '1Dutc' else actual_tf
+                for sym, tf, ohlcv_data, df, is_stale, error in fetch_ohlcv_batch():
+                    try:
+                        if error:
+                            logger.warning(f"[scan] K线获取失败 {sym} {tf}: {error}")
+                            fetch_failed_list.append((sym, tf))
+                            continue
                         
                         if ohlcv_data and len(ohlcv_data) > 0:
                             # 计算该周期的期望K线时间戳
                             tf_ms = {
-                                '1m': 60000, '3m': 180000, '5m': 300000, 
+                                '1m': 60000, '3m': 180000, '5m': 300000,
                                 '15m': 900000, '30m': 1800000, '1h': 3600000,
                                 '4h': 14400000, '1D': 86400000, '1Dutc': 86400000
                             }.get(tf, 60000)
                             expected_tf_ts = ((current_minute_ts // tf_ms) * tf_ms) - tf_ms
                             latest_candle_ts = ohlcv_data[-1][0]
                             is_lag = latest_candle_ts < expected_tf_ts
-                            is_stale = False
                             
                             if is_lag:
                                 ohlcv_lag_count += 1
+                                logger.debug(f"[scan-skip] reason=data_lag symbol={sym} tf={tf}")
                             
-                            # 转换为 DataFrame
-                            df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+                            if df is None:
+                                df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
                             
-                            # 存入预加载数据
                             if sym not in preloaded_data:
                                 preloaded_data[sym] = {}
                             preloaded_data[sym][tf] = df
@@ -2366,69 +2370,14 @@ def main():
                                 ohlcv_lag_dict[sym] = {}
                             ohlcv_lag_dict[sym][tf] = is_lag
                             
-                            upsert_ohlcv(sym, tf, ohlcv_data)
+                            defer_upsert_ohlcv(sym, tf, ohlcv_data)
                             ohlcv_ok_count += 1
+                            if is_stale:
+                                ohlcv_stale_count += 1
                         else:
                             fetch_failed_list.append((sym, tf))
-                
-                else:
-                    # 同步串行模式（旧逻辑，作为回退）
-                    logger.debug("[scan] 使用同步串行获取模式")
-                    fetch_tasks = []
-                    
-                    with ThreadPoolExecutor(max_workers=10) as executor:
-                        for symbol in current_symbols:
-                            for tf in due_timeframes:
-                                fetch_tasks.append(executor.submit(fetch_ohlcv_task, symbol, tf))
-                        
-                        # 等待所有结果
-                        for future in as_completed(fetch_tasks):
-                            try:
-                                sym, tf, ohlcv_data, is_stale, error = future.result()
-                                
-                                if error:
-                                    logger.warning(f"[scan] K线获取失败 {sym} {tf}: {error}")
-                                    fetch_failed_list.append((sym, tf))
-                                    continue
-                                
-                                if ohlcv_data and len(ohlcv_data) > 0:
-                                    # 计算该周期的期望K线时间戳
-                                    tf_ms = {'1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000, '1h': 3600000}.get(tf, 60000)
-                                    expected_tf_ts = ((current_minute_ts // tf_ms) * tf_ms) - tf_ms
-                                    latest_candle_ts = ohlcv_data[-1][0]
-                                    is_lag = latest_candle_ts < expected_tf_ts
-                                    
-                                    if is_lag:
-                                        ohlcv_lag_count += 1
-                                        logger.debug(f"[scan-skip] reason=data_lag symbol={sym} tf={tf}")
-                                    
-                                    df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                                    
-                                    if sym not in preloaded_data:
-                                        preloaded_data[sym] = {}
-                                    preloaded_data[sym][tf] = df
-                                    
-                                    if sym not in ohlcv_data_dict:
-                                        ohlcv_data_dict[sym] = {}
-                                    ohlcv_data_dict[sym][tf] = ohlcv_data
-                                    
-                                    if sym not in ohlcv_stale_dict:
-                                        ohlcv_stale_dict[sym] = {}
-                                    ohlcv_stale_dict[sym][tf] = is_stale
-                                    
-                                    if sym not in ohlcv_lag_dict:
-                                        ohlcv_lag_dict[sym] = {}
-                                    ohlcv_lag_dict[sym][tf] = is_lag
-                                    
-                                    upsert_ohlcv(sym, tf, ohlcv_data)
-                                    ohlcv_ok_count += 1
-                                    if is_stale:
-                                        ohlcv_stale_count += 1
-                                else:
-                                    fetch_failed_list.append((sym, tf))
-                            except Exception as e:
-                                logger.error(f"并行拉取结果处理失败: {e}")
+                    except Exception as e:
+                        logger.error(f"并行拉取结果处理失败: {e}")
                 
                 fetch_cost = time.perf_counter() - fetch_start_time
                 
@@ -2440,6 +2389,7 @@ def main():
             
             # 记录信号计算开始时间
             signal_calc_start = time.perf_counter()
+            scan_stage_timing = {}  # 多进程后端的分阶段耗时（各周期累加）
             
             # K线获取结果记录到DEBUG日志
             log_parts = [f"K线获取: {ohlcv_ok_count}/{len(current_symbols) * len(due_timeframes)}"]
@@ -2481,7 +2431,7 @@ def main():
                     if market_data_fail_count >= 3:
                         logger.warning(f"行情断流: 连续{market_data_fail_count}次失败，自动暂停")
                         set_control_flags(pause_trading=1)
-                        update_engine_status(ts=int(time.time() * 1000), last_error=f"行情断流")
+                        defer_update_engine_status(ts=int(time.time() * 1000), last_error=f"行情断流")
                     continue
                 else:
                     market_data_fail_count = 0
@@ -2714,7 +2664,38 @@ def main():
                 PARALLEL_THRESHOLD = 8  # 币种数量超过此阈值才使用并行
                 
                 if analysis_tasks:
-                    if len(analysis_tasks) >= PARALLEL_THRESHOLD:
+                    if len(analysis_tasks) >= PARALLEL_THRESHOLD and get_scan_backend() == "process":
+                        # 多进程执行：子进程常驻策略实例，K线经共享内存传递
+                        # 超时 / 崩溃的币种在剩余时间内用线程池补算，进程池保留（崩溃的进程由执行器自行重建）
+                        ANALYSIS_BUDGET_SEC = 10
+                        try:
+                            analysis_results, stage_timing, missing = _analyze_symbols_in_processes(
+                                analysis_tasks, strategy_id, timeframe, timeout=ANALYSIS_BUDGET_SEC
+                            )
+                            for stage, cost in stage_timing.items():
+                                scan_stage_timing[stage] = scan_stage_timing.get(stage, 0.0) + cost
+                        except Exception as e:
+                            logger.warning(f"[process] 多进程分析失败，本轮回退线程池: {e}")
+                            analysis_results = []
+                            missing = [task[0] for task in analysis_tasks]
+                        
+                        remaining = ANALYSIS_BUDGET_SEC - (time.time() - analysis_start)
+                        if missing and remaining > 0:
+                            missing_set = set(missing)
+                            retry_tasks = [task for task in analysis_tasks if task[0] in missing_set]
+                            executor = get_strategy_executor()
+                            try:
+                                for result in executor.map(_analyze_symbol, retry_tasks, timeout=remaining):
+                                    if result is not None:
+                                        analysis_results.append(result)
+                            except Exception as e:
+                                logger.warning(f"[parallel] 补算超时或失败: {e}")
+                            # 恢复币种顺序
+                            order = {task[0]: i for i, task in enumerate(analysis_tasks)}
+                            analysis_results.sort(key=lambda item: order[item[0]])
+                        elif missing:
+                            logger.warning(f"[process] 本轮分析预算已用完，跳过 {len(missing)} 个币种")
+                    elif len(analysis_tasks) >= PARALLEL_THRESHOLD:
                         # 并行执行：币种多时使用线程池
                         executor = get_strategy_executor()
                         try:
@@ -3036,6 +3017,10 @@ def main():
                         can_execute_real_order = False
                         can_execute_paper_order = False
                 
+                # 下单前先落库此前的延迟写入（信号缓存等），保证崩溃重启后不会重复下单
+                if can_execute_real_order or can_execute_paper_order:
+                    flush_writes()
+                
                 if can_execute_real_order:
                     try:
                         # P1修复: 价格偏离保护（滑点检查）
@@ -3138,7 +3123,7 @@ def main():
                         scan_orders += 1
                     except Exception as e:
                         logger.error(f"真实订单执行失败: {e}")
-                        update_engine_status(last_error=str(e))
+                        defer_update_engine_status(last_error=str(e))
                         cycle_error_count += 1
                 elif can_execute_paper_order:
                     try:
@@ -3259,7 +3244,7 @@ def main():
                         # 注意：这里不需要使交易所的缓存失效，因为paper模式不与交易所交互
                     except Exception as e:
                         logger.error(f"模拟订单执行失败: {e}", exc_info=True)
-                        update_engine_status(last_error=str(e))
+                        defer_update_engine_status(last_error=str(e))
                         cycle_error_count += 1
                 elif plan_order is not None:
                     # 订单被拦截，记录拦截原因（只有当plan_order存在时才记录）
@@ -3294,7 +3279,7 @@ def main():
             except Exception:
                 plan_order_json = "{}"
             
-            update_engine_status(
+            defer_update_engine_status(
                 ts=int(time.time() * 1000),
                 alive=1,
                 cycle_ms=cycle_time,
@@ -3309,19 +3294,19 @@ def main():
                 if ws_provider is not None:
                     ws_connected = ws_provider.is_connected()
                     ws_stats = ws_provider.ws_client.get_cache_stats() if ws_provider.ws_client else {}
-                    update_ws_status(
+                    defer_update_ws_status(
                         connected=ws_connected,
                         subscriptions=ws_stats.get('subscriptions', 0),
                         candle_cache_count=len(ws_stats.get('candle_cache', {}))
                     )
                 else:
-                    update_ws_status(connected=False, subscriptions=0, candle_cache_count=0)
+                    defer_update_ws_status(connected=False, subscriptions=0, candle_cache_count=0)
             except Exception:
                 pass  # 静默处理，不影响主循环
             
             try:
                 # 记录性能指标
-                insert_performance_metrics(metrics)
+                defer_insert_performance_metrics(metrics)
                 
                 # 重置错误计数
                 cycle_error_count = 0
@@ -3355,7 +3340,8 @@ def main():
                         debug_timing={
                             'price_fetch': price_fetch_time,
                             'data_fetch': fetch_cost,
-                            'signal_calc': signal_calc_cost
+                            'signal_calc': signal_calc_cost,
+                            **scan_stage_timing
                         }
                     )
                 
@@ -3368,7 +3354,7 @@ def main():
                     'mode': run_mode
                 }
                 logger.error(f"循环执行错误: {e}", extra=extra)
-                update_engine_status(
+                defer_update_engine_status(
                     alive=1,
                     last_error=str(e),
                     run_mode=run_mode
@@ -3377,7 +3363,7 @@ def main():
                 # 检查最大错误数
                 if cycle_error_count >= MAX_CYCLE_ERRORS:
                     logger.error(f"连续错误数达到上限 ({MAX_CYCLE_ERRORS})，引擎将停止", extra=extra)
-                    update_engine_status(alive=0)
+                    defer_update_engine_status(alive=0)
                     if EXIT_ON_FATAL:
                         sys.exit(1)
                     break
@@ -3386,9 +3372,15 @@ def main():
                 time.sleep(SCAN_INTERVAL_SEC * 2)
                 continue
         else:
-            # 未触发扫描时，低延迟空转
+            # 未触发扫描时，把距下次扫描的空闲时间交给数据库维护（后台线程执行，到点前停在块边界）
+            db_maintenance.offer_idle(next_scan_at - DB_MAINTENANCE_IDLE_MARGIN_SEC)
+            # 低延迟空转
             time.sleep(0.01)  # 10ms空转，提高扫描精度
     
+    # 落库剩余的延迟写入，停止数据库维护
+    shutdown_writes()
+    db_maintenance.stop()
+    
     # 清理 WebSocket 连接
     if ws_provider is not None:
         try:
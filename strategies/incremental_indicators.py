@@ -0,0 +1,625 @@
+# -*- coding: utf-8 -*-
+"""
+策略 V2 增量指标引擎
+
+TradingStrategy.calculate_indicators 每次扫描都对整段 K 线（通常 1000 根）全量重算，
+而两次扫描之间往往只多了一根收线 K 线。本模块按 (symbol, timeframe) 保存递推状态：
+
+- EMA / RMA / bcwsma / Wilder 平滑：只保存上一个值，新 K 线 O(1) 递推
+- 滚动窗口（Stochastic、RSV、OBV 标准差、WMA、摆动检测）：只保存窗口内的值
+- 最后一根 K 线视为"未定稿"：只在状态副本上试算，不提交，下次扫描再按收线值提交
+
+状态以首次全量计算时的第一根 K 线为起点（锚定序列），之后的输出与对锚定序列
+调用 _ema_numba / _rma_numba / _bcwsma_numba / _wilder_smoothing_numba 的结果一致
+（浮点误差内）。出现缺口（上次提交的 K 线不在本次数据中）、已提交 K 线被修改、
+或历史长度不足最长 EMA 周期时，回退为全量重算。
+"""
+import threading
+from collections import deque
+from typing import Dict, Tuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from strategies.strategy_v2 import (
+    _ema_numba,
+    _rma_numba,
+    _wilder_smoothing_numba,
+)
+
+# 输出列（与 calculate_indicators 的列顺序一致）
+INDICATOR_COLUMNS = [
+    'stoch_k', 'pk', 'pd', 'obv_plus', 'obv_minus', 'obv_adx', 'trend_adx', 'adx_slope',
+    'ema12', 'fast_top', 'fast_bot', 'slow_top', 'slow_bot', 'macd', 'macd_signal', 'macd_hist',
+    'rsi', 'parsed_high', 'parsed_low', 'leg', 'swing_high_bar', 'swing_low_bar',
+    'swing_high_price', 'swing_low_price', 'swing_high_index', 'swing_low_index', 'atr',
+    'bullish_ob', 'bearish_ob', 'ob_high', 'ob_low', 'ob_time',
+]
+_BOOL_COLUMNS = ('swing_high_bar', 'swing_low_bar', 'bullish_ob', 'bearish_ob')
+
+# 历史存储中额外保存的原始行情列（订单块回溯需要）
+_HISTORY_COLUMNS = INDICATOR_COLUMNS + ['high', 'low', 'close']
+_COL = {name: j for j, name in enumerate(_HISTORY_COLUMNS)}
+
+_EMA_PERIODS = (12, 144, 169, 576, 676, 13, 34)
+# 锚定序列达到最长 EMA 周期后，批量函数的输出才与前缀无关，之后才能增量推进
+_MIN_INCREMENTAL_BARS = max(_EMA_PERIODS)
+_ADX_LEN = 14
+_HISTORY_SLACK = 256
+
+
+def _timestamp_values(df: pd.DataFrame) -> np.ndarray:
+    """时间戳列（交易引擎用 timestamp，双通道引擎用 ts）"""
+    return (df['timestamp'] if 'timestamp' in df.columns else df['ts']).values
+
+
+class _History:
+    """
+    指标历史（二维 float64 存储，尾部追加）
+
+    row 为数组内行号，锚定位置 = base + row。
+    写满后把最近 capacity 行搬到开头，摊还 O(1)。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.full((capacity + _HISTORY_SLACK, len(_HISTORY_COLUMNS)), np.nan)
+        self.base = 0
+        self.length = 0
+
+    def append(self) -> int:
+        if self.length == len(self.data):
+            keep = self.capacity
+            self.data[:keep] = self.data[self.length - keep:self.length]
+            self.data[keep:] = np.nan
+            self.base += self.length - keep
+            self.length = keep
+        row = self.length
+        self.length += 1
+        return row
+
+    def row_of(self, pos: int) -> int:
+        """锚定位置 -> 行号（已淘汰返回 -1）"""
+        row = pos - self.base
+        return row if 0 <= row < self.length else -1
+
+    def tail_copy(self, rows: int) -> '_History':
+        """复制最近 rows 行并预留一行，用于试算未定稿 K 线"""
+        rows = min(rows, self.length)
+        copy = _History.__new__(_History)
+        copy.capacity = rows + 1
+        copy.data = np.full((rows + 1, len(_HISTORY_COLUMNS)), np.nan)
+        copy.data[:rows] = self.data[self.length - rows:self.length]
+        copy.base = self.base + self.length - rows
+        copy.length = rows
+        return copy
+
+
+class _IndicatorState:
+    """单个 (symbol, timeframe) 的递推状态"""
+
+    def __init__(self, strategy):
+        self.k_period = strategy.k_period
+        self.k_smooth = strategy.k_smooth
+        self.kdj_ilong = strategy.kdj_ilong
+        self.kdj_isig = strategy.kdj_isig
+        self.obv_len = strategy.obv_len
+        self.obv_sig = strategy.obv_sig
+        self.rsi_len = strategy.rsi_len
+        self.swing_len = strategy.swing_len
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.history: Optional[_History] = None
+        self.n = 0              # 已提交的锚定 K 线数
+        self.first_ts = None    # 锚定序列第一根 K 线的时间戳
+        self.last_ts = None     # 最后一根已提交 K 线的时间戳
+        self.last_close = np.nan
+
+        self.prev_close = self.prev_high = self.prev_low = np.nan
+        self.obv = 0.0
+        self.ema = {}
+        self.macd_signal = self.plus_ema = self.minus_ema = self.adx_ema = 0.0
+        self.tr_ur_rma = self.gain_rma = self.loss_rma = 0.0
+        self.smoothed_tr = self.smoothed_dm_plus = self.smoothed_dm_minus = 0.0
+        self.pk = self.pd = 0.0
+        self.prev_plus = self.prev_minus = 0.0
+        self.prev_trend_adx = np.nan
+        self.leg = 0
+        self.min_low = np.inf
+        self.max_high = -np.inf
+
+        self.lows = deque(maxlen=self.k_period)
+        self.highs = deque(maxlen=self.k_period)
+        self.stoch_raw = deque(maxlen=self.k_smooth)
+        self.obv_window = deque(maxlen=self.obv_len)
+        self.dx_window = deque(maxlen=_ADX_LEN)
+        self.parsed_highs = deque(maxlen=self.swing_len)
+        self.parsed_lows = deque(maxlen=self.swing_len)
+
+        self.order_blocks = []       # 未失效订单块 [{'type', 'high', 'low', 'index'}]
+        self.mitigated = set()       # 已失效订单块 {(type, index)}
+
+    def clone(self) -> '_IndicatorState':
+        """浅复制标量 + 复制窗口，用于试算未定稿 K 线"""
+        other = _IndicatorState.__new__(_IndicatorState)
+        other.__dict__.update(self.__dict__)
+        other.ema = dict(self.ema)
+        for name in ('lows', 'highs', 'stoch_raw', 'obv_window', 'dx_window', 'parsed_highs', 'parsed_lows'):
+            setattr(other, name, deque(getattr(self, name), maxlen=getattr(self, name).maxlen))
+        other.order_blocks = [dict(ob) for ob in self.order_blocks]
+        other.mitigated = set(self.mitigated)
+        return other
+
+    # ------------------------------------------------------------------
+    # 全量重算（缺口 / 重置 / 历史不足）
+    # ------------------------------------------------------------------
+    def seed(self, strategy, committed: pd.DataFrame, capacity: int):
+        """用批量结果初始化状态，committed 为已收线部分"""
+        self._clear()
+        out = strategy.calculate_indicators(committed.copy())
+
+        close = committed['close'].values.astype(np.float64)
+        high = committed['high'].values.astype(np.float64)
+        low = committed['low'].values.astype(np.float64)
+        n = len(committed)
+
+        self.history = _History(capacity)
+        self.history.length = n
+        if n > len(self.history.data):
+            self.history.data = np.full((n + _HISTORY_SLACK, len(_HISTORY_COLUMNS)), np.nan)
+        for name in INDICATOR_COLUMNS:
+            self.history.data[:n, _COL[name]] = out[name].values.astype(np.float64)
+        self.history.data[:n, _COL['high']] = high
+        self.history.data[:n, _COL['low']] = low
+        self.history.data[:n, _COL['close']] = close
+        # 索引列统一存锚定位置，ob_time 存锚定位置（输出时换回 DataFrame 索引）
+        positions = np.arange(n, dtype=np.float64)
+        self.history.data[:n, _COL['ob_time']] = np.where(out['ob_time'].notna().values, positions, np.nan)
+
+        self.n = n
+        timestamps = _timestamp_values(committed)
+        self.first_ts = timestamps[0]
+        self.last_ts = timestamps[-1]
+        self.last_close = close[-1]
+        self.prev_close, self.prev_high, self.prev_low = close[-1], high[-1], low[-1]
+
+        # Stochastic / RSV 窗口
+        self.lows.extend(low[-self.k_period:])
+        self.highs.extend(high[-self.k_period:])
+        lowest = committed['low'].rolling(self.k_period).min()
+        highest = committed['high'].rolling(self.k_period).max()
+        stoch_raw = (100 * (committed['close'] - lowest) / (highest - lowest)).values
+        self.stoch_raw.extend(stoch_raw[-self.k_smooth:])
+        self.pk = out['pk'].iat[-1]
+        self.pd = out['pd'].iat[-1]
+
+        # OBV-ADX
+        obv = (np.sign(committed['close'].diff()) * committed['volume']).fillna(0).cumsum()
+        self.obv = obv.iat[-1]
+        self.obv_window.extend(obv.values[-self.obv_len:])
+        up = obv.diff()
+        down = -obv.diff()
+        plus_dm = np.where((up > down) & (up > 0), up, 0).astype(np.float64)
+        minus_dm = np.where((down > up) & (down > 0), down, 0).astype(np.float64)
+        obv_stdev = obv.rolling(self.obv_len).std(ddof=1).fillna(0).values.astype(np.float64)
+        self.tr_ur_rma = _rma_numba(obv_stdev, self.obv_len)[-1]
+        self.plus_ema = _ema_numba(plus_dm, self.obv_len)[-1]
+        self.minus_ema = _ema_numba(minus_dm, self.obv_len)[-1]
+        self.prev_plus = out['obv_plus'].iat[-1]
+        self.prev_minus = out['obv_minus'].iat[-1]
+        plus = out['obv_plus'].values
+        minus = out['obv_minus'].values
+        total = plus + minus
+        total = np.where(total == 0, 1, total)
+        self.adx_ema = _ema_numba((np.abs(plus - minus) / total).astype(np.float64), self.obv_sig)[-1]
+
+        # 趋势 ADX
+        prev_close = np.r_[np.nan, close[:-1]]
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        high_diff = np.r_[0.0, np.diff(high)]
+        low_diff = np.r_[0.0, np.diff(low)]
+        dm_plus = np.where((high_diff > -low_diff) & (high_diff > 0), high_diff, 0).astype(np.float64)
+        dm_minus = np.where((-low_diff > high_diff) & (-low_diff > 0), -low_diff, 0).astype(np.float64)
+        s_tr, s_plus, s_minus = _wilder_smoothing_numba(
+            np.nan_to_num(true_range).astype(np.float64), dm_plus, dm_minus, _ADX_LEN)
+        self.smoothed_tr, self.smoothed_dm_plus, self.smoothed_dm_minus = s_tr[-1], s_plus[-1], s_minus[-1]
+        s_tr = np.where(s_tr == 0, 1e-10, s_tr)
+        di_plus = 100 * s_plus / s_tr
+        di_minus = 100 * s_minus / s_tr
+        di_sum = di_plus + di_minus
+        dx = np.nan_to_num(100 * np.abs(di_plus - di_minus) / np.where(di_sum == 0, 1, di_sum), nan=0.0)
+        self.dx_window.extend(dx[-_ADX_LEN:])
+        self.prev_trend_adx = out['trend_adx'].iat[-1]
+
+        # EMA / MACD / RSI
+        for period in _EMA_PERIODS:
+            self.ema[period] = _ema_numba(close, period)[-1]
+        macd = _ema_numba(close, 13) - _ema_numba(close, 34)
+        self.macd_signal = _ema_numba(macd, 9)[-1]
+        delta = committed['close'].diff()
+        self.gain_rma = _rma_numba(delta.clip(lower=0).fillna(0).values.astype(np.float64), self.rsi_len)[-1]
+        self.loss_rma = _rma_numba((-delta.clip(upper=0)).fillna(0).values.astype(np.float64), self.rsi_len)[-1]
+
+        # 摆动结构 / 订单块
+        self.parsed_highs.extend(out['parsed_high'].values[-self.swing_len:])
+        self.parsed_lows.extend(out['parsed_low'].values[-self.swing_len:])
+        self.leg = int(out['leg'].iat[-1])
+        self.min_low = low.min()
+        self.max_high = high.max()
+        bullish = out['bullish_ob'].values
+        bearish = out['bearish_ob'].values
+        ob_high = out['ob_high'].values
+        ob_low = out['ob_low'].values
+        for idx in np.flatnonzero(~np.isnan(ob_high)):
+            if bullish[idx]:
+                self.order_blocks.append({'type': 'BULLISH', 'high': ob_high[idx], 'low': ob_low[idx], 'index': int(idx)})
+            if bearish[idx]:
+                self.order_blocks.append({'type': 'BEARISH', 'high': ob_high[idx], 'low': ob_low[idx], 'index': int(idx)})
+            if not bullish[idx] and not bearish[idx]:
+                self.mitigated.add(('BULLISH', int(idx)))
+                self.mitigated.add(('BEARISH', int(idx)))
+
+    # ------------------------------------------------------------------
+    # 单根 K 线递推（与 calculate_indicators 的逐列公式一一对应）
+    # ------------------------------------------------------------------
+    def step(self, history: _History, o: float, h: float, l: float, c: float, v: float):
+        i = self.n
+        row = history.append()
+        data = history.data
+        data[row, :] = np.nan
+        data[row, _COL['high']] = h
+        data[row, _COL['low']] = l
+        data[row, _COL['close']] = c
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # === 1. Stochastic %K ===
+            self.lows.append(l)
+            self.highs.append(h)
+            lowest, highest = min(self.lows), max(self.highs)
+            self.stoch_raw.append(np.float64(100) * (c - lowest) / np.float64(highest - lowest))
+            raw = np.array(self.stoch_raw)
+            data[row, _COL['stoch_k']] = raw.mean() if not np.isnan(raw).any() else np.nan
+
+            # === 2. KDJ ===
+            recent_lows = list(self.lows)[-self.kdj_ilong:]
+            recent_highs = list(self.highs)[-self.kdj_ilong:]
+            low_n = min(recent_lows)
+            rsv = np.float64(100) * (c - low_n) / np.float64(max(recent_highs) - low_n)
+            if np.isnan(rsv):
+                rsv = 50.0
+            length, m = self.kdj_isig, 1
+            self.pk = (m * rsv + (length - m) * (0.0 if np.isnan(self.pk) else self.pk)) / length
+            self.pd = (m * self.pk + (length - m) * (0.0 if np.isnan(self.pd) else self.pd)) / length
+            data[row, _COL['pk']] = self.pk
+            data[row, _COL['pd']] = self.pd
+
+            # === 3. OBV-ADX ===
+            prev_obv = self.obv
+            self.obv = prev_obv + np.sign(c - self.prev_close) * v
+            up = self.obv - prev_obv
+            down = -up
+            plus_dm = up if (up > down and up > 0) else 0.0
+            minus_dm = down if (down > up and down > 0) else 0.0
+            self.obv_window.append(self.obv)
+            obv_stdev = np.std(np.array(self.obv_window), ddof=1)
+            self.tr_ur_rma = (self.tr_ur_rma * (self.obv_len - 1) + obv_stdev) / self.obv_len
+            tr_ur = self.tr_ur_rma if self.tr_ur_rma != 0 else 1e-10
+            alpha = 2.0 / (self.obv_len + 1.0)
+            self.plus_ema = alpha * plus_dm + (1 - alpha) * self.plus_ema
+            self.minus_ema = alpha * minus_dm + (1 - alpha) * self.minus_ema
+            plus = 100 * self.plus_ema / tr_ur
+            minus = 100 * self.minus_ema / tr_ur
+            plus = self.prev_plus if np.isnan(plus) else plus
+            minus = self.prev_minus if np.isnan(minus) else minus
+            self.prev_plus, self.prev_minus = plus, minus
+            total = plus + minus
+            if total == 0:
+                total = 1
+            alpha = 2.0 / (self.obv_sig + 1.0)
+            self.adx_ema = alpha * (abs(plus - minus) / total) + (1 - alpha) * self.adx_ema
+            data[row, _COL['obv_plus']] = plus
+            data[row, _COL['obv_minus']] = minus
+            data[row, _COL['obv_adx']] = 100 * self.adx_ema
+
+            # === 4. 趋势 ADX ===
+            true_range = max(h - l, abs(h - self.prev_close), abs(l - self.prev_close))
+            high_diff = h - self.prev_high
+            low_diff = l - self.prev_low
+            dm_plus = high_diff if (high_diff > -low_diff and high_diff > 0) else 0.0
+            dm_minus = -low_diff if (-low_diff > high_diff and -low_diff > 0) else 0.0
+            self.smoothed_tr = self.smoothed_tr - (self.smoothed_tr / _ADX_LEN) + true_range
+            self.smoothed_dm_plus = self.smoothed_dm_plus - (self.smoothed_dm_plus / _ADX_LEN) + dm_plus
+            self.smoothed_dm_minus = self.smoothed_dm_minus - (self.smoothed_dm_minus / _ADX_LEN) + dm_minus
+            atr = self.smoothed_tr if self.smoothed_tr != 0 else 1e-10
+            di_plus = 100 * self.smoothed_dm_plus / atr
+            di_minus = 100 * self.smoothed_dm_minus / atr
+            di_sum = di_plus + di_minus
+            dx = 100 * abs(di_plus - di_minus) / (di_sum if di_sum != 0 else 1)
+            self.dx_window.append(0.0 if np.isnan(dx) else dx)
+            weighted_sum = 0.0
+            for j, value in enumerate(self.dx_window):
+                weighted_sum += value * (j + 1)
+            trend_adx = weighted_sum / (_ADX_LEN * (_ADX_LEN + 1) / 2)
+            data[row, _COL['trend_adx']] = trend_adx
+            data[row, _COL['adx_slope']] = trend_adx - self.prev_trend_adx
+            data[row, _COL['atr']] = atr
+            self.prev_trend_adx = trend_adx
+
+            # === 5. EMA 快慢通道 / 6. MACD ===
+            for period in _EMA_PERIODS:
+                alpha = 2.0 / (period + 1.0)
+                self.ema[period] = alpha * c + (1 - alpha) * self.ema[period]
+            ema = self.ema
+            data[row, _COL['ema12']] = ema[12]
+            data[row, _COL['fast_top']] = max(ema[144], ema[169])
+            data[row, _COL['fast_bot']] = min(ema[144], ema[169])
+            data[row, _COL['slow_top']] = max(ema[576], ema[676])
+            data[row, _COL['slow_bot']] = min(ema[576], ema[676])
+            macd = ema[13] - ema[34]
+            alpha = 2.0 / (9 + 1.0)
+            self.macd_signal = alpha * macd + (1 - alpha) * self.macd_signal
+            data[row, _COL['macd']] = macd
+            data[row, _COL['macd_signal']] = self.macd_signal
+            data[row, _COL['macd_hist']] = macd - self.macd_signal
+
+            # === 7. RSI ===
+            delta = c - self.prev_close
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            self.gain_rma = (self.gain_rma * (self.rsi_len - 1) + gain) / self.rsi_len
+            self.loss_rma = (self.loss_rma * (self.rsi_len - 1) + loss) / self.rsi_len
+            avg_loss = self.loss_rma if self.loss_rma != 0 else 1e-10
+            rsi = 100 - (100 / (1 + self.gain_rma / avg_loss))
+            data[row, _COL['rsi']] = 50.0 if np.isnan(rsi) else min(max(rsi, 0.0), 100.0)
+
+        # === 8. SMC 摆动结构 ===
+        high_volatility = (h - l) >= (2 * atr)
+        parsed_high = l if high_volatility else h
+        parsed_low = h if high_volatility else l
+        data[row, _COL['parsed_high']] = parsed_high
+        data[row, _COL['parsed_low']] = parsed_low
+
+        prev_leg = self.leg
+        if i >= self.swing_len:
+            window_highs = self.parsed_highs
+            window_lows = self.parsed_lows
+            first_high, first_low = window_highs[0], window_lows[0]
+            if first_high > max(window_highs):
+                self.leg = 0
+            elif first_low < min(window_lows):
+                self.leg = 1
+        self.parsed_highs.append(parsed_high)
+        self.parsed_lows.append(parsed_low)
+        data[row, _COL['leg']] = self.leg
+        data[row, _COL['swing_high_bar']] = 0.0
+        data[row, _COL['swing_low_bar']] = 0.0
+        data[row, _COL['swing_high_index']] = -1
+        data[row, _COL['swing_low_index']] = -1
+        data[row, _COL['bullish_ob']] = 0.0
+        data[row, _COL['bearish_ob']] = 0.0
+
+        # === 10. 订单块失效（对全部已有订单块检查当前 K 线）===
+        self.min_low = min(self.min_low, l)
+        self.max_high = max(self.max_high, h)
+        for ob in self.order_blocks:
+            if (ob['type'] == 'BULLISH' and l < ob['low']) or (ob['type'] == 'BEARISH' and h > ob['high']):
+                self._mitigate(history, ob)
+        self.order_blocks = [ob for ob in self.order_blocks if (ob['type'], ob['index']) not in self.mitigated]
+
+        if i >= self.swing_len + 1 and self.leg != prev_leg:
+            self._mark_swing(history, i - self.swing_len, prev_leg)
+
+        self.n = i + 1
+        self.prev_close, self.prev_high, self.prev_low = c, h, l
+
+    def _mark_swing(self, history: _History, swing_idx: int, prev_leg: int):
+        """记录摆动点，并按 calculate_indicators 的突破条件检测订单块"""
+        swing_row = history.row_of(swing_idx)
+        if swing_row < 0:
+            return
+        data = history.data
+        if prev_leg == 1 and self.leg == 0:
+            side, price_col, bar_col, index_col = 'BULLISH', 'high', 'swing_high_bar', 'swing_high_index'
+        elif prev_leg == 0 and self.leg == 1:
+            side, price_col, bar_col, index_col = 'BEARISH', 'low', 'swing_low_bar', 'swing_low_index'
+        else:
+            return
+        swing_price = data[swing_row, _COL[price_col]]
+        data[swing_row, _COL[bar_col]] = 1.0
+        data[swing_row, _COL[f'swing_{price_col}_price']] = swing_price
+        data[swing_row, _COL[index_col]] = swing_idx
+
+        if swing_idx < self.swing_len + 2:
+            return
+        close = data[swing_row, _COL['close']]
+        if side == 'BULLISH' and not close > swing_price:
+            return
+        if side == 'BEARISH' and not close < swing_price:
+            return
+
+        start_row = history.row_of(max(0, swing_idx - self.swing_len))
+        if start_row < 0:
+            return
+        if side == 'BULLISH':
+            ob_row = start_row + int(np.argmax(data[start_row:swing_row + 1, _COL['parsed_high']]))
+        else:
+            ob_row = start_row + int(np.argmin(data[start_row:swing_row + 1, _COL['parsed_low']]))
+        expansion = data[ob_row, _COL['atr']] * 0.1
+        ob = {
+            'type': side,
+            'high': data[ob_row, _COL['high']] + expansion,
+            'low': data[ob_row, _COL['low']] - expansion,
+            'index': history.base + ob_row,
+        }
+        data[ob_row, _COL['ob_high']] = ob['high']
+        data[ob_row, _COL['ob_low']] = ob['low']
+        data[ob_row, _COL['ob_time']] = ob['index']
+        flag_col = 'bullish_ob' if side == 'BULLISH' else 'bearish_ob'
+        if (side, ob['index']) not in self.mitigated:
+            data[ob_row, _COL[flag_col]] = 1.0
+        # calculate_indicators 的失效检测覆盖全部 K 线，包括订单块形成之前的
+        if (side == 'BULLISH' and self.min_low < ob['low']) or (side == 'BEARISH' and self.max_high > ob['high']):
+            self._mitigate(history, ob)
+        else:
+            self.order_blocks.append(ob)
+
+    def _mitigate(self, history: _History, ob: dict):
+        self.mitigated.add((ob['type'], ob['index']))
+        row = history.row_of(ob['index'])
+        if row >= 0:
+            data = history.data
+            data[row, _COL['bullish_ob' if ob['type'] == 'BULLISH' else 'bearish_ob']] = 0.0
+
+
+class IncrementalIndicatorEngine:
+    """
+    按 (symbol, timeframe) 维护增量指标状态
+
+    用法:
+        engine = IncrementalIndicatorEngine(strategy)
+        df = engine.update(symbol, timeframe, df)   # 返回带指标列的新 DataFrame
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self._states: Dict[Tuple[str, str], _IndicatorState] = {}
+        self._prefix_states: Dict[Tuple[str, str], _IndicatorState] = {}
+        self._lock = threading.Lock()
+        self.stats = {'incremental': 0, 'full': 0, 'bars_advanced': 0, 'prefix_hits': 0}
+
+    def reset(self, symbol: str = None, timeframe: str = None):
+        """清除状态（不传参数则全部清除）"""
+        with self._lock:
+            for states in (self._states, self._prefix_states):
+                if symbol is None:
+                    states.clear()
+                else:
+                    states.pop((symbol, timeframe), None)
+
+    def _get_state(self, key, states: Dict = None) -> _IndicatorState:
+        states = self._states if states is None else states
+        with self._lock:
+            state = states.get(key)
+            if state is None:
+                state = states[key] = _IndicatorState(self.strategy)
+            return state
+
+    def update(self, symbol: str, timeframe: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        推进状态并返回指标 DataFrame
+
+        df 最后一行视为未定稿 K 线：只试算不提交。
+        """
+        if len(df) < 200:
+            raise ValueError(f"数据不足，至少需要 200 根 K 线（当前: {len(df)}）")
+
+        state = self._get_state((symbol, timeframe))
+        with state.lock:
+            timestamps = _timestamp_values(df)
+            committed_end = len(df) - 1
+            start = self._find_resume_position(state, df, timestamps, committed_end)
+
+            if start is None:
+                state.seed(self.strategy, df.iloc[:committed_end], capacity=len(df))
+                self.stats['full'] += 1
+            else:
+                opens = df['open'].values
+                highs = df['high'].values
+                lows = df['low'].values
+                closes = df['close'].values
+                volumes = df['volume'].values
+                for k in range(start, committed_end):
+                    state.step(state.history, float(opens[k]), float(highs[k]), float(lows[k]),
+                               float(closes[k]), float(volumes[k]))
+                if committed_end > start:
+                    state.last_ts = timestamps[committed_end - 1]
+                    state.last_close = float(closes[committed_end - 1])
+                self.stats['incremental'] += 1
+                self.stats['bars_advanced'] += committed_end - start
+
+            # 试算未定稿 K 线
+            preview = state.history.tail_copy(committed_end)
+            last = df.iloc[-1]
+            state.clone().step(preview, float(last['open']), float(last['high']), float(last['low']),
+                               float(last['close']), float(last['volume']))
+
+        return self._to_frame(df, preview)
+
+    def update_with_forming(self, symbol: str, timeframe: str, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        收线前缀只算一次，盘中通道由前缀状态推进一根未收线 K 线得到
+
+        与 update 不同，这里不跨窗口锚定：结果等价于分别对 df[:-1] 和 df 调用
+        calculate_indicators。同一窗口内（收线 K 线未变化）的多次扫描复用前缀状态。
+
+        返回: (收线通道指标 DataFrame, 盘中通道指标 DataFrame)
+        """
+        committed_end = len(df) - 1
+        if committed_end < 200:
+            raise ValueError(f"数据不足，至少需要 200 根已收线 K 线（当前: {committed_end}）")
+
+        state = self._get_state((symbol, timeframe), self._prefix_states)
+        with state.lock:
+            timestamps = _timestamp_values(df)
+            same_prefix = (
+                state.history is not None
+                and state.n == committed_end
+                and timestamps[0] == state.first_ts
+                and timestamps[committed_end - 1] == state.last_ts
+                and float(df['close'].iat[committed_end - 1]) == state.last_close
+            )
+            if same_prefix:
+                self.stats['prefix_hits'] += 1
+            else:
+                state.seed(self.strategy, df.iloc[:committed_end], capacity=committed_end)
+                self.stats['full'] += 1
+
+            closed = state.history.tail_copy(committed_end)
+            preview = state.history.tail_copy(committed_end)
+            last = df.iloc[-1]
+            state.clone().step(preview, float(last['open']), float(last['high']), float(last['low']),
+                               float(last['close']), float(last['volume']))
+
+        return self._to_frame(df.iloc[:committed_end], closed), self._to_frame(df, preview)
+
+    @staticmethod
+    def _find_resume_position(state: _IndicatorState, df: pd.DataFrame, timestamps, committed_end: int) -> Optional[int]:
+        """返回需要提交的第一根新 K 线位置；需要全量重算时返回 None"""
+        if state.history is None or state.n < _MIN_INCREMENTAL_BARS:
+            return None
+        if len(df) > state.history.capacity:
+            return None
+        matches = np.flatnonzero(timestamps[:committed_end] == state.last_ts)
+        if len(matches) == 0:
+            return None  # 缺口：上次提交的 K 线已不在本次数据中
+        pos = int(matches[-1])
+        if float(df['close'].iat[pos]) != state.last_close:
+            return None  # 已提交 K 线被修改
+        if state.history.length < pos + 1:
+            return None  # 本次数据比已保存的历史更早
+        return pos + 1
+
+    @staticmethod
+    def _to_frame(df: pd.DataFrame, preview: _History) -> pd.DataFrame:
+        rows = len(df)
+        block = preview.data[preview.length - rows:preview.length]
+        indicators = pd.DataFrame(block[:, :len(INDICATOR_COLUMNS)], columns=INDICATOR_COLUMNS, index=df.index)
+        offset = preview.base + preview.length - rows
+        for name in _BOOL_COLUMNS:
+            indicators[name] = indicators[name].values > 0
+        for name in ('swing_high_index', 'swing_low_index'):
+            values = indicators[name].values
+            indicators[name] = np.where(values >= 0, values - offset, -1).astype(np.int32)
+        indicators['leg'] = indicators['leg'].values.astype(np.int32)
+        ob_pos = indicators['ob_time'].values
+        has_ob = ~np.isnan(ob_pos)
+        ob_time = np.full(rows, np.nan)
+        if has_ob.any():
+            ob_time = ob_time.astype(object)
+            ob_time[has_ob] = df.index.values[(ob_pos[has_ob] - offset).astype(np.int64)]
+        indicators['ob_time'] = ob_time
+
+        base = df.drop(columns=[c for c in INDICATOR_COLUMNS if c in df.columns])
+        return pd.concat([base, indicators], axis=1)
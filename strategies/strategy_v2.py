@@ -19,6 +19,7 @@
 策略引擎 V2 - 多周期趋势策略
 使用 Numba 加速的技术指标计算
 """
+import os
 import pandas as pd
 import numpy as np
 from numba import njit
@@ -225,6 +226,11 @@ class TradingStrategy:
         # 新增：何以为底模式参数
         self.more_bottom = True  # 平衡模式默认开启
         self.choose_bottom = 1   # 平衡模式对应的参数
+        
+        # 增量指标：按 (symbol, timeframe) 保存递推状态，每轮扫描只推进新收线的 K 线
+        # 注意：增量结果以首次计算的第一根 K 线为起点，与逐轮对 1000 根窗口全量重算存在 EMA 初始化差异
+        self.incremental_indicators = os.getenv("STRATEGY_INCREMENTAL_INDICATORS", "false").lower() == "true"
+        self._indicator_engine = None
     
     def set_bottom_mode(self, mode):
         """设置何以为底模式"""
@@ -265,6 +271,29 @@ class TradingStrategy:
         result = _bcwsma_numba(values, length, m)
         return pd.Series(result, index=series.index)
     
+    def calculate_indicators_incremental(self, df, symbol, timeframe):
+        """
+        增量计算技术指标（列与 calculate_indicators 一致）
+        
+        最后一根 K 线视为未定稿，只试算不提交；缺口或数据被修改时自动全量重算
+        """
+        if self._indicator_engine is None:
+            from strategies.incremental_indicators import IncrementalIndicatorEngine
+            self._indicator_engine = IncrementalIndicatorEngine(self)
+        return self._indicator_engine.update(symbol, timeframe, df)
+    
+    def calculate_indicators_with_forming(self, df, symbol, timeframe):
+        """
+        双通道共享前缀计算：已收线部分只算一次，再推进最后一根未收线 K 线
+        
+        返回: (df[:-1] 的指标 DataFrame, df 的指标 DataFrame)，
+        分别等价于 calculate_indicators(df[:-1]) 和 calculate_indicators(df)
+        """
+        if self._indicator_engine is None:
+            from strategies.incremental_indicators import IncrementalIndicatorEngine
+            self._indicator_engine = IncrementalIndicatorEngine(self)
+        return self._indicator_engine.update_with_forming(symbol, timeframe, df)
+    
     def calculate_indicators(self, df):
         """
         计算所有技术指标
@@ -628,18 +657,32 @@ class TradingStrategy:
         if df['rsi'].isnull().all():
             raise ValueError("RSI column contains all NaN values, calculation failed")
         
+        return self.check_signals_at(df, len(df) - 1, timeframe)
+    
+    def check_signals_at(self, df, bar_index, timeframe='3m'):
+        """
+        按 bar 索引检查信号（回测用）
+        
+        结果等价于 check_signals(df.iloc[:bar_index + 1], timeframe)，
+        但不需要切片，df 为一次性算好指标的完整数据。
+        """
+        n = bar_index + 1  # 视图长度
+        
         # 00秒确认模式：使用已收盘的K线数据
         # 确保数据长度足够（至少4根K线）
-        if len(df) < 4:
+        if n < 4:
             return {"action": "HOLD", "reason": "数据不足（需至少4根K线）", "type": "NONE"}
         
+        if 'rsi' not in df.columns:
+            raise ValueError("RSI column not found in df, please check calculation")
+        
         # 00秒确认模式（与TradingView收盘触发一致）
-        # df.iloc[-1] 是刚开盘的新K线（只有几秒数据，不使用）
-        # df.iloc[-2] 是刚收盘的K线（这是我们要判断的"当前K线"）
-        # df.iloc[-3] 是上一根已收盘的K线
-        curr = df.iloc[-2]   # 刚收盘的K线（与TradingView一致）
-        prev = df.iloc[-3]   # 上一根已收盘的K线
-        prev2 = df.iloc[-4]  # 上上根K线
+        # bar_index 是刚开盘的新K线（只有几秒数据，不使用）
+        # bar_index-1 是刚收盘的K线（这是我们要判断的"当前K线"）
+        # bar_index-2 是上一根已收盘的K线
+        curr = df.iloc[bar_index - 1]   # 刚收盘的K线（与TradingView一致）
+        prev = df.iloc[bar_index - 2]   # 上一根已收盘的K线
+        prev2 = df.iloc[bar_index - 3]  # 上上根K线
         
         # 安全访问 RSI 值，提供默认值
         curr_rsi = curr.get('rsi', 50.0)
@@ -692,7 +735,7 @@ class TradingStrategy:
         extended_buy_signal = False
         extended_sell_signal = False
         
-        if self.more_bottom and len(df) >= 4:
+        if self.more_bottom and n >= 4:
             # 修复：TradingView的逻辑是 (bar_index - obv_buy_bar_bottom) <= choose_bottom
             # 这意味着：当前K线(bar_index) 与 OBV信号K线(obv_buy_bar_bottom) 的距离 <= choose_bottom
             # 距离为0表示同一根K线，距离为1表示相邻K线
@@ -701,8 +744,8 @@ class TradingStrategy:
             # 当前K线索引是 -2（00秒确认模式）
             # 回溯范围：当前K线(-2) 到 当前K线-choose_bottom(-2-choose_bottom)
             for lookback in range(0, self.choose_bottom + 1):  # 0 到 choose_bottom
-                check_idx = -(2 + lookback)  # -2, -3, -4, ... 
-                if len(df) >= abs(check_idx):
+                check_idx = bar_index - 1 - lookback  # 等价于切片中的 -2, -3, -4, ...
+                if check_idx >= 0:
                     past = df.iloc[check_idx]
                     past_obv_buy = (past['obv_minus'] >= 22) and (past['obv_adx'] >= 22) and (past['obv_plus'] <= 18)
                     if past_obv_buy and smi_kdj_buy:
@@ -710,8 +753,8 @@ class TradingStrategy:
                         break
             
             for lookback in range(0, self.choose_bottom + 1):
-                check_idx = -(2 + lookback)
-                if len(df) >= abs(check_idx):
+                check_idx = bar_index - 1 - lookback
+                if check_idx >= 0:
                     past = df.iloc[check_idx]
                     past_obv_sell = (past['obv_plus'] >= 22) and (past['obv_adx'] >= 22) and (past['obv_minus'] <= 18)
                     if past_obv_sell and smi_kdj_sell:
@@ -728,14 +771,19 @@ class TradingStrategy:
         ob_short_signal = False
         
         # 查找最近的未失效订单块（向前回溯最多50根K线）
-        for i in range(min(50, len(df) - 1), 0, -1):
-            check_candle = df.iloc[-i]
+        # 直接读取 NumPy 列，避免逐行构造 Series
+        bullish_ob_col = df['bullish_ob'].to_numpy() if 'bullish_ob' in df.columns else None
+        bearish_ob_col = df['bearish_ob'].to_numpy() if 'bearish_ob' in df.columns else None
+        ob_high_col = df['ob_high'].to_numpy() if 'ob_high' in df.columns else None
+        ob_low_col = df['ob_low'].to_numpy() if 'ob_low' in df.columns else None
+        
+        for i in range(min(50, n - 1), 0, -1):
+            check_pos = n - i
+            ob_high = ob_high_col[check_pos] if ob_high_col is not None else 0
+            ob_low = ob_low_col[check_pos] if ob_low_col is not None else 0
             
             # 看涨订单块触发：当前价格回踩到订单块区域
-            if check_candle.get('bullish_ob', False):
-                ob_high = check_candle.get('ob_high', 0)
-                ob_low = check_candle.get('ob_low', 0)
-                
+            if bullish_ob_col is not None and bullish_ob_col[check_pos]:
                 # 触发条件：当前低点触及订单块区间 [无需额外buffer]
                 if curr['low'] <= ob_high and curr['low'] >= ob_low:
                     # 确认订单块未失效（价格未跌破订单块低点）
@@ -744,10 +792,7 @@ class TradingStrategy:
                         break
             
             # 看跌订单块触发：当前价格反弹到订单块区域
-            if check_candle.get('bearish_ob', False):
-                ob_high = check_candle.get('ob_high', 0)
-                ob_low = check_candle.get('ob_low', 0)
-                
+            if bearish_ob_col is not None and bearish_ob_col[check_pos]:
                 # 触发条件：当前高点触及订单块区间
                 if curr['high'] >= ob_low and curr['high'] <= ob_high:
                     # 确认订单块未失效（价格未突破订单块高点）
@@ -858,6 +903,195 @@ class TradingStrategy:
             "reason": "无有效信号"
         }
     
+    def check_signals_vectorized(self, df, timeframe='3m'):
+        """
+        向量化信号计算：一次性给出每根K线的信号
+        
+        第 i 行的结果等价于 check_signals_at(df, i, timeframe)，
+        即把 df.iloc[:i + 1] 交给 check_signals 的结果（00秒确认模式，判断第 i-1 根K线）。
+        
+        Returns:
+            DataFrame（与 df 同索引），列: action, type, position_pct, leverage, reason
+        """
+        if 'rsi' not in df.columns:
+            raise ValueError("RSI column not found in df, please check calculation")
+        
+        n = len(df)
+        bar_idx = np.arange(n)
+        
+        def col(name, default=np.nan):
+            if name in df.columns:
+                return df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            return np.full(n, default, dtype=np.float64)
+        
+        def flag(name):
+            if name in df.columns:
+                return df[name].fillna(False).to_numpy(dtype=bool)
+            return np.zeros(n, dtype=bool)
+        
+        def shift(values, k):
+            """out[i] = values[i - k]"""
+            out = np.full(n, False if values.dtype == bool else np.nan, dtype=values.dtype)
+            if k < n:
+                out[k:] = values[:n - k]
+            return out
+        
+        # curr / prev / prev2 分别对应 check_signals 中的 iloc[-2] / iloc[-3] / iloc[-4]
+        def curr(name):
+            return shift(col(name), 1)
+        
+        def prev(name):
+            return shift(col(name), 2)
+        
+        def prev2(name):
+            return shift(col(name), 3)
+        
+        curr_rsi = curr('rsi')
+        curr_rsi = np.where(np.isnan(curr_rsi), 50.0, curr_rsi)
+        prev_rsi = prev('rsi')
+        prev_rsi = np.where(np.isnan(prev_rsi), 50.0, prev_rsi)
+        
+        curr_ema12 = curr('ema12')
+        curr_close = curr('close')
+        curr_high = curr('high')
+        curr_low = curr('low')
+        curr_stoch = curr('stoch_k')
+        curr_obv_adx = curr('obv_adx')
+        
+        # === 趋势2.3 主信号 ===
+        bullish_trend = (curr_ema12 > curr('fast_top')) & (curr_ema12 > curr('slow_top'))
+        bearish_trend = (curr_ema12 < curr('fast_bot')) & (curr_ema12 < curr('slow_bot'))
+        
+        if self.osc_filter:
+            trend_filter = (curr('trend_adx') > self.osc_len) & (curr('adx_slope') > 0)
+        else:
+            trend_filter = np.ones(n, dtype=bool)
+        
+        curr_hist, prev_hist, prev2_hist = curr('macd_hist'), prev('macd_hist'), prev2('macd_hist')
+        macd_below_rise = (curr_hist < 0) & (curr_hist > prev_hist) & (prev_hist < prev2_hist)
+        macd_above_fall = (curr_hist > 0) & (curr_hist < prev_hist) & (prev_hist > prev2_hist)
+        
+        rsi_cross_up = (prev_rsi <= self.rsi_os) & (curr_rsi > self.rsi_os)
+        rsi_cross_dn = (prev_rsi >= self.rsi_ob) & (curr_rsi < self.rsi_ob)
+        
+        long_cond = macd_below_rise & ((curr_rsi > 50) | rsi_cross_up)
+        short_cond = macd_above_fall & ((curr_rsi < 50) | rsi_cross_dn)
+        
+        trend_buy = trend_filter & bullish_trend & long_cond
+        trend_sell = trend_filter & bearish_trend & short_cond
+        
+        # === 何以为底信号 ===
+        stoch_os = curr_stoch < 20
+        stoch_ob = curr_stoch > 80
+        curr_pk, curr_pd, prev_pk, prev_pd = curr('pk'), curr('pd'), prev('pk'), prev('pd')
+        kdj_gold = (prev_pk < prev_pd) & (curr_pk > curr_pd)
+        kdj_dead = (prev_pk > prev_pd) & (curr_pk < curr_pd)
+        smi_kdj_buy = stoch_os & kdj_gold
+        smi_kdj_sell = stoch_ob & kdj_dead
+        
+        obv_plus, obv_minus, obv_adx = col('obv_plus'), col('obv_minus'), col('obv_adx')
+        obv_buy_raw = (obv_minus >= 22) & (obv_adx >= 22) & (obv_plus <= 18)
+        obv_sell_raw = (obv_plus >= 22) & (obv_adx >= 22) & (obv_minus <= 18)
+        
+        bottom_buy = smi_kdj_buy & shift(obv_buy_raw, 1)
+        bottom_sell = smi_kdj_sell & shift(obv_sell_raw, 1)
+        
+        # 扩展信号：回溯 [0, choose_bottom] 根K线内的 OBV 信号
+        if self.more_bottom:
+            past_obv_buy = np.zeros(n, dtype=bool)
+            past_obv_sell = np.zeros(n, dtype=bool)
+            for lookback in range(0, self.choose_bottom + 1):
+                past_obv_buy |= shift(obv_buy_raw, 1 + lookback)
+                past_obv_sell |= shift(obv_sell_raw, 1 + lookback)
+            bottom_buy |= smi_kdj_buy & past_obv_buy
+            bottom_sell |= smi_kdj_sell & past_obv_sell
+        
+        # === 订单块信号检测 ===
+        # 与逐根版本一致：从最旧的K线向最新回溯，遇到第一个触发的订单块即停止
+        bullish_ob, bearish_ob = flag('bullish_ob'), flag('bearish_ob')
+        ob_high_all, ob_low_all = col('ob_high', 0.0), col('ob_low', 0.0)
+        
+        ob_long_signal = np.zeros(n, dtype=bool)
+        ob_short_signal = np.zeros(n, dtype=bool)
+        decided = np.zeros(n, dtype=bool)
+        
+        for distance in range(50, 0, -1):
+            in_range = distance <= bar_idx
+            ob_high = shift(ob_high_all, distance - 1)
+            ob_low = shift(ob_low_all, distance - 1)
+            
+            long_hit = in_range & shift(bullish_ob, distance - 1) & \
+                (curr_low <= ob_high) & (curr_low >= ob_low) & (curr_close > ob_low)
+            short_hit = in_range & shift(bearish_ob, distance - 1) & \
+                (curr_high >= ob_low) & (curr_high <= ob_high) & (curr_close < ob_high)
+            
+            ob_long_signal |= ~decided & long_hit
+            ob_short_signal |= ~decided & ~long_hit & short_hit
+            decided |= long_hit | short_hit
+        
+        # === 信号优先级判定（与 check_signals_at 的规则顺序一致）===
+        tf = timeframe
+        
+        def trend_reason(side):
+            return lambda i: f"[{tf}]趋势2.3主{side}信号 | EMA12={curr_ema12[i]:.2f} | RSI={curr_rsi[i]:.1f}"
+        
+        def bottom_reason(i):
+            return f"[{tf}]何以为底抄底信号 | Stoch={curr_stoch[i]:.1f} | OBV_ADX={curr_obv_adx[i]:.1f}"
+        
+        def top_reason(i):
+            return f"[{tf}]何以为底逃顶信号 | Stoch={curr_stoch[i]:.1f}"
+        
+        def ob_reason(side):
+            return lambda i: f"[{tf}]SMC{side}订单块触发 | 触发价≈${curr_close[i]:.4f}"
+        
+        def tp_reason(i):
+            return f"[{tf}]订单块止盈信号（仅平仓）"
+        
+        rules = []  # (条件, action, type, position_pct, leverage, reason)
+        if tf in ['1m', '3m', '5m']:
+            rules.append((trend_buy, "LONG", "MAIN_TREND", self.main_signal_pct, 50, trend_reason("做多")))
+            rules.append((trend_sell, "SHORT", "MAIN_TREND", self.main_signal_pct, 50, trend_reason("做空")))
+        if tf in ['3m', '5m', '15m', '30m', '1h', '1m']:
+            rules.append((bottom_buy, "LONG", "SUB_BOTTOM", self.sub_signal_pct, 50, bottom_reason))
+            rules.append((bottom_sell, "SHORT", "SUB_TOP", self.sub_signal_pct, 50, top_reason))
+        if tf in ['30m', '1h']:
+            rules.append((ob_long_signal, "LONG", "SUB_ORDER_BLOCK", self.sub_signal_pct, 50, ob_reason("看涨")))
+            rules.append((ob_short_signal, "SHORT", "SUB_ORDER_BLOCK", self.sub_signal_pct, 50, ob_reason("看跌")))
+        if tf in ['1m', '3m', '5m', '15m']:
+            rules.append((ob_long_signal, "LONG", "TP_ORDER_BLOCK", 0, 0, tp_reason))
+            rules.append((ob_short_signal, "SHORT", "TP_ORDER_BLOCK", 0, 0, tp_reason))
+        
+        actions = np.full(n, "HOLD", dtype=object)
+        types = np.full(n, "NONE", dtype=object)
+        reasons = np.full(n, "无有效信号", dtype=object)
+        position_pct = np.full(n, np.nan)
+        leverage = np.full(n, np.nan)
+        
+        # 前3根K线数据不足
+        too_short = bar_idx < 3
+        reasons[too_short] = "数据不足（需至少4根K线）"
+        assigned = too_short.copy()
+        
+        for cond, action, sig_type, pct, lev, reason in rules:
+            hit = cond & ~assigned
+            if not hit.any():
+                continue
+            actions[hit] = action
+            types[hit] = sig_type
+            position_pct[hit] = pct
+            leverage[hit] = lev
+            for i in np.flatnonzero(hit):
+                reasons[i] = reason(i)
+            assigned |= hit
+        
+        return pd.DataFrame({
+            'action': actions,
+            'type': types,
+            'position_pct': position_pct,
+            'leverage': leverage,
+            'reason': reasons,
+        }, index=df.index)
+    
     def risk_check(self, current_equity, current_position_notional, proposed_notional):
         """
         风控检查 - 使用名义价值 (Notional Value)
@@ -930,7 +1164,10 @@ class TradingStrategy:
             
             try:
                 # 计算技术指标
-                df_with_indicators = self.calculate_indicators(df)
+                if self.incremental_indicators:
+                    df_with_indicators = self.calculate_indicators_incremental(df, symbol, tf)
+                else:
+                    df_with_indicators = self.calculate_indicators(df)
                 
                 # 检查信号
                 sig = self.check_signals(df_with_indicators, timeframe=tf)
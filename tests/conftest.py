@@ -6,11 +6,15 @@ Pytest 配置文件
 """
 import os
 import sys
+import tempfile
 import pytest
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# 运行日志（如 exchange_adapters 导入时创建的 exchange.log）写到临时目录，不落在仓库的 logs/ 下
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="pytest-logs-"))
+
 
 @pytest.fixture
 def sample_ohlcv():
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+AI 数据库管理器测试
+
+验证 ai_positions 复合索引覆盖热点查询，以及交易历史排序
+"""
+import pytest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.ai_db_manager import (
+    AIDBManager, AIDecision, get_db_connection, close_thread_connections,
+    _POSITION_INDEXES, _HOT_QUERIES,
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    yield AIDBManager(str(tmp_path / "arena.db"))
+    close_thread_connections()
+
+
+class TestPositionIndexes:
+    """索引与查询计划"""
+
+    def test_indexes_created(self, manager):
+        import sqlite3
+        conn = sqlite3.connect(manager.db_path)
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        assert set(_POSITION_INDEXES) <= names
+
+    def test_hot_queries_use_index(self, manager):
+        plans = manager.check_query_plans()
+        assert set(plans) == set(_HOT_QUERIES)
+        for name, details in plans.items():
+            assert not any(d.startswith('SCAN') for d in details), (name, details)
+
+    def test_missing_index_is_reported(self, manager, caplog):
+        import sqlite3
+        conn = sqlite3.connect(manager.db_path)
+        for index_name in _POSITION_INDEXES:
+            conn.execute(f"DROP INDEX {index_name}")
+        conn.commit()
+        conn.close()
+
+        with caplog.at_level('WARNING', logger='ai.ai_db_manager'):
+            manager.check_query_plans()
+        assert '未命中索引' in caplog.text
+
+
+class TestTradeHistory:
+    """交易历史：未平仓在前，已平仓按平仓时间倒序"""
+
+    def test_open_first_then_closed_by_exit_time(self, manager):
+        first = manager.open_position('deepseek', 'BTC/USDT:USDT', 'long', 100.0, 10.0)
+        second = manager.open_position('deepseek', 'ETH/USDT:USDT', 'short', 10.0, 10.0)
+        manager.close_position(first, 101.0)
+        time.sleep(0.01)
+        manager.close_position(second, 9.0)
+        still_open = manager.open_position('deepseek', 'SOL/USDT:USDT', 'long', 1.0, 10.0)
+        manager.open_position('qwen', 'BTC/USDT:USDT', 'long', 100.0, 10.0)
+
+        history = manager.get_trade_history('deepseek')
+        assert [t['id'] for t in history] == [still_open, second, first]
+        assert [t['id'] for t in manager.get_trade_history('deepseek', limit=2)] == [still_open, second]
+
+        assert manager.get_consecutive_losses('deepseek') == 0
+        assert manager.get_daily_pnl('deepseek') > 0
+
+
+class TestRunningStats:
+    """平仓时增量维护的风险聚合"""
+
+    def _trade(self, manager, agent, exit_price):
+        position_id = manager.open_position(agent, 'BTC/USDT:USDT', 'long', 100.0, 100.0, leverage=1)
+        return manager.close_position(position_id, exit_price)
+
+    def test_incremental_matches_replay_and_backfill(self, manager):
+        for exit_price in [110, 95, 90, 120, 80, 85]:
+            self._trade(manager, 'deepseek', exit_price)
+
+        stats = manager.get_stats('deepseek')
+        assert stats.total_trades == 6
+        assert stats.total_pnl == pytest.approx(-20.0)
+        assert stats.peak_equity == pytest.approx(10015.0)
+        assert stats.consecutive_losses == 2
+        assert stats.max_win_streak == 1
+        assert stats.max_loss_streak == 2
+        assert manager.get_consecutive_losses('deepseek') == 2
+        assert manager.get_consecutive_losses('deepseek', limit=1) == 1
+        assert manager.get_daily_pnl('deepseek') == pytest.approx(-20.0)
+
+        # 物化值与按平仓记录重放的结果一致
+        replay = manager.get_max_drawdown('deepseek', lookback_days=3650)
+        assert manager.get_max_drawdown('deepseek') == pytest.approx(replay)
+
+        before = stats.to_dict()
+        counts = manager.backfill_stats()
+        assert counts['deepseek'] == 6
+        after = manager.get_stats('deepseek').to_dict()
+        for key in ('total_trades', 'total_pnl', 'peak_equity', 'max_drawdown', 'current_drawdown',
+                    'consecutive_losses', 'max_win_streak', 'max_loss_streak', 'daily_pnl', 'current_streak'):
+            assert after[key] == pytest.approx(before[key]), key
+
+    def test_arena_contexts_from_one_read(self, manager, monkeypatch):
+        self._trade(manager, 'qwen', 110)
+        self._trade(manager, 'deepseek', 90)
+
+        calls = []
+        original = manager.get_all_stats
+        monkeypatch.setattr(manager, 'get_all_stats', lambda: calls.append(1) or original())
+
+        contexts = manager.get_all_arena_contexts(['deepseek', 'qwen'])
+        assert len(calls) == 1
+        assert contexts['qwen']['my_rank'] == 1
+        assert contexts['deepseek']['my_stats']['current_drawdown'] > 0
+        assert contexts['deepseek'] == manager.get_arena_context('deepseek')
+
+    def test_migrates_old_stats_table(self, tmp_path):
+        import sqlite3
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TABLE ai_stats (
+                agent_name TEXT PRIMARY KEY, total_trades INTEGER DEFAULT 0,
+                win_count INTEGER DEFAULT 0, loss_count INTEGER DEFAULT 0,
+                win_rate REAL DEFAULT 0.0, total_pnl REAL DEFAULT 0.0,
+                current_streak INTEGER DEFAULT 0, best_trade REAL DEFAULT 0.0,
+                worst_trade REAL DEFAULT 0.0, avg_pnl REAL DEFAULT 0.0,
+                last_signal TEXT DEFAULT '', last_updated INTEGER DEFAULT 0
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+        # 旧库已有平仓记录：迁移后风险聚合字段应自动回填，而不是停留在默认值
+        seed = AIDBManager(str(tmp_path / "seed.db"))
+        for exit_price in [110, 90, 80]:
+            position_id = seed.open_position('deepseek', 'BTC/USDT:USDT', 'long', 100.0, 100.0, leverage=1)
+            seed.close_position(position_id, exit_price)
+        expected = seed.get_stats('deepseek')
+        conn = sqlite3.connect(path)
+        conn.execute("ATTACH DATABASE ? AS seed", (str(tmp_path / "seed.db"),))
+        conn.execute("CREATE TABLE ai_positions AS SELECT * FROM seed.ai_positions")
+        conn.execute("""
+            INSERT INTO ai_stats (agent_name, total_trades, total_pnl)
+            VALUES ('deepseek', 3, ?)
+        """, (expected.total_pnl,))
+        conn.commit()
+        conn.close()
+
+        manager = AIDBManager(path)
+        stats = manager.get_stats('deepseek')
+        assert stats.total_trades == 3
+        assert stats.peak_equity == pytest.approx(expected.peak_equity)
+        assert stats.max_drawdown == pytest.approx(expected.max_drawdown)
+        assert stats.max_drawdown > 0
+        assert stats.consecutive_losses == 2
+
+
+class TestThreadLocalConnection:
+    """线程内长连接与批量保存决策"""
+
+    def test_connection_reused_per_thread(self, manager):
+        import threading
+
+        with get_db_connection(manager.db_path) as first:
+            assert first.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        with get_db_connection(manager.db_path) as second:
+            assert second is first
+
+        other = []
+
+        def worker():
+            with get_db_connection(manager.db_path) as conn:
+                other.append(conn)
+            close_thread_connections()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        assert other[0] is not first
+
+    def test_uncommitted_writes_rolled_back_on_exit(self, manager):
+        with get_db_connection(manager.db_path) as conn:
+            conn.execute("UPDATE ai_stats SET last_signal = 'x'")
+            with get_db_connection(manager.db_path) as inner:
+                assert inner.in_transaction  # 嵌套使用不提前回滚
+        with get_db_connection(manager.db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM ai_stats WHERE last_signal = 'x'").fetchone()[0] == 0
+
+    def test_save_decisions_batch(self, manager):
+        decisions = [
+            AIDecision(timestamp=1000 + i, agent_name=agent, symbol=f"SYM{i}/USDT:USDT",
+                       signal=signal, price=1.0)
+            for i, (agent, signal) in enumerate([('deepseek', 'BUY'), ('qwen', 'SELL'), ('deepseek', 'HOLD')])
+        ]
+        ids = manager.save_decisions_batch(decisions)
+        assert len(ids) == 3 and ids == sorted(ids)
+
+        saved = {d.id: d for d in manager.get_latest_decisions(limit=10)}
+        assert [saved[i].symbol for i in ids] == [d.symbol for d in decisions]
+        assert manager.get_stats('deepseek').last_signal == 'HOLD'
+        assert manager.get_stats('qwen').last_signal == 'SELL'
+        assert manager.save_decisions_batch([]) == []
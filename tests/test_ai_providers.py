@@ -5,6 +5,11 @@ AI 服务商适配器测试
 import pytest
 import sys
 import os
+import json
+import asyncio
+import threading
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -18,6 +23,10 @@ from ai.ai_providers import (
     get_all_provider_ids,
     quick_validate_key_format,
     PROVIDER_ALIASES,
+    UniversalAIClient,
+    get_http_client_stats,
+    close_http_clients,
+    aclose_http_clients,
 )
 
 
@@ -131,3 +140,82 @@ class TestKeyValidation:
         # spark 没有前缀要求
         valid, msg = quick_validate_key_format('spark', 'any_valid_key_here')
         assert valid is True
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        _ChatHandler.connections.add(self.client_address)
+        body = json.dumps({"choices": [{"message": {"content": "<think>x</think>pong"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_client(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _ChatHandler.connections = set()
+
+    client = UniversalAIClient('deepseek', 'sk-test')
+    client.provider = replace(
+        client.provider,
+        name=f"local-{server.server_address[1]}",
+        api_base=f"http://127.0.0.1:{server.server_address[1]}",
+    )
+    client.proxy = None
+    try:
+        yield client
+    finally:
+        close_http_clients()
+        server.shutdown()
+        server.server_close()
+
+
+class TestPooledHTTPClient:
+    """共享 HTTP 连接池"""
+
+    def test_sync_requests_reuse_connection(self, local_client):
+        for _ in range(3):
+            assert local_client.chat_with_messages([{"role": "user", "content": "ping"}]) == "pong"
+
+        timing = get_http_client_stats()['providers'][local_client.provider.name]
+        assert timing['requests'] == 3
+        assert timing['new_connections'] == 1
+        assert timing['reused_connections'] == 2
+        assert timing['avg_ttfb_ms'] is not None
+        assert len(_ChatHandler.connections) == 1
+
+    def test_async_requests_reuse_connection_within_loop(self, local_client):
+        async def run():
+            try:
+                for _ in range(3):
+                    assert await local_client.chat_async("ping") == "pong"
+            finally:
+                await aclose_http_clients()
+
+        asyncio.run(run())
+
+        timing = get_http_client_stats()['providers'][local_client.provider.name]
+        assert timing['requests'] == 3
+        assert timing['new_connections'] == 1
+        assert timing['http_version'] == "HTTP/1.1"
+
+    def test_new_event_loop_gets_fresh_client(self, local_client):
+        for _ in range(2):
+            asyncio.run(local_client.chat_async("ping"))
+
+        timing = get_http_client_stats()['providers'][local_client.provider.name]
+        assert timing['requests'] == 2
+        assert timing['new_connections'] == 2
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+竞技场调度器测试
+
+验证批量对战并发调用所有 AI、单个 AI 超时/失败不影响其他 AI
+"""
+import pytest
+import sys
+import os
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.arena_scheduler import ArenaScheduler, LatencyHistogram
+from ai.ai_brain import MarketContext, AIDecisionResult
+
+
+class FakeAgent:
+    def __init__(self, name, delay, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.cancelled = False
+
+    async def get_batch_decisions(self, contexts, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError("boom")
+        return [
+            AIDecisionResult(agent_name=self.name, signal="wait", confidence=50, reasoning="ok")
+            for _ in contexts
+        ]
+
+
+class FakeDB:
+    def __init__(self):
+        self.saved = []
+
+    def get_all_arena_contexts(self, agents):
+        return {agent: {} for agent in agents}
+
+    def get_open_positions(self, agent):
+        return []
+
+    def get_stats(self, agent):
+        return None
+
+    def save_decision(self, decision):
+        self.saved.append(decision)
+        return len(self.saved)
+
+    def save_decisions_batch(self, decisions):
+        return [self.save_decision(decision) for decision in decisions]
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    agents = {
+        'fast': FakeAgent('fast', 0.05),
+        'medium': FakeAgent('medium', 0.2),
+        'slow': FakeAgent('slow', 5.0),
+        'broken': FakeAgent('broken', 0.01, fail=True),
+    }
+    sched = ArenaScheduler(agents=list(agents), agent_timeout=0.5)
+    db = FakeDB()
+
+    async def fake_market_data(symbol, timeframes, limit):
+        return {
+            'symbol': symbol, 'timeframe': timeframes[0], 'current_price': 100.0,
+            'ohlcv': [], 'indicators': {}, 'formatted_indicators': '', 'sentiment': None,
+        }
+
+    async def no_execution(decisions, price, symbol):
+        return None
+
+    monkeypatch.setattr(sched, '_fetch_multi_timeframe_data', fake_market_data)
+    monkeypatch.setattr(sched, '_fetch_sentiment', lambda: None)
+    monkeypatch.setattr(sched, '_get_db_manager', lambda: db)
+    monkeypatch.setattr(sched, '_get_agent', lambda name: agents[name])
+    monkeypatch.setattr(sched, '_simulate_execution', no_execution)
+    sched.fake_agents = agents
+    sched.fake_db = db
+    return sched
+
+
+class TestBatchFanOut:
+    """批量对战并发调用"""
+
+    def test_agents_run_concurrently_with_partial_results(self, scheduler):
+        start = time.perf_counter()
+        results = asyncio.run(scheduler.run_batch_battle_cycle(['BTC/USDT', 'ETH/USDT']))
+        elapsed = time.perf_counter() - start
+
+        # 最慢的 AI 被超时取消，本轮总耗时约等于单个 AI 的超时
+        assert elapsed < 1.5
+        assert scheduler.fake_agents['slow'].cancelled
+
+        assert [r.symbol for r in results] == ['BTC/USDT', 'ETH/USDT']
+        for result in results:
+            assert [d['agent_name'] for d in result.decisions] == ['fast', 'medium']
+        assert len(scheduler.fake_db.saved) == 4
+
+    def test_health_status_reports_latency_histogram(self, scheduler):
+        asyncio.run(scheduler.run_batch_battle_cycle(['BTC/USDT']))
+        health = scheduler.get_health_status()
+
+        latency = health['agent_latency']
+        assert set(latency) == {'fast', 'medium', 'slow', 'broken'}
+        assert latency['slow']['timeouts'] == 1
+        assert latency['broken']['errors'] == 1
+        assert latency['fast']['buckets']['le_1s'] == 1
+        assert health['api_failures'] == {'fast': 0, 'medium': 0, 'slow': 1, 'broken': 1}
+
+
+class TestLatencyHistogram:
+    def test_bucketing(self):
+        hist = LatencyHistogram()
+        for seconds in (0.5, 3, 3, 25, 500):
+            hist.observe(seconds)
+        data = hist.to_dict()
+        assert data['count'] == 5
+        # 累计计数：le_Ns 包含所有更小的桶
+        assert data['buckets']['le_1s'] == 1
+        assert data['buckets']['le_2s'] == 1
+        assert data['buckets']['le_5s'] == 3
+        assert data['buckets']['le_30s'] == 4
+        assert data['buckets']['le_120s'] == 4
+        assert data['buckets']['+Inf'] == 5
+        assert data['max_sec'] == 500
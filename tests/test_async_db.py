@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+异步数据库访问层测试
+
+验证线程池代理不阻塞事件循环，以及原始 SQL 的异步执行
+"""
+import pytest
+import sys
+import os
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import async_db, db_bridge
+from database.async_db import AsyncDBProxy, AsyncDatabase, _to_asyncpg
+
+
+@pytest.fixture
+def db_config(tmp_path):
+    config = {"kind": "sqlite", "path": str(tmp_path / "async.db")}
+    db_bridge.init_db(config)
+    return config
+
+
+class SlowDB:
+    """同步阻塞的数据库对象"""
+    name = 'slow'
+
+    def save(self, value, delay=0.3):
+        time.sleep(delay)
+        return value * 2
+
+
+class TestAsyncDBProxy:
+    """同步接口的异步代理"""
+
+    def test_blocking_calls_do_not_stall_loop(self):
+        proxy = AsyncDBProxy(SlowDB())
+        assert proxy.name == 'slow'
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                for _ in range(10):
+                    await asyncio.sleep(0.02)
+                    ticks += 1
+
+            start = time.perf_counter()
+            results, _ = await asyncio.gather(
+                asyncio.gather(proxy.save(1), proxy.save(2), delay_kw(proxy)),
+                ticker(),
+            )
+            return results, ticks, time.perf_counter() - start
+
+        async def delay_kw(p):
+            return await p.save(3, delay=0.3)
+
+        results, ticks, elapsed = asyncio.run(main())
+        assert results == [2, 4, 6]
+        assert ticks == 10          # 阻塞调用期间事件循环照常调度
+        assert elapsed < 0.8        # 三次阻塞调用在线程池并发执行
+
+    def test_arena_manager_proxy(self, tmp_path):
+        from ai.ai_db_manager import AIDBManager, AIDecision, close_thread_connections
+
+        manager = AIDBManager(str(tmp_path / "arena.db"))
+        proxy = AsyncDBProxy(manager)
+
+        async def main():
+            ids = await proxy.save_decisions_batch([
+                AIDecision(timestamp=1, agent_name='deepseek', symbol='BTC/USDT:USDT', signal='BUY', price=1.0)
+            ])
+            contexts = await proxy.get_all_arena_contexts(['deepseek'])
+            return ids, contexts
+
+        try:
+            ids, contexts = asyncio.run(main())
+        finally:
+            close_thread_connections()
+        assert len(ids) == 1
+        assert contexts['deepseek'] == manager.get_arena_context('deepseek')
+
+
+class TestAsyncDatabase:
+    """原始 SQL"""
+
+    def test_sqlite_roundtrip(self, db_config):
+        db = AsyncDatabase(db_config)
+        assert not db.uses_asyncpg
+
+        async def main():
+            await db.executemany(
+                "INSERT INTO signal_events (symbol, timeframe, ts, signal_type, price) VALUES (?, ?, ?, ?, ?)",
+                [('BTC/USDT', '1m', 1000 + i, 'BUY', 1.0 + i) for i in range(3)],
+            )
+            await db.execute("UPDATE signal_events SET price = ? WHERE ts = ?", (9.0, 1002))
+            rows = await db.fetch("SELECT ts, price FROM signal_events WHERE symbol = ? ORDER BY ts", ('BTC/USDT',))
+            one = await db.fetchone("SELECT COUNT(*) AS n FROM signal_events")
+            none = await db.fetchone("SELECT ts FROM signal_events WHERE ts = ?", (0,))
+            return rows, one, none
+
+        rows, one, none = asyncio.run(main())
+        assert rows == [{'ts': 1000, 'price': 1.0}, {'ts': 1001, 'price': 2.0}, {'ts': 1002, 'price': 9.0}]
+        assert one == {'n': 3}
+        assert none is None
+
+    def test_asyncpg_placeholders(self):
+        assert _to_asyncpg("SELECT * FROM t WHERE a = ? AND b > ?") == "SELECT * FROM t WHERE a = $1 AND b > $2"
+        # 引号内的 ? 不是占位符
+        assert _to_asyncpg("SELECT '?', 'it''s ?', \"a?\" FROM t WHERE a = ?") == \
+            "SELECT '?', 'it''s ?', \"a?\" FROM t WHERE a = $1"
+
+    def test_concurrent_first_callers_share_one_pg_pool(self, monkeypatch):
+        created = []
+
+        class FakeAsyncpg:
+            @staticmethod
+            async def create_pool(**kwargs):
+                await asyncio.sleep(0.05)
+                created.append(kwargs)
+                return object()
+
+        monkeypatch.setattr(async_db, 'asyncpg', FakeAsyncpg)
+        db = AsyncDatabase({"kind": "postgres", "url": "postgresql://localhost/test"})
+
+        async def main():
+            return await asyncio.gather(*(db._get_pg_pool() for _ in range(5)))
+
+        pools = asyncio.run(main())
+        assert len(created) == 1
+        assert all(pool is pools[0] for pool in pools)
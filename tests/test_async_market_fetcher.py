@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+异步市场数据获取器测试
+
+验证带 since / params 的批量任务
+"""
+import pytest
+import sys
+import os
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("ccxt.async_support")
+
+from core.async_market_fetcher import AsyncMarketFetcher, FetchTask
+
+
+class FakeAsyncExchange:
+    def __init__(self):
+        self.calls = []
+
+    async def fetch_ohlcv(self, symbol, timeframe, limit, since=None, params=None):
+        self.calls.append((symbol, timeframe, limit, since, params, time.perf_counter()))
+        return [[since or 0, 1, 1, 1, 1, 1]]
+
+
+class TestAsyncMarketFetcher:
+    """批量任务"""
+
+    def test_fetcher_passes_since_and_params(self):
+        fetcher = AsyncMarketFetcher(max_concurrent=4)
+        fetcher.exchange = FakeAsyncExchange()
+
+        async def main():
+            fetcher._semaphore = asyncio.Semaphore(4)
+            return await fetcher.fetch_batch_ohlcv([
+                FetchTask('BTC/USDT:USDT', '1m', 3, since=123),
+                FetchTask('ETH/USDT:USDT', '5m', 50),
+                FetchTask('SOL/USDT:USDT', '1m', 100, params={'after': '456'}),
+            ])
+
+        results = asyncio.run(main())
+        assert [r.data[0][0] for r in results] == [123, 0, 0]
+        assert [c[3] for c in fetcher.exchange.calls] == [123, None, None]
+        assert [c[4] for c in fetcher.exchange.calls] == [{}, {}, {'after': '456'}]
+
+
+class HangingExchange(FakeAsyncExchange):
+    """指定币种永不返回"""
+
+    def __init__(self, hang_symbol):
+        super().__init__()
+        self.hang_symbol = hang_symbol
+
+    async def fetch_ohlcv(self, symbol, timeframe, limit, since=None, params=None):
+        if symbol == self.hang_symbol:
+            await asyncio.sleep(3600)
+        return await super().fetch_ohlcv(symbol, timeframe, limit, since, params)
+
+
+class TestSyncChunks:
+    """同步接口按块提交与部分结果"""
+
+    def test_timed_out_chunk_keeps_other_results(self, monkeypatch):
+        import core.async_market_fetcher as amf
+
+        fetcher = AsyncMarketFetcher(max_concurrent=2)
+        fetcher.exchange = HangingExchange('HANG/USDT:USDT')
+
+        async def fake_get_or_create_fetcher(**kwargs):
+            if fetcher._semaphore is None:
+                fetcher._semaphore = asyncio.Semaphore(2)
+            return fetcher
+
+        monkeypatch.setattr(amf, '_get_or_create_fetcher', fake_get_or_create_fetcher)
+        monkeypatch.setattr(amf, 'SYNC_CHUNK_WAVES', 1)
+        monkeypatch.setattr(amf, 'SYNC_CHUNK_TIMEOUT', 0.3)
+
+        tasks = [('A/USDT:USDT', '1m', 10), ('B/USDT:USDT', '1m', 10),
+                 ('HANG/USDT:USDT', '1m', 10), ('C/USDT:USDT', '1m', 10),
+                 ('D/USDT:USDT', '1m', 10)]
+        start = time.perf_counter()
+        results = amf.fetch_batch_ohlcv_sync(tasks, max_concurrent=2)
+
+        assert time.perf_counter() - start < 2
+        assert set(results) == {(t[0], t[1]) for t in tasks}
+        # 块大小 2：[A, B] [HANG, C] [D]，只有超时的块丢失
+        assert results[('A/USDT:USDT', '1m')] is not None
+        assert results[('B/USDT:USDT', '1m')] is not None
+        assert results[('HANG/USDT:USDT', '1m')] is None
+        assert results[('C/USDT:USDT', '1m')] is None
+        assert results[('D/USDT:USDT', '1m')] is not None
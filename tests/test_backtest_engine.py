@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+回测引擎测试
+
+验证增量 walk-forward 模式与旧版逐 bar 切片模式的交易结果一致
+"""
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.backtest_engine import BacktestEngine, BacktestConfig, BacktestResult
+from strategies.strategy_v2 import TradingStrategy
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """不连接交易所的回测引擎"""
+    monkeypatch.setattr(BacktestEngine, '_init_exchange', lambda self: None)
+    return BacktestEngine()
+
+
+@pytest.fixture
+def price_df():
+    """随机游走 K 线"""
+    np.random.seed(7)
+    n = 1500
+    closes = 100.0 * np.cumprod(1 + np.random.randn(n) * 0.004)
+    highs = closes * (1 + np.abs(np.random.randn(n) * 0.002))
+    lows = closes * (1 - np.abs(np.random.randn(n) * 0.002))
+    opens = np.r_[closes[0], closes[:-1]]
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='1min'),
+        'open': opens,
+        'high': highs,
+        'low': lows,
+        'close': closes,
+        'volume': np.random.uniform(100, 1000, n),
+    })
+
+
+class MACrossStrategy:
+    """只实现 check_signals 的简单均线策略"""
+
+    def calculate_indicators(self, df):
+        df['fast'] = df['close'].rolling(10).mean()
+        df['slow'] = df['close'].rolling(30).mean()
+        return df
+
+    def check_signals(self, df, timeframe='1m'):
+        curr, prev = df.iloc[-2], df.iloc[-3]
+        if prev['fast'] <= prev['slow'] and curr['fast'] > curr['slow']:
+            return {"action": "LONG", "reason": "金叉"}
+        if prev['fast'] >= prev['slow'] and curr['fast'] < curr['slow']:
+            return {"action": "SHORT", "reason": "死叉"}
+        return {"action": "HOLD"}
+
+
+class AnalyzeStrategy:
+    """只实现 analyze 的策略"""
+
+    def analyze(self, ohlcv, symbol, timeframe='1m'):
+        closes = ohlcv['close']
+        if closes.iloc[-1] > closes.iloc[-20:].mean() * 1.003:
+            return {"action": "LONG", "reason": "突破"}
+        if closes.iloc[-1] < closes.iloc[-20:].mean() * 0.997:
+            return {"action": "CLOSE_LONG", "reason": "回落", "close_pct": 0.5}
+        return {"action": "HOLD"}
+
+
+def _run_both(engine, strategy_factory, df, timeframe='1m'):
+    results = []
+    for mode in ('legacy', 'incremental'):
+        config = BacktestConfig(timeframe=timeframe, simulation_mode=mode)
+        trades, curve = engine._simulate_trading(strategy_factory(), df.copy(), config)
+        result = engine._calculate_metrics(trades, curve, config, BacktestResult(initial_capital=config.initial_capital))
+        results.append(result)
+    return results
+
+
+def _assert_same(legacy, incremental):
+    assert len(legacy.trades) == len(incremental.trades)
+    for a, b in zip(legacy.trades, incremental.trades):
+        assert a.entry_time == b.entry_time
+        assert a.exit_time == b.exit_time
+        assert a.side == b.side
+        assert a.pnl == pytest.approx(b.pnl)
+        assert a.exit_reason == b.exit_reason
+    assert legacy.final_capital == pytest.approx(incremental.final_capital)
+    assert legacy.max_drawdown_pct == pytest.approx(incremental.max_drawdown_pct)
+    assert legacy.sharpe_ratio == pytest.approx(incremental.sharpe_ratio)
+    assert len(legacy.equity_curve) == len(incremental.equity_curve)
+
+
+class TestIncrementalSimulation:
+    """增量模式与旧版模式一致性"""
+
+    def test_check_signals_strategy(self, engine, price_df):
+        legacy, incremental = _run_both(engine, MACrossStrategy, price_df)
+        assert legacy.total_trades > 0
+        _assert_same(legacy, incremental)
+
+    def test_analyze_strategy(self, engine, price_df):
+        legacy, incremental = _run_both(engine, AnalyzeStrategy, price_df)
+        assert legacy.total_trades > 0
+        _assert_same(legacy, incremental)
+
+    @pytest.mark.parametrize("timeframe", ['1m', '30m'])
+    def test_strategy_v2_bar_index(self, engine, price_df, timeframe):
+        legacy, incremental = _run_both(engine, TradingStrategy, price_df, timeframe)
+        _assert_same(legacy, incremental)
+
+
+class TestTimeframeAlignment:
+    """core.simulation 多周期对齐表"""
+
+    def test_alignment_matches_linear_search(self, price_df):
+        from core.simulation import BacktestEngine as MultiTFBacktestEngine
+
+        engine = MultiTFBacktestEngine(TradingStrategy())
+        tf_data = {tf: engine._resample_timeframe(price_df, tf) for tf in ['1m', '5m', '15m']}
+        alignment = engine._build_alignment_table(tf_data['1m'], tf_data)
+
+        for tf, df_tf in tf_data.items():
+            for i in range(0, len(price_df), 97):
+                target = tf_data['1m']['timestamp'].iloc[i]
+                expected = int((df_tf['timestamp'] <= target).sum()) - 1
+                assert alignment[tf][i] == expected
+
+    def test_caller_df_preferred_over_local_store(self, price_df, monkeypatch):
+        from core.simulation import BacktestEngine as MultiTFBacktestEngine
+
+        engine = MultiTFBacktestEngine(TradingStrategy())
+        calls = []
+        monkeypatch.setattr(engine, '_load_from_store', lambda *args: calls.append(args))
+
+        engine.run(price_df, start_date='2024-01-01', end_date='2024-01-02', timeframes=['1m', '5m'])
+        assert calls == []
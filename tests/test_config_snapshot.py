@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+配置快照测试
+
+验证版本号随写入递增、快照命中不回源、本进程写入立即可见、其他进程写入在轮询后可见
+"""
+import pytest
+import sys
+import os
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_bridge
+from database.config_snapshot import ConfigSnapshot
+
+
+@pytest.fixture
+def db_config(tmp_path):
+    config = {"kind": "sqlite", "path": str(tmp_path / "snapshot.db")}
+    db_bridge.init_db(config)
+    return config
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = []
+    original = db_bridge.get_bot_config
+
+    def counting(db_config=None):
+        calls.append(1)
+        return original(db_config)
+
+    monkeypatch.setattr(db_bridge, 'get_bot_config', counting)
+    return calls
+
+
+class TestConfigVersions:
+    """写入在同一事务内递增版本号"""
+
+    def test_writes_bump_versions(self, db_config):
+        before = db_bridge.get_config_versions(db_config)
+        assert set(before) == set(db_bridge.CONFIG_VERSION_TABLES)
+
+        db_bridge.update_bot_config(db_config, run_mode='paper')
+        db_bridge.set_control_flags(db_config, pause_trading=1)
+        db_bridge.set_control_flags(db_config, pause_trading=0)
+        db_bridge.update_engine_status(db_config, alive=1)
+
+        after = db_bridge.get_config_versions(db_config)
+        assert after['bot_config'] == before['bot_config'] + 1
+        assert after['control_flags'] == before['control_flags'] + 2
+        assert after['engine_status'] == before['engine_status'] + 1
+
+
+class TestConfigSnapshot:
+    """快照读取"""
+
+    def test_reads_served_from_memory(self, db_config, loads):
+        snapshot = ConfigSnapshot(db_config, poll_interval=60)
+        for _ in range(100):
+            config = snapshot.get('bot_config')
+        assert config['run_mode'] == 'sim'
+        assert len(loads) == 1
+        assert snapshot.stats['hits'] == 99
+
+        # 返回副本，修改不影响快照
+        config['run_mode'] = 'live'
+        assert snapshot.get('bot_config')['run_mode'] == 'sim'
+
+    def test_local_write_visible_immediately(self, db_config):
+        snapshot = ConfigSnapshot(db_config, poll_interval=60)
+        assert snapshot.get('control_flags')['reload_config'] == 0
+        db_bridge.set_control_flags(db_config, reload_config=1)
+        assert snapshot.get('control_flags')['reload_config'] == 1
+
+    def test_external_write_visible_after_poll(self, db_config, loads):
+        snapshot = ConfigSnapshot(db_config, poll_interval=0.1)
+        assert snapshot.get('bot_config')['symbols'] == ''
+
+        # 模拟其他进程写入（不经过本进程回调）
+        conn = sqlite3.connect(db_config['path'])
+        conn.execute("UPDATE bot_config SET symbols = 'BTC/USDT' WHERE id = 1")
+        conn.execute("UPDATE config_versions SET version = version + 1 WHERE name = 'bot_config'")
+        conn.commit()
+        conn.close()
+
+        assert snapshot.get('bot_config')['symbols'] == ''
+        time.sleep(0.15)
+        assert snapshot.get('bot_config')['symbols'] == 'BTC/USDT'
+
+        # 其他表版本号变化不触发 bot_config 重新加载
+        loaded = len(loads)
+        db_bridge.update_engine_status(db_config, alive=1)
+        time.sleep(0.15)
+        snapshot.get('bot_config')
+        assert len(loads) == loaded
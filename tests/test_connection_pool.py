@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+数据库连接池测试
+"""
+import pytest
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection_pool import ConnectionPool, get_pool_for_config
+from database import db_bridge
+
+
+@pytest.fixture
+def db_config(tmp_path):
+    config = {"kind": "sqlite", "path": str(tmp_path / "pool.db")}
+    db_bridge.init_db(config)
+    return config
+
+
+class TestConnectionPool:
+    """连接复用与统计"""
+
+    def test_reuse_counts_hits(self, tmp_path):
+        pool = ConnectionPool({"kind": "sqlite", "path": str(tmp_path / "a.db")}, pool_size=2)
+        first = pool.get_connection()
+        pool.return_connection(first)
+        second = pool.get_connection()
+        pool.return_connection(second)
+
+        assert first is second
+        stats = pool.stats
+        assert (stats["misses"], stats["hits"], stats["created_count"]) == (1, 1, 1)
+
+    def test_uncommitted_writes_rolled_back_on_return(self, tmp_path):
+        pool = ConnectionPool({"kind": "sqlite", "path": str(tmp_path / "b.db")}, pool_size=1)
+        with pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.commit()
+            conn.execute("INSERT INTO t VALUES (1)")
+        with pool.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+    def test_wait_and_timeout_stats(self, tmp_path):
+        pool = ConnectionPool({"kind": "sqlite", "path": str(tmp_path / "c.db")}, pool_size=1)
+        held = pool.get_connection()
+
+        with pytest.raises(TimeoutError):
+            pool.get_connection(timeout=0.2)
+
+        timer = threading.Timer(0.1, pool.return_connection, args=(held,))
+        timer.start()
+        conn = pool.get_connection(timeout=2)
+        timer.join()
+        pool.return_connection(conn)
+
+        stats = pool.stats
+        assert stats["timeouts"] == 1
+        assert stats["waits"] == 1
+        assert stats["wait_time_ms"] > 0
+
+
+class TestDbBridgePooling:
+    """db_bridge 走连接池"""
+
+    def test_calls_reuse_pooled_connection(self, db_config):
+        pool = get_pool_for_config(db_config)
+        before = pool.stats
+
+        db_bridge.update_paper_position("BTC/USDT:USDT", "long", qty=1.0, entry_price=100.0, db_config=db_config)
+        for _ in range(5):
+            assert db_bridge.get_paper_position("BTC/USDT:USDT", "long", db_config)["qty"] == 1.0
+        db_bridge.set_signal_cache("BTC/USDT:USDT", "1m", "BUY", 123, db_config)
+        assert db_bridge.get_signal_cache("BTC/USDT:USDT", "1m", "BUY", db_config) == 123
+
+        after = pool.stats
+        assert after["checkouts"] - before["checkouts"] >= 9
+        assert after["created_count"] == 1
+        assert after["available_count"] == 1
+
+    def test_read_modify_write_does_not_hold_two_connections(self, db_config, monkeypatch):
+        pool = get_pool_for_config(db_config)
+        monkeypatch.setattr(pool, "pool_size", 1)
+        monkeypatch.setattr(pool, "timeout", 0.5)
+
+        db_bridge.update_bot_config(db_config, run_mode="sim")
+        db_bridge.update_paper_balance(wallet_balance=300.0, db_config=db_config)
+        db_bridge.update_paper_position("ETH/USDT:USDT", "short", qty=2.0, entry_price=10.0, db_config=db_config)
+
+        assert db_bridge.get_paper_balance(db_config)["wallet_balance"] == 300.0
+        assert pool.stats["timeouts"] == 0
+
+    def test_closed_proxy_returns_once(self, db_config):
+        pool = get_pool_for_config(db_config)
+        conn, db_kind = db_bridge._get_connection(db_config)
+        assert db_kind == "sqlite"
+        available = pool.stats["available_count"]
+        conn.close()
+        conn.close()
+        assert pool.stats["available_count"] == available + 1
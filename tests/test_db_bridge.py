@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+数据库桥接层测试
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_bridge
+
+
+@pytest.fixture
+def db_config(tmp_path):
+    config = {"kind": "sqlite", "path": str(tmp_path / "bridge.db")}
+    db_bridge.init_db(config)
+    return config
+
+
+def _bars(start, count, close=100.0):
+    return [[1704067200000 + (start + i) * 60000, close, close + 1, close - 1, close + i, 10.0]
+            for i in range(count)]
+
+
+class TestUpsertOHLCV:
+    """K线批量写入"""
+
+    def test_only_new_bars_written(self, db_config):
+        assert db_bridge.upsert_ohlcv("BTC/USDT", "1m", _bars(0, 250), db_config) == 250
+
+        # 同一窗口向前滑动一根：只重写最后一根（可能未收盘）+ 新增一根
+        assert db_bridge.upsert_ohlcv("BTC/USDT", "1m", _bars(1, 250), db_config) == 2
+        assert db_bridge.upsert_ohlcv("BTC/USDT", "1m", _bars(1, 250), db_config) == 1
+
+        rows = db_bridge.load_ohlcv("BTC/USDT", "1m", limit=1000, db_config=db_config)
+        assert len(rows) == 251
+        assert [r[0] for r in rows] == [b[0] for b in _bars(0, 251)]
+
+    def test_forming_bar_overwritten(self, db_config):
+        db_bridge.upsert_ohlcv("ETH/USDT", "5m", _bars(0, 3), db_config)
+        updated = _bars(0, 3)
+        updated[-1][4] = 999.0
+        db_bridge.upsert_ohlcv("ETH/USDT", "5m", updated, db_config)
+
+        rows = db_bridge.load_ohlcv("ETH/USDT", "5m", limit=10, db_config=db_config)
+        assert rows[-1][4] == 999.0
+        assert len(rows) == 3
+
+    def test_duplicate_ts_keeps_last(self, db_config):
+        bars = _bars(0, 3)
+        duplicate = list(bars[1])
+        duplicate[4] = 555.0
+        bars.append(duplicate)
+
+        assert db_bridge.upsert_ohlcv("SOL/USDT", "1m", bars, db_config) == 3
+        rows = db_bridge.load_ohlcv("SOL/USDT", "1m", limit=10, db_config=db_config)
+        assert [r[0] for r in rows] == [b[0] for b in _bars(0, 3)]
+        assert rows[1][4] == 555.0
+
+    def test_keys_independent_and_empty_input(self, db_config):
+        db_bridge.upsert_ohlcv("BTC/USDT", "1m", _bars(100, 5), db_config)
+        assert db_bridge.upsert_ohlcv("BTC/USDT", "5m", _bars(0, 5), db_config) == 5
+        assert db_bridge.upsert_ohlcv("BTC/USDT", "1m", [], db_config) == 0
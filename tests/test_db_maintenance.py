@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+数据库维护测试
+
+验证保留期删除、1m→1h 降采样、决策归档、增量 VACUUM 回收空间，以及按截止时间分段执行
+"""
+import pytest
+import sys
+import os
+import gzip
+import json
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_bridge
+from database.maintenance import (
+    DatabaseMaintenance, RetentionPolicy, _quant_target, _arena_target, DAY_MS, HOUR_MS,
+)
+from ai.ai_db_manager import AIDBManager, AIDecision, close_thread_connections
+
+MINUTE = 60 * 1000
+
+
+@pytest.fixture
+def db_config(tmp_path):
+    config = {"kind": "sqlite", "path": str(tmp_path / "quant_system.db")}
+    db_bridge.init_db(config)
+    return config
+
+
+@pytest.fixture
+def arena_path(tmp_path):
+    path = str(tmp_path / "arena.db")
+    AIDBManager(path)
+    yield path
+    close_thread_connections()
+
+
+def _maintenance(tmp_path, policies, db_config=None, arena_path=None):
+    targets = {}
+    if db_config is not None:
+        targets['quant'] = _quant_target(db_config)
+    if arena_path is not None:
+        targets['arena'] = _arena_target(arena_path)
+    return DatabaseMaintenance(policies=policies, targets=targets, archive_dir=str(tmp_path / "archive"))
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class TestRetention:
+    """保留期删除与降采样"""
+
+    def test_delete_expired_rows(self, tmp_path, db_config):
+        now = _now_ms()
+        for i in range(5000):
+            ts = now - 40 * DAY_MS + i if i < 4500 else now - i
+            db_bridge.insert_signal_event('BTC/USDT', '1m', ts, 'BUY', 1.0, db_config=db_config)
+
+        policy = RetentionPolicy('signal_events', 'quant', 'signal_events', 'ts', 30)
+        report = _maintenance(tmp_path, [policy], db_config=db_config).run_pass()
+
+        table = report.tables['signal_events']
+        assert (table.rows_before, table.deleted, table.rows_after) == (5000, 4500, 500)
+
+    def test_env_overrides_keep_days(self, monkeypatch):
+        policy = RetentionPolicy('signal_events', 'quant', 'signal_events', 'ts', 30)
+        monkeypatch.setenv('RETENTION_SIGNAL_EVENTS_DAYS', '1')
+        assert policy.cutoff(now=10 * 86400) == 9 * DAY_MS
+        assert RetentionPolicy('x', 'quant', 'x', 'ts', 1, ts_unit='s').cutoff(now=10 * 86400) == 9 * 86400
+
+    def test_downsample_1m_to_1h(self, tmp_path, db_config):
+        start = (_now_ms() - 10 * DAY_MS) // HOUR_MS * HOUR_MS
+        bars = [[start + i * MINUTE, 100 + i, 200 + i, 50 - i, 101 + i, 1.0] for i in range(150)]
+        recent = [[_now_ms() // MINUTE * MINUTE - MINUTE, 1, 1, 1, 1, 1]]
+        db_bridge.upsert_ohlcv('BTC/USDT', '1m', bars, db_config=db_config)
+        db_bridge.upsert_ohlcv('BTC/USDT', '1m', recent, db_config=db_config)
+        # 交易所原始 1h K线优先于聚合结果
+        db_bridge.upsert_ohlcv('BTC/USDT', '1h', [[start + 2 * HOUR_MS, 9, 9, 9, 9, 9]], db_config=db_config)
+
+        policy = RetentionPolicy('ohlcv_1m', 'quant', 'ohlcv_cache', 'ts', 7, action='downsample', timeframe='1m')
+        report = _maintenance(tmp_path, [policy], db_config=db_config).run_pass()
+        assert report.tables['ohlcv_cache'].downsampled == 150
+
+        conn = sqlite3.connect(db_config['path'])
+        hourly = conn.execute(
+            "SELECT ts, open, high, low, close, volume FROM ohlcv_cache WHERE timeframe = '1h' ORDER BY ts"
+        ).fetchall()
+        remaining = conn.execute("SELECT COUNT(*) FROM ohlcv_cache WHERE timeframe = '1m'").fetchone()[0]
+        conn.close()
+
+        assert remaining == 1
+        assert hourly[0] == (start, 100, 259, -9, 160, 60.0)
+        assert hourly[1] == (start + HOUR_MS, 160, 319, -69, 220, 60.0)
+        assert hourly[2] == (start + 2 * HOUR_MS, 9, 9, 9, 9, 9)
+
+
+class TestArchive:
+    """决策归档"""
+
+    def test_archive_decisions_keeps_open_position_refs(self, tmp_path, arena_path):
+        manager = AIDBManager(arena_path)
+        old = _now_ms() - 40 * DAY_MS
+        ids = manager.save_decisions_batch([
+            AIDecision(timestamp=old + i, agent_name='deepseek', symbol='BTC/USDT:USDT', signal='BUY', price=1.0)
+            for i in range(3)
+        ] + [AIDecision(timestamp=_now_ms(), agent_name='qwen', symbol='BTC/USDT:USDT', signal='SELL', price=1.0)])
+        manager.open_position('deepseek', 'BTC/USDT:USDT', 'long', 1.0, 10.0, decision_id=ids[1])
+        close_thread_connections()
+
+        policy = RetentionPolicy('ai_decisions', 'arena', 'ai_decisions', 'timestamp', 30, action='archive',
+                                 keep_where="id IN (SELECT decision_id FROM ai_positions WHERE status = 'open')")
+        report = _maintenance(tmp_path, [policy], arena_path=arena_path).run_pass()
+
+        assert report.tables['ai_decisions'].archived == 2
+        [path] = report.archive_files
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            archived = [json.loads(line) for line in f]
+        assert [r['id'] for r in archived] == [ids[0], ids[2]]
+        assert archived[0]['signal'] == 'BUY'
+
+        remaining = [d.id for d in manager.get_latest_decisions(limit=10)]
+        assert sorted(remaining) == [ids[1], ids[3]]
+
+
+class TestVacuum:
+    """空间回收与分段执行"""
+
+    def test_incremental_vacuum_reclaims_space(self, tmp_path, db_config):
+        conn = sqlite3.connect(db_config['path'])
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        conn.close()
+
+        old = int(time.time()) - 30 * 86400
+        for i in range(3000):
+            db_bridge.insert_performance_metrics({'ts': old + i, 'cycle_ms': i}, db_config=db_config)
+
+        policy = RetentionPolicy('performance_metrics', 'quant', 'performance_metrics', 'ts', 7, ts_unit='s')
+        report = _maintenance(tmp_path, [policy], db_config=db_config).run_pass()
+
+        assert report.tables['performance_metrics'].deleted == 3000
+        assert report.reclaimed_bytes['quant'] > 0
+        conn = sqlite3.connect(db_config['path'])
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        conn.close()
+
+    def test_full_vacuum_converts_legacy_db(self, tmp_path):
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE sentiment_history (id INTEGER PRIMARY KEY, timestamp INTEGER, payload TEXT)")
+        conn.executemany("INSERT INTO sentiment_history (timestamp, payload) VALUES (?, ?)",
+                         [(1000 + i, 'x' * 200) for i in range(2000)])
+        conn.commit()
+        conn.close()
+
+        policy = RetentionPolicy('sentiment_history', 'arena', 'sentiment_history', 'timestamp', 7, ts_unit='s')
+        maintenance = _maintenance(tmp_path, [policy], arena_path=path)
+        report = maintenance.run_pass()
+        assert report.tables['sentiment_history'].deleted == 2000
+        assert report.reclaimed_bytes.get('arena', 0) == 0  # 未开启增量 VACUUM，只提示
+
+        report = maintenance.run_pass(full_vacuum=True)
+        conn = sqlite3.connect(path)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        conn.close()
+        assert report.reclaimed_bytes['arena'] > 0
+        assert report.file_bytes_after['arena'] < report.file_bytes_before['arena']
+
+    def test_pass_resumes_across_deadlines(self, tmp_path, db_config):
+        now = _now_ms()
+        for i in range(10):
+            db_bridge.insert_signal_event('BTC/USDT', '1m', now - 40 * DAY_MS + i, 'BUY', 1.0, db_config=db_config)
+
+        policy = RetentionPolicy('signal_events', 'quant', 'signal_events', 'ts', 30)
+        maintenance = _maintenance(tmp_path, [policy], db_config=db_config)
+        assert maintenance.run_pass(deadline=time.time() - 1) is None
+        assert maintenance.last_report is None
+
+        report = maintenance.run_pass()
+        assert report.tables['signal_events'].deleted == 10
+
+    def test_measure_respects_deadline(self, tmp_path, db_config):
+        policies = [
+            RetentionPolicy('signal_events', 'quant', 'signal_events', 'ts', 30),
+            RetentionPolicy('performance_metrics', 'quant', 'performance_metrics', 'ts', 7, ts_unit='s'),
+        ]
+        maintenance = _maintenance(tmp_path, policies, db_config=db_config)
+        maintenance._start_pass(full_vacuum=False)
+
+        # 截止时间已过：不做全表计数，下个窗口继续
+        assert maintenance._measure(time.time() - 1, before=True) is False
+        assert maintenance._report.tables == {}
+
+        assert maintenance._measure(float('inf'), before=True) is True
+        assert set(maintenance._report.tables) == {'signal_events', 'performance_metrics'}
+
+    def test_disabled_by_default(self, monkeypatch):
+        import database.maintenance as maintenance_module
+
+        monkeypatch.setattr(maintenance_module, '_maintenance', None)
+        monkeypatch.delenv('DB_MAINTENANCE', raising=False)
+        assert maintenance_module.get_maintenance().__class__.__name__ == '_DisabledMaintenance'
+
+        monkeypatch.setattr(maintenance_module, '_maintenance', None)
+        monkeypatch.setenv('DB_MAINTENANCE', '1')
+        assert isinstance(maintenance_module.get_maintenance(), DatabaseMaintenance)
+        monkeypatch.setattr(maintenance_module, '_maintenance', None)
+
+    def test_offer_idle_runs_in_background(self, tmp_path, db_config):
+        now = _now_ms()
+        db_bridge.insert_signal_event('BTC/USDT', '1m', now - 40 * DAY_MS, 'BUY', 1.0, db_config=db_config)
+
+        policy = RetentionPolicy('signal_events', 'quant', 'signal_events', 'ts', 30)
+        maintenance = _maintenance(tmp_path, [policy], db_config=db_config)
+        maintenance.min_idle = 0.1
+        try:
+            maintenance.offer_idle(time.time() + 0.05)  # 窗口太短，不启动
+            assert maintenance._thread is None
+            maintenance.offer_idle(time.time() + 5)
+            for _ in range(100):
+                if maintenance.last_report is not None:
+                    break
+                time.sleep(0.05)
+        finally:
+            maintenance.stop()
+        assert maintenance.last_report.tables['signal_events'].deleted == 1
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+双通道信号引擎测试
+
+验证共享前缀计算与逐通道全量计算信号一致，多币种并行扫描按顺序汇总
+"""
+import pytest
+import sys
+import os
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dual_channel.dual_channel_ohlcv import DualChannelOHLCV
+from dual_channel.dual_channel_engine import DualChannelSignalEngine
+from dual_channel.dual_channel_tracker import IntrabarSignalTracker, ConfirmedSignalTracker
+from dual_channel.dual_channel_integration import DualChannelIntegration
+from strategies.strategy_v2 import TradingStrategy
+
+
+def _candles(seed, n=1000):
+    rng = np.random.default_rng(seed)
+    closes = 100.0 * np.cumprod(1 + rng.standard_normal(n) * 0.004)
+    opens = np.r_[closes[0], closes[:-1]]
+    return [
+        [1704067200000 + i * 60000, opens[i], max(opens[i], closes[i]) * 1.001,
+         min(opens[i], closes[i]) * 0.999, closes[i], 100.0 + i]
+        for i in range(n)
+    ]
+
+
+class _PerChannelStrategy:
+    """隐藏 calculate_indicators_with_forming，强制逐通道全量计算"""
+
+    def __init__(self):
+        self._strategy = TradingStrategy()
+
+    def calculate_indicators(self, df):
+        return self._strategy.calculate_indicators(df)
+
+    def check_signals(self, df, timeframe):
+        return self._strategy.check_signals(df, timeframe)
+
+
+def _fresh_engine(strategy):
+    engine = DualChannelSignalEngine(strategy, execution_mode="both")
+    engine.intrabar_tracker = IntrabarSignalTracker()
+    engine.confirmed_tracker = ConfirmedSignalTracker()
+    return engine
+
+
+class _FakeProvider:
+    def __init__(self, candles_by_symbol):
+        self.candles_by_symbol = candles_by_symbol
+
+    def get_dual_channel_ohlcv(self, symbol, timeframe):
+        data = DualChannelOHLCV.from_candles(symbol, timeframe, self.candles_by_symbol[symbol])
+        return data, False
+
+
+class TestSharedPrefix:
+    """共享前缀与逐通道计算一致"""
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_same_signals_as_per_channel(self, seed):
+        data = DualChannelOHLCV.from_candles('BTC/USDT:USDT', '1m', _candles(seed))
+        shared = _fresh_engine(TradingStrategy())
+        separate = _fresh_engine(_PerChannelStrategy())
+
+        closed_df, forming_df = shared.calculate_shared_indicators(data)
+        assert closed_df is not None and len(forming_df) == len(closed_df) + 1
+        assert separate.calculate_shared_indicators(data) == (None, None)
+
+        a = shared.process_scan(data, '00:00:59')
+        b = separate.process_scan(data, '00:00:59')
+        for x, y in ((a.intrabar_signals, b.intrabar_signals), (a.confirmed_signals, b.confirmed_signals)):
+            assert [(s.action, s.reason) for s in x] == [(s.action, s.reason) for s in y]
+
+
+    def test_confirmed_only_skips_shared_calculation(self, monkeypatch):
+        data = DualChannelOHLCV.from_candles('BTC/USDT:USDT', '1m', _candles(0))
+        engine = _fresh_engine(TradingStrategy())
+        engine.set_execution_mode("confirmed")
+        calls = []
+        monkeypatch.setattr(engine, 'calculate_shared_indicators', lambda d: calls.append(d) or (None, None))
+        indicator_calls = []
+        original = engine.strategy.calculate_indicators
+        monkeypatch.setattr(engine.strategy, 'calculate_indicators',
+                            lambda df: indicator_calls.append(len(df)) or original(df))
+
+        engine.process_scan(data, '00:00:30')
+        engine.process_scan(data, '00:00:59')   # 同一根收线K线：不再计算
+        assert calls == []
+        assert indicator_calls == [len(data.get_closed_candles())]
+
+
+class TestMultiSymbolScan:
+    """多币种并行扫描"""
+
+    def test_results_follow_symbol_order(self):
+        symbols = [f"SYM{i}/USDT:USDT" for i in range(6)]
+        provider = _FakeProvider({s: _candles(i) for i, s in enumerate(symbols)})
+        integration = DualChannelIntegration(TradingStrategy(), execution_mode="both", use_print=False)
+        integration.engine = _fresh_engine(integration.engine.strategy)
+
+        results = integration.process_multi_symbol_scan(provider, symbols, '1m', '00:00:59')
+
+        assert list(results) == symbols
+        assert all(r.closed_ts == _candles(0)[-2][0] for r in results.values())
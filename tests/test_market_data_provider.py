@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+MarketDataProvider 列式K线缓存测试
+
+验证结构化数组的合并 / 裁剪语义与原列表实现一致，as_arrays 与 DataFrame 视图的缓存，
+以及批量全量分页 / 增量拉取的请求形态
+"""
+import pytest
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import market_data_provider
+from core.market_data_provider import MarketDataProvider, OHLCVBars, OHLCV_DTYPE
+
+MINUTE = 60 * 1000
+
+
+def _bar(ts, close=None):
+    close = float(ts // MINUTE % 1000) if close is None else close
+    return [ts, close - 1, close + 1, close - 2, close, 10.0]
+
+
+def _reference_merge(cached, new, limit):
+    """原 _merge_ohlcv 的列表实现"""
+    ts_map = {c[0]: c for c in cached}
+    for c in new:
+        ts_map[c[0]] = c
+    return sorted(ts_map.values(), key=lambda x: x[0])[-limit:]
+
+
+class FakeClock:
+    """替换 market_data_provider.time：可控的当前时间，sleep 不等待"""
+
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+
+    def time(self):
+        return self.now_ms / 1000
+
+    def sleep(self, _):
+        pass
+
+
+class FakeExchange:
+    """按 1m 生成K线的交易所适配器（支持 after 倒序分页与 since 增量，since 返回最新的 limit 根）"""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe, limit=100, since=None, params=None):
+        self.calls += 1
+        if params and 'after' in params:
+            rows = [b for b in self.bars if b[0] < int(params['after'])][-limit:]
+        elif since is not None:
+            rows = [b for b in self.bars if b[0] >= since][-limit:]
+        else:
+            rows = self.bars[-limit:]
+        return [list(b) for b in rows]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(int(time.time() * 1000) // MINUTE * MINUTE + 5000)
+    monkeypatch.setattr(market_data_provider, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def provider(clock):
+    now = clock.now_ms // MINUTE * MINUTE
+    exchange = FakeExchange([_bar(now - i * MINUTE) for i in range(250, -1, -1)])
+    return MarketDataProvider(exchange, '1m', 200), exchange, now
+
+
+class TestOHLCVBars:
+    """结构化数组存储"""
+
+    def test_merge_matches_list_semantics(self):
+        rng = np.random.default_rng(7)
+        bars = OHLCVBars(capacity=50)
+        reference = []
+        for _ in range(200):
+            last = reference[-1][0] if reference else 0
+            # 覆盖最后一根 / 追加若干根 / 偶尔改写更早的K线，且输入乱序、有重复
+            stamps = [last + k * MINUTE for k in range(int(rng.integers(0, 4)))]
+            if reference and rng.random() < 0.2:
+                stamps.append(reference[int(rng.integers(0, len(reference)))][0])
+            new = [_bar(ts, float(rng.integers(1, 1000))) for ts in stamps if ts > 0]
+            new += new[:1]
+            rng.shuffle(new)
+            bars.merge(new, 50)
+            reference = _reference_merge(reference, new, 50)
+            assert bars.to_list() == reference
+        assert len(bars) == 50
+        assert bars.last_ts == reference[-1][0]
+
+    def test_append_trims_to_capacity_without_copy(self):
+        bars = OHLCVBars(capacity=100)
+        bars.merge([_bar(i * MINUTE) for i in range(1, 101)])
+        storage = bars._published[0]
+
+        assert bars.merge([_bar(101 * MINUTE), _bar(102 * MINUTE)]) == 2
+        assert bars._published[0] is storage      # 尾部追加，不重建
+        assert len(bars) == 100
+        assert bars.arrays()['ts'][0] == 3 * MINUTE
+
+        # 只更新形成中的K线：原地写入
+        assert bars.merge([_bar(102 * MINUTE, 5.0)]) == 0
+        assert bars.arrays()['close'][-1] == 5.0
+        assert bars._published[0] is storage
+
+    def test_frame_built_once_per_version(self):
+        bars = OHLCVBars(capacity=10)
+        bars.merge([_bar(i * MINUTE) for i in range(1, 6)])
+
+        frame = bars.to_frame()
+        assert list(frame.columns) == ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+        assert frame['timestamp'].iloc[-1] == pd.Timestamp(5 * MINUTE, unit='ms')
+        cached = bars._frame_cache[1]
+
+        frame['close'] = 0.0                      # 返回副本，修改不影响缓存
+        again = bars.to_frame()
+        assert bars._frame_cache[1] is cached
+        assert again['close'].iloc[-1] == bars.arrays()['close'][-1]
+
+        bars.merge([_bar(6 * MINUTE)])
+        assert bars._frame_cache[1] is cached     # 懒构建
+        assert len(bars.to_frame()) == 6
+        assert bars._frame_cache[1] is not cached
+
+
+class TestProviderCache:
+    """MarketDataProvider.get_ohlcv"""
+
+    def test_full_init_and_incremental(self, provider, clock):
+        provider, exchange, now = provider
+        data, stale = provider.get_ohlcv('BTC/USDT:USDT', '1m', limit=200)
+        assert not stale
+        assert data == exchange.bars[-200:]
+
+        exchange.bars += [_bar(now + MINUTE), _bar(now + 2 * MINUTE)]
+        exchange.bars[-3] = _bar(now, 42.0)
+        clock.now_ms += 2 * MINUTE
+        data, stale = provider.get_ohlcv('BTC/USDT:USDT', '1m', limit=200, force_fetch=True)
+        assert not stale
+        assert data == exchange.bars[-200:]
+
+        entry = provider.ohlcv_cache[('BTC/USDT:USDT', '1m')]
+        assert entry.last_max_ts == now + 2 * MINUTE
+        assert entry.bars_count == 200
+
+        # 交易所未更新：标记为陈旧
+        data, stale = provider.get_ohlcv('BTC/USDT:USDT', '1m', limit=200, force_fetch=True)
+        assert stale and entry.stale_count == 1
+
+    def test_as_arrays_and_frame(self, provider):
+        provider, exchange, now = provider
+        arrays, _ = provider.get_ohlcv('BTC/USDT:USDT', '1m', limit=200, as_arrays=True)
+        assert arrays.dtype == OHLCV_DTYPE
+        assert not arrays.flags.writeable
+        assert arrays['ts'][-1] == now
+
+        calls = exchange.calls
+        frame, stale = provider.get_ohlcv_frame('BTC/USDT:USDT', '1m', limit=200)
+        assert exchange.calls == calls           # 缓存新鲜，不再请求
+        assert not stale
+        assert len(frame) == 200
+        assert frame['close'].tolist() == arrays['close'].tolist()
+        assert provider.get_cached_ohlcv_frame('ETH/USDT:USDT', '1m') is None
+
+
+class TestGetOHLCVMany:
+    """MarketDataProvider.get_ohlcv_many"""
+
+    @pytest.fixture
+    def batch(self, provider):
+        provider, exchange, now = provider
+        batches = []
+
+        def batch_fetcher(tasks):
+            batches.append(tasks)
+            results = {}
+            for sym, tf, limit, since, *rest in tasks:
+                params = rest[0] if rest else None
+                results[(sym, tf)] = None if sym == 'BAD/USDT:USDT' else \
+                    exchange.fetch_ohlcv(sym, tf, limit, since=since, params=params)
+            return results
+
+        provider.batch_fetcher = batch_fetcher
+        provider._batch_fetcher_resolved = True
+        return provider, exchange, now, batches
+
+    def test_full_init_pages_batched_across_keys(self, batch):
+        provider, exchange, now, batches = batch
+        keys = [('BTC/USDT:USDT', '1m'), ('ETH/USDT:USDT', '1m'), ('BAD/USDT:USDT', '1m')]
+
+        results = provider.get_ohlcv_many(keys, limit=200)
+        # 每一轮一个批次、每个 key 一页：251 根历史 → 第 1 页最新 100 根，第 2 页 after 游标
+        assert len(batches) == 2
+        assert [t[4] for t in batches[0]] == [None, None, None]
+        assert [t[0] for t in batches[1]] == ['BTC/USDT:USDT', 'ETH/USDT:USDT']
+        assert {t[4]['after'] for t in batches[1]} == {str(exchange.bars[-100][0])}
+
+        for key in keys[:2]:
+            assert results[key].error is None
+            assert results[key].data == exchange.bars[-200:]
+        bad = results[('BAD/USDT:USDT', '1m')]
+        assert bad.data is None and '空数据' in bad.error
+        assert provider.get_pending_init_symbols() == [('BAD/USDT:USDT', '1m', 1)]
+
+    def test_incremental_fetches_only_newest_bars(self, batch, clock):
+        provider, exchange, now, batches = batch
+        keys = [('BTC/USDT:USDT', '1m'), ('ETH/USDT:USDT', '1m'), ('BAD/USDT:USDT', '1m')]
+        provider.get_ohlcv_many(keys, limit=200)
+        batches.clear()
+
+        # 缓存新鲜：不请求
+        results = provider.get_ohlcv_many(keys[:2], limit=200)
+        assert batches == []
+        assert not any(r.is_stale for r in results.values())
+
+        # 整点：所有增量在一个批次中发出，只拉缓存最新K线 + 新收盘的K线
+        exchange.bars.append(_bar(now + MINUTE))
+        clock.now_ms += MINUTE
+        results = provider.get_ohlcv_many(keys[:2], limit=200, as_arrays=True)
+        assert len(batches) == 1
+        assert sorted(t[0] for t in batches[0]) == ['BTC/USDT:USDT', 'ETH/USDT:USDT']
+        assert {(t[2], t[3]) for t in batches[0]} == {(2, now)}
+
+        btc = results[('BTC/USDT:USDT', '1m')]
+        assert not btc.is_stale and btc.data['ts'][-1] == now + MINUTE
+        assert len(btc.data) == 200
+
+    def test_incremental_failure_returns_cached(self, batch, clock):
+        provider, exchange, now, batches = batch
+        provider.ohlcv_cache[('BAD/USDT:USDT', '1m')] = provider._new_entry(exchange.bars[-200:], 200, clock.now_ms)
+
+        clock.now_ms += 2 * MINUTE
+        results = provider.get_ohlcv_many([('BAD/USDT:USDT', '1m')], limit=200, as_arrays=True)
+        assert batches[0][0][2] == 3
+        bad = results[('BAD/USDT:USDT', '1m')]
+        assert bad.is_stale and bad.data['ts'][-1] == now    # 失败时返回旧缓存
+
+    def test_large_gap_triggers_full_init(self, batch, clock):
+        provider, exchange, now, batches = batch
+        provider.get_ohlcv_many([('BTC/USDT:USDT', '1m')], limit=200)
+        batches.clear()
+
+        # 缓存落后超过单次增量拉取的根数：重新全量拉取，而不是合并出有空洞的K线
+        exchange.bars += [_bar(now + i * MINUTE) for i in range(1, 61)]
+        clock.now_ms += 60 * MINUTE
+        results = provider.get_ohlcv_many([('BTC/USDT:USDT', '1m')], limit=200)
+        assert batches[0][0][4] is None and batches[0][0][2] == 100
+        assert results[('BTC/USDT:USDT', '1m')].data == exchange.bars[-200:]
+
+    def test_thread_fallback_without_batch_fetcher(self, provider):
+        provider, exchange, now = provider
+        provider._batch_fetcher_resolved = True
+        results = provider.get_ohlcv_many([('BTC/USDT:USDT', '1m'), ('ETH/USDT:USDT', '1m')], limit=200)
+        assert all(r.error is None and r.data == exchange.bars[-200:] for r in results.values())
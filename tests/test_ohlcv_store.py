@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+本地K线库测试
+
+验证按月分区读写、覆盖区间与增量补缺，以及回测引擎重复回测不再下载
+"""
+import pytest
+import sys
+import os
+import numpy as np
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.ohlcv_store as ohlcv_store
+from database.ohlcv_store import OHLCVStore
+
+MINUTE = 60 * 1000
+# 2024-01-31 23:00 UTC，跨越 1 月 / 2 月分区
+START = int(datetime(2024, 1, 31, 23, 0, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _bars(start_ms, n, tf_ms=MINUTE):
+    ts = start_ms + np.arange(n) * tf_ms
+    close = 100.0 + np.arange(n)
+    return np.column_stack([ts, close, close + 1, close - 1, close, np.full(n, 10.0)])
+
+
+class FakeDownloader:
+    """按区间生成K线并记录调用"""
+
+    def __init__(self, complete=True, limit=None):
+        self.calls = []
+        self.complete = complete
+        self.limit = limit
+
+    def __call__(self, symbol, timeframe, start_ms, end_ms):
+        self.calls.append((start_ms, end_ms))
+        n = (end_ms - start_ms) // MINUTE + 1
+        if self.limit is not None:
+            n = min(n, self.limit)
+        return _bars(start_ms, n).tolist(), self.complete
+
+
+@pytest.fixture
+def store(tmp_path):
+    return OHLCVStore(root=str(tmp_path))
+
+
+class TestOHLCVStore:
+    """读写与覆盖区间"""
+
+    def test_write_read_across_months(self, store, tmp_path):
+        bars = _bars(START, 120)
+        assert store.write('BTC/USDT:USDT', '1m', bars) == 120
+
+        part_dir = tmp_path / 'BTC_USDT_USDT' / '1m'
+        assert sorted(p.name for p in part_dir.glob('*.npy')) == ['2024-01.npy', '2024-02.npy']
+
+        rows = store.read('BTC/USDT:USDT', '1m', START, START + 119 * MINUTE)
+        np.testing.assert_array_equal(rows, bars)
+
+        # 单个月份内的读取是内存映射上的只读视图
+        jan = store.read('BTC/USDT:USDT', '1m', START, START + 10 * MINUTE)
+        assert len(jan) == 11
+        assert not jan.flags.writeable
+        assert isinstance(jan.base, np.memmap) or isinstance(jan, np.memmap)
+
+    def test_write_dedupes_and_prefers_new_rows(self, store):
+        store.write('ETH/USDT:USDT', '1m', _bars(START, 10))
+        updated = _bars(START + 5 * MINUTE, 10)
+        updated[:, 4] = 1.0
+        store.write('ETH/USDT:USDT', '1m', updated)
+
+        rows = store.read('ETH/USDT:USDT', '1m', START, START + 20 * MINUTE)
+        assert len(rows) == 15
+        assert np.all(np.diff(rows[:, 0]) == MINUTE)
+        assert rows[4, 4] == 104.0
+        assert np.all(rows[5:, 4] == 1.0)
+
+    def test_missing_ranges(self, store):
+        store.mark_covered('BTC/USDT:USDT', '1m', 100, 199)
+        store.mark_covered('BTC/USDT:USDT', '1m', 300, 399)
+        store.mark_covered('BTC/USDT:USDT', '1m', 200, 249)
+
+        assert store.get_coverage('BTC/USDT:USDT', '1m') == [[100, 249], [300, 399]]
+        assert store.missing_ranges('BTC/USDT:USDT', '1m', 0, 500) == [(0, 99), (250, 299), (400, 500)]
+        assert store.missing_ranges('BTC/USDT:USDT', '1m', 120, 240) == []
+
+    def test_ensure_downloads_only_gaps(self, store):
+        download = FakeDownloader()
+        end = START + 99 * MINUTE
+
+        rows = store.ensure('BTC/USDT:USDT', '1m', START, end, download=download)
+        assert len(rows) == 100
+        assert download.calls == [(START, end)]
+
+        # 同一区间不再下载
+        rows = store.ensure('BTC/USDT:USDT', '1m', START, end, download=download)
+        assert len(rows) == 100
+        assert len(download.calls) == 1
+
+        # 扩展区间只下载新增部分
+        rows = store.ensure('BTC/USDT:USDT', '1m', START, end + 50 * MINUTE, download=download)
+        assert len(rows) == 150
+        assert download.calls[-1] == (end + 1, end + 50 * MINUTE)
+
+    def test_incomplete_download_leaves_gap(self, store):
+        download = FakeDownloader(complete=False, limit=30)
+        end = START + 99 * MINUTE
+
+        rows = store.ensure('BTC/USDT:USDT', '1m', START, end, download=download)
+        assert len(rows) == 30
+        assert store.missing_ranges('BTC/USDT:USDT', '1m', START, end) == [(START + 30 * MINUTE, end)]
+
+        download.complete, download.limit = True, None
+        rows = store.ensure('BTC/USDT:USDT', '1m', START, end, download=download)
+        assert len(rows) == 100
+        assert download.calls[-1] == (START + 30 * MINUTE, end)
+
+    def test_replace_retries_while_partition_locked(self, store, monkeypatch):
+        real_replace = os.replace
+        failures = []
+
+        def locked_replace(src, dst):
+            # 模拟 Windows：目标分区被其他读者映射时前两次替换失败
+            if dst.endswith('.npy') and len(failures) < 2:
+                failures.append(dst)
+                raise PermissionError(13, 'file is mapped', dst)
+            real_replace(src, dst)
+
+        monkeypatch.setattr(ohlcv_store.os, 'replace', locked_replace)
+        monkeypatch.setattr(ohlcv_store, '_REPLACE_RETRY_DELAY', 0.001)
+
+        assert store.write('BTC/USDT:USDT', '1m', _bars(START, 10)) == 10
+        assert len(failures) == 2
+        assert len(store.read('BTC/USDT:USDT', '1m', START, START + 9 * MINUTE)) == 10
+
+    def test_write_failure_leaves_gap_uncovered(self, store, monkeypatch):
+        def always_locked(src, dst):
+            raise PermissionError(13, 'file is mapped', dst)
+
+        monkeypatch.setattr(ohlcv_store.os, 'replace', always_locked)
+        monkeypatch.setattr(ohlcv_store, '_REPLACE_RETRY_DELAY', 0.001)
+
+        end = START + 9 * MINUTE
+        rows = store.ensure('BTC/USDT:USDT', '1m', START, end, download=FakeDownloader())
+        assert len(rows) == 0
+        assert store.missing_ranges('BTC/USDT:USDT', '1m', START, end) == [(START, end)]
+        assert not [name for _, _, files in os.walk(store.root) for name in files if '.tmp' in name]
+
+
+class TestBacktestEngineStore:
+    """回测引擎读取本地K线库"""
+
+    def test_repeat_backtest_uses_local_store(self, store, monkeypatch):
+        from core.backtest_engine import BacktestEngine
+
+        monkeypatch.setattr(ohlcv_store, '_ohlcv_store', store)
+        monkeypatch.setattr(BacktestEngine, '_init_exchange', lambda self: None)
+        engine = BacktestEngine()
+        engine.exchange = object()
+        download = FakeDownloader()
+        monkeypatch.setattr(engine, '_download_range', download)
+
+        start = datetime(2024, 1, 31, 23, 0)
+        end = datetime(2024, 2, 1, 1, 0)
+        first = engine.fetch_historical_data('BTC', '1m', start, end)
+        assert len(first) == 121
+        assert len(download.calls) == 1
+
+        # 交易所断开后仍可从本地重复回测
+        engine.exchange = None
+        second = engine.fetch_historical_data('BTC', '1m', start, end)
+        assert len(download.calls) == 1
+        assert second['timestamp'].tolist() == first['timestamp'].tolist()
+        assert second['close'].tolist() == first['close'].tolist()
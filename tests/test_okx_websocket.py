@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+WebSocket K线缓存与订阅分片测试
+"""
+import pytest
+import sys
+import os
+import json
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exchange.okx_websocket import CandleRingBuffer, WEBSOCKET_AVAILABLE
+
+
+def _candle(i, close=100.0):
+    return [1704067200000 + i * 60000, close, close + 1, close - 1, close, 10.0]
+
+
+class TestCandleRingBuffer:
+    """环形缓冲测试"""
+
+    def test_append_and_update_forming_bar(self):
+        buffer = CandleRingBuffer(capacity=5)
+        buffer.upsert(_candle(0))
+        buffer.upsert(_candle(1))
+        buffer.upsert(_candle(1, close=105.0))
+
+        assert len(buffer) == 2
+        assert buffer.snapshot()[-1, 4] == 105.0
+        assert buffer.last_ts == _candle(1)[0]
+
+    def test_capacity_trim_keeps_latest(self):
+        buffer = CandleRingBuffer(capacity=5)
+        for i in range(23):
+            buffer.upsert(_candle(i, close=float(i)))
+
+        snapshot = buffer.snapshot()
+        assert len(snapshot) == 5
+        assert snapshot[:, 4].tolist() == [18.0, 19.0, 20.0, 21.0, 22.0]
+        assert np.all(np.diff(snapshot[:, 0]) > 0)
+
+    def test_snapshot_is_read_only_and_stable_after_compaction(self):
+        buffer = CandleRingBuffer(capacity=3)
+        for i in range(3):
+            buffer.upsert(_candle(i, close=float(i)))
+        old_view = buffer.snapshot()
+
+        with pytest.raises(ValueError):
+            old_view[0, 4] = -1.0
+
+        for i in range(3, 10):
+            buffer.upsert(_candle(i, close=float(i)))
+        assert old_view[:, 4].tolist() == [0.0, 1.0, 2.0]
+        assert buffer.snapshot(limit=2)[:, 4].tolist() == [8.0, 9.0]
+
+    def test_out_of_order_update_and_insert(self):
+        buffer = CandleRingBuffer(capacity=10)
+        for i in (0, 1, 3):
+            buffer.upsert(_candle(i))
+        buffer.upsert(_candle(1, close=50.0))
+        buffer.upsert(_candle(2, close=60.0))
+
+        snapshot = buffer.snapshot()
+        assert snapshot[:, 0].tolist() == [_candle(i)[0] for i in range(4)]
+        assert snapshot[1, 4] == 50.0
+        assert snapshot[2, 4] == 60.0
+
+    def test_out_of_order_update_leaves_published_view_intact(self):
+        buffer = CandleRingBuffer(capacity=10)
+        for i in range(4):
+            buffer.upsert(_candle(i, close=float(i)))
+        old_view = buffer.snapshot()
+
+        buffer.upsert(_candle(1, close=50.0))
+        assert old_view[:, 4].tolist() == [0.0, 1.0, 2.0, 3.0]
+        assert buffer.snapshot()[:, 4].tolist() == [0.0, 50.0, 2.0, 3.0]
+
+    def test_load_keeps_existing_rows(self):
+        buffer = CandleRingBuffer(capacity=10)
+        buffer.upsert(_candle(5, close=999.0))
+        rows = np.array([_candle(i) for i in range(8)], dtype=np.float64)
+
+        added = buffer.load(rows)
+
+        assert added == 7
+        assert len(buffer) == 8
+        assert buffer.snapshot()[5, 4] == 999.0
+
+
+class TestCacheConcurrency:
+    """缓存并发读写"""
+
+    def test_readers_see_consistent_snapshots(self):
+        import threading
+
+        buffer = CandleRingBuffer(capacity=50)
+        stop = threading.Event()
+        errors = []
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                with buffer.lock:
+                    buffer.upsert(_candle(i, close=float(i)))
+                i += 1
+
+        def reader():
+            while not stop.is_set():
+                snapshot = buffer.snapshot()
+                if len(snapshot) > 1 and not np.all(np.diff(snapshot[:, 0]) > 0):
+                    errors.append(snapshot.copy())
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+        for t in threads:
+            t.start()
+        stop.wait(0.3)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        assert not errors
+        assert buffer.lock.acquisitions > 0
+        assert len(buffer) == 50
+
+
+class FakeSocket:
+    """记录发送帧的 WebSocketApp 替身"""
+
+    def __init__(self):
+        self.frames = []
+
+    def send(self, message):
+        self.frames.append(json.loads(message))
+
+    def close(self):
+        pass
+
+
+@pytest.mark.skipif(not WEBSOCKET_AVAILABLE, reason="websocket-client 未安装")
+class TestSubscriptionSharding:
+    """订阅分片 / 批量订阅帧 / 重新订阅计时"""
+
+    @pytest.fixture
+    def client(self):
+        from exchange.okx_websocket import OKXWebSocketClient
+
+        client = OKXWebSocketClient()
+        client.channels_per_conn = 4
+        client.max_connections = 2
+        client.subscribe_batch = 3
+        client.reconnect_stagger = 0.5
+        return client
+
+    @staticmethod
+    def _open(conn):
+        conn.ws = FakeSocket()
+        conn._on_open(conn.ws)
+        return conn.ws
+
+    def test_channels_sharded_and_resubscribed_in_batches(self, client):
+        symbols = ['BTC/USDT:USDT', 'ETH/USDT:USDT', 'SOL/USDT:USDT']
+        # 未连接：只记录订阅并分配连接，连接建立后发送
+        assert not client.subscribe_candles_many(symbols, ['1m', '5m'])
+        assert [len(conn.channels) for conn in client.connections] == [4, 2]
+
+        sockets = [self._open(conn) for conn in client.connections]
+        assert [len(ws.frames) for ws in sockets] == [2, 1]   # 4 个频道 = 3 + 1 两帧
+        assert all(frame['op'] == 'subscribe' for ws in sockets for frame in ws.frames)
+        sent = [arg for ws in sockets for frame in ws.frames for arg in frame['args']]
+        assert sorted((a['channel'], a['instId']) for a in sent) == sorted(
+            (f'candle{tf}', f'{s.split("/")[0]}-USDT-SWAP') for s in symbols for tf in ('1m', '5m')
+        )
+        assert client.connected and client.get_subscription_count() == 6
+
+    def test_live_subscribe_batches_and_caps_connections(self, client):
+        client.subscribe_ticker('BTC/USDT:USDT')
+        ws = self._open(client.connections[0])
+        ws.frames.clear()
+
+        assert client.subscribe_candles_many(['BTC/USDT:USDT', 'ETH/USDT:USDT'], ['1m'])
+        assert ws.frames == [{'op': 'subscribe', 'args': [
+            {'channel': 'candle1m', 'instId': 'BTC-USDT-SWAP'},
+            {'channel': 'candle1m', 'instId': 'ETH-USDT-SWAP'},
+        ]}]
+        assert client.subscribe_candles('BTC/USDT:USDT', '1m')   # 已订阅：不重复发送
+        assert len(ws.frames) == 1
+
+        # 连接数达到上限后分配给频道最少的连接
+        client.subscribe_candles_many(['SOL/USDT:USDT', 'XRP/USDT:USDT'], ['1m', '5m', '15m'])
+        assert len(client.connections) == 2
+        assert sorted(len(conn.channels) for conn in client.connections) == [4, 5]
+
+        assert client.unsubscribe('BTC/USDT:USDT', 'candle', '1m')
+        assert ws.frames[-1]['op'] == 'unsubscribe'
+        assert 'candle1m:BTC-USDT-SWAP' not in client.connections[0].channels
+
+    def test_resubscribe_time_measured_on_acks(self, client):
+        client.subscribe_candles_many(['BTC/USDT:USDT', 'ETH/USDT:USDT'], ['1m'])
+        conn = client.connections[0]
+        self._open(conn)
+        assert conn.stats()['resubscribe_pending'] == 2
+
+        ack = {'event': 'subscribe', 'arg': {'channel': 'candle1m', 'instId': 'BTC-USDT-SWAP'}}
+        client._process_message(json.dumps(ack))
+        assert conn.stats()['last_resubscribe_ms'] is None
+
+        ack['arg']['instId'] = 'ETH-USDT-SWAP'
+        client._process_message(json.dumps(ack))
+        stats = client.get_cache_stats()['connections'][0]
+        assert stats['resubscribe_pending'] == 0
+        assert stats['last_resubscribe_ms'] is not None and stats['last_resubscribe_ms'] >= 0
+
+    def test_reconnect_delay_staggered_per_connection(self, client):
+        client.subscribe_candles_many(['BTC/USDT:USDT', 'ETH/USDT:USDT', 'SOL/USDT:USDT'], ['1m', '5m'])
+        first, second = client.connections
+        first.reconnect_attempts = second.reconnect_attempts = 3
+        assert first.reconnect_delay() == 4
+        assert second.reconnect_delay() == 4.5
+        second.reconnect_attempts = 20
+        assert second.reconnect_delay() == client.max_reconnect_delay + 0.5
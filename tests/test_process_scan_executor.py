@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+多进程策略扫描执行器测试
+
+验证进程池 + 共享内存路径与直接调用 run_analysis_with_data 结果一致，币种固定分配到进程、超时不重建进程
+"""
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from separated_system.process_scan_executor import (
+    ProcessScanExecutor,
+    get_scan_backend,
+    _frame_to_rows,
+    _rows_to_frame,
+)
+from strategies.strategy_v2 import TradingStrategy
+
+
+def _make_df(seed, n=400):
+    rng = np.random.default_rng(seed)
+    closes = 100.0 * np.cumprod(1 + rng.standard_normal(n) * 0.004)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(1704067200000 + np.arange(n) * 60000, unit='ms'),
+        'open': np.r_[closes[0], closes[:-1]],
+        'high': closes * 1.002,
+        'low': closes * 0.998,
+        'close': closes,
+        'volume': rng.uniform(100, 1000, n),
+    })
+
+
+class TestSharedMemoryPacking:
+    """K线打包往返"""
+
+    def test_roundtrip(self):
+        df = _make_df(0)
+        restored = _rows_to_frame(_frame_to_rows(df))
+        pd.testing.assert_frame_equal(restored, df, check_dtype=False)
+        assert restored['timestamp'].iloc[-1] == df['timestamp'].iloc[-1]
+
+
+class TestProcessScanExecutor:
+    """进程池扫描"""
+
+    def test_matches_direct_analysis_in_symbol_order(self):
+        symbols = [f"SYM{i}/USDT:USDT" for i in range(6)]
+        tasks = [(symbol, _make_df(i, n=300 + i * 10)) for i, symbol in enumerate(symbols)]
+
+        executor = ProcessScanExecutor(workers=2)
+        try:
+            merged, timing, missing = executor.run('strategy_v2', '1m', tasks, timeout=60)
+        finally:
+            executor.shutdown()
+
+        assert missing == []
+        assert [symbol for symbol, _ in merged] == symbols
+        assert set(timing) == {'scan_pack', 'scan_compute', 'scan_ipc', 'scan_merge'}
+
+        strategy = TradingStrategy()
+        for (symbol, df), (_, scan_results) in zip(tasks, merged):
+            expected = strategy.run_analysis_with_data(symbol, {'1m': df.copy()}, ['1m'])
+            assert scan_results[0]['action'] == expected[0]['action']
+            assert scan_results[0]['reason'] == expected[0]['reason']
+            assert scan_results[0]['candle_time'] == expected[0]['candle_time']
+
+    def test_symbols_pinned_to_workers(self):
+        executor = ProcessScanExecutor(workers=3)
+        symbols = [f"SYM{i}/USDT:USDT" for i in range(30)]
+        slots = [executor.worker_for(symbol) for symbol in symbols]
+        assert slots == [ProcessScanExecutor(workers=3).worker_for(symbol) for symbol in symbols]
+        assert set(slots) == {0, 1, 2}
+
+    def test_timeout_keeps_workers_and_reports_missing(self):
+        symbols = [f"SYM{i}/USDT:USDT" for i in range(4)]
+        tasks = [(symbol, _make_df(i)) for i, symbol in enumerate(symbols)]
+
+        executor = ProcessScanExecutor(workers=2)
+        try:
+            merged, _, missing = executor.run('strategy_v2', '1m', tasks, timeout=0)
+            assert merged == []
+            assert sorted(missing) == sorted(symbols)
+            pools = list(executor._pools)
+            assert any(pool is not None for pool in pools)
+
+            merged, _, missing = executor.run('strategy_v2', '1m', tasks, timeout=60)
+            assert missing == []
+            assert [symbol for symbol, _ in merged] == symbols
+            # 超时不重建进程
+            assert all(a is b for a, b in zip(pools, executor._pools) if a is not None)
+        finally:
+            executor.shutdown()
+
+    def test_backend_env(self, monkeypatch):
+        monkeypatch.delenv("STRATEGY_SCAN_BACKEND", raising=False)
+        assert get_scan_backend() == "thread"
+        monkeypatch.setenv("STRATEGY_SCAN_BACKEND", "Process")
+        assert get_scan_backend() == "process"
+        monkeypatch.setenv("STRATEGY_SCAN_BACKEND", "gpu")
+        assert get_scan_backend() == "thread"
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+REST 限流器测试
+
+验证令牌桶的突发 / 持续速率、线程与 asyncio 共享额度、按 API Key 分桶、跨进程共享和 429 退避
+"""
+import pytest
+import sys
+import os
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rate_limiter import (
+    RateLimiter, TokenBucket, SQLiteBucketStore, api_key_of, is_rate_limit_error, ohlcv_endpoint,
+)
+
+LIMITS = {
+    'candles': (10, 1.0, 'ip'),
+    'balance': (5, 1.0, 'key'),
+}
+
+
+class TestTokenBucket:
+    """令牌桶"""
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket('t', capacity=5, rate=50)
+        waits = [bucket.reserve() for _ in range(10)]
+        assert waits[:5] == [0.0] * 5
+        assert waits[5:] == pytest.approx([0.02 * i for i in range(1, 6)], abs=0.005)
+
+    def test_shared_between_threads_and_asyncio(self):
+        limiter = RateLimiter(headroom=1.0, limits=LIMITS)
+        start = time.perf_counter()
+
+        threads = [threading.Thread(target=limiter.acquire, args=('candles',)) for _ in range(10)]
+        for t in threads:
+            t.start()
+
+        async def main():
+            await asyncio.gather(*(limiter.acquire_async('candles') for _ in range(10)))
+
+        asyncio.run(main())
+        for t in threads:
+            t.join()
+
+        # 20 个请求：10 个突发 + 10 个按 10/s 放行
+        assert 0.9 <= time.perf_counter() - start < 1.5
+        stats = limiter.stats()['candles']
+        assert stats['requests'] == 20
+        assert stats['throttled'] == 10
+        assert stats['max_wait_ms'] == pytest.approx(1000, abs=50)
+
+
+class TestRateLimiter:
+    """端点族与限速维度"""
+
+    def test_scopes(self):
+        limiter = RateLimiter(limits=LIMITS)
+        assert limiter.bucket('candles', 'key-a') is limiter.bucket('candles', 'key-b')
+        assert limiter.bucket('balance', 'key-a') is not limiter.bucket('balance', 'key-b')
+        assert limiter.bucket('balance', 'key-a') is limiter.bucket('balance', 'key-a')
+        assert 'key-a' not in limiter.bucket('balance', 'key-a').name
+
+    def test_penalize_blocks_window(self):
+        limiter = RateLimiter(headroom=1.0, limits=LIMITS)
+        limiter.penalize('candles', seconds=0.2)
+        assert limiter.bucket('candles').reserve() == pytest.approx(0.3, abs=0.02)
+        assert limiter.stats()['candles']['penalties'] == 1
+
+    def test_disabled_only_counts(self):
+        limiter = RateLimiter(enabled=False, limits=LIMITS)
+        assert all(limiter.acquire('candles') == 0 for _ in range(50))
+        assert limiter.stats()['candles']['requests'] == 50
+
+    def test_shared_across_processes(self, tmp_path):
+        path = str(tmp_path / "rate.db")
+        first = RateLimiter(headroom=1.0, store=SQLiteBucketStore(path), limits=LIMITS)
+        second = RateLimiter(headroom=1.0, store=SQLiteBucketStore(path), limits=LIMITS)
+
+        assert [first.bucket('candles').reserve() for _ in range(10)] == [0.0] * 10
+        # 另一个进程的限流器看到同一份额度
+        assert second.bucket('candles').reserve() == pytest.approx(0.1, abs=0.02)
+
+    def test_shared_store_reserved_off_event_loop(self, tmp_path, monkeypatch):
+        limiter = RateLimiter(headroom=1.0, store=SQLiteBucketStore(str(tmp_path / "rate.db")), limits=LIMITS)
+        threads = []
+        original = limiter._reserve
+        monkeypatch.setattr(limiter, '_reserve', lambda *args: threads.append(threading.get_ident()) or original(*args))
+
+        async def main():
+            await asyncio.gather(*(limiter.acquire_async('candles') for _ in range(3)))
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(main())
+        assert len(threads) == 3
+        assert loop_thread not in threads
+        assert limiter.stats()['candles']['requests'] == 3
+
+
+class TestHelpers:
+    def test_api_key_of(self):
+        class Ccxt:
+            apiKey = 'ccxt-key'
+
+        class Adapter:
+            def __init__(self):
+                self.exchange = Ccxt()
+
+        assert api_key_of(Ccxt()) == 'ccxt-key'
+        assert api_key_of(Adapter()) == 'ccxt-key'
+        assert api_key_of(object()) is None
+
+    def test_is_rate_limit_error(self):
+        class RateLimitExceeded(Exception):
+            pass
+
+        assert is_rate_limit_error(RateLimitExceeded('x'))
+        assert is_rate_limit_error(Exception('okx {"code":"50011","msg":"Too Many Requests"}'))
+        assert not is_rate_limit_error(Exception('bar 1700000429000 missing'))
+
+    def test_ohlcv_endpoint(self):
+        minute = 60 * 1000
+        now = 1_700_000_000_000
+        assert ohlcv_endpoint(None, minute, now) == 'candles'
+        assert ohlcv_endpoint(now - 1439 * minute, minute, now) == 'candles'
+        assert ohlcv_endpoint(now - 1440 * minute, minute, now) == 'history_candles'
+        assert ohlcv_endpoint(now - 90 * 86400 * 1000, 3600 * 1000, now) == 'history_candles'
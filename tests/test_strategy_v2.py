@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+策略 V2 信号测试
+
+验证向量化信号与逐根 check_signals 结果一致
+"""
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strategies.strategy_v2 import TradingStrategy
+
+
+@pytest.fixture(scope="module")
+def strategy():
+    return TradingStrategy()
+
+
+@pytest.fixture(scope="module")
+def indicator_df(strategy):
+    """已计算指标的随机游走 K 线，并注入订单块以覆盖订单块规则"""
+    np.random.seed(3)
+    n = 1200
+    closes = 100.0 * np.cumprod(1 + np.random.randn(n) * 0.004)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='1min'),
+        'open': np.r_[closes[0], closes[:-1]],
+        'high': closes * (1 + np.abs(np.random.randn(n) * 0.002)),
+        'low': closes * (1 - np.abs(np.random.randn(n) * 0.002)),
+        'close': closes,
+        'volume': np.random.uniform(100, 1000, n),
+    })
+    df = strategy.calculate_indicators(df)
+
+    rng = np.random.default_rng(1)
+    ob_idx = rng.choice(n, 100, replace=False)
+    df.loc[df.index[ob_idx[:50]], 'bullish_ob'] = True
+    df.loc[df.index[ob_idx[35:]], 'bearish_ob'] = True
+    df.loc[df.index[ob_idx], 'ob_high'] = df['high'].values[ob_idx] * 1.003
+    df.loc[df.index[ob_idx], 'ob_low'] = df['low'].values[ob_idx] * 0.997
+    return df
+
+
+class TestCheckSignalsVectorized:
+    """向量化信号一致性"""
+
+    @pytest.mark.parametrize("timeframe", ['1m', '5m', '15m', '30m', '4h'])
+    def test_parity_with_scalar_path(self, strategy, indicator_df, timeframe):
+        signals = strategy.check_signals_vectorized(indicator_df, timeframe)
+        assert len(signals) == len(indicator_df)
+
+        for i in range(len(indicator_df)):
+            expected = strategy.check_signals_at(indicator_df, i, timeframe)
+            assert signals['action'].iat[i] == expected['action'], i
+            assert signals['type'].iat[i] == expected['type'], i
+            assert signals['reason'].iat[i] == expected['reason'], i
+
+    def test_check_signals_matches_last_row(self, strategy, indicator_df):
+        signals = strategy.check_signals_vectorized(indicator_df, '30m')
+        sub_df = indicator_df.iloc[:900]
+        expected = strategy.check_signals(sub_df, '30m')
+        assert signals['action'].iat[899] == expected['action']
+        assert signals['reason'].iat[899] == expected['reason']
+
+    def test_order_block_rules_covered(self, strategy, indicator_df):
+        types = set(strategy.check_signals_vectorized(indicator_df, '30m')['type'])
+        assert 'SUB_ORDER_BLOCK' in types
+        types = set(strategy.check_signals_vectorized(indicator_df, '1m')['type'])
+        assert 'TP_ORDER_BLOCK' in types
+
+
+@pytest.fixture(scope="module")
+def long_df():
+    """1400 根随机游走 K 线（整数索引，模拟交易引擎的滑动窗口）"""
+    np.random.seed(5)
+    n = 1400
+    closes = 100.0 * np.cumprod(1 + np.random.randn(n) * 0.004)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='1min'),
+        'open': np.r_[closes[0], closes[:-1]],
+        'high': closes * (1 + np.abs(np.random.randn(n) * 0.002)),
+        'low': closes * (1 - np.abs(np.random.randn(n) * 0.002)),
+        'close': closes,
+        'volume': np.random.uniform(100, 1000, n),
+    })
+
+
+def _assert_frames_close(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    for col in expected.columns:
+        assert actual[col].dtype == expected[col].dtype, col
+        if expected[col].dtype.kind == 'f':
+            np.testing.assert_allclose(actual[col].values, expected[col].values, rtol=1e-9, atol=1e-9, err_msg=col)
+        else:
+            assert (actual[col].values == expected[col].values).all(), col
+
+
+class TestIncrementalIndicators:
+    """增量指标与锚定序列全量计算一致"""
+
+    WINDOW = 1000
+
+    def _window(self, df, end):
+        return df.iloc[end - self.WINDOW:end].reset_index(drop=True)
+
+    def _expected(self, strategy, df, end, anchor=0):
+        """对锚定序列 df[anchor:end] 全量计算，取最后一个窗口"""
+        full = strategy.calculate_indicators(df.iloc[anchor:end].reset_index(drop=True))
+        return full.iloc[-self.WINDOW:].reset_index(drop=True)
+
+    def test_sliding_window_matches_anchored_batch(self, long_df):
+        strategy = TradingStrategy()
+        for end in range(self.WINDOW, 1201):
+            out = strategy.calculate_indicators_incremental(self._window(long_df, end), 'BTC', '1m')
+            if end % 100 == 0:
+                _assert_frames_close(out, self._expected(strategy, long_df, end))
+
+        stats = strategy._indicator_engine.stats
+        assert stats['full'] == 1
+        assert stats['bars_advanced'] == 200
+
+    def test_forming_bar_is_not_committed(self, long_df):
+        strategy = TradingStrategy()
+        strategy.calculate_indicators_incremental(self._window(long_df, 1100), 'BTC', '1m')
+
+        forming = self._window(long_df, 1101)
+        forming.loc[forming.index[-1], ['high', 'close']] *= 1.01
+        strategy.calculate_indicators_incremental(forming, 'BTC', '1m')
+
+        out = strategy.calculate_indicators_incremental(self._window(long_df, 1102), 'BTC', '1m')
+        _assert_frames_close(out, self._expected(strategy, long_df, 1102, anchor=100))
+        assert strategy._indicator_engine.stats['full'] == 1
+
+    def test_gap_and_revision_trigger_full_recompute(self, long_df):
+        strategy = TradingStrategy()
+        strategy.calculate_indicators_incremental(self._window(long_df, 1000), 'BTC', '1m')
+
+        # 缺口：上次提交的 K 线不在本次数据中
+        gap_df = long_df.iloc[1000:1400].reset_index(drop=True)
+        out = strategy.calculate_indicators_incremental(gap_df, 'BTC', '1m')
+        assert strategy._indicator_engine.stats['full'] == 2
+        _assert_frames_close(out, strategy.calculate_indicators(gap_df.copy()))
+
+        # 已提交 K 线被修改
+        strategy.calculate_indicators_incremental(self._window(long_df, 1100), 'ETH', '1m')
+        revised = self._window(long_df, 1101)
+        revised.loc[revised.index[-3], 'close'] *= 1.001
+        strategy.calculate_indicators_incremental(revised, 'ETH', '1m')
+        assert strategy._indicator_engine.stats['full'] == 4
+
+    def test_keys_are_independent(self, long_df):
+        strategy = TradingStrategy()
+        strategy.calculate_indicators_incremental(self._window(long_df, 1000), 'BTC', '1m')
+        strategy.calculate_indicators_incremental(self._window(long_df, 1000), 'ETH', '1m')
+        strategy.calculate_indicators_incremental(self._window(long_df, 1001), 'BTC', '1m')
+        stats = strategy._indicator_engine.stats
+        assert (stats['incremental'], stats['full'], stats['bars_advanced']) == (1, 2, 1)
+
+
+class TestSharedPrefixIndicators:
+    """双通道共享前缀：等价于分别对已收线部分和含未收线部分全量计算"""
+
+    def test_matches_two_batch_calls(self, long_df):
+        strategy = TradingStrategy()
+        window = long_df.iloc[:1000].rename(columns={'timestamp': 'ts'})
+        window['ts'] = window['ts'].astype('int64') // 10**6
+
+        closed_df, forming_df = strategy.calculate_indicators_with_forming(window, 'BTC', '1h')
+
+        _assert_frames_close(closed_df, strategy.calculate_indicators(window.iloc[:-1].copy()))
+        _assert_frames_close(forming_df, strategy.calculate_indicators(window.copy()))
+
+    def test_prefix_reused_while_forming_bar_changes(self, long_df):
+        strategy = TradingStrategy()
+        window = long_df.iloc[:1000].copy()
+        strategy.calculate_indicators_with_forming(window, 'BTC', '1h')
+
+        window.loc[window.index[-1], ['high', 'close']] *= 1.02
+        _, forming_df = strategy.calculate_indicators_with_forming(window, 'BTC', '1h')
+
+        _assert_frames_close(forming_df, strategy.calculate_indicators(window.copy()))
+        assert strategy._indicator_engine.stats['full'] == 1
+        assert strategy._indicator_engine.stats['prefix_hits'] == 1
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+写后台持久化队列测试
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_bridge
+from database.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def db_config(tmp_path):
+    config = {"kind": "sqlite", "path": str(tmp_path / "write_behind.db")}
+    db_bridge.init_db(config)
+    return config
+
+
+@pytest.fixture
+def queue(db_config):
+    q = WriteBehindQueue(linger=0.2, db_config=db_config)
+    yield q
+    q.shutdown()
+
+
+class TestWriteBehindQueue:
+    """合并、批量、flush"""
+
+    def test_coalesce_and_flush(self, queue, db_config):
+        for candle_time in range(50):
+            queue.submit(('signal', 'BTC'), db_bridge.set_signal_cache,
+                         'BTC/USDT', '1m', 'BUY', candle_time, db_config=db_config)
+        queue.submit(('engine',), db_bridge.update_engine_status, merge_kwargs=True,
+                     db_config=db_config, cycle_ms=10, last_error="a")
+        queue.submit(('engine',), db_bridge.update_engine_status, merge_kwargs=True,
+                     db_config=db_config, last_error="b")
+
+        assert queue.flush()
+
+        assert db_bridge.get_signal_cache('BTC/USDT', '1m', 'BUY', db_config) == 49
+        status = db_bridge.get_engine_status(db_config)
+        assert (status['cycle_ms'], status['last_error']) == (10, "b")
+        stats = queue.stats
+        assert stats['coalesced'] == 50
+        assert stats['written'] == 2
+        assert stats['pending'] == 0
+
+    def test_writes_batched_into_one_transaction(self, queue, db_config):
+        for i in range(20):
+            queue.submit(None, db_bridge.insert_performance_metrics,
+                         {'ts': 1000 + i, 'cycle_ms': i}, db_config=db_config)
+        assert queue.flush()
+
+        assert len(db_bridge.get_recent_performance_metrics(limit=100, db_config=db_config)) == 20
+        assert queue.stats['batches'] <= 2
+
+    def test_failed_write_does_not_drop_batch(self, queue, db_config):
+        def broken():
+            raise RuntimeError("boom")
+
+        queue.submit(('a',), db_bridge.set_signal_cache, 'ETH/USDT', '5m', 'SELL', 7, db_config=db_config)
+        queue.submit(('b',), broken)
+        queue.submit(('c',), db_bridge.set_signal_cache, 'SOL/USDT', '5m', 'BUY', 8, db_config=db_config)
+        assert queue.flush()
+
+        assert db_bridge.get_signal_cache('ETH/USDT', '5m', 'SELL', db_config) == 7
+        assert db_bridge.get_signal_cache('SOL/USDT', '5m', 'BUY', db_config) == 8
+        assert (queue.stats['written'], queue.stats['failed']) == (2, 1)
+
+    def test_bounded_queue_drops_new_keys(self, db_config):
+        q = WriteBehindQueue(max_pending=2, linger=5, db_config=db_config)
+        try:
+            assert q.submit(('a',), db_bridge.set_signal_cache, 'A', '1m', 'BUY', 1, db_config=db_config)
+            assert q.submit(('b',), db_bridge.set_signal_cache, 'B', '1m', 'BUY', 1, db_config=db_config)
+            assert not q.submit(('c',), db_bridge.set_signal_cache, 'C', '1m', 'BUY', 1, db_config=db_config)
+            # 已存在的 key 仍可合并更新
+            assert q.submit(('a',), db_bridge.set_signal_cache, 'A', '1m', 'BUY', 2, db_config=db_config)
+        finally:
+            q.shutdown()
+        assert db_bridge.get_signal_cache('A', '1m', 'BUY', db_config) == 2
+        assert db_bridge.get_signal_cache('C', '1m', 'BUY', db_config) is None
+        assert q.stats['dropped'] == 1
+
+    def test_disabled_runs_synchronously(self, db_config):
+        q = WriteBehindQueue(db_config=db_config, enabled=False)
+        q.submit(('a',), db_bridge.set_signal_cache, 'X', '1m', 'BUY', 3, db_config=db_config)
+        assert db_bridge.get_signal_cache('X', '1m', 'BUY', db_config) == 3
@@ -23,12 +23,13 @@ import plotly.graph_objects as go
 
 # 导入项目模块
 from database.db_bridge import (
-    get_engine_status, get_control_flags, get_bot_config,
     get_recent_performance_metrics, init_db,
     load_ohlcv, load_signals,
     get_paper_balance, get_paper_positions,
     set_control_flags, update_bot_config
 )
+# 每次 rerun 都读取的单行配置表走进程内快照
+from database.config_snapshot import get_engine_status, get_control_flags, get_bot_config
 
 def load_ohlcv_from_db(symbol: str, timeframe: str, limit: int = 200) -> pd.DataFrame:
     """从数据库加载OHLCV数据并转换为DataFrame
@@ -204,6 +204,8 @@ def render_scan_block(
     - orders: 订单列表 [{'symbol': ..., 'action': ..., 'price': ..., 'type': ..., 'is_hedge': ...}, ...]
     - elapsed_sec: 扫描耗时（秒）
     - logger: 日志记录器（仅写入文件，不输出到控制台）
+    - debug_timing: 分阶段耗时 {'price_fetch', 'data_fetch', 'signal_calc'}，
+      多进程扫描后端额外包含 {'scan_pack', 'scan_compute', 'scan_ipc', 'scan_merge'}
     """
     signals = signals or []
     orders = orders or []
@@ -259,6 +261,15 @@ def render_scan_block(
             timing_parts.append(f"数据: {debug_timing['data_fetch']:.2f}s")
         if 'signal_calc' in debug_timing:
             timing_parts.append(f"信号: {debug_timing['signal_calc']:.2f}s")
+        # 多进程扫描后端的分阶段耗时
+        if 'scan_pack' in debug_timing:
+            timing_parts.append(f"打包: {debug_timing['scan_pack']:.3f}s")
+        if 'scan_compute' in debug_timing:
+            timing_parts.append(f"计算: {debug_timing['scan_compute']:.3f}s")
+        if 'scan_ipc' in debug_timing:
+            timing_parts.append(f"进程通信: {debug_timing['scan_ipc']:.3f}s")
+        if 'scan_merge' in debug_timing:
+            timing_parts.append(f"合并: {debug_timing['scan_merge']:.3f}s")
         if timing_parts:
             lines.append(f"   ⏱️ [DEBUG] {' | '.join(timing_parts)}")
     